@@ -0,0 +1,8 @@
+# autonovel/__init__.py
+# -*- coding: utf-8 -*-
+"""
+AutoNovel 命令行入口（无界面，可在无桌面环境的服务器上运行）
+
+用法:
+    python -m autonovel batch --project DIR --from 1 --to 200 --config config.json
+"""
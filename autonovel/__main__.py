@@ -0,0 +1,8 @@
+# autonovel/__main__.py
+# -*- coding: utf-8 -*-
+import sys
+
+from autonovel.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
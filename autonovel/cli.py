@@ -0,0 +1,406 @@
+# autonovel/cli.py
+# -*- coding: utf-8 -*-
+"""
+无界面命令行：批量生成章节、重建向量库
+
+    python -m autonovel batch --project DIR --from 1 --to 200 --config config.json
+    python -m autonovel multi --job DIR_A:1-200 --job DIR_B:1-50 --workers 3 --config config.json
+    python -m autonovel reindex --project DIR --config config.json
+
+stdout 每行输出一个 JSON 事件（batch_start / chapter_start / progress / log /
+chapter_done / chapter_skipped / chapter_failed / batch_done；multi 另有 project_done / stats，
+且事件带 project 字段；reindex 为 reindex_start / progress / log / reindex_done），
+Python 日志输出到 stderr。
+
+退出码:
+    0   全部章节处理成功（含跳过）
+    1   有章节生成失败，批量生成已中止；或向量库重建有批次失败（旧库保持不变）
+    2   参数或配置错误
+    130 被 Ctrl+C / SIGINT 中断
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+
+EXIT_OK = 0
+EXIT_CHAPTER_FAILED = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+
+class JsonLinesReporter:
+    """把批量生成事件按 JSON Lines 写到输出流（多线程安全，逐行 flush）"""
+
+    def __init__(self, stream=None, quiet: bool = False):
+        self.stream = stream or sys.stdout
+        self.quiet = quiet
+        self._lock = threading.Lock()
+
+    def emit(self, event: str, **fields):
+        record = {"event": event, "ts": round(time.time(), 3)}
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+    def log_callback(self, chapter: int, project: str = None):
+        extra = {"project": project} if project else {}
+
+        def log(msg):
+            if not self.quiet:
+                self.emit("log", chapter=chapter, message=str(msg), **extra)
+        return log
+
+    def progress_callback(self, chapter: int, project: str = None):
+        extra = {"project": project} if project else {}
+
+        def progress(stage, pct):
+            self.emit("progress", chapter=chapter, stage=str(stage), progress=round(float(pct), 4), **extra)
+        return progress
+
+
+class UsageError(Exception):
+    """参数或配置错误（退出码 2），fields 会附加到 error 事件中"""
+
+    def __init__(self, message: str, **fields):
+        super().__init__(message)
+        self.fields = fields
+
+
+def _load_config(path: str) -> dict:
+    # 不使用 config_manager.load_config：它在文件缺失时会写出默认配置，批处理应直接报错
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        raise UsageError(f"读取配置失败: {e}", config=path)
+
+
+def _add_generation_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--config", default="config.json", help="配置文件路径（默认 config.json）")
+    parser.add_argument("--word", type=int, default=None, help="期望字数（默认取 other_params.word_number）")
+    parser.add_argument("--min-word", type=int, default=None, help="最低字数（默认与期望字数相同）")
+    parser.add_argument("--auto-enrich", action="store_true", help="草稿低于最低字数70%%时自动扩写")
+    parser.add_argument(
+        "--on-existing", choices=["skip", "overwrite", "fail"], default="skip",
+        help="章节文件已存在时的处理方式（默认 skip）"
+    )
+    parser.add_argument("--retries", type=int, default=1, help="单章失败后的重试次数（默认1）")
+    parser.add_argument(
+        "--pipeline-depth", type=int, default=None,
+        help="同时在途的章节数：2 表示第N章定稿时预取第N+1章上下文，1 为完全串行（默认取 AUTONOVEL_PIPELINE_DEPTH，未设置时为2）"
+    )
+    parser.add_argument("--quiet", action="store_true", help="不输出 log 事件，只输出进度与结果")
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m autonovel", description="AutoNovel 无界面命令行")
+    subparsers = parser.add_subparsers(dest="command")
+
+    batch = subparsers.add_parser("batch", help="批量生成章节（构建提示词 → 草稿 → 扩写 → 定稿）")
+    batch.add_argument("--project", required=True, help="项目目录（含 Novel_architecture.txt / Novel_directory.txt）")
+    batch.add_argument("--from", dest="start", type=int, required=True, help="起始章节号")
+    batch.add_argument("--to", dest="end", type=int, required=True, help="结束章节号（含）")
+    _add_generation_arguments(batch)
+
+    multi = subparsers.add_parser("multi", help="多个项目并发批量生成（项目内按章节顺序，项目间轮流调度）")
+    multi.add_argument(
+        "--job", action="append", required=True, metavar="DIR:FROM-TO",
+        help="项目目录及章节范围，可重复指定，例如 --job ./novel_a:1-200"
+    )
+    multi.add_argument("--workers", type=int, default=3, help="同时生成的项目数（默认3）")
+    multi.add_argument("--stats-interval", type=float, default=30.0, help="输出 stats 事件的间隔秒数（默认30）")
+    _add_generation_arguments(multi)
+
+    reindex = subparsers.add_parser("reindex", help="从定稿章节与卷摘要重建向量库（完成后替换 vectorstore/，中断可续跑）")
+    reindex.add_argument("--project", required=True, help="项目目录（含 chapters/）")
+    reindex.add_argument("--config", default="config.json", help="配置文件路径（默认 config.json）")
+    reindex.add_argument(
+        "--workers", type=int, default=None,
+        help="并发 embedding 的批次数（默认取 AUTONOVEL_REINDEX_WORKERS，未设置时为2）"
+    )
+    reindex.add_argument(
+        "--batch-size", type=int, default=None,
+        help="每批分块数（默认取 AUTONOVEL_REINDEX_BATCH，未设置时为256）"
+    )
+    reindex.add_argument("--quiet", action="store_true", help="不输出 log 事件，只输出进度与结果")
+    return parser
+
+
+def _parse_job(spec: str):
+    match = re.match(r"^(.+):(\d+)-(\d+)$", spec.strip())
+    if not match:
+        raise UsageError(f"无法解析 --job {spec!r}，格式应为 DIR:FROM-TO")
+    return match.group(1), int(match.group(2)), int(match.group(3))
+
+
+def _word_settings(args, config: dict):
+    other_params = config.get("other_params", {})
+    try:
+        word = args.word if args.word is not None else int(other_params.get("word_number", 3000))
+    except (TypeError, ValueError):
+        word = 3000
+    min_word = args.min_word if args.min_word is not None else word
+    return word, min_word
+
+
+def _plan_project(args, config: dict, project: str, start: int, end: int):
+    """
+    校验项目目录与章节范围，构建批量上下文并确定要跳过的章节
+
+    Returns:
+        (batch_context, skip_chapters, resuming, to_generate)
+    """
+    filepath = os.path.abspath(project)
+    if not os.path.isdir(filepath):
+        raise UsageError(f"项目目录不存在: {filepath}")
+    if start < 1 or start > end:
+        raise UsageError(f"章节范围无效: {start}-{end}", project=filepath)
+
+    # 延迟导入：参数错误时不必加载 LLM / 向量库依赖
+    from novel_generator.batch import build_batch_context_from_config, pending_chapters
+
+    try:
+        batch_context = build_batch_context_from_config(config, filepath=filepath)
+    except (KeyError, StopIteration) as e:
+        raise UsageError(f"配置不完整: {e}", config=args.config)
+
+    # 检查点日志中未完成的章节即使文件已存在也要续跑
+    resumable = pending_chapters(filepath)
+    chapters_dir = os.path.join(filepath, "chapters")
+    existing = [
+        n for n in range(start, end + 1)
+        if n not in resumable and os.path.exists(os.path.join(chapters_dir, f"chapter_{n}.txt"))
+    ]
+    if existing and args.on_existing == "fail":
+        raise UsageError("章节文件已存在", project=filepath, existing_chapters=existing)
+    skip_chapters = set(existing) if args.on_existing == "skip" else set()
+    resuming = sorted(n for n in resumable if start <= n <= end)
+    to_generate = [n for n in range(start, end + 1) if n not in skip_chapters]
+    return batch_context, skip_chapters, resuming, to_generate
+
+
+def _pipeline_depth(args) -> int:
+    from novel_generator.batch import PIPELINE_DEPTH
+    return args.pipeline_depth if args.pipeline_depth is not None else PIPELINE_DEPTH
+
+
+def run_batch(args, reporter: JsonLinesReporter) -> int:
+    config = _load_config(args.config)
+    batch_context, skip_chapters, resuming, to_generate = _plan_project(
+        args, config, args.project, args.start, args.end
+    )
+
+    from core.utils.rate_limiter import configure_rate_limits_from_config
+    from novel_generator.batch import ChapterPipeline, generate_chapter_with_retry
+
+    configure_rate_limits_from_config(config)
+    word, min_word = _word_settings(args, config)
+    filepath = batch_context["filepath"]
+    total = args.end - args.start + 1
+    depth = _pipeline_depth(args)
+    reporter.emit(
+        "batch_start", project=filepath, start=args.start, end=args.end, total=total,
+        skipped=len(skip_chapters), resuming=resuming, word=word, min_word=min_word,
+        auto_enrich=args.auto_enrich, pipeline_depth=depth
+    )
+
+    batch_started = time.monotonic()
+    processed = 0
+    failed_chapter = None
+    with ChapterPipeline(batch_context, word, min_word, args.auto_enrich, depth=depth) as pipeline:
+        for chapter_num in range(args.start, args.end + 1):
+            if chapter_num in skip_chapters:
+                reporter.emit("chapter_skipped", chapter=chapter_num, reason="exists")
+                continue
+
+            position = to_generate.index(chapter_num)
+            next_chapter = to_generate[position + 1] if position + 1 < len(to_generate) else None
+            reporter.emit("chapter_start", chapter=chapter_num)
+            chapter_started = time.monotonic()
+            try:
+                success = generate_chapter_with_retry(
+                    batch_context, chapter_num, word, min_word, args.auto_enrich,
+                    log=reporter.log_callback(chapter_num),
+                    progress=reporter.progress_callback(chapter_num),
+                    max_retries=max(0, args.retries),
+                    pipeline=pipeline,
+                    next_chapter=next_chapter
+                )
+            except Exception as e:
+                logging.error(f"Chapter {chapter_num} batch generation failed: {e}")
+                reporter.emit("chapter_failed", chapter=chapter_num, error=str(e))
+                failed_chapter = chapter_num
+                break
+
+            elapsed = round(time.monotonic() - chapter_started, 2)
+            if not success:
+                reporter.emit("chapter_failed", chapter=chapter_num, error="定稿失败（章节内容为空）", seconds=elapsed)
+                failed_chapter = chapter_num
+                break
+            processed += 1
+            reporter.emit("chapter_done", chapter=chapter_num, seconds=elapsed)
+
+    reporter.emit(
+        "batch_done",
+        status="failed" if failed_chapter is not None else "ok",
+        processed=processed,
+        skipped=len(skip_chapters),
+        failed_chapter=failed_chapter,
+        seconds=round(time.monotonic() - batch_started, 2)
+    )
+    return EXIT_CHAPTER_FAILED if failed_chapter is not None else EXIT_OK
+
+
+def run_multi(args, reporter: JsonLinesReporter) -> int:
+    config = _load_config(args.config)
+    jobs = [_parse_job(spec) for spec in args.job]
+    plans = []
+    for project, start, end in jobs:
+        plans.append((start, end) + _plan_project(args, config, project, start, end))
+    projects = [plan[2]["filepath"] for plan in plans]
+    if len(set(projects)) != len(projects):
+        raise UsageError("同一项目目录不能重复指定 --job")
+
+    from core.utils.rate_limiter import configure_rate_limits_from_config, inflight_stats
+    from core.utils.task_queue import ProjectScheduler, TaskManager
+    from novel_generator.batch import schedule_project_batch
+
+    configure_rate_limits_from_config(config)
+    word, min_word = _word_settings(args, config)
+    depth = _pipeline_depth(args)
+
+    def on_event(event, project, label, **fields):
+        chapter = int(label.rsplit("_", 1)[1]) if label else None
+        if event == "task_start":
+            reporter.emit("chapter_start", project=project, chapter=chapter)
+        elif event == "task_done":
+            reporter.emit("chapter_done", project=project, chapter=chapter, **fields)
+        elif event == "task_failed":
+            reporter.emit("chapter_failed", project=project, chapter=chapter, **fields)
+        elif event == "project_done":
+            reporter.emit("project_done", project=project, **fields)
+
+    def emit_stats():
+        reporter.emit("stats", providers=inflight_stats(), **scheduler.stats())
+
+    # 独立的线程池：线程数即同时生成的项目数，不影响 GUI 共享的全局 TaskManager
+    scheduler = ProjectScheduler(TaskManager(), max_workers=max(1, args.workers), on_event=on_event)
+    started = time.monotonic()
+    for start, end, batch_context, skip_chapters, resuming, to_generate in plans:
+        filepath = batch_context["filepath"]
+        reporter.emit(
+            "batch_start", project=filepath, start=start, end=end, total=end - start + 1,
+            skipped=len(skip_chapters), resuming=resuming, word=word, min_word=min_word,
+            auto_enrich=args.auto_enrich, pipeline_depth=depth
+        )
+        for chapter_num in sorted(skip_chapters):
+            reporter.emit("chapter_skipped", project=filepath, chapter=chapter_num, reason="exists")
+        schedule_project_batch(
+            scheduler, batch_context, to_generate, word, min_word, args.auto_enrich,
+            log_factory=lambda n, p=filepath: reporter.log_callback(n, p),
+            progress_factory=lambda n, p=filepath: reporter.progress_callback(n, p),
+            max_retries=max(0, args.retries),
+            depth=depth
+        )
+
+    try:
+        while not scheduler.wait(timeout=max(1.0, args.stats_interval)):
+            emit_stats()
+    except KeyboardInterrupt:
+        scheduler.cancel()
+        raise
+
+    emit_stats()
+    stats = scheduler.stats()
+    failures = scheduler.failures()
+    reporter.emit(
+        "batch_done",
+        status="failed" if failures else "ok",
+        processed=sum(project["done"] for project in stats["projects"].values()),
+        failed={project: label for project, (label, _) in failures.items()},
+        seconds=round(time.monotonic() - started, 2)
+    )
+    return EXIT_CHAPTER_FAILED if failures else EXIT_OK
+
+
+def run_reindex(args, reporter: JsonLinesReporter) -> int:
+    config = _load_config(args.config)
+    filepath = os.path.abspath(args.project)
+    if not os.path.isdir(filepath):
+        raise UsageError(f"项目目录不存在: {filepath}")
+
+    from novel_generator.batch import build_batch_context_from_config
+
+    try:
+        batch_context = build_batch_context_from_config(config, filepath=filepath)
+    except (KeyError, StopIteration) as e:
+        raise UsageError(f"配置不完整: {e}", config=args.config)
+
+    from core.utils.rate_limiter import configure_rate_limits_from_config
+    from novel_generator.reindex import rebuild_vector_store
+
+    configure_rate_limits_from_config(config)
+    embedding = batch_context["embedding"]
+    reporter.emit(
+        "reindex_start", project=filepath, interface_format=embedding["interface_format"],
+        model_name=embedding["model_name"]
+    )
+
+    def log(msg):
+        if not reporter.quiet:
+            reporter.emit("log", message=str(msg))
+
+    def progress(stage, pct):
+        reporter.emit("progress", stage=str(stage), progress=round(float(pct), 4))
+
+    summary = rebuild_vector_store(
+        embedding["api_key"],
+        embedding["url"],
+        embedding["interface_format"],
+        embedding["model_name"],
+        filepath,
+        num_volumes=batch_context["num_volumes"],
+        total_chapters=batch_context["total_chapters"],
+        log_callback=log,
+        progress_callback=progress,
+        max_workers=args.workers,
+        batch_size=args.batch_size
+    )
+    reporter.emit("reindex_done", **summary)
+    return EXIT_CHAPTER_FAILED if summary["status"] == "failed" else EXIT_OK
+
+
+def main(argv=None) -> int:
+    parser = _build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help(sys.stderr)
+        return EXIT_USAGE
+
+    logging.basicConfig(
+        level=logging.INFO,
+        stream=sys.stderr,
+        format="%(asctime)s [%(levelname)s] %(message)s"
+    )
+    reporter = JsonLinesReporter(quiet=args.quiet)
+    runner = {"multi": run_multi, "reindex": run_reindex}.get(args.command, run_batch)
+    try:
+        return runner(args, reporter)
+    except UsageError as e:
+        reporter.emit("error", message=str(e), **e.fields)
+        return EXIT_USAGE
+    except KeyboardInterrupt:
+        reporter.emit("reindex_done" if args.command == "reindex" else "batch_done", status="interrupted")
+        return EXIT_INTERRUPTED
+    finally:
+        # 退出前归还并释放向量库句柄（只在本次运行确实打开过向量库时）
+        vectorstore_utils = sys.modules.get("novel_generator.vectorstore_utils")
+        if vectorstore_utils is not None:
+            vectorstore_utils.close_all_vector_stores()
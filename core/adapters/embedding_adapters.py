@@ -1,10 +1,17 @@
 # embedding_adapters.py
 # -*- coding: utf-8 -*-
 import logging
+import os
+import threading
+import time
 import traceback
-from typing import List
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Tuple
 import requests
+import requests.adapters
 from langchain_openai import AzureOpenAIEmbeddings, OpenAIEmbeddings
+from core.utils.embedding_cache import get_embedding_cache, text_digest
+from core.utils.rate_limiter import estimate_tokens
 
 def ensure_openai_base_url_has_v1(url: str) -> str:
     """
@@ -19,6 +26,105 @@ def ensure_openai_base_url_has_v1(url: str) -> str:
             url = url.rstrip('/') + '/v1'
     return url
 
+# HTTP 类 embedding 适配器共用：连接复用、超时、并发与逐条重试
+try:
+    EMBEDDING_REQUEST_TIMEOUT = float(os.getenv("AUTONOVEL_EMBEDDING_TIMEOUT", "60"))
+except ValueError:
+    EMBEDDING_REQUEST_TIMEOUT = 60.0
+try:
+    EMBEDDING_MAX_WORKERS = max(1, int(os.getenv("AUTONOVEL_EMBEDDING_WORKERS", "4")))
+except ValueError:
+    EMBEDDING_MAX_WORKERS = 4
+EMBEDDING_ITEM_RETRIES = 2
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """进程共享的 requests.Session（连接池大小覆盖并发数，复用 TCP/TLS 连接）"""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            pool_size = max(10, EMBEDDING_MAX_WORKERS * 4)
+            http_adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("http://", http_adapter)
+            session.mount("https://", http_adapter)
+            _http_session = session
+        return _http_session
+
+
+def _map_concurrently(func, items: list, max_workers: int = None) -> list:
+    """在有界线程池中对每个元素调用 func，结果顺序与输入一致；单个元素直接在当前线程执行"""
+    if len(items) <= 1:
+        return [func(item) for item in items]
+    workers = min(len(items), max_workers or EMBEDDING_MAX_WORKERS)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embedding") as executor:
+        return list(executor.map(func, items))
+
+
+def _retry_failed_items(texts: List[str], vectors: List[List[float]], embed_one, label: str) -> List[List[float]]:
+    """对结果为空的文本逐条重试（退避等待），只重发失败的那几条"""
+    vectors = list(vectors)
+    for attempt in range(1, EMBEDDING_ITEM_RETRIES + 1):
+        missing = [i for i, vec in enumerate(vectors) if not vec]
+        if not missing:
+            break
+        logging.warning(f"{label} embedding: {len(missing)}/{len(texts)} texts failed, retry {attempt}/{EMBEDDING_ITEM_RETRIES}")
+        time.sleep(attempt)
+        retried = _map_concurrently(embed_one, [texts[i] for i in missing])
+        for i, vec in zip(missing, retried):
+            vectors[i] = vec
+    return vectors
+
+def _embed_in_sub_batches(
+    texts: List[str],
+    embed_batch,
+    embed_one,
+    max_batch_size: int,
+    max_tokens: int,
+    label: str,
+) -> List[List[float]]:
+    """
+    去重后按条数与估算 token 数把文本切成子批次，有界并发请求，结果按输入顺序拼回
+
+    Args:
+        embed_batch: 请求一个子批次，返回与输入等长的向量列表，失败返回 None
+        embed_one: 请求单条文本（用于逐条重试失败项），失败返回 []
+        max_batch_size: 每次请求的最多条数
+        max_tokens: 每次请求的估算 token 上限（单条超限时单独成批）
+    """
+    if not texts:
+        return []
+    unique = list(dict.fromkeys(texts))
+    batches, current, current_tokens = [], [], 0
+    for text in unique:
+        tokens = estimate_tokens(text)
+        if current and (len(current) >= max_batch_size or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    if len(batches) > 1 or len(unique) < len(texts):
+        logging.debug(f"{label} embedding: {len(texts)} texts -> {len(unique)} unique in {len(batches)} requests")
+
+    vectors = []
+    for batch, result in zip(batches, _map_concurrently(embed_batch, batches)):
+        vectors.extend(result if result is not None and len(result) == len(batch) else [[] for _ in batch])
+    vectors = _retry_failed_items(unique, vectors, embed_one, label)
+    by_text = dict(zip(unique, vectors))
+    return [by_text[text] for text in texts]
+
+def _ordered_embeddings(data: list, expected: int) -> List[List[float]]:
+    """OpenAI 兼容响应的 data 按 index 排序后取出向量，条数不符时抛出 ValueError"""
+    if len(data) != expected:
+        raise ValueError(f"expected {expected} embeddings, got {len(data)}")
+    items = sorted(data, key=lambda item: item.get("index", 0))
+    return [item.get("embedding", []) for item in items]
+
 class BaseEmbeddingAdapter:
     """
     Embedding 接口统一基类
@@ -75,54 +181,93 @@ class AzureOpenAIEmbeddingAdapter(BaseEmbeddingAdapter):
 
 class OllamaEmbeddingAdapter(BaseEmbeddingAdapter):
     """
-    其接口路径为 /api/embeddings
+    Ollama 本地服务：优先使用批量接口 /api/embed（input 为列表），
+    旧版本 Ollama 不支持时退回 /api/embeddings 逐条并发请求
     """
+    MAX_BATCH_SIZE = 256
+    MAX_TOKENS_PER_REQUEST = 32000
+
     def __init__(self, model_name: str, base_url: str):
         self.model_name = model_name
         self.base_url = base_url.rstrip("/")
+        root = self._service_root(self.base_url)
+        self.batch_url = f"{root}/api/embed"
+        self.single_url = f"{root}/api/embeddings"
+        self._batch_supported = True
+
+    @staticmethod
+    def _service_root(url: str) -> str:
+        for suffix in ("/api/embeddings", "/api/embed", "/api"):
+            if url.endswith(suffix):
+                return url[:-len(suffix)]
+        if "/v1" in url:
+            url = url[:url.index("/v1")]
+        return url.rstrip("/")
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        embeddings = []
-        for text in texts:
-            vec = self._embed_single(text)
-            embeddings.append(vec)
-        return embeddings
+        return _embed_in_sub_batches(
+            texts, self._embed_batch, self._embed_single,
+            self.MAX_BATCH_SIZE, self.MAX_TOKENS_PER_REQUEST, "Ollama"
+        )
 
     def embed_query(self, query: str) -> List[float]:
-        return self._embed_single(query)
+        return _retry_failed_items([query], [self._embed_single(query)], self._embed_single, "Ollama")[0]
+
+    def _embed_batch(self, texts: List[str]):
+        """请求一个子批次：优先 /api/embed，不支持时逐条并发请求 /api/embeddings"""
+        if self._batch_supported:
+            vectors = self._request_batch(texts)
+            if vectors is not None or self._batch_supported:
+                return vectors
+        return _map_concurrently(self._embed_single, texts)
+
+    def _request_batch(self, texts: List[str]):
+        """调用 /api/embed 一次取回整批向量；接口不可用或失败时返回 None"""
+        try:
+            response = get_http_session().post(
+                self.batch_url,
+                json={"model": self.model_name, "input": texts},
+                timeout=EMBEDDING_REQUEST_TIMEOUT
+            )
+            if response.status_code == 404 and "model" not in response.text.lower():
+                logging.info("Ollama /api/embed not available, falling back to /api/embeddings")
+                self._batch_supported = False
+                return None
+            response.raise_for_status()
+            embeddings = response.json().get("embeddings")
+            if not isinstance(embeddings, list) or len(embeddings) != len(texts):
+                raise ValueError("Unexpected 'embeddings' field in Ollama response.")
+            return embeddings
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logging.error(f"Ollama batch embeddings request error: {e}")
+            return None
 
     def _embed_single(self, text: str) -> List[float]:
         """
         调用 Ollama 本地服务 /api/embeddings 接口，获取文本 embedding
         """
-        url = self.base_url.rstrip("/")
-        if "/api/embeddings" not in url:
-            if "/api" in url:
-                url = f"{url}/embeddings"
-            else:
-                if "/v1" in url:
-                    url = url[:url.index("/v1")]
-                url = f"{url}/api/embeddings"
-
         data = {
             "model": self.model_name,
             "prompt": text
         }
         try:
-            response = requests.post(url, json=data)
+            response = get_http_session().post(self.single_url, json=data, timeout=EMBEDDING_REQUEST_TIMEOUT)
             response.raise_for_status()
             result = response.json()
             if "embedding" not in result:
                 raise ValueError("No 'embedding' field in Ollama response.")
             return result["embedding"]
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, ValueError) as e:
             logging.error(f"Ollama embeddings request error: {e}\n{traceback.format_exc()}")
             return []
 
 class MLStudioEmbeddingAdapter(BaseEmbeddingAdapter):
     """
-    基于 LM Studio 的 embedding 适配器
+    基于 LM Studio 的 embedding 适配器（OpenAI 兼容 /v1/embeddings，input 为列表）
     """
+    MAX_BATCH_SIZE = 64
+    MAX_TOKENS_PER_REQUEST = 16000
+
     def __init__(self, api_key: str, base_url: str, model_name: str):
         self.url = ensure_openai_base_url_has_v1(base_url)
         if not self.url.endswith('/embeddings'):
@@ -135,51 +280,48 @@ class MLStudioEmbeddingAdapter(BaseEmbeddingAdapter):
         self.model_name = model_name
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return _embed_in_sub_batches(
+            texts, self._embed_batch, self._embed_single,
+            self.MAX_BATCH_SIZE, self.MAX_TOKENS_PER_REQUEST, "LM Studio"
+        )
+
+    def embed_query(self, query: str) -> List[float]:
+        return _retry_failed_items([query], [self._embed_single(query)], self._embed_single, "LM Studio")[0]
+
+    def _embed_batch(self, texts: List[str]):
+        """请求一个子批次；失败时返回 None"""
         try:
             payload = {
                 "input": texts,
                 "model": self.model_name
             }
-            response = requests.post(self.url, json=payload, headers=self.headers)
+            response = get_http_session().post(self.url, json=payload, headers=self.headers, timeout=EMBEDDING_REQUEST_TIMEOUT)
             response.raise_for_status()
             result = response.json()
             if "data" not in result:
                 logging.error(f"Invalid response format from LM Studio API: {result}")
-                return [[]] * len(texts)
-            return [item.get("embedding", []) for item in result["data"]]
+                return None
+            return _ordered_embeddings(result["data"], len(texts))
         except requests.exceptions.RequestException as e:
             logging.error(f"LM Studio API request failed: {str(e)}")
-            return [[]] * len(texts)
+            return None
         except (KeyError, IndexError, ValueError, TypeError) as e:
             logging.error(f"Error parsing LM Studio API response: {str(e)}")
-            return [[]] * len(texts)
+            return None
 
-    def embed_query(self, query: str) -> List[float]:
-        try:
-            payload = {
-                "input": query,
-                "model": self.model_name
-            }
-            response = requests.post(self.url, json=payload, headers=self.headers)
-            response.raise_for_status()
-            result = response.json()
-            if "data" not in result or not result["data"]:
-                logging.error(f"Invalid response format from LM Studio API: {result}")
-                return []
-            return result["data"][0].get("embedding", [])
-        except requests.exceptions.RequestException as e:
-            logging.error(f"LM Studio API request failed: {str(e)}")
-            return []
-        except (KeyError, IndexError, ValueError, TypeError) as e:
-            logging.error(f"Error parsing LM Studio API response: {str(e)}")
-            return []
+    def _embed_single(self, text: str) -> List[float]:
+        result = self._embed_batch([text])
+        return result[0] if result else []
 
 class GeminiEmbeddingAdapter(BaseEmbeddingAdapter):
     """
     基于 Google Generative AI (Gemini) 接口的 Embedding 适配器
-    使用直接 POST 请求方式，URL 示例：
-    https://generativelanguage.googleapis.com/v1beta/models/text-embedding-004:embedContent?key=YOUR_API_KEY
+    使用直接 POST 请求方式，批量文本走 batchEmbedContents（每次最多100条，多批并发），URL 示例：
+    https://generativelanguage.googleapis.com/v1beta/models/text-embedding-004:batchEmbedContents?key=YOUR_API_KEY
     """
+    MAX_BATCH_SIZE = 100
+    MAX_TOKENS_PER_REQUEST = 100 * 2048
+
     def __init__(self, api_key: str, model_name: str, base_url: str):
         """
         :param api_key: 传入的 Google API Key
@@ -189,16 +331,40 @@ class GeminiEmbeddingAdapter(BaseEmbeddingAdapter):
         self.api_key = api_key
         self.model_name = model_name
         self.base_url = base_url.rstrip("/")
+        # batchEmbedContents 的每个子请求需要带 "models/" 前缀的完整模型名
+        self.model_ref = model_name if model_name.startswith("models/") else f"models/{model_name}"
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        embeddings = []
-        for text in texts:
-            vec = self._embed_single(text)
-            embeddings.append(vec)
-        return embeddings
+        return _embed_in_sub_batches(
+            texts, self._embed_batch, self._embed_single,
+            self.MAX_BATCH_SIZE, self.MAX_TOKENS_PER_REQUEST, "Gemini"
+        )
 
     def embed_query(self, query: str) -> List[float]:
-        return self._embed_single(query)
+        return _retry_failed_items([query], [self._embed_single(query)], self._embed_single, "Gemini")[0]
+
+    def _embed_batch(self, texts: List[str]):
+        """调用 batchEmbedContents 取回一批向量；失败时返回 None"""
+        url = f"{self.base_url}/{self.model_name}:batchEmbedContents?key={self.api_key}"
+        payload = {
+            "requests": [
+                {"model": self.model_ref, "content": {"parts": [{"text": text}]}}
+                for text in texts
+            ]
+        }
+        try:
+            response = get_http_session().post(url, json=payload, timeout=EMBEDDING_REQUEST_TIMEOUT)
+            response.raise_for_status()
+            embeddings = response.json().get("embeddings")
+            if not isinstance(embeddings, list) or len(embeddings) != len(texts):
+                raise ValueError("Unexpected 'embeddings' field in Gemini response.")
+            return [item.get("values", []) for item in embeddings]
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Gemini batchEmbedContents request error: {e}")
+            return None
+        except Exception as e:
+            logging.error(f"Gemini batchEmbedContents parse error: {e}\n{traceback.format_exc()}")
+            return None
 
     def _embed_single(self, text: str) -> List[float]:
         """
@@ -215,8 +381,7 @@ class GeminiEmbeddingAdapter(BaseEmbeddingAdapter):
         }
 
         try:
-            response = requests.post(url, json=payload)
-            print(response.text)
+            response = get_http_session().post(url, json=payload, timeout=EMBEDDING_REQUEST_TIMEOUT)
             response.raise_for_status()
             result = response.json()
             embedding_data = result.get("embedding", {})
@@ -230,71 +395,224 @@ class GeminiEmbeddingAdapter(BaseEmbeddingAdapter):
 
 class SiliconFlowEmbeddingAdapter(BaseEmbeddingAdapter):
     """
-    基于 SiliconFlow 的 embedding 适配器
+    基于 SiliconFlow 的 embedding 适配器（input 为列表，按服务商限制自动拆分子批次）
     """
+    MAX_BATCH_SIZE = 32
+    MAX_TOKENS_PER_REQUEST = 8000
+
     def __init__(self, api_key: str, base_url: str, model_name: str):
         # 自动为 base_url 添加 scheme（如果缺失）
         if not base_url.startswith("http://") and not base_url.startswith("https://"):
             base_url = "https://" + base_url
         self.url = base_url if base_url else "https://api.siliconflow.cn/v1/embeddings"
-
-        self.payload = {
-            "model": model_name,
-            "input": "Silicon flow embedding online: fast, affordable, and high-quality embedding services. come try it out!",
-            "encoding_format": "float"
-        }
+        self.model_name = model_name
         self.headers = {
             "Authorization": "Bearer {api_key}".format(api_key=api_key),
             "Content-Type": "application/json"
         }
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        embeddings = []
-        for text in texts:
-            try:
-                self.payload["input"] = text
-                response = requests.post(self.url, json=self.payload, headers=self.headers)
-                response.raise_for_status()
-                result = response.json()
-                if not result or "data" not in result or not result["data"]:
-                    logging.error(f"Invalid response format from SiliconFlow API: {result}")
-                    embeddings.append([])
-                    continue
-                emb = result["data"][0].get("embedding", [])
-                embeddings.append(emb)
-            except requests.exceptions.RequestException as e:
-                logging.error(f"SiliconFlow API request failed: {str(e)}")
-                embeddings.append([])
-            except (KeyError, IndexError, ValueError, TypeError) as e:
-                logging.error(f"Error parsing SiliconFlow API response: {str(e)}")
-                embeddings.append([])
-        return embeddings
+        return _embed_in_sub_batches(
+            texts, self._embed_batch, self._embed_single,
+            self.MAX_BATCH_SIZE, self.MAX_TOKENS_PER_REQUEST, "SiliconFlow"
+        )
 
     def embed_query(self, query: str) -> List[float]:
+        return _retry_failed_items([query], [self._embed_single(query)], self._embed_single, "SiliconFlow")[0]
+
+    def _embed_batch(self, texts: List[str]):
+        """请求一个子批次；失败时返回 None"""
+        payload = {
+            "model": self.model_name,
+            "input": texts,
+            "encoding_format": "float"
+        }
         try:
-            self.payload["input"] = query
-            response = requests.post(self.url, json=self.payload, headers=self.headers)
+            response = get_http_session().post(self.url, json=payload, headers=self.headers, timeout=EMBEDDING_REQUEST_TIMEOUT)
             response.raise_for_status()
             result = response.json()
             if not result or "data" not in result or not result["data"]:
                 logging.error(f"Invalid response format from SiliconFlow API: {result}")
-                return []
-            return result["data"][0].get("embedding", [])
+                return None
+            return _ordered_embeddings(result["data"], len(texts))
         except requests.exceptions.RequestException as e:
             logging.error(f"SiliconFlow API request failed: {str(e)}")
-            return []
+            return None
         except (KeyError, IndexError, ValueError, TypeError) as e:
             logging.error(f"Error parsing SiliconFlow API response: {str(e)}")
+            return None
+
+    def _embed_single(self, text: str) -> List[float]:
+        result = self._embed_batch([text])
+        return result[0] if result else []
+
+# 本地模型：进程内按 (模型名, 后端) 只加载一次，首次创建适配器时在后台线程预热
+LOCAL_EMBEDDING_DEFAULT_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+LOCAL_EMBEDDING_BACKEND = os.getenv("AUTONOVEL_LOCAL_EMBEDDING_BACKEND", "torch").strip().lower()
+try:
+    LOCAL_EMBEDDING_BATCH_SIZE = max(1, int(os.getenv("AUTONOVEL_LOCAL_EMBEDDING_BATCH", "32")))
+except ValueError:
+    LOCAL_EMBEDDING_BATCH_SIZE = 32
+try:
+    LOCAL_EMBEDDING_THREADS = max(0, int(os.getenv("AUTONOVEL_LOCAL_EMBEDDING_THREADS", "0")))
+except ValueError:
+    LOCAL_EMBEDDING_THREADS = 0
+
+_local_models: Dict[Tuple[str, str], Future] = {}
+_local_models_lock = threading.Lock()
+# 同一模型（model_name, backend）的推理串行执行，避免多个适配器实例的线程同时占满 CPU 核心
+_local_encode_locks: Dict[Tuple[str, str], threading.Lock] = {}
+_local_model_loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-loader")
+
+
+def _load_local_model(model_name: str, backend: str, threads: int):
+    """
+    加载 sentence-transformers 模型（backend 为 torch 或 onnx，onnx 由 optimum + onnxruntime 在 CPU 上推理）
+
+    threads 非 0 时显式设置推理线程数：torch 后端用 torch.set_num_threads，
+    onnx 后端通过 SessionOptions.intra_op_num_threads 传给 onnxruntime 会话。
+    """
+    from sentence_transformers import SentenceTransformer
+    started = time.monotonic()
+    if backend == "onnx":
+        model_kwargs = {"provider": "CPUExecutionProvider"}
+        if threads:
+            import onnxruntime
+            session_options = onnxruntime.SessionOptions()
+            session_options.intra_op_num_threads = threads
+            model_kwargs["session_options"] = session_options
+        model = SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+    else:
+        if threads:
+            try:
+                import torch
+                torch.set_num_threads(threads)
+            except Exception as e:
+                logging.warning(f"Failed to set torch threads: {e}")
+        model = SentenceTransformer(model_name, device="cpu")
+    logging.info(f"Local embedding model {model_name} ({backend}) loaded in {time.monotonic() - started:.1f}s")
+    return model
+
+
+def get_local_embedding_model(model_name: str, backend: str = None, threads: int = None) -> Future:
+    """返回加载本地模型的 Future；同一模型只提交一次加载任务（即后台预热）"""
+    backend = backend or LOCAL_EMBEDDING_BACKEND
+    threads = LOCAL_EMBEDDING_THREADS if threads is None else threads
+    key = (model_name, backend)
+    with _local_models_lock:
+        future = _local_models.get(key)
+        if future is None or (future.done() and future.exception() is not None):
+            future = _local_model_loader.submit(_load_local_model, model_name, backend, threads)
+            _local_models[key] = future
+        return future
+
+
+def get_local_encode_lock(model_name: str, backend: str = None) -> threading.Lock:
+    """返回同一本地模型共享的推理锁"""
+    key = (model_name, backend or LOCAL_EMBEDDING_BACKEND)
+    with _local_models_lock:
+        return _local_encode_locks.setdefault(key, threading.Lock())
+
+
+class LocalEmbeddingAdapter(BaseEmbeddingAdapter):
+    """
+    本地 CPU 推理的 embedding 适配器（sentence-transformers，可选 onnxruntime 后端），不发起网络请求
+    model_name 可以是 HuggingFace 模型名或本地模型目录；base_url 不使用。
+    通过环境变量调整：
+    - AUTONOVEL_LOCAL_EMBEDDING_BACKEND=torch|onnx
+    - AUTONOVEL_LOCAL_EMBEDDING_BATCH=32    每批推理的文本数
+    - AUTONOVEL_LOCAL_EMBEDDING_THREADS=0   推理线程数（0 为框架默认）
+    """
+    def __init__(self, model_name: str, batch_size: int = None):
+        self.model_name = (model_name or "").strip() or LOCAL_EMBEDDING_DEFAULT_MODEL
+        self.batch_size = batch_size or LOCAL_EMBEDDING_BATCH_SIZE
+        self._model_future = get_local_embedding_model(self.model_name)
+        self._encode_lock = get_local_encode_lock(self.model_name)
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        try:
+            model = self._model_future.result()
+        except Exception as e:
+            logging.error(f"Local embedding model {self.model_name} failed to load: {e}\n{traceback.format_exc()}")
+            return [[] for _ in texts]
+        try:
+            with self._encode_lock:
+                vectors = model.encode(
+                    texts,
+                    batch_size=self.batch_size,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True,
+                    show_progress_bar=False
+                )
+            return [vec.tolist() for vec in vectors]
+        except Exception as e:
+            logging.error(f"Local embedding inference error: {e}\n{traceback.format_exc()}")
+            return [[] for _ in texts]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
             return []
+        return self._encode(list(texts))
 
-def create_embedding_adapter(
+    def embed_query(self, query: str) -> List[float]:
+        return self._encode([query])[0]
+
+class CachedEmbeddingAdapter(BaseEmbeddingAdapter):
+    """
+    在任意 embedding 适配器前加一层持久化缓存：
+    只把缓存未命中（且去重后）的文本发给服务商，返回顺序与输入一致。
+    服务商返回的空向量（失败）不写入缓存，下次仍会重新请求。
+    """
+    def __init__(self, inner: BaseEmbeddingAdapter, cache_model: str, cache=None):
+        self.inner = inner
+        self.cache_model = cache_model
+        self.cache = cache
+
+    def __getattr__(self, name):
+        # 透传 model_name / base_url 等属性，调用方无需区分是否包了缓存
+        if name == "inner":
+            raise AttributeError(name)
+        return getattr(self.inner, name)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        digests = [text_digest(t) for t in texts]
+        vectors = self.cache.get_many(self.cache_model, digests)
+
+        miss_texts = {}
+        for digest, text in zip(digests, texts):
+            if digest not in vectors and digest not in miss_texts:
+                miss_texts[digest] = text
+        if miss_texts:
+            miss_digests = list(miss_texts)
+            embedded = self.inner.embed_documents([miss_texts[d] for d in miss_digests]) or []
+            fresh = {d: vec for d, vec in zip(miss_digests, embedded) if vec}
+            self.cache.put_many(self.cache_model, fresh)
+            vectors.update(fresh)
+        logging.debug(
+            f"[EmbeddingCache] {self.cache_model}: {len(texts)} texts, {len(miss_texts)} sent to provider"
+        )
+        return [vectors.get(d, []) for d in digests]
+
+    def embed_query(self, query: str) -> List[float]:
+        digest = text_digest(query)
+        cached = self.cache.get_many(self.cache_model, [digest])
+        if digest in cached:
+            return cached[digest]
+        vec = self.inner.embed_query(query)
+        if vec:
+            self.cache.put_many(self.cache_model, {digest: vec})
+        return vec
+
+def _build_embedding_adapter(
     interface_format: str,
     api_key: str,
     base_url: str,
     model_name: str
 ) -> BaseEmbeddingAdapter:
     """
-    工厂函数：根据 interface_format 返回不同的 embedding 适配器实例
+    根据 interface_format 构造具体的 embedding 适配器实例（不含缓存）
     """
     fmt = interface_format.strip().lower()
     if fmt == "openai":
@@ -309,6 +627,25 @@ def create_embedding_adapter(
         return GeminiEmbeddingAdapter(api_key, model_name, base_url)
     elif fmt == "siliconflow":
         return SiliconFlowEmbeddingAdapter(api_key, base_url, model_name)
+    elif fmt == "local":
+        return LocalEmbeddingAdapter(model_name)
     else:
         raise ValueError(f"Unknown embedding interface_format: {interface_format}")
 
+
+def create_embedding_adapter(
+    interface_format: str,
+    api_key: str,
+    base_url: str,
+    model_name: str
+) -> BaseEmbeddingAdapter:
+    """
+    工厂函数：根据 interface_format 返回不同的 embedding 适配器实例。
+    开启 embedding 缓存时（默认开启）返回包了持久化缓存的适配器，缓存按 (接口类型|模型名, sha1(文本)) 寻址。
+    """
+    adapter = _build_embedding_adapter(interface_format, api_key, base_url, model_name)
+    cache = get_embedding_cache()
+    if cache is None:
+        return adapter
+    cache_model = f"{interface_format.strip().lower()}|{model_name}"
+    return CachedEmbeddingAdapter(adapter, cache_model, cache)
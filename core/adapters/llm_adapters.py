@@ -1,20 +1,25 @@
 # llm_adapters.py
 # -*- coding: utf-8 -*-
+import asyncio
+import inspect
 import logging
 import threading
-from typing import Optional
+import weakref
+from typing import Dict, Iterator, Optional, Tuple
 from langchain_openai import ChatOpenAI, AzureChatOpenAI
 # from google import genai
 import google.generativeai as genai
 # from google.genai import types
 from google.generativeai import types
 from azure.ai.inference import ChatCompletionsClient
+from azure.ai.inference.aio import ChatCompletionsClient as AsyncChatCompletionsClient
 from azure.core.credentials import AzureKeyCredential
 from azure.ai.inference.models import SystemMessage, UserMessage
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 
 from langchain_core.messages import SystemMessage as LCSystemMessage, HumanMessage
 from core.utils.error_utils import is_rate_limit_error
+from core.utils.rate_limiter import llm_rate_limit_key, set_last_usage
 
 
 class CancellationToken:
@@ -78,12 +83,32 @@ def check_base_url(url: str) -> str:
             url = url.rstrip('/') + '/v1'
     return url
 
+def _record_usage(response) -> None:
+    """从各 SDK 的响应对象中提取 total tokens（取不到时记为 None）"""
+    total = None
+    try:
+        usage_metadata = getattr(response, "usage_metadata", None)  # langchain AIMessage / Gemini
+        if isinstance(usage_metadata, dict):
+            total = usage_metadata.get("total_tokens")
+        elif usage_metadata is not None:
+            total = getattr(usage_metadata, "total_token_count", None)
+        if total is None:
+            usage = getattr(response, "usage", None)  # openai / azure-ai-inference
+            total = getattr(usage, "total_tokens", None)
+    except Exception:
+        total = None
+    set_last_usage(int(total) if isinstance(total, (int, float)) else None)
+
+
 class BaseLLMAdapter:
     """
     统一的 LLM 接口基类，为不同后端（OpenAI、Ollama、ML Studio、Gemini等）提供一致的方法签名。
 
     支持取消令牌机制，允许在长时间运行的LLM调用中优雅地取消操作。
     """
+    # 限流分组键，由 create_llm_adapter 按配置中的原始 base_url 写入（见 llm_rate_limit_key）
+    rate_limit_key: Optional[str] = None
+
     def invoke(
         self,
         prompt: str,
@@ -106,6 +131,194 @@ class BaseLLMAdapter:
         """
         raise NotImplementedError("Subclasses must implement .invoke(prompt) method.")
 
+    async def ainvoke(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        cancellation_token: Optional[CancellationToken] = None
+    ) -> str:
+        """
+        异步调用LLM生成响应，语义与 invoke 相同
+
+        默认实现把同步 invoke 放到线程池执行；具备原生异步客户端的子类应覆盖此方法，
+        这样大量并发请求只占用一个事件循环而不是每个请求一个线程。
+        """
+        return await asyncio.to_thread(
+            self.invoke, prompt, system_prompt=system_prompt, cancellation_token=cancellation_token
+        )
+
+    def _get_loop_client(self, factory):
+        """
+        获取绑定到当前事件循环的异步客户端
+
+        异步客户端的连接池绑定在创建它的事件循环上，而适配器实例会被进程级缓存复用，
+        因此按事件循环分别缓存。客户端在事件循环关闭前（asyncio.run 的 shutdown_asyncgens 阶段）
+        自动关闭，也可以在循环内调用 aclose_loop_clients 提前关闭。
+        """
+        loop = asyncio.get_running_loop()
+        clients = self.__dict__.setdefault("_loop_clients", weakref.WeakKeyDictionary())
+        entry = clients.get(loop)
+        if entry is None:
+            client = factory()
+            entry = (client, _close_on_loop_shutdown(client))
+            clients[loop] = entry
+        return entry[0]
+
+    async def aclose_loop_clients(self):
+        """关闭当前事件循环上由 _get_loop_client 创建的异步客户端"""
+        clients = self.__dict__.get("_loop_clients")
+        if not clients:
+            return
+        entry = clients.pop(asyncio.get_running_loop(), None)
+        if entry is not None:
+            await entry[1].aclose()
+
+    def invoke_stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        cancellation_token: Optional[CancellationToken] = None
+    ) -> Iterator[str]:
+        """
+        流式调用LLM，按到达顺序逐块产出生成文本
+
+        默认实现退化为一次性调用 invoke 并整体产出；支持流式输出的子类应覆盖此方法。
+        与 invoke 不同，流式过程中出现的网络/服务异常会直接抛出，
+        调用方可以保留已收到的部分文本并据此续写。
+
+        Yields:
+            str: 新到达的文本片段
+        """
+        text = self.invoke(prompt, system_prompt=system_prompt, cancellation_token=cancellation_token)
+        if text:
+            yield text
+
+
+async def _aclose_client(client):
+    """关闭异步客户端；langchain ChatModel 的异步 openai 客户端挂在 root_async_client 上"""
+    target = getattr(client, "root_async_client", None) or client
+    close = getattr(target, "close", None)
+    if close is None:
+        return
+    try:
+        result = close()
+        if inspect.isawaitable(result):
+            await result
+    except Exception as e:
+        logging.debug(f"关闭异步 LLM 客户端失败: {e}")
+
+
+async def _loop_client_reaper(client):
+    try:
+        yield
+    finally:
+        await _aclose_client(client)
+
+
+def _close_on_loop_shutdown(client):
+    """
+    让事件循环在关闭前关闭 client，返回登记用的异步生成器（调用方需持有引用）
+
+    事件循环会跟踪在其中启动过的异步生成器，并在 shutdown_asyncgens 时逐个 aclose，
+    这里把生成器推进到 yield 处完成登记，关闭时 finally 中释放客户端。
+    """
+    reaper = _loop_client_reaper(client)
+    step = reaper.asend(None)
+    try:
+        step.send(None)
+    except StopIteration:
+        pass
+    return reaper
+
+
+async def _ainvoke_langchain_chat(client, prompt: str, system_prompt: Optional[str], cancellation_token: Optional[CancellationToken]):
+    """
+    基于 langchain ChatModel.ainvoke 的原生异步调用（ChatOpenAI / AzureChatOpenAI 共用）
+
+    ChatModel 内部的异步 openai 客户端同样绑定事件循环，client 应由 _get_loop_client 按事件循环创建。
+    """
+    if cancellation_token:
+        cancellation_token.raise_if_cancelled()
+
+    active_system_prompt = (system_prompt or "").strip()
+    if active_system_prompt:
+        messages = [LCSystemMessage(content=active_system_prompt), HumanMessage(content=prompt)]
+        response = await client.ainvoke(messages)
+    else:
+        response = await client.ainvoke(prompt)
+
+    if cancellation_token:
+        cancellation_token.raise_if_cancelled()
+    return response
+
+
+async def _ainvoke_openai_chat(client, model_name: str, prompt: str, system_prompt: Optional[str], cancellation_token: Optional[CancellationToken], **create_kwargs):
+    """基于 openai AsyncOpenAI 的原生异步调用（火山引擎 / 硅基流动 / Grok 共用）"""
+    if cancellation_token:
+        cancellation_token.raise_if_cancelled()
+
+    active_system_prompt = (system_prompt or "").strip()
+    messages = []
+    if active_system_prompt:
+        messages.append({"role": "system", "content": active_system_prompt})
+    messages.append({"role": "user", "content": prompt})
+
+    response = await client.chat.completions.create(
+        model=model_name,
+        messages=messages,
+        **create_kwargs
+    )
+
+    if cancellation_token:
+        cancellation_token.raise_if_cancelled()
+    return response
+
+
+def _stream_langchain_chat(client, prompt: str, system_prompt: Optional[str], cancellation_token: Optional[CancellationToken]) -> Iterator[str]:
+    """基于 langchain ChatModel.stream 的流式输出（ChatOpenAI / AzureChatOpenAI 共用）"""
+    if cancellation_token:
+        cancellation_token.raise_if_cancelled()
+
+    active_system_prompt = (system_prompt or "").strip()
+    if active_system_prompt:
+        payload = [LCSystemMessage(content=active_system_prompt), HumanMessage(content=prompt)]
+    else:
+        payload = prompt
+
+    for chunk in client.stream(payload):
+        if cancellation_token:
+            cancellation_token.raise_if_cancelled()
+        text = getattr(chunk, "content", "")
+        if text:
+            yield text
+
+
+def _stream_openai_chat(client, model_name: str, prompt: str, system_prompt: Optional[str], cancellation_token: Optional[CancellationToken], **create_kwargs) -> Iterator[str]:
+    """基于 openai SDK chat.completions(stream=True) 的流式输出（火山引擎 / 硅基流动 / Grok 共用）"""
+    if cancellation_token:
+        cancellation_token.raise_if_cancelled()
+
+    active_system_prompt = (system_prompt or "").strip()
+    messages = []
+    if active_system_prompt:
+        messages.append({"role": "system", "content": active_system_prompt})
+    messages.append({"role": "user", "content": prompt})
+
+    stream = client.chat.completions.create(
+        model=model_name,
+        messages=messages,
+        stream=True,
+        **create_kwargs
+    )
+    for chunk in stream:
+        if cancellation_token:
+            cancellation_token.raise_if_cancelled()
+        if not chunk.choices:
+            continue
+        text = getattr(chunk.choices[0].delta, "content", None)
+        if text:
+            yield text
+
 class DeepSeekAdapter(BaseLLMAdapter):
     """
     适配官方/OpenAI兼容接口（使用 langchain.ChatOpenAI）
@@ -118,7 +331,10 @@ class DeepSeekAdapter(BaseLLMAdapter):
         self.temperature = temperature
         self.timeout = timeout
 
-        self._client = ChatOpenAI(
+        self._client = self._new_client()
+
+    def _new_client(self):
+        return ChatOpenAI(
             model=self.model_name,
             api_key=self.api_key,
             base_url=self.base_url,
@@ -144,6 +360,7 @@ class DeepSeekAdapter(BaseLLMAdapter):
             if cancellation_token:
                 cancellation_token.raise_if_cancelled()
 
+            _record_usage(response)
             if not response:
                 logging.warning("No response from DeepSeekAdapter.")
                 return ""
@@ -154,6 +371,22 @@ class DeepSeekAdapter(BaseLLMAdapter):
             logging.error(f"DeepSeekAdapter received empty generations/choices: {e}")
             return ""
 
+    async def ainvoke(self, prompt: str, system_prompt: Optional[str] = None, cancellation_token: Optional[CancellationToken] = None) -> str:
+        try:
+            response = await _ainvoke_langchain_chat(self._get_loop_client(self._new_client), prompt, system_prompt, cancellation_token)
+            _record_usage(response)
+            if not response:
+                logging.warning("No response from DeepSeekAdapter.")
+                return ""
+            return response.content
+        except IndexError as e:
+            logging.error(f"DeepSeekAdapter received empty generations/choices: {e}")
+            return ""
+
+    def invoke_stream(self, prompt: str, system_prompt: Optional[str] = None, cancellation_token: Optional[CancellationToken] = None) -> Iterator[str]:
+        yield from _stream_langchain_chat(self._client, prompt, system_prompt, cancellation_token)
+
+
 class OpenAIAdapter(BaseLLMAdapter):
     """
     适配官方/OpenAI兼容接口（使用 langchain.ChatOpenAI）
@@ -166,7 +399,10 @@ class OpenAIAdapter(BaseLLMAdapter):
         self.temperature = temperature
         self.timeout = timeout
 
-        self._client = ChatOpenAI(
+        self._client = self._new_client()
+
+    def _new_client(self):
+        return ChatOpenAI(
             model=self.model_name,
             api_key=self.api_key,
             base_url=self.base_url,
@@ -192,6 +428,7 @@ class OpenAIAdapter(BaseLLMAdapter):
             if cancellation_token:
                 cancellation_token.raise_if_cancelled()
 
+            _record_usage(response)
             if not response:
                 logging.warning("No response from OpenAIAdapter.")
                 return ""
@@ -202,6 +439,22 @@ class OpenAIAdapter(BaseLLMAdapter):
             logging.error(f"OpenAIAdapter received empty generations/choices: {e}")
             return ""
 
+    async def ainvoke(self, prompt: str, system_prompt: Optional[str] = None, cancellation_token: Optional[CancellationToken] = None) -> str:
+        try:
+            response = await _ainvoke_langchain_chat(self._get_loop_client(self._new_client), prompt, system_prompt, cancellation_token)
+            _record_usage(response)
+            if not response:
+                logging.warning("No response from OpenAIAdapter.")
+                return ""
+            return response.content
+        except IndexError as e:
+            logging.error(f"OpenAIAdapter received empty generations/choices: {e}")
+            return ""
+
+    def invoke_stream(self, prompt: str, system_prompt: Optional[str] = None, cancellation_token: Optional[CancellationToken] = None) -> Iterator[str]:
+        yield from _stream_langchain_chat(self._client, prompt, system_prompt, cancellation_token)
+
+
 class GeminiAdapter(BaseLLMAdapter):
     """
     适配 Google Gemini (Google Generative AI) 接口
@@ -247,6 +500,7 @@ class GeminiAdapter(BaseLLMAdapter):
             if cancellation_token:
                 cancellation_token.raise_if_cancelled()
 
+            _record_usage(response)
             if response and response.text:
                 return response.text
             logging.warning("No text response from Gemini API.")
@@ -263,6 +517,73 @@ class GeminiAdapter(BaseLLMAdapter):
             logging.error(f"Gemini API 调用失败: {e}")
             return ""
 
+    async def ainvoke(self, prompt: str, system_prompt: Optional[str] = None, cancellation_token: Optional[CancellationToken] = None) -> str:
+        try:
+            if cancellation_token:
+                cancellation_token.raise_if_cancelled()
+
+            active_system_prompt = (system_prompt or "").strip()
+            model = self._default_model
+            if active_system_prompt:
+                model = genai.GenerativeModel(**{**self._model_kwargs, "system_instruction": active_system_prompt})
+
+            generation_config = genai.types.GenerationConfig(
+                max_output_tokens=self.max_tokens,
+                temperature=self.temperature,
+            )
+
+            response = await model.generate_content_async(
+                prompt,
+                generation_config=generation_config
+            )
+
+            if cancellation_token:
+                cancellation_token.raise_if_cancelled()
+
+            _record_usage(response)
+            if response and response.text:
+                return response.text
+            logging.warning("No text response from Gemini API.")
+            return ""
+        except CancelledException:
+            raise
+        except Exception as e:
+            if is_rate_limit_error(e):
+                logging.warning(f"Gemini API 速率限制: {e}")
+                raise
+            logging.error(f"Gemini API 调用失败: {e}")
+            return ""
+
+    def invoke_stream(self, prompt: str, system_prompt: Optional[str] = None, cancellation_token: Optional[CancellationToken] = None) -> Iterator[str]:
+        if cancellation_token:
+            cancellation_token.raise_if_cancelled()
+
+        active_system_prompt = (system_prompt or "").strip()
+        model = self._default_model
+        if active_system_prompt:
+            model = genai.GenerativeModel(**{**self._model_kwargs, "system_instruction": active_system_prompt})
+
+        generation_config = genai.types.GenerationConfig(
+            max_output_tokens=self.max_tokens,
+            temperature=self.temperature,
+        )
+
+        response = model.generate_content(
+            prompt,
+            generation_config=generation_config,
+            stream=True
+        )
+        for chunk in response:
+            if cancellation_token:
+                cancellation_token.raise_if_cancelled()
+            try:
+                text = chunk.text
+            except ValueError:
+                # 被安全策略拦截或无候选内容的分片没有 text
+                continue
+            if text:
+                yield text
+
 
 class AzureOpenAIAdapter(BaseLLMAdapter):
     """
@@ -284,7 +605,10 @@ class AzureOpenAIAdapter(BaseLLMAdapter):
         self.temperature = temperature
         self.timeout = timeout
 
-        self._client = AzureChatOpenAI(
+        self._client = self._new_client()
+
+    def _new_client(self):
+        return AzureChatOpenAI(
             azure_endpoint=self.azure_endpoint,
             azure_deployment=self.azure_deployment,
             api_version=self.api_version,
@@ -302,6 +626,7 @@ class AzureOpenAIAdapter(BaseLLMAdapter):
                 response = self._client.invoke(messages)
             else:
                 response = self._client.invoke(prompt)
+            _record_usage(response)
             if not response:
                 logging.warning("No response from AzureOpenAIAdapter.")
                 return ""
@@ -310,6 +635,22 @@ class AzureOpenAIAdapter(BaseLLMAdapter):
             logging.error(f"AzureOpenAIAdapter received empty generations/choices: {e}")
             return ""
 
+    async def ainvoke(self, prompt: str, system_prompt: Optional[str] = None, cancellation_token: Optional[CancellationToken] = None) -> str:
+        try:
+            response = await _ainvoke_langchain_chat(self._get_loop_client(self._new_client), prompt, system_prompt, cancellation_token)
+            _record_usage(response)
+            if not response:
+                logging.warning("No response from AzureOpenAIAdapter.")
+                return ""
+            return response.content
+        except IndexError as e:
+            logging.error(f"AzureOpenAIAdapter received empty generations/choices: {e}")
+            return ""
+
+    def invoke_stream(self, prompt: str, system_prompt: Optional[str] = None, cancellation_token: Optional[CancellationToken] = None) -> Iterator[str]:
+        yield from _stream_langchain_chat(self._client, prompt, system_prompt, cancellation_token)
+
+
 class OllamaAdapter(BaseLLMAdapter):
     """
     Ollama 同样有一个 OpenAI-like /v1/chat 接口，可直接使用 ChatOpenAI。
@@ -325,7 +666,10 @@ class OllamaAdapter(BaseLLMAdapter):
         if self.api_key == '':
             self.api_key= 'ollama'
 
-        self._client = ChatOpenAI(
+        self._client = self._new_client()
+
+    def _new_client(self):
+        return ChatOpenAI(
             model=self.model_name,
             api_key=self.api_key,
             base_url=self.base_url,
@@ -342,6 +686,19 @@ class OllamaAdapter(BaseLLMAdapter):
                 response = self._client.invoke(messages)
             else:
                 response = self._client.invoke(prompt)
+            _record_usage(response)
+            if not response:
+                logging.warning("No response from OllamaAdapter.")
+                return ""
+            return response.content
+        except IndexError as e:
+            logging.error(f"OllamaAdapter received empty generations/choices: {e}")
+            return ""
+
+    async def ainvoke(self, prompt: str, system_prompt: Optional[str] = None, cancellation_token: Optional[CancellationToken] = None) -> str:
+        try:
+            response = await _ainvoke_langchain_chat(self._get_loop_client(self._new_client), prompt, system_prompt, cancellation_token)
+            _record_usage(response)
             if not response:
                 logging.warning("No response from OllamaAdapter.")
                 return ""
@@ -350,6 +707,10 @@ class OllamaAdapter(BaseLLMAdapter):
             logging.error(f"OllamaAdapter received empty generations/choices: {e}")
             return ""
 
+    def invoke_stream(self, prompt: str, system_prompt: Optional[str] = None, cancellation_token: Optional[CancellationToken] = None) -> Iterator[str]:
+        yield from _stream_langchain_chat(self._client, prompt, system_prompt, cancellation_token)
+
+
 class MLStudioAdapter(BaseLLMAdapter):
     def __init__(self, api_key: str, base_url: str, model_name: str, max_tokens: int, temperature: float = 0.7, timeout: Optional[int] = 600):
         self.base_url = check_base_url(base_url)
@@ -359,7 +720,10 @@ class MLStudioAdapter(BaseLLMAdapter):
         self.temperature = temperature
         self.timeout = timeout
 
-        self._client = ChatOpenAI(
+        self._client = self._new_client()
+
+    def _new_client(self):
+        return ChatOpenAI(
             model=self.model_name,
             api_key=self.api_key,
             base_url=self.base_url,
@@ -376,6 +740,7 @@ class MLStudioAdapter(BaseLLMAdapter):
                 response = self._client.invoke(messages)
             else:
                 response = self._client.invoke(prompt)
+            _record_usage(response)
             if not response:
                 logging.warning("No response from MLStudioAdapter.")
                 return ""
@@ -393,6 +758,29 @@ class MLStudioAdapter(BaseLLMAdapter):
             logging.error(f"ML Studio API 调用超时或失败: {e}")
             return ""
 
+    async def ainvoke(self, prompt: str, system_prompt: Optional[str] = None, cancellation_token: Optional[CancellationToken] = None) -> str:
+        try:
+            response = await _ainvoke_langchain_chat(self._get_loop_client(self._new_client), prompt, system_prompt, cancellation_token)
+            _record_usage(response)
+            if not response:
+                logging.warning("No response from MLStudioAdapter.")
+                return ""
+            return response.content
+        except IndexError as e:
+            logging.error(f"MLStudioAdapter received empty generations/choices: {e}")
+            return ""
+        except CancelledException:
+            raise
+        except Exception as e:
+            if is_rate_limit_error(e):
+                logging.warning(f"ML Studio API 速率限制: {e}")
+                raise
+            logging.error(f"ML Studio API 调用超时或失败: {e}")
+            return ""
+
+    def invoke_stream(self, prompt: str, system_prompt: Optional[str] = None, cancellation_token: Optional[CancellationToken] = None) -> Iterator[str]:
+        yield from _stream_langchain_chat(self._client, prompt, system_prompt, cancellation_token)
+
 
 class AzureAIAdapter(BaseLLMAdapter):
     """
@@ -438,6 +826,7 @@ class AzureAIAdapter(BaseLLMAdapter):
             response = self._client.complete(
                 messages=messages
             )
+            _record_usage(response)
             if response and response.choices:
                 return response.choices[0].message.content
             logging.warning("No response from AzureAIAdapter.")
@@ -452,6 +841,66 @@ class AzureAIAdapter(BaseLLMAdapter):
             logging.error(f"Azure AI Inference API 调用失败: {e}")
             return ""
 
+    async def ainvoke(self, prompt: str, system_prompt: Optional[str] = None, cancellation_token: Optional[CancellationToken] = None) -> str:
+        try:
+            if cancellation_token:
+                cancellation_token.raise_if_cancelled()
+
+            active_system_prompt = (system_prompt or "").strip()
+            messages = []
+            if active_system_prompt:
+                messages.append(SystemMessage(active_system_prompt))
+            messages.append(UserMessage(prompt))
+
+            # azure.ai.inference.aio 基于 aiohttp
+            client = self._get_loop_client(lambda: AsyncChatCompletionsClient(
+                endpoint=self.endpoint,
+                credential=AzureKeyCredential(self.api_key),
+                model=self.model_name,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                timeout=self.timeout
+            ))
+            response = await client.complete(
+                messages=messages
+            )
+            _record_usage(response)
+            if response and response.choices:
+                return response.choices[0].message.content
+            logging.warning("No response from AzureAIAdapter.")
+            return ""
+        except CancelledException:
+            raise
+        except Exception as e:
+            if is_rate_limit_error(e):
+                logging.warning(f"Azure AI Inference API 速率限制: {e}")
+                raise
+            logging.error(f"Azure AI Inference API 调用失败: {e}")
+            return ""
+
+    def invoke_stream(self, prompt: str, system_prompt: Optional[str] = None, cancellation_token: Optional[CancellationToken] = None) -> Iterator[str]:
+        if cancellation_token:
+            cancellation_token.raise_if_cancelled()
+
+        active_system_prompt = (system_prompt or "").strip()
+        messages = []
+        if active_system_prompt:
+            messages.append(SystemMessage(active_system_prompt))
+        messages.append(UserMessage(prompt))
+
+        response = self._client.complete(
+            messages=messages,
+            stream=True
+        )
+        for update in response:
+            if cancellation_token:
+                cancellation_token.raise_if_cancelled()
+            if not update.choices:
+                continue
+            text = update.choices[0].delta.content
+            if text:
+                yield text
+
 
 # 火山引擎实现
 class VolcanoEngineAIAdapter(BaseLLMAdapter):
@@ -481,6 +930,7 @@ class VolcanoEngineAIAdapter(BaseLLMAdapter):
                 messages=messages,
                 timeout=self.timeout
             )
+            _record_usage(response)
             if not response:
                 logging.warning("No response from VolcanoEngineAIAdapter.")
                 return ""
@@ -495,6 +945,38 @@ class VolcanoEngineAIAdapter(BaseLLMAdapter):
             logging.error(f"火山引擎API调用超时或失败: {e}")
             return ""
 
+    async def ainvoke(self, prompt: str, system_prompt: Optional[str] = None, cancellation_token: Optional[CancellationToken] = None) -> str:
+        try:
+            # AsyncOpenAI 基于 httpx.AsyncClient
+            client = self._get_loop_client(lambda: AsyncOpenAI(
+                base_url=str(self._client.base_url),  # 与同步客户端使用相同的地址
+                api_key=self.api_key,
+                timeout=self.timeout
+            ))
+            response = await _ainvoke_openai_chat(
+                client, self.model_name, prompt, system_prompt, cancellation_token,
+                timeout=self.timeout
+            )
+            _record_usage(response)
+            if not response:
+                logging.warning("No response from VolcanoEngineAIAdapter.")
+                return ""
+            return response.choices[0].message.content
+        except CancelledException:
+            raise
+        except Exception as e:
+            if is_rate_limit_error(e):
+                logging.warning(f"火山引擎API 速率限制: {e}")
+                raise
+            logging.error(f"火山引擎API调用超时或失败: {e}")
+            return ""
+
+    def invoke_stream(self, prompt: str, system_prompt: Optional[str] = None, cancellation_token: Optional[CancellationToken] = None) -> Iterator[str]:
+        yield from _stream_openai_chat(
+            self._client, self.model_name, prompt, system_prompt, cancellation_token,
+            timeout=self.timeout
+        )
+
 
 class SiliconFlowAdapter(BaseLLMAdapter):
     def __init__(self, api_key: str, base_url: str, model_name: str, max_tokens: int, temperature: float = 0.7, timeout: Optional[int] = 600):
@@ -523,6 +1005,7 @@ class SiliconFlowAdapter(BaseLLMAdapter):
                 messages=messages,
                 timeout=self.timeout
             )
+            _record_usage(response)
             if not response:
                 logging.warning("No response from SiliconFlowAdapter.")
                 return ""
@@ -537,6 +1020,38 @@ class SiliconFlowAdapter(BaseLLMAdapter):
             logging.error(f"硅基流动API调用超时或失败: {e}")
             return ""
 
+    async def ainvoke(self, prompt: str, system_prompt: Optional[str] = None, cancellation_token: Optional[CancellationToken] = None) -> str:
+        try:
+            # AsyncOpenAI 基于 httpx.AsyncClient
+            client = self._get_loop_client(lambda: AsyncOpenAI(
+                base_url=str(self._client.base_url),  # 与同步客户端使用相同的地址
+                api_key=self.api_key,
+                timeout=self.timeout
+            ))
+            response = await _ainvoke_openai_chat(
+                client, self.model_name, prompt, system_prompt, cancellation_token,
+                timeout=self.timeout
+            )
+            _record_usage(response)
+            if not response:
+                logging.warning("No response from SiliconFlowAdapter.")
+                return ""
+            return response.choices[0].message.content
+        except CancelledException:
+            raise
+        except Exception as e:
+            if is_rate_limit_error(e):
+                logging.warning(f"硅基流动API 速率限制: {e}")
+                raise
+            logging.error(f"硅基流动API调用超时或失败: {e}")
+            return ""
+
+    def invoke_stream(self, prompt: str, system_prompt: Optional[str] = None, cancellation_token: Optional[CancellationToken] = None) -> Iterator[str]:
+        yield from _stream_openai_chat(
+            self._client, self.model_name, prompt, system_prompt, cancellation_token,
+            timeout=self.timeout
+        )
+
 
 class GrokAdapter(BaseLLMAdapter):
     """
@@ -571,6 +1086,7 @@ class GrokAdapter(BaseLLMAdapter):
                 temperature=self.temperature,
                 timeout=self.timeout
             )
+            _record_usage(response)
             if response and response.choices:
                 return response.choices[0].message.content
             logging.warning("No response from GrokAdapter.")
@@ -585,9 +1101,55 @@ class GrokAdapter(BaseLLMAdapter):
             logging.error(f"Grok API 调用失败: {e}")
             return ""
 
+    async def ainvoke(self, prompt: str, system_prompt: Optional[str] = None, cancellation_token: Optional[CancellationToken] = None) -> str:
+        try:
+            # AsyncOpenAI 基于 httpx.AsyncClient
+            client = self._get_loop_client(lambda: AsyncOpenAI(
+                base_url=self.base_url,
+                api_key=self.api_key,
+                timeout=self.timeout
+            ))
+            response = await _ainvoke_openai_chat(
+                client, self.model_name, prompt, system_prompt, cancellation_token,
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                timeout=self.timeout
+            )
+            _record_usage(response)
+            if response and response.choices:
+                return response.choices[0].message.content
+            logging.warning("No response from GrokAdapter.")
+            return ""
+        except CancelledException:
+            raise
+        except Exception as e:
+            if is_rate_limit_error(e):
+                logging.warning(f"Grok API 速率限制: {e}")
+                raise
+            logging.error(f"Grok API 调用失败: {e}")
+            return ""
 
-def create_llm_adapter(
-    interface_format: str,
+    def invoke_stream(self, prompt: str, system_prompt: Optional[str] = None, cancellation_token: Optional[CancellationToken] = None) -> Iterator[str]:
+        yield from _stream_openai_chat(
+            self._client, self.model_name, prompt, system_prompt, cancellation_token,
+            max_tokens=self.max_tokens,
+            temperature=self.temperature,
+            timeout=self.timeout
+        )
+
+
+# 进程级适配器缓存：相同配置复用同一个客户端实例（及其 HTTP 连接池），
+# 避免每次调用都重新构造 SDK 客户端、重新进行 TLS 握手。
+# 底层 httpx / requests 客户端均为线程安全，可在批量生成的多个工作线程间共享。
+_adapter_cache: Dict[Tuple, BaseLLMAdapter] = {}
+_adapter_cache_lock = threading.Lock()
+# 不参与缓存的接口：google-generativeai 的 genai.configure(api_key=...) 是进程级全局设置，
+# 缓存多个不同 Key 的 Gemini 适配器时，先建的实例会在后建实例配置后悄悄改用后者的 Key
+_UNCACHED_FORMATS = {"gemini"}
+
+
+def _build_llm_adapter(
+    fmt: str,
     base_url: str,
     model_name: str,
     api_key: str,
@@ -595,10 +1157,22 @@ def create_llm_adapter(
     max_tokens: int,
     timeout: int
 ) -> BaseLLMAdapter:
-    """
-    工厂函数：根据 interface_format 返回不同的适配器实例。
-    """
-    fmt = interface_format.strip().lower()
+    """构造适配器并记录限流分组键（按配置中的原始 base_url，与 configure_rate_limits_from_config 一致）"""
+    adapter = _construct_llm_adapter(fmt, base_url, model_name, api_key, temperature, max_tokens, timeout)
+    adapter.rate_limit_key = llm_rate_limit_key(fmt, base_url)
+    return adapter
+
+
+def _construct_llm_adapter(
+    fmt: str,
+    base_url: str,
+    model_name: str,
+    api_key: str,
+    temperature: float,
+    max_tokens: int,
+    timeout: int
+) -> BaseLLMAdapter:
+    """根据已规范化的 interface_format 构造新的适配器实例（不经过缓存）。"""
     if fmt == "deepseek":
         return DeepSeekAdapter(api_key, base_url, model_name, max_tokens, temperature, timeout)
     if fmt == "openai":
@@ -621,4 +1195,49 @@ def create_llm_adapter(
         return SiliconFlowAdapter(api_key, base_url, model_name, max_tokens, temperature, timeout)
     if fmt == "grok":
         return GrokAdapter(api_key, base_url, model_name, max_tokens, temperature, timeout)
-    raise ValueError(f"Unknown interface_format: {interface_format}")
+    raise ValueError(f"Unknown interface_format: {fmt}")
+
+
+def create_llm_adapter(
+    interface_format: str,
+    base_url: str,
+    model_name: str,
+    api_key: str,
+    temperature: float,
+    max_tokens: int,
+    timeout: int,
+    reuse: bool = True
+) -> BaseLLMAdapter:
+    """
+    工厂函数：根据 interface_format 返回不同的适配器实例。
+
+    默认从进程级缓存中返回已预热的实例，缓存键为
+    (interface_format, base_url, model_name, api_key, temperature, max_tokens, timeout)。
+    Gemini 使用进程级全局凭据，每次调用都重新构造（见 _UNCACHED_FORMATS）。
+
+    Args:
+        reuse: 为 False 时跳过缓存，强制构造新实例（如测试配置时）
+    """
+    fmt = interface_format.strip().lower()
+    if not reuse or fmt in _UNCACHED_FORMATS:
+        return _build_llm_adapter(fmt, base_url, model_name, api_key, temperature, max_tokens, timeout)
+
+    cache_key = (fmt, (base_url or "").strip(), model_name, api_key, temperature, max_tokens, timeout)
+    with _adapter_cache_lock:
+        adapter = _adapter_cache.get(cache_key)
+    if adapter is not None:
+        return adapter
+
+    # 构造过程可能较慢（SDK 初始化），放在锁外进行；并发首建时以先写入者为准
+    adapter = _build_llm_adapter(fmt, base_url, model_name, api_key, temperature, max_tokens, timeout)
+    with _adapter_cache_lock:
+        adapter = _adapter_cache.setdefault(cache_key, adapter)
+    logging.debug(f"LLM adapter cached: {fmt} / {model_name} (cache size={len(_adapter_cache)})")
+    return adapter
+
+
+def clear_llm_adapter_cache():
+    """清空适配器缓存（如切换代理、修改 API Key 后需要重建连接时调用）"""
+    with _adapter_cache_lock:
+        _adapter_cache.clear()
+    logging.info("LLM adapter cache cleared.")
@@ -123,7 +123,8 @@ def test_llm_config(interface_format, api_key, base_url, model_name, temperature
                 api_key=api_key,
                 temperature=temperature,
                 max_tokens=max_tokens,
-                timeout=timeout
+                timeout=timeout,
+                reuse=False  # 测试配置时强制新建客户端，避免复用旧连接掩盖问题
             )
 
             test_prompt = "Please reply 'OK'"
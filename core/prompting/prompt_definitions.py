@@ -19,8 +19,8 @@ def resolve_global_system_prompt(enabled: bool = None) -> str:
     Returns:
         全局system prompt内容，如果未启用或内容为空则返回空字符串
     """
-    from .prompt_manager import PromptManager
-    pm = PromptManager()
+    from .prompt_manager import get_shared_prompt_manager
+    pm = get_shared_prompt_manager()
 
     # 优先使用PromptManager的配置（新版本）
     if enabled is None:
@@ -7,9 +7,11 @@
 import json
 import os
 import logging
-import string
+import threading
 from typing import Dict, Optional
 
+from .prompt_manager_helper import get_template_fields
+
 class PromptManager:
     """提示词管理器"""
 
@@ -19,9 +21,22 @@ class PromptManager:
         self.config = self.load_config()
         self.default_prompts = self._load_default_prompts()
 
+        # 模板缓存：(category, name) -> (自定义文件的 (mtime_ns, size) 或 None, 校验后的提示词)
+        # 文件被修改或删除后签名变化，下次 get_prompt 自动重新读取
+        self._template_cache = {}
+        self._cache_lock = threading.Lock()
+
         # 确保自定义提示词目录存在
         os.makedirs(self.custom_dir, exist_ok=True)
 
+    def invalidate(self, category: str = None, name: str = None):
+        """清除指定模块（不指定时为全部）的模板缓存"""
+        with self._cache_lock:
+            if category is None:
+                self._template_cache.clear()
+            else:
+                self._template_cache.pop((category, name), None)
+
     def load_config(self) -> dict:
         """加载配置文件"""
         if os.path.exists(self.config_path):
@@ -530,36 +545,45 @@ class PromptManager:
             module = self.config["modules"][category][name]
             file_path = module["file"]
 
-            # 尝试读取自定义文件
-            if os.path.exists(file_path):
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read().strip()
-                    if content:
-                        if self._validate_prompt_placeholders(content, module, category, name, is_custom=True):
-                            return content
-                        return ""
-
-            # 否则返回默认值
-            prompt_key = self._get_prompt_key(category, name)
-            default_prompt = self.default_prompts.get(prompt_key, "")
-            self._validate_prompt_placeholders(default_prompt, module, category, name, is_custom=False)
-            return default_prompt
+            try:
+                st = os.stat(file_path)
+                signature = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                signature = None
+
+            key = (category, name)
+            with self._cache_lock:
+                cached = self._template_cache.get(key)
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+
+            prompt = self._resolve_prompt(module, file_path, signature is not None, category, name)
+            with self._cache_lock:
+                self._template_cache[key] = (signature, prompt)
+            return prompt
 
         except Exception as e:
             logging.error(f"Failed to get prompt {category}.{name}: {e}")
             return None
 
+    def _resolve_prompt(self, module: dict, file_path: str, has_custom_file: bool, category: str, name: str) -> str:
+        # 尝试读取自定义文件
+        if has_custom_file:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+                if content:
+                    if self._validate_prompt_placeholders(content, module, category, name, is_custom=True):
+                        return content
+                    return ""
+
+        # 否则返回默认值
+        prompt_key = self._get_prompt_key(category, name)
+        default_prompt = self.default_prompts.get(prompt_key, "")
+        self._validate_prompt_placeholders(default_prompt, module, category, name, is_custom=False)
+        return default_prompt
+
     def _extract_prompt_fields(self, prompt: str) -> set:
-        fields = set()
-        if not prompt:
-            return fields
-        for _, field_name, _, _ in string.Formatter().parse(prompt):
-            if not field_name:
-                continue
-            root = field_name.split(".", 1)[0].split("[", 1)[0]
-            if root:
-                fields.add(root)
-        return fields
+        return set(get_template_fields(prompt or ""))
 
     def _validate_prompt_placeholders(
         self,
@@ -600,6 +624,7 @@ class PromptManager:
             os.makedirs(os.path.dirname(file_path), exist_ok=True)
             with open(file_path, 'w', encoding='utf-8') as f:
                 f.write(content)
+            self.invalidate(category, name)
 
             logging.info(f"Saved custom prompt: {category}.{name}")
         except Exception as e:
@@ -627,6 +652,7 @@ class PromptManager:
 
             module["enabled"] = enabled
             self._save_config()
+            self.invalidate(category, name)
             logging.info(f"Toggled module {category}.{name}: {enabled}")
         except Exception as e:
             logging.error(f"Failed to toggle module {category}.{name}: {e}")
@@ -664,6 +690,7 @@ class PromptManager:
             # 删除自定义文件
             if os.path.exists(file_path):
                 os.remove(file_path)
+            self.invalidate(category, name)
 
             logging.info(f"Reset prompt to default: {category}.{name}")
         except Exception as e:
@@ -728,3 +755,20 @@ class PromptManager:
             return None
 
 
+_shared_instance: Optional[PromptManager] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_prompt_manager() -> PromptManager:
+    """
+    获取进程共享的 PromptManager（首次调用时初始化）
+
+    共享实例只读取一次 prompts_config.json 与默认提示词，自定义提示词按文件 mtime 缓存。
+    初始化失败时抛出异常且不缓存，下次调用会重试。
+    """
+    global _shared_instance
+    with _shared_lock:
+        if _shared_instance is None:
+            _shared_instance = PromptManager()
+        return _shared_instance
+
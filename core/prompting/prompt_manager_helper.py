@@ -6,23 +6,28 @@ PromptManager 辅助函数
 """
 import logging
 import string
+from functools import lru_cache
 from typing import Optional
 
 
-def _extract_template_fields(template: str) -> set:
+@lru_cache(maxsize=512)
+def get_template_fields(template: str) -> frozenset:
     """
     提取模板中的占位符字段（仅取顶层变量名）
+
+    结果按模板内容缓存：PromptManager 返回的模板字符串在文件未改动时是同一个对象，
+    重复格式化时不再重新解析。
     """
     fields = set()
     if not template:
-        return fields
+        return frozenset()
     for _, field_name, _, _ in string.Formatter().parse(template):
         if not field_name:
             continue
         root = field_name.split(".", 1)[0].split("[", 1)[0]
         if root:
             fields.add(root)
-    return fields
+    return frozenset(fields)
 
 
 def format_prompt_safe(template: str, variables: dict, prompt_name: str = "") -> str:
@@ -32,8 +37,8 @@ def format_prompt_safe(template: str, variables: dict, prompt_name: str = "") ->
     if template is None:
         return ""
     variables = variables or {}
-    placeholders = _extract_template_fields(template)
-    missing = sorted(placeholders - set(variables.keys()))
+    placeholders = get_template_fields(template)
+    missing = sorted(placeholders.difference(variables.keys()))
     if missing:
         name = f" ({prompt_name})" if prompt_name else ""
         logging.warning(f"Prompt format missing variables{name}: {', '.join(missing)}")
@@ -48,14 +53,14 @@ def format_prompt_safe(template: str, variables: dict, prompt_name: str = "") ->
 
 def get_prompt_manager():
     """
-    安全地初始化 PromptManager，失败时返回 Fallback 对象
+    安全地获取进程共享的 PromptManager，失败时返回 Fallback 对象
 
     Returns:
         PromptManager 实例或 FallbackPromptManager 实例
     """
     try:
-        from .prompt_manager import PromptManager
-        return PromptManager()
+        from .prompt_manager import get_shared_prompt_manager
+        return get_shared_prompt_manager()
     except Exception as e:
         logging.error(f"Failed to initialize PromptManager: {e}")
 
@@ -1,6 +1,9 @@
 # chapter_blueprint_parser.py
 # -*- coding: utf-8 -*-
+import os
 import re
+import threading
+from functools import lru_cache
 
 CHINESE_NUM_MAP = {
     '零': 0, '〇': 0,
@@ -255,23 +258,10 @@ def parse_chapter_blueprint(blueprint_text: str):
     results.sort(key=lambda x: x['chapter_number'])
     return results
 
-def get_chapter_info_from_blueprint(blueprint_text: str, target_chapter_number: int):
-    """
-    在已经加载好的章节蓝图文本中，找到对应章号的结构化信息；
-    兼容：若找不到精确匹配，则按序号回退（列表下标 target-1），避免因格式瑕疵导致完全丢失目录。
-    返回包含卷信息的完整章节数据。
-    """
-    all_chapters = parse_chapter_blueprint(blueprint_text)
-    for ch in all_chapters:
-        if ch['chapter_number'] == target_chapter_number:
-            return ch
-    # 顺序回退：若至少有 target_chapter_number 个条目，则取第 target-1 个
-    if 1 <= target_chapter_number <= len(all_chapters):
-        return all_chapters[target_chapter_number - 1]
-    # 默认返回（包含卷信息字段）
+def _default_chapter_info(chapter_number: int) -> dict:
     return {
-        "chapter_number": target_chapter_number,
-        "chapter_title": f"第{target_chapter_number}章",
+        "chapter_number": chapter_number,
+        "chapter_title": f"第{chapter_number}章",
         "chapter_role": "",
         "chapter_purpose": "",
         "suspense_level": "",
@@ -284,5 +274,88 @@ def get_chapter_info_from_blueprint(blueprint_text: str, target_chapter_number:
     }
 
 
+class BlueprintIndex:
+    """
+    解析后的章节蓝图索引：按章节号、按卷号 O(1) 查找。
+    查找返回的是字典副本，调用方修改不会污染共享缓存。
+    """
+
+    def __init__(self, chapters: list):
+        self.chapters = chapters
+        self._by_number = {}
+        self._by_volume = {}
+        for ch in chapters:
+            # 章节号重复时保留第一条（与逐条扫描的行为一致）
+            self._by_number.setdefault(ch['chapter_number'], ch)
+            self._by_volume.setdefault(ch.get('volume_number'), []).append(ch)
+
+    def __len__(self):
+        return len(self.chapters)
+
+    def get_chapter(self, chapter_number: int) -> dict:
+        """
+        按章号查找；找不到精确匹配时按序号回退（列表下标 chapter_number-1），
+        仍找不到则返回只含默认标题的章节信息。
+        """
+        ch = self._by_number.get(chapter_number)
+        if ch is None and 1 <= chapter_number <= len(self.chapters):
+            ch = self.chapters[chapter_number - 1]
+        if ch is None:
+            return _default_chapter_info(chapter_number)
+        return dict(ch)
+
+    def get_volume_chapters(self, volume_number: int) -> list:
+        """返回指定卷的全部章节（按章节号排序）"""
+        return [dict(ch) for ch in self._by_volume.get(volume_number, [])]
+
+    @property
+    def volume_numbers(self) -> list:
+        return sorted(v for v in self._by_volume if v is not None)
+
 
+@lru_cache(maxsize=8)
+def _index_from_text(blueprint_text: str) -> BlueprintIndex:
+    return BlueprintIndex(parse_chapter_blueprint(blueprint_text))
 
+
+# 文件索引缓存：abspath -> ((mtime_ns, size), BlueprintIndex)
+_file_index_cache = {}
+_file_index_lock = threading.Lock()
+
+
+def get_blueprint_index(filepath: str) -> BlueprintIndex:
+    """
+    获取项目 Novel_directory.txt 的蓝图索引，按 (路径, mtime, 文件大小) 缓存；
+    蓝图被重新生成或手动编辑后自动重新解析。文件不存在时返回空索引。
+    """
+    path = os.path.abspath(os.path.join(filepath, "Novel_directory.txt"))
+    try:
+        st = os.stat(path)
+    except OSError:
+        return BlueprintIndex([])
+    signature = (st.st_mtime_ns, st.st_size)
+
+    with _file_index_lock:
+        cached = _file_index_cache.get(path)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+    except (OSError, UnicodeDecodeError):
+        return BlueprintIndex([])
+    index = BlueprintIndex(parse_chapter_blueprint(text))
+    with _file_index_lock:
+        _file_index_cache[path] = (signature, index)
+    return index
+
+
+def get_chapter_info_from_blueprint(blueprint_text: str, target_chapter_number: int):
+    """
+    在已经加载好的章节蓝图文本中，找到对应章号的结构化信息；
+    兼容：若找不到精确匹配，则按序号回退（列表下标 target-1），避免因格式瑕疵导致完全丢失目录。
+    返回包含卷信息的完整章节数据。
+    同一文本的解析结果会被缓存；已知项目路径时优先使用 get_blueprint_index。
+    """
+    return _index_from_text(blueprint_text or "").get_chapter(target_chapter_number)
@@ -0,0 +1,148 @@
+"""
+Embedding 持久化缓存（SQLite，float32 blob）
+
+键为 (模型标识, sha1(文本))。跨章节重复出现的检索关键词、重新定稿时未改动的文本块、
+重复导入的知识库文件都不必再次请求 embedding 服务。
+
+默认开启，通过环境变量调整：
+- AUTONOVEL_EMBEDDING_CACHE=0           关闭缓存
+- AUTONOVEL_EMBEDDING_CACHE_PATH=...    缓存文件位置（默认 <程序目录>/cache/embeddings.sqlite3）
+- AUTONOVEL_EMBEDDING_CACHE_MAX_MB=512  向量数据体积上限，超出按 LRU 淘汰
+"""
+
+import array
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+EMBEDDING_CACHE_ENABLED = os.getenv("AUTONOVEL_EMBEDDING_CACHE", "1").lower() not in ("0", "false", "no")
+EMBEDDING_CACHE_PATH = Path(
+    os.getenv("AUTONOVEL_EMBEDDING_CACHE_PATH", "")
+    or Path(__file__).resolve().parents[2] / "cache" / "embeddings.sqlite3"
+)
+try:
+    EMBEDDING_CACHE_MAX_BYTES = int(float(os.getenv("AUTONOVEL_EMBEDDING_CACHE_MAX_MB", "512")) * 1024 * 1024)
+except ValueError:
+    EMBEDDING_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# SQLite 单条语句的参数个数有上限，批量查询时分段
+_SQL_BATCH = 500
+
+
+def text_digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8", errors="ignore")).hexdigest()
+
+
+class EmbeddingCache:
+    """线程安全的 embedding 缓存；向量以 float32 字节存储"""
+
+    def __init__(self, db_path: str, max_bytes: int = EMBEDDING_CACHE_MAX_BYTES):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " digest TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " accessed REAL NOT NULL,"
+            " PRIMARY KEY (model, digest))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_accessed ON embeddings(accessed)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    def get_many(self, model: str, digests: Sequence[str]) -> Dict[str, List[float]]:
+        """批量读取，返回命中的 digest -> 向量"""
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(digests))
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(unique), _SQL_BATCH):
+                part = unique[i:i + _SQL_BATCH]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT digest, vector FROM embeddings WHERE model = ? AND digest IN ({placeholders})",
+                    [model, *part],
+                ).fetchall()
+                for digest, blob in rows:
+                    vec = array.array("f")
+                    vec.frombytes(blob)
+                    found[digest] = vec.tolist()
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET accessed = ? WHERE model = ? AND digest = ?",
+                    [(now, model, d) for d in found],
+                )
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(unique) - len(found)
+        return found
+
+    def put_many(self, model: str, items: Dict[str, List[float]]):
+        """批量写入 digest -> 向量（空向量不写入），超出体积上限时淘汰最久未访问的条目"""
+        rows = [
+            (model, digest, array.array("f", vec).tobytes(), time.time())
+            for digest, vec in items.items()
+            if vec
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings(model, digest, vector, accessed) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._total_bytes += sum(len(r[2]) for r in rows)
+            if self._total_bytes > self.max_bytes:
+                self._evict_locked()
+            self._conn.commit()
+
+    def _evict_locked(self):
+        # 按最近访问时间淘汰到上限的 90%，避免每次写入都触发淘汰
+        target = int(self.max_bytes * 0.9)
+        total = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+        evicted = []
+        for model, digest, size in self._conn.execute(
+            "SELECT model, digest, LENGTH(vector) FROM embeddings ORDER BY accessed ASC"
+        ):
+            if total <= target:
+                break
+            evicted.append((model, digest))
+            total -= size
+        self._conn.executemany("DELETE FROM embeddings WHERE model = ? AND digest = ?", evicted)
+        self._total_bytes = total
+        logging.info(f"[EmbeddingCache] evicted {len(evicted)} vectors to stay under {self.max_bytes} bytes")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_shared_cache: Optional[EmbeddingCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """获取进程共享的 embedding 缓存；关闭或无法打开时返回 None"""
+    global _shared_cache
+    if not EMBEDDING_CACHE_ENABLED:
+        return None
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            try:
+                _shared_cache = EmbeddingCache(str(EMBEDDING_CACHE_PATH))
+            except (OSError, sqlite3.Error) as e:
+                logging.warning(f"[EmbeddingCache] 无法打开缓存 {EMBEDDING_CACHE_PATH}: {e}")
+                return None
+        return _shared_cache
@@ -3,6 +3,7 @@
 import os
 import json
 import logging
+import threading
 from pathlib import Path
 
 LOG_FILE_PATH = Path(__file__).resolve().parents[2] / "logs" / "app.log"
@@ -26,6 +27,70 @@ def read_file(filename: str) -> str:
         print(f"[read_file] 读取文件时发生错误: {e}")
         return ""
 
+# 文件快照缓存：abspath -> ((mtime_ns, size), 内容, 派生视图字典)
+# 仅由 read_file_cached / ProjectFiles 使用，避免一个章节周期内反复打开解码同一批状态文件
+_file_snapshots = {}
+_file_snapshots_lock = threading.Lock()
+
+
+def _file_signature(path: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _get_snapshot(filename: str):
+    """返回文件当前版本的快照 (signature, content, views)；文件不存在时返回 None"""
+    path = os.path.abspath(filename)
+    signature = _file_signature(path)
+    if signature is None:
+        with _file_snapshots_lock:
+            _file_snapshots.pop(path, None)
+        return None
+    with _file_snapshots_lock:
+        snapshot = _file_snapshots.get(path)
+    if snapshot is not None and snapshot[0] == signature:
+        return snapshot
+    snapshot = (signature, read_file(path), {})
+    with _file_snapshots_lock:
+        _file_snapshots[path] = snapshot
+    return snapshot
+
+
+def read_file_cached(filename: str) -> str:
+    """
+    带缓存的 read_file：按 (路径, mtime_ns, 文件大小) 复用已解码的内容。
+    通过 save_string_to_txt / clear_file_content / append_text_to_file 写入时会主动失效。
+    """
+    snapshot = _get_snapshot(filename)
+    return snapshot[1] if snapshot else ""
+
+
+def get_file_view(filename: str, key, compute):
+    """
+    获取文件内容的派生视图：每个文件版本只调用一次 compute(content)。
+    文件不存在时按空字符串计算且不缓存。
+    """
+    snapshot = _get_snapshot(filename)
+    if snapshot is None:
+        return compute("")
+    views = snapshot[2]
+    with _file_snapshots_lock:
+        if key in views:
+            return views[key]
+    value = compute(snapshot[1])
+    with _file_snapshots_lock:
+        views[key] = value
+    return value
+
+
+def invalidate_file_snapshot(filename: str):
+    """写入文件后丢弃其快照（mtime 精度不足时同一时刻的改写也能被读到）"""
+    with _file_snapshots_lock:
+        _file_snapshots.pop(os.path.abspath(filename), None)
+
 def append_text_to_file(text_to_append: str, file_path: str):
     """在文件末尾追加文本(带换行)。若文本非空且无换行，则自动加换行。"""
     if text_to_append and not text_to_append.startswith('\n'):
@@ -34,6 +99,7 @@ def append_text_to_file(text_to_append: str, file_path: str):
     try:
         with open(file_path, 'a', encoding='utf-8') as file:
             file.write(text_to_append)
+        invalidate_file_snapshot(file_path)
     except IOError as e:
         print(f"[append_text_to_file] 发生错误：{e}")
 
@@ -42,6 +108,7 @@ def clear_file_content(filename: str):
     try:
         with open(filename, 'w', encoding='utf-8') as file:
             pass
+        invalidate_file_snapshot(filename)
     except IOError as e:
         print(f"[clear_file_content] 无法清空文件 '{filename}' 的内容：{e}")
 
@@ -50,6 +117,7 @@ def save_string_to_txt(content: str, filename: str):
     try:
         with open(filename, 'w', encoding='utf-8') as file:
             file.write(content)
+        invalidate_file_snapshot(filename)
     except Exception as e:
         print(f"[save_string_to_txt] 保存文件时发生错误: {e}")
 
@@ -113,7 +181,7 @@ def get_context_summary_for_character(
         格式化的上下文摘要文本
     """
     global_summary_file = os.path.join(filepath, "global_summary.txt")
-    global_summary = read_file(global_summary_file) if os.path.exists(global_summary_file) else ""
+    global_summary = read_file_cached(global_summary_file) if os.path.exists(global_summary_file) else ""
 
     # 非分卷模式
     if num_volumes <= 1:
@@ -145,7 +213,7 @@ def get_context_summary_for_character(
 
         prev_volume_summary = ""
         if os.path.exists(prev_volume_summary_file):
-            prev_volume_summary = read_file(prev_volume_summary_file)
+            prev_volume_summary = read_file_cached(prev_volume_summary_file)
             logging.info(f"读取上一卷摘要：volume_{prev_volume}_summary.txt")
         else:
             logging.warning(f"上一卷摘要不存在：volume_{prev_volume}_summary.txt")
@@ -0,0 +1,207 @@
+"""
+LLM 响应缓存（内容寻址，按项目存放于 SQLite）
+
+键为 sha256(model, base_url, system_prompt, prompt, temperature, max_tokens)，
+值为 zstd 压缩后的清理结果。重新生成草稿、崩溃后重跑定稿、调试提示词时，
+完全相同的请求直接命中缓存，不再重复调用模型。
+
+默认关闭，通过环境变量开启与调整：
+- AUTONOVEL_LLM_CACHE=1            开启缓存
+- AUTONOVEL_LLM_CACHE_MAX_MB=256   单个项目缓存的压缩后体积上限，超出按 LRU 淘汰
+- AUTONOVEL_LLM_CACHE_TTL_DAYS=30  条目有效期（0 表示不过期）
+
+各模块的缓存策略见 CACHE_POLICIES；未列出的模块仅在 temperature == 0 时缓存。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+try:
+    import zstandard as zstd
+    _ZSTD_COMPRESSOR = zstd.ZstdCompressor(level=10)
+    _ZSTD_DECOMPRESSOR = zstd.ZstdDecompressor()
+except ImportError:  # pragma: no cover - zstandard 在 requirements 中，缺失时退回 zlib
+    zstd = None
+    import zlib
+
+LLM_CACHE_ENABLED = os.getenv("AUTONOVEL_LLM_CACHE", "").lower() in ("1", "true", "yes")
+try:
+    LLM_CACHE_MAX_BYTES = int(float(os.getenv("AUTONOVEL_LLM_CACHE_MAX_MB", "256")) * 1024 * 1024)
+except ValueError:
+    LLM_CACHE_MAX_BYTES = 256 * 1024 * 1024
+try:
+    LLM_CACHE_TTL_SECONDS = int(float(os.getenv("AUTONOVEL_LLM_CACHE_TTL_DAYS", "30")) * 86400)
+except ValueError:
+    LLM_CACHE_TTL_SECONDS = 30 * 86400
+
+# 缓存策略
+POLICY_ALWAYS = "always"               # 无论 temperature 都缓存（结果用于检索/摘要，不追求多样性）
+POLICY_DETERMINISTIC = "deterministic"  # 仅 temperature == 0 时缓存
+POLICY_NEVER = "never"                 # 从不缓存
+
+CACHE_POLICIES: Dict[str, str] = {
+    "helper.knowledge_search": POLICY_ALWAYS,
+    "chapter.single_chapter_summary": POLICY_ALWAYS,
+    "chapter.draft": POLICY_DETERMINISTIC,  # 草稿仅在 temperature == 0 时可复用
+}
+
+CACHE_DIR_NAME = ".cache"
+CACHE_DB_NAME = "llm_responses.sqlite3"
+
+
+def _compress(text: str) -> bytes:
+    data = text.encode("utf-8")
+    if zstd is not None:
+        return _ZSTD_COMPRESSOR.compress(data)
+    return zlib.compress(data, 6)
+
+
+def _decompress(blob: bytes) -> str:
+    if zstd is not None:
+        return _ZSTD_DECOMPRESSOR.decompress(blob).decode("utf-8")
+    return zlib.decompress(blob).decode("utf-8")
+
+
+def make_cache_key(llm_adapter, prompt: str, system_prompt: str) -> str:
+    """按模型、接口地址、提示词与采样参数计算内容寻址键"""
+    payload = json.dumps(
+        [
+            getattr(llm_adapter, "model_name", ""),
+            getattr(llm_adapter, "base_url", ""),
+            system_prompt or "",
+            prompt,
+            getattr(llm_adapter, "temperature", None),
+            getattr(llm_adapter, "max_tokens", None),
+        ],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def should_cache(module: Optional[str], llm_adapter) -> bool:
+    """根据模块策略与 temperature 判断本次调用是否走缓存"""
+    if not module:
+        return False
+    policy = CACHE_POLICIES.get(module, POLICY_DETERMINISTIC)
+    if policy == POLICY_ALWAYS:
+        return True
+    if policy == POLICY_NEVER:
+        return False
+    try:
+        return float(getattr(llm_adapter, "temperature", 1) or 0) == 0
+    except (TypeError, ValueError):
+        return False
+
+
+class LLMResponseCache:
+    """单个项目的响应缓存，线程安全；压缩体积超过上限时按最近访问时间淘汰"""
+
+    def __init__(self, db_path: str, max_bytes: int = LLM_CACHE_MAX_BYTES, ttl_seconds: int = LLM_CACHE_TTL_SECONDS):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " module TEXT,"
+            " value BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created REAL NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed)")
+        self._conn.commit()
+
+    def get(self, key: str, module: str = "") -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                hits, misses = self.hits, self.misses
+            else:
+                self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+                self.hits += 1
+                hits, misses = self.hits, self.misses
+
+        if row is None:
+            logging.info(f"[LLMCache] miss module={module} (hits={hits}, misses={misses})")
+            return None
+        logging.info(f"[LLMCache] hit module={module} (hits={hits}, misses={misses})")
+        return _decompress(row[0])
+
+    def put(self, key: str, value: str, module: str = ""):
+        if not value:
+            return
+        blob = _compress(value)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses(key, module, value, size, created, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, module, blob, len(blob), now, now),
+            )
+            self._evict_locked(now)
+            self._conn.commit()
+
+    def _evict_locked(self, now: float):
+        if self.ttl_seconds:
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        freed = 0
+        evicted = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed ASC"):
+            evicted.append((key,))
+            freed += size
+            if total - freed <= self.max_bytes:
+                break
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        logging.info(f"[LLMCache] evicted {len(evicted)} entries ({freed} bytes) to stay under {self.max_bytes} bytes")
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_project_caches: Dict[str, LLMResponseCache] = {}
+_project_caches_lock = threading.Lock()
+
+
+def get_project_llm_cache(filepath: str) -> Optional[LLMResponseCache]:
+    """获取项目的响应缓存；未开启缓存或未指定项目路径时返回 None"""
+    if not LLM_CACHE_ENABLED or not filepath:
+        return None
+    db_path = os.path.abspath(os.path.join(filepath, CACHE_DIR_NAME, CACHE_DB_NAME))
+    with _project_caches_lock:
+        cache = _project_caches.get(db_path)
+        if cache is None:
+            try:
+                cache = LLMResponseCache(db_path)
+            except (OSError, sqlite3.Error) as e:
+                logging.warning(f"[LLMCache] 无法打开缓存 {db_path}: {e}")
+                return None
+            _project_caches[db_path] = cache
+        return cache
@@ -0,0 +1,178 @@
+# project_files.py
+# -*- coding: utf-8 -*-
+"""
+项目状态文件的统一读取层
+
+Novel_architecture.txt、Novel_directory.txt、global_summary.txt、character_state.txt、
+plot_arcs.txt、Volume_architecture.txt、volume_N_summary.txt 在一个章节周期内会被
+提示词构建、定稿和界面多次读取。这里按 (路径, mtime_ns, 文件大小) 缓存解码后的内容，
+并提供按文件版本只计算一次的派生视图（未解决伏笔、分卷架构切片）。
+"""
+import logging
+import os
+import re
+
+from core.utils.file_utils import get_file_view, read_file_cached
+
+ARCHITECTURE_FILE = "Novel_architecture.txt"
+DIRECTORY_FILE = "Novel_directory.txt"
+GLOBAL_SUMMARY_FILE = "global_summary.txt"
+CHARACTER_STATE_FILE = "character_state.txt"
+PLOT_ARCS_FILE = "plot_arcs.txt"
+VOLUME_ARCHITECTURE_FILE = "Volume_architecture.txt"
+
+
+def volume_summary_filename(volume_num: int) -> str:
+    return f"volume_{volume_num}_summary.txt"
+
+
+# 已解决标记：支持多种符号和格式
+_RESOLVED_MARKERS = ['✓已解决', '✅已解决', '☑已解决', '已解决', '（已解决）', '(已解决)', '[已解决]']
+# 任意位置匹配 [A级-xxx] 或 【A级-xxx】，格式示例: [A级-主线] xxxx、【B级-支线】xxx、1. [A级-主线] xxx
+_PLOT_ARC_PATTERN = re.compile(r'[\[【]([AB]级-[^\]】]+)[\]】]')
+_A_LEVEL_PATTERN = re.compile(r'[\[【]A级')
+_B_LEVEL_PATTERN = re.compile(r'[\[【]B级')
+
+
+def parse_unresolved_plot_arcs(full_content: str) -> str:
+    """
+    [Plan A] 从 plot_arcs.txt 内容中提取 A级(主线)和 B级(支线)的未解决伏笔
+
+    格式兼容性：
+    - 支持任意前导符号：-, •, ·, *, 数字编号等
+    - 支持任意缩进
+    - 支持 [A级-xxx] 或 【A级-xxx】 格式
+    - 自动排除已解决的伏笔（通过检查同行的解决标记）
+    """
+    if not full_content.strip():
+        return "（暂无记录）"
+
+    unresolved_lines = []
+    for line in full_content.split('\n'):
+        line_stripped = line.strip()
+        if not line_stripped:
+            continue
+
+        # 检查本行是否包含已解决标记
+        if any(marker in line_stripped for marker in _RESOLVED_MARKERS):
+            continue
+
+        # 使用 search 而非 match，匹配行内任意位置的 A/B 级标记
+        if _PLOT_ARC_PATTERN.search(line_stripped):
+            unresolved_lines.append(line_stripped)
+
+    if not unresolved_lines:
+        return "（暂无重要未解决伏笔）"
+
+    # 限制返回条数，避免过长（A级最多10条，B级最多5条）
+    a_level = [l for l in unresolved_lines if _A_LEVEL_PATTERN.search(l)]
+    b_level = [l for l in unresolved_lines if _B_LEVEL_PATTERN.search(l)]
+
+    result_lines = a_level[:10] + b_level[:5]
+
+    if not result_lines:
+        return "（暂无重要未解决伏笔）"
+
+    logging.debug(f"Extracted {len(a_level)} A-level and {len(b_level)} B-level plot arcs")
+    return "\n".join(result_lines)
+
+
+# 优化正则：匹配行首的标题格式，排除内容中的引用
+# 支持格式: ### **第一卷（第1-10章）** 等
+_VOLUME_HEADER_PATTERN = re.compile(
+    r'^\s*(?:[#*>\-]+\s*)?第\s*([零〇一二两三四五六七八九十百千万\d]+)\s*卷',
+    re.MULTILINE
+)
+
+
+def split_volume_architecture(volume_arch_text: str) -> dict:
+    """
+    把 Volume_architecture.txt 按卷标题切分为 {卷号: 该卷架构文本}
+
+    支持格式：
+        ### **第一卷（第1-10章）**
+        ### **第1卷（第1-10章）**
+        ## 第二卷
+        ### 第三卷
+    同一卷号出现多次时保留第一次出现的切片。
+    """
+    from core.utils.chapter_directory_parser import _to_int_from_chinese
+
+    matches = list(_VOLUME_HEADER_PATTERN.finditer(volume_arch_text))
+    slices = {}
+    for i, match in enumerate(matches):
+        vol_num_str = match.group(1)
+        vol_num = int(vol_num_str) if vol_num_str.isdigit() else _to_int_from_chinese(vol_num_str)
+        if vol_num in slices:
+            continue
+
+        # 提取从当前位置到下一个卷标题（或文件末尾）的内容
+        end_pos = matches[i + 1].start() if i + 1 < len(matches) else len(volume_arch_text)
+        content = volume_arch_text[match.start():end_pos].strip()
+
+        # 移除开头和结尾的分隔符 "---"（支持前后都有的情况）
+        content = re.sub(r'^[\s\n]*-{3,}[\s\n]*', '', content)
+        content = re.sub(r'[\s\n]*-{3,}[\s\n]*$', '', content)
+        slices[vol_num] = content.strip()
+    return slices
+
+
+class ProjectFiles:
+    """
+    某个项目目录下状态文件的缓存视图
+
+    读取结果按文件版本缓存（进程内共享，同一路径的多个 ProjectFiles 实例共用快照），
+    写入请继续使用 save_string_to_txt / clear_file_content，它们会让对应快照失效。
+    """
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.filepath, name)
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(self.path(name))
+
+    def read(self, name: str) -> str:
+        """读取项目内文件（不存在时返回空字符串）"""
+        return read_file_cached(self.path(name))
+
+    @property
+    def architecture(self) -> str:
+        return self.read(ARCHITECTURE_FILE)
+
+    @property
+    def directory(self) -> str:
+        return self.read(DIRECTORY_FILE)
+
+    @property
+    def global_summary(self) -> str:
+        return self.read(GLOBAL_SUMMARY_FILE)
+
+    @property
+    def character_state(self) -> str:
+        return self.read(CHARACTER_STATE_FILE)
+
+    @property
+    def plot_arcs(self) -> str:
+        return self.read(PLOT_ARCS_FILE)
+
+    @property
+    def volume_architecture(self) -> str:
+        return self.read(VOLUME_ARCHITECTURE_FILE)
+
+    def volume_summary(self, volume_num: int) -> str:
+        return self.read(volume_summary_filename(volume_num))
+
+    def unresolved_plot_arcs(self) -> str:
+        """plot_arcs.txt 中未解决的 A/B 级伏笔（每个文件版本只解析一次）"""
+        if not self.exists(PLOT_ARCS_FILE):
+            return "（暂无记录）"
+        return get_file_view(self.path(PLOT_ARCS_FILE), "unresolved_plot_arcs", parse_unresolved_plot_arcs)
+
+    def volume_architecture_slice(self, volume_num: int) -> str:
+        """Volume_architecture.txt 中指定卷的架构文本，找不到时返回空字符串"""
+        slices = get_file_view(self.path(VOLUME_ARCHITECTURE_FILE), "volume_slices", split_volume_architecture)
+        return slices.get(volume_num, "")
+
@@ -0,0 +1,380 @@
+"""
+LLM 调用的进程级限流器（按服务商/base_url 共享令牌桶）
+
+所有线程、所有项目对同一服务商的请求共用一个令牌桶：
+- RPM 桶：每个请求消耗 1 个令牌
+- TPM 桶：按提示词估算的 token 预扣，拿到响应后用实际 usage 校正
+- 收到 429 时按 Retry-After（若有）冻结整个桶，而不是各线程各自指数退避
+
+预算来源（优先级从高到低）：
+1. config.json 中 llm_configs 各项的可选字段 "rpm" / "tpm"（按该配置填写的 base_url 生效，见 llm_rate_limit_key）
+2. 环境变量 AUTONOVEL_LLM_RPM / AUTONOVEL_LLM_TPM（对所有服务商生效）
+均未配置（或为 0）时不做预先限速，仅在 429 后按 Retry-After 冻结。
+
+另有按 (分组键, 模型) 共享的在途请求上限（InflightLimiter），多项目并发生成时
+同一个模型同时最多发出 max_concurrency 个请求：
+1. config.json 中 llm_configs 各项的可选字段 "max_concurrency"
+2. 环境变量 AUTONOVEL_LLM_MAX_INFLIGHT
+均未配置（或为 0）时不限制。
+"""
+
+import asyncio
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional, Tuple
+
+
+def _env_int(name: str) -> int:
+    try:
+        return max(0, int(os.getenv(name, "0")))
+    except ValueError:
+        return 0
+
+
+# 最近一次 LLM 调用的实际 token 用量（按线程/协程上下文隔离），由适配器写入，供限流器校正 TPM 预扣
+_last_usage: ContextVar[Optional[int]] = ContextVar("llm_last_usage", default=None)
+
+
+def set_last_usage(total_tokens: Optional[int]):
+    _last_usage.set(total_tokens)
+
+
+def pop_last_usage() -> Optional[int]:
+    """取出并清空当前上下文中最近一次调用的 token 用量"""
+    total = _last_usage.get()
+    _last_usage.set(None)
+    return total
+
+
+_CJK_RE = re.compile(r"[㐀-鿿豈-﫿　-〿＀-￯]")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中日韩字符按 1 字 1 token，其余按 4 字符 1 token"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk) // 4 + 1
+
+
+class TokenBucketLimiter:
+    """
+    RPM/TPM 双令牌桶
+
+    acquire() 在锁内计算需要等待的时间并立即预扣令牌（允许余额为负），
+    在锁外睡眠，因此并发调用者自然按到达顺序排队，不会同时醒来造成突发。
+    """
+
+    def __init__(self, name: str, rpm: int = 0, tpm: int = 0):
+        self.name = name
+        self._lock = threading.Lock()
+        self._blocked_until = 0.0
+        self.configure(rpm, tpm)
+
+    def configure(self, rpm: int = 0, tpm: int = 0):
+        with self._lock:
+            self.rpm = max(0, int(rpm or 0))
+            self.tpm = max(0, int(tpm or 0))
+            self._req_tokens = float(self.rpm)
+            self._tok_tokens = float(self.tpm)
+            self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rpm:
+            self._req_tokens = min(self.rpm, self._req_tokens + elapsed * self.rpm / 60.0)
+        if self.tpm:
+            self._tok_tokens = min(self.tpm, self._tok_tokens + elapsed * self.tpm / 60.0)
+
+    def reserve(self, tokens: int = 0) -> float:
+        """预扣一个请求和 tokens 个 token，返回发送前应等待的秒数（含抖动）"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+
+            wait = max(0.0, self._blocked_until - now)
+            if self.rpm:
+                if self._req_tokens < 1:
+                    wait = max(wait, (1 - self._req_tokens) * 60.0 / self.rpm)
+                self._req_tokens -= 1
+            if self.tpm and tokens > 0:
+                # 单个请求超过整桶容量时按满桶计，避免永远等不到
+                need = min(tokens, self.tpm)
+                if self._tok_tokens < need:
+                    wait = max(wait, (need - self._tok_tokens) * 60.0 / self.tpm)
+                self._tok_tokens -= need
+
+        if wait > 0:
+            # 抖动：避免排队的多个线程在同一时刻一起发出请求
+            wait += random.uniform(0, min(1.0, wait * 0.1))
+        return wait
+
+    def acquire(self, tokens: int = 0) -> float:
+        wait = self.reserve(tokens)
+        if wait > 0:
+            logging.info(f"[RateLimit] {self.name}: waiting {wait:.1f}s before request (tokens~{tokens})")
+            time.sleep(wait)
+        return wait
+
+    async def aacquire(self, tokens: int = 0) -> float:
+        wait = self.reserve(tokens)
+        if wait > 0:
+            logging.info(f"[RateLimit] {self.name}: waiting {wait:.1f}s before request (tokens~{tokens})")
+            await asyncio.sleep(wait)
+        return wait
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """用响应中的实际 usage 校正预扣量（含输出 token）"""
+        if not self.tpm or actual_tokens is None:
+            return
+        with self._lock:
+            self._tok_tokens -= max(0, actual_tokens) - min(estimated_tokens, self.tpm)
+
+    def block_for(self, seconds: float):
+        """服务端要求暂停（429 / Retry-After）：冻结整个桶，所有共享该服务商的调用一起等待"""
+        if seconds <= 0:
+            return
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        logging.warning(f"[RateLimit] {self.name}: blocked for {seconds:.1f}s by server")
+
+
+_limiters: Dict[str, TokenBucketLimiter] = {}
+_limit_overrides: Dict[str, Tuple[int, int]] = {}
+_limiters_lock = threading.Lock()
+
+
+def _normalize_key(base_url: str) -> str:
+    return (base_url or "").strip().rstrip("/#").lower()
+
+
+def get_rate_limiter(key: str) -> TokenBucketLimiter:
+    """获取（必要时创建）某个服务商的共享限流器"""
+    key = _normalize_key(key)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            rpm, tpm = _limit_overrides.get(key, (_env_int("AUTONOVEL_LLM_RPM"), _env_int("AUTONOVEL_LLM_TPM")))
+            limiter = TokenBucketLimiter(key or "default", rpm, tpm)
+            _limiters[key] = limiter
+        return limiter
+
+
+def llm_rate_limit_key(interface_format: str, base_url: str) -> str:
+    """
+    LLM 配置的限流分组键：按配置中填写的原始 base_url 分组，未填写时按接口类型分组
+
+    config.json 一侧（configure_rate_limits_from_config）与适配器一侧（create_llm_adapter 写入的
+    adapter.rate_limit_key）都由此函数计算，适配器内部改写后的地址（补 /v1、Azure endpoint 等）不影响分组。
+    """
+    return _normalize_key(base_url) or (interface_format or "").strip().lower()
+
+
+def _adapter_key(llm_adapter) -> str:
+    """适配器的限流分组键；未经 create_llm_adapter 构造的实例退回 base_url 或类名"""
+    key = getattr(llm_adapter, "rate_limit_key", None)
+    if key is None:
+        key = getattr(llm_adapter, "base_url", None) or type(llm_adapter).__name__
+    return _normalize_key(key)
+
+
+def get_adapter_rate_limiter(llm_adapter) -> TokenBucketLimiter:
+    """按适配器的限流分组键（见 llm_rate_limit_key）取共享限流器"""
+    return get_rate_limiter(_adapter_key(llm_adapter))
+
+
+class InflightLimiter:
+    """
+    某个服务商/模型的在途请求上限（可调整上限的计数信号量）
+
+    slot()/aslot() 在发送请求前占用一个名额、响应结束后归还；limit 为 0 表示不限制。
+    同时记录在途与排队数量，供调度器汇报。
+    """
+
+    def __init__(self, name: str, limit: int = 0):
+        self.name = name
+        self._cond = threading.Condition()
+        self.limit = max(0, int(limit or 0))
+        self.in_flight = 0
+        self.waiting = 0
+
+    def configure(self, limit: int = 0):
+        with self._cond:
+            self.limit = max(0, int(limit or 0))
+            self._cond.notify_all()
+
+    def _try_acquire(self) -> bool:
+        """调用方需持有 _cond"""
+        if self.limit and self.in_flight >= self.limit:
+            return False
+        self.in_flight += 1
+        return True
+
+    def acquire(self):
+        with self._cond:
+            if self._try_acquire():
+                return
+            self.waiting += 1
+            try:
+                while not self._try_acquire():
+                    self._cond.wait()
+            finally:
+                self.waiting -= 1
+
+    async def aacquire(self):
+        # 不阻塞事件循环：拿不到名额时让出控制权后重试
+        with self._cond:
+            if self._try_acquire():
+                return
+            self.waiting += 1
+        try:
+            while True:
+                await asyncio.sleep(0.05)
+                with self._cond:
+                    if self._try_acquire():
+                        return
+        finally:
+            with self._cond:
+                self.waiting -= 1
+
+    def release(self):
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            self._cond.notify()
+
+    def slot(self):
+        return _InflightSlot(self)
+
+    def aslot(self):
+        return _AsyncInflightSlot(self)
+
+
+class _InflightSlot:
+    def __init__(self, limiter: InflightLimiter):
+        self.limiter = limiter
+
+    def __enter__(self):
+        self.limiter.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.limiter.release()
+
+
+class _AsyncInflightSlot(_InflightSlot):
+    async def __aenter__(self):
+        await self.limiter.aacquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.limiter.release()
+
+
+_inflight: Dict[Tuple[str, str], InflightLimiter] = {}
+_inflight_overrides: Dict[Tuple[str, str], int] = {}
+
+
+def get_inflight_limiter(llm_adapter) -> InflightLimiter:
+    """按适配器的 (限流分组键, 模型) 取共享的在途请求限制器"""
+    base = _adapter_key(llm_adapter)
+    model = (getattr(llm_adapter, "model_name", "") or "").strip().lower()
+    key = (base, model)
+    with _limiters_lock:
+        limiter = _inflight.get(key)
+        if limiter is None:
+            limit = _inflight_overrides.get(key, _env_int("AUTONOVEL_LLM_MAX_INFLIGHT"))
+            limiter = InflightLimiter(f"{base}|{model}", limit)
+            _inflight[key] = limiter
+        return limiter
+
+
+def inflight_stats() -> Dict[str, Dict[str, int]]:
+    """各服务商/模型当前的在途与排队请求数（只列出有过请求的）"""
+    with _limiters_lock:
+        limiters = list(_inflight.values())
+    return {
+        limiter.name: {"limit": limiter.limit, "in_flight": limiter.in_flight, "waiting": limiter.waiting}
+        for limiter in limiters
+    }
+
+
+def _min_nonzero(a: int, b: int) -> int:
+    return min(a, b) if a and b else (a or b)
+
+
+def configure_rate_limits_from_config(config: Dict[str, Any]):
+    """
+    从 config.json 读取各 LLM 配置的可选 rpm/tpm 字段并应用到对应分组（见 llm_rate_limit_key）的限流器，
+    max_concurrency 字段应用到对应 (分组键, 模型) 的在途请求上限。
+    同一 base_url（或模型）出现在多个配置中时取最小的非零预算。
+    """
+    overrides: Dict[str, Tuple[int, int]] = {}
+    inflight_overrides: Dict[Tuple[str, str], int] = {}
+    for conf in (config or {}).get("llm_configs", {}).values():
+        max_concurrency = int(conf.get("max_concurrency", 0) or 0)
+        if max_concurrency:
+            inflight_key = (
+                llm_rate_limit_key(conf.get("interface_format", ""), conf.get("base_url", "")),
+                (conf.get("model_name", "") or "").strip().lower(),
+            )
+            inflight_overrides[inflight_key] = _min_nonzero(inflight_overrides.get(inflight_key, 0), max_concurrency)
+
+        rpm = int(conf.get("rpm", 0) or 0)
+        tpm = int(conf.get("tpm", 0) or 0)
+        if not rpm and not tpm:
+            continue
+        key = llm_rate_limit_key(conf.get("interface_format", ""), conf.get("base_url", ""))
+        old_rpm, old_tpm = overrides.get(key, (0, 0))
+        overrides[key] = (_min_nonzero(old_rpm, rpm), _min_nonzero(old_tpm, tpm))
+
+    with _limiters_lock:
+        _limit_overrides.clear()
+        _limit_overrides.update(overrides)
+        for key, limiter in _limiters.items():
+            rpm, tpm = overrides.get(key, (_env_int("AUTONOVEL_LLM_RPM"), _env_int("AUTONOVEL_LLM_TPM")))
+            limiter.configure(rpm, tpm)
+        _inflight_overrides.clear()
+        _inflight_overrides.update(inflight_overrides)
+        for key, limiter in _inflight.items():
+            limiter.configure(inflight_overrides.get(key, _env_int("AUTONOVEL_LLM_MAX_INFLIGHT")))
+    if overrides:
+        logging.info(f"[RateLimit] configured budgets: {overrides}")
+    if inflight_overrides:
+        logging.info(f"[RateLimit] configured in-flight caps: {inflight_overrides}")
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """
+    从异常携带的 HTTP 响应中解析 Retry-After（秒数或 HTTP 日期），沿异常链查找。
+    未携带时返回 None。
+    """
+    seen = 0
+    while error is not None and seen < 5:
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None)
+        if headers:
+            value = headers.get("retry-after-ms")
+            if value:
+                try:
+                    return max(0.0, float(value) / 1000.0)
+                except ValueError:
+                    pass
+            value = headers.get("retry-after")
+            if value:
+                try:
+                    return max(0.0, float(value))
+                except ValueError:
+                    try:
+                        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+                    except (TypeError, ValueError):
+                        pass
+        error = getattr(error, "__cause__", None)
+        seen += 1
+    return None
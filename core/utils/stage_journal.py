@@ -0,0 +1,236 @@
+"""
+章节阶段检查点日志（追加写入的 JSONL，按项目存放）
+
+批量生成一章要经过：前文摘要 → 检索关键词 → 向量检索 → 知识过滤 → 提示词 →
+草稿 → 扩写 → 定稿各子步骤。进程崩溃或单章重试时，已完成阶段的输出从
+<项目>/.cache/stage_journal.jsonl 读回，不再重复调用 LLM。
+
+记录格式（每行一个 JSON）：
+- {"kind": "begin", "chapter": N, "fingerprint": "..."}    开始（或重新开始）一章
+- {"kind": "stage", "chapter": N, "stage": "...", "output": ...}  某阶段完成及其输出
+- {"kind": "done", "chapter": N}                            整章完成，之前的记录作废
+
+fingerprint 由影响输出的参数（字数、用户指导、模型等）计算，参数变化时旧记录作废。
+没有未完成章节时日志文件会被清空；最后一行写到一半（崩溃）时读取时直接忽略。
+
+通过环境变量 AUTONOVEL_STAGE_JOURNAL=0 关闭。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.utils.llm_cache import CACHE_DIR_NAME
+
+STAGE_JOURNAL_ENABLED = os.getenv("AUTONOVEL_STAGE_JOURNAL", "1").lower() not in ("0", "false", "no")
+JOURNAL_FILE_NAME = "stage_journal.jsonl"
+# 累计追加这么多行后压缩一次（只保留未完成章节的记录）
+_COMPACT_EVERY = 500
+
+
+def make_fingerprint(params: Dict[str, Any]) -> str:
+    """对影响阶段输出的参数计算指纹"""
+    payload = json.dumps(params, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class ChapterCheckpoint:
+    """某一章在检查点日志中的视图，供生成流程查询/记录阶段输出"""
+
+    def __init__(self, journal: "StageJournal", chapter: int):
+        self.journal = journal
+        self.chapter = chapter
+
+    def lookup(self, stage: str) -> Tuple[bool, Any]:
+        """返回 (是否已完成, 输出)"""
+        return self.journal.lookup(self.chapter, stage)
+
+    def record(self, stage: str, output: Any = None):
+        self.journal.record(self.chapter, stage, output)
+
+    def completed_stages(self) -> List[str]:
+        return self.journal.completed_stages(self.chapter)
+
+    def run(
+        self,
+        stage: str,
+        compute: Callable[[], Any],
+        log: Optional[Callable[[str], None]] = None,
+        keep: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """
+        阶段已完成则直接返回记录的输出，否则执行 compute 并记录结果
+
+        keep: 判断输出是否值得记录（例如排除兜底的错误提示文本），返回 False 时不记录
+        """
+        done, output = self.lookup(stage)
+        if done:
+            if log:
+                log(f"   ⏭ 阶段 {stage} 已在上次运行中完成，使用检查点结果")
+            return output
+        output = compute()
+        if keep is None or keep(output):
+            self.record(stage, output)
+        return output
+
+
+class MemoryCheckpoint(ChapterCheckpoint):
+    """不落盘的检查点（检查点日志关闭时，批量流水线用它在预取与正式生成之间传递阶段输出）"""
+
+    def __init__(self, chapter: int):
+        self.journal = None
+        self.chapter = chapter
+        self._stages: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, stage: str) -> Tuple[bool, Any]:
+        with self._lock:
+            if stage not in self._stages:
+                return False, None
+            return True, self._stages[stage]
+
+    def record(self, stage: str, output: Any = None):
+        with self._lock:
+            self._stages[stage] = output
+
+    def completed_stages(self) -> List[str]:
+        with self._lock:
+            return list(self._stages)
+
+
+class StageJournal:
+    """单个项目的阶段检查点日志（线程安全）"""
+
+    def __init__(self, filepath: str):
+        self.path = os.path.join(filepath, CACHE_DIR_NAME, JOURNAL_FILE_NAME)
+        self._lock = threading.Lock()
+        # chapter -> {"fingerprint": str, "stages": {stage: output}}
+        self._chapters: Dict[int, Dict[str, Any]] = {}
+        self._appended = 0
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 崩溃时写了一半的最后一行
+                        logging.warning(f"Skipping corrupt stage journal line in {self.path}")
+                        continue
+                    self._apply(entry)
+                    self._appended += 1
+        except OSError as e:
+            logging.warning(f"Failed to read stage journal {self.path}: {e}")
+
+    def _apply(self, entry: Dict[str, Any]):
+        kind = entry.get("kind")
+        chapter = entry.get("chapter")
+        if kind == "begin":
+            self._chapters[chapter] = {"fingerprint": entry.get("fingerprint", ""), "stages": {}}
+        elif kind == "stage":
+            state = self._chapters.get(chapter)
+            if state is not None:
+                state["stages"][entry.get("stage")] = entry.get("output")
+        elif kind == "done":
+            self._chapters.pop(chapter, None)
+
+    def _append(self, entry: Dict[str, Any]):
+        """调用方需持有 _lock"""
+        self._apply(entry)
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._appended += 1
+        except OSError as e:
+            logging.warning(f"Failed to append stage journal {self.path}: {e}")
+
+    def _compact(self):
+        """调用方需持有 _lock：只保留未完成章节的记录"""
+        tmp_path = self.path + ".tmp"
+        lines = []
+        for chapter, state in sorted(self._chapters.items()):
+            lines.append({"kind": "begin", "chapter": chapter, "fingerprint": state["fingerprint"]})
+            for stage, output in state["stages"].items():
+                lines.append({"kind": "stage", "chapter": chapter, "stage": stage, "output": output})
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for entry in lines:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self._appended = len(lines)
+        except OSError as e:
+            logging.warning(f"Failed to compact stage journal {self.path}: {e}")
+
+    def begin_chapter(self, chapter: int, fingerprint: str) -> ChapterCheckpoint:
+        """开始一章：指纹一致且有未完成记录时续用，否则重新开始"""
+        with self._lock:
+            state = self._chapters.get(chapter)
+            if state is None or state["fingerprint"] != fingerprint:
+                if state is not None:
+                    logging.info(f"Stage journal: chapter {chapter} parameters changed, discarding checkpoints")
+                self._append({"kind": "begin", "chapter": chapter, "fingerprint": fingerprint})
+        return ChapterCheckpoint(self, chapter)
+
+    def lookup(self, chapter: int, stage: str) -> Tuple[bool, Any]:
+        with self._lock:
+            state = self._chapters.get(chapter)
+            if state is None or stage not in state["stages"]:
+                return False, None
+            return True, state["stages"][stage]
+
+    def record(self, chapter: int, stage: str, output: Any = None):
+        with self._lock:
+            if chapter not in self._chapters:
+                return
+            self._append({"kind": "stage", "chapter": chapter, "stage": stage, "output": output})
+
+    def completed_stages(self, chapter: int) -> List[str]:
+        with self._lock:
+            state = self._chapters.get(chapter)
+            return list(state["stages"]) if state else []
+
+    def complete_chapter(self, chapter: int):
+        """整章完成：作废该章记录，必要时压缩日志"""
+        with self._lock:
+            if chapter not in self._chapters:
+                return
+            self._append({"kind": "done", "chapter": chapter})
+            if not self._chapters or self._appended >= _COMPACT_EVERY:
+                self._compact()
+
+    def pending_chapters(self) -> List[int]:
+        """已开始但未完成的章节"""
+        with self._lock:
+            return sorted(self._chapters)
+
+
+_journals: Dict[str, StageJournal] = {}
+_journals_lock = threading.Lock()
+
+
+def get_stage_journal(filepath: str) -> Optional[StageJournal]:
+    """获取项目共享的检查点日志；已通过环境变量关闭时返回 None"""
+    if not STAGE_JOURNAL_ENABLED or not filepath:
+        return None
+    key = os.path.abspath(filepath)
+    with _journals_lock:
+        journal = _journals.get(key)
+        if journal is None:
+            journal = StageJournal(key)
+            _journals[key] = journal
+        return journal
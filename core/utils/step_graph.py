@@ -0,0 +1,123 @@
+"""
+带依赖关系的步骤并发执行器
+
+把一组步骤声明为有向无环图：没有依赖关系的步骤在有界线程池中并发执行，
+有依赖的步骤在其所有前置步骤成功后才开始。用于定稿等由多个独立 LLM 调用组成的流程。
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+
+
+def default_step_workers(env_name: str, default: int = 3) -> int:
+    """从环境变量读取并发数（至少为1）"""
+    try:
+        return max(1, int(os.getenv(env_name, str(default))))
+    except ValueError:
+        return default
+
+
+@dataclass
+class Step:
+    """
+    图中的一个步骤
+
+    Attributes:
+        name: 步骤名（图内唯一）
+        func: 执行函数，接收一个 log(msg) 参数；步骤内的日志会缓冲到步骤结束后整体输出，避免并发步骤的日志交错
+        depends_on: 前置步骤名列表
+        label: 用于进度提示的显示名
+    """
+    name: str
+    func: Callable[[Callable[[str], None]], None]
+    depends_on: Sequence[str] = field(default_factory=tuple)
+    label: str = ""
+
+
+def run_step_graph(
+    steps: List[Step],
+    max_workers: int = 3,
+    log: Optional[Callable[[str], None]] = None,
+    on_progress: Optional[Callable[[str, int, int], None]] = None,
+) -> Dict[str, Optional[BaseException]]:
+    """
+    按依赖关系并发执行步骤
+
+    Args:
+        steps: 步骤列表（列表顺序即同一批就绪步骤的提交顺序）
+        max_workers: 线程池大小
+        log: 日志输出函数（每个步骤的缓冲日志在其结束后一次性输出）
+        on_progress: 进度回调 (label, 已完成数, 总数)
+
+    Returns:
+        dict: 步骤名 -> 异常（成功为 None）。前置步骤失败的步骤不会执行，其异常为前置步骤的异常。
+
+    Raises:
+        ValueError: 依赖了不存在的步骤或存在循环依赖
+    """
+    by_name = {s.name: s for s in steps}
+    for s in steps:
+        for dep in s.depends_on:
+            if dep not in by_name:
+                raise ValueError(f"步骤 {s.name} 依赖了不存在的步骤 {dep}")
+
+    results: Dict[str, Optional[BaseException]] = {}
+    pending = list(steps)
+    total = len(steps)
+    log_lock = threading.Lock()
+
+    def emit(lines: List[str]):
+        if log and lines:
+            with log_lock:
+                for line in lines:
+                    log(line)
+
+    def run_one(step: Step):
+        buffered: List[str] = []
+        try:
+            step.func(buffered.append)
+        finally:
+            emit(buffered)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="step") as executor:
+        running = {}
+        while pending or running:
+            # 提交所有依赖已满足的步骤；前置失败的步骤直接标记失败。
+            # 标记失败会让其后继步骤也变为可判定，因此反复扫描直到没有变化，
+            # 否则列表中排在前面的后继会被漏掉，进而被误判为循环依赖
+            changed = True
+            while changed:
+                changed = False
+                for step in list(pending):
+                    deps = [results.get(d, "pending") for d in step.depends_on]
+                    if "pending" in deps:
+                        continue
+                    pending.remove(step)
+                    changed = True
+                    failed_dep = next((e for e in deps if e is not None), None)
+                    if failed_dep is not None:
+                        results[step.name] = failed_dep
+                        logging.warning(f"[StepGraph] skip {step.name}: dependency failed")
+                        continue
+                    running[executor.submit(run_one, step)] = step
+
+            if not running:
+                if pending:
+                    raise ValueError(f"步骤存在循环依赖: {[s.name for s in pending]}")
+                break
+
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                step = running.pop(future)
+                error = future.exception()
+                results[step.name] = error
+                if error is not None:
+                    logging.error(f"[StepGraph] step {step.name} failed: {error}", exc_info=error)
+                if on_progress:
+                    on_progress(step.label or step.name, len(results), total)
+
+    return results
@@ -14,7 +14,8 @@ import queue
 import threading
 import logging
 import time
-from typing import Optional, Callable, Any, Dict
+from collections import deque
+from typing import Optional, Callable, Any, Dict, List, Tuple
 from dataclasses import dataclass, field
 from enum import Enum
 from concurrent.futures import ThreadPoolExecutor, Future
@@ -550,9 +551,29 @@ class TaskManager:
     def get_executor(self) -> ThreadPoolExecutor:
         """获取线程池执行器"""
         if self._executor is None:
-            self._executor = ThreadPoolExecutor(max_workers=self._max_workers)
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="task")
         return self._executor
 
+    @property
+    def max_workers(self) -> int:
+        return self._max_workers
+
+    def set_max_workers(self, max_workers: int):
+        """
+        调整线程池大小（线程池已创建时，等已提交的任务结束后以新大小重建）
+
+        Args:
+            max_workers: 线程数（至少为1）
+        """
+        max_workers = max(1, int(max_workers))
+        if max_workers == self._max_workers:
+            return
+        self._max_workers = max_workers
+        if self._executor is not None:
+            old_executor = self._executor
+            self._executor = None
+            old_executor.shutdown(wait=False)
+
     def submit_task(self, fn: Callable, *args, **kwargs) -> Future:
         """
         提交任务到线程池
@@ -574,6 +595,243 @@ class TaskManager:
             self._executor.shutdown(wait=False)
 
 
+@dataclass
+class _ProjectQueue:
+    """调度器内某个项目的任务队列与统计"""
+    project: str
+    tasks: deque = field(default_factory=deque)  # (label, fn)
+    running_label: Optional[str] = None
+    done: int = 0
+    failed_label: Optional[str] = None
+    error: Optional[BaseException] = None
+    busy_seconds: float = 0.0
+    first_started: Optional[float] = None
+    last_finished: Optional[float] = None
+    last_served: float = 0.0
+    on_finished: Optional[Callable[["_ProjectQueue"], None]] = None
+    finished: bool = False
+
+
+class ProjectScheduler:
+    """
+    多项目任务调度器（使用 TaskManager 的线程池）
+
+    - 同一项目的任务严格按提交顺序串行执行（章节必须按顺序生成）
+    - 不同项目的任务在线程池中并发执行，并发数即 TaskManager 的 max_workers
+    - 有空闲线程时优先调度最久未被服务的项目，避免某个项目长期占满线程
+    - 项目中某个任务抛出异常后，该项目剩余任务取消，其他项目不受影响
+    - stats() 汇报队列深度、各项目进度与吞吐量
+
+    对同一服务商/模型的并发与 RPM/TPM 限制由 rate_limiter 在进程内统一执行，
+    所有项目共享，调度器本身不区分服务商。
+
+    使用示例：
+        scheduler = ProjectScheduler(get_task_manager(), max_workers=3)
+        scheduler.submit("novel_a", "第1章", lambda: ...)
+        scheduler.submit("novel_b", "第1章", lambda: ...)
+        scheduler.wait()
+    """
+
+    def __init__(
+        self,
+        task_manager: Optional[TaskManager] = None,
+        max_workers: Optional[int] = None,
+        on_event: Optional[Callable[..., None]] = None,
+    ):
+        """
+        Args:
+            task_manager: 提供线程池的任务管理器，默认为全局实例
+            max_workers: 同时运行的任务数，默认沿用 TaskManager 的线程池大小
+            on_event: 事件回调 on_event(event, project, label, **fields)，
+                event 为 task_start / task_done / task_failed / project_done
+        """
+        self.task_manager = task_manager or get_task_manager()
+        if max_workers:
+            self.task_manager.set_max_workers(max_workers)
+        self.max_workers = self.task_manager.max_workers
+        self.on_event = on_event
+        self._projects: Dict[str, _ProjectQueue] = {}
+        self._cond = threading.Condition()
+        self._running = 0
+        self._cancelled = False
+
+    def _emit(self, event: str, project: str, label: Optional[str] = None, **fields):
+        if self.on_event:
+            try:
+                self.on_event(event, project, label, **fields)
+            except Exception as e:
+                logging.warning(f"调度器事件回调异常: {e}")
+
+    def submit(self, project: str, label: str, fn: Callable[[], Any]):
+        """向项目队列末尾追加一个任务"""
+        self.submit_many(project, [(label, fn)])
+
+    def submit_many(
+        self,
+        project: str,
+        tasks: List[Tuple[str, Callable[[], Any]]],
+        on_finished: Optional[Callable[["_ProjectQueue"], None]] = None,
+    ):
+        """
+        向项目队列末尾追加一组任务
+
+        Args:
+            project: 项目标识（通常为项目目录）
+            tasks: [(label, fn), ...]，fn 无参数，抛出异常表示失败
+            on_finished: 项目所有任务结束（或失败/取消）后调用一次，用于释放项目级资源
+        """
+        with self._cond:
+            state = self._projects.get(project)
+            if state is None or state.finished:
+                state = _ProjectQueue(project=project)
+                self._projects[project] = state
+            state.tasks.extend(tasks)
+            if on_finished is not None:
+                state.on_finished = on_finished
+        self._dispatch()
+
+    def _pick_next(self) -> Optional[_ProjectQueue]:
+        """调用方需持有 _cond：在没有运行中任务的项目里挑最久未被服务的"""
+        candidates = [
+            state for state in self._projects.values()
+            if state.tasks and state.running_label is None and state.error is None
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda state: state.last_served)
+
+    def _dispatch(self):
+        to_start = []
+        with self._cond:
+            while not self._cancelled and self._running < self.max_workers:
+                state = self._pick_next()
+                if state is None:
+                    break
+                label, fn = state.tasks.popleft()
+                state.running_label = label
+                state.last_served = time.monotonic()
+                if state.first_started is None:
+                    state.first_started = state.last_served
+                self._running += 1
+                to_start.append((state, label, fn))
+        for state, label, fn in to_start:
+            self.task_manager.submit_task(self._run, state, label, fn)
+
+    def _run(self, state: _ProjectQueue, label: str, fn: Callable[[], Any]):
+        self._emit("task_start", state.project, label)
+        started = time.monotonic()
+        error = None
+        try:
+            fn()
+        except Exception as e:
+            # 任务异常只影响所属项目
+            error = e
+            logging.error(f"[Scheduler] {state.project} {label} failed: {e}")
+
+        finished_callback = None
+        just_finished = False
+        with self._cond:
+            elapsed = time.monotonic() - started
+            state.running_label = None
+            state.last_finished = time.monotonic()
+            if error is None:
+                state.done += 1
+                state.busy_seconds += elapsed
+            else:
+                state.error = error
+                state.failed_label = label
+                state.tasks.clear()
+            if self._cancelled:
+                state.tasks.clear()
+            if not state.tasks and not state.finished:
+                state.finished = True
+                just_finished = True
+                finished_callback = state.on_finished
+
+        if error is None:
+            self._emit("task_done", state.project, label, seconds=round(elapsed, 2))
+        else:
+            self._emit("task_failed", state.project, label, error=str(error), seconds=round(elapsed, 2))
+        if just_finished:
+            if finished_callback:
+                try:
+                    finished_callback(state)
+                except Exception as e:
+                    logging.warning(f"[Scheduler] {state.project} on_finished failed: {e}")
+            self._emit("project_done", state.project, None, done=state.done, failed=state.failed_label)
+
+        # 回调都结束后才计为空闲，wait() 返回时所有事件均已发出
+        with self._cond:
+            self._running -= 1
+            self._cond.notify_all()
+        self._dispatch()
+
+    def cancel(self):
+        """取消所有尚未开始的任务（运行中的任务会执行完）"""
+        idle_finished = []
+        with self._cond:
+            self._cancelled = True
+            for state in self._projects.values():
+                state.tasks.clear()
+                if state.running_label is None and not state.finished:
+                    state.finished = True
+                    idle_finished.append(state)
+            self._cond.notify_all()
+        for state in idle_finished:
+            if state.on_finished:
+                try:
+                    state.on_finished(state)
+                except Exception as e:
+                    logging.warning(f"[Scheduler] {state.project} on_finished failed: {e}")
+            self._emit("project_done", state.project, None, done=state.done, failed=state.failed_label, cancelled=True)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待所有项目的任务结束
+
+        Returns:
+            bool: 全部结束返回 True，超时返回 False
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._running or any(state.tasks for state in self._projects.values()):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def failures(self) -> Dict[str, Tuple[str, BaseException]]:
+        """失败的项目：{project: (失败任务 label, 异常)}"""
+        with self._cond:
+            return {
+                state.project: (state.failed_label, state.error)
+                for state in self._projects.values() if state.error is not None
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        """队列深度与各项目吞吐量"""
+        now = time.monotonic()
+        with self._cond:
+            projects = {}
+            for state in self._projects.values():
+                wall = ((state.last_finished if state.finished else now) - state.first_started) if state.first_started else 0.0
+                projects[state.project] = {
+                    "pending": len(state.tasks),
+                    "running": state.running_label,
+                    "done": state.done,
+                    "failed": state.failed_label,
+                    "avg_seconds": round(state.busy_seconds / state.done, 2) if state.done else None,
+                    "per_hour": round(state.done * 3600.0 / wall, 2) if wall > 0 and state.done else None,
+                }
+            return {
+                "queue_depth": sum(len(state.tasks) for state in self._projects.values()),
+                "running": self._running,
+                "max_workers": self.max_workers,
+                "projects": projects,
+            }
+
+
 # 全局任务管理器实例
 _task_manager: Optional[TaskManager] = None
 
@@ -0,0 +1,182 @@
+"""
+中文分句与分块（不依赖 NLTK）
+
+- iter_sentences: 按中文/英文句末标点与换行切分句子，句末标点后紧跟的引号、括号归入本句；
+  输入可以是整段文本，也可以是逐块读取的文本流（生成器，逐句产出）
+- iter_chunks: 把句子按长度合并为分块，超长句子硬切，可选相邻分块重叠
+- split_text: 上述两步的便捷组合，返回列表
+- iter_sentence_spans / iter_chunk_spans: 同上，但同时产出每句/每块在原文中的字符偏移
+
+句子保留原文中的空白与换行，合并时直接拼接，不会像 nltk.sent_tokenize + " ".join
+那样在中文句子之间插入空格。长度默认按字符数计算，传入
+length_function=core.utils.rate_limiter.estimate_tokens 即按 token 估算。
+"""
+
+import re
+from typing import Callable, Iterable, Iterator, List, Tuple, Union
+
+# 句末标点（连续出现视为一个句末，如 "！？"、"……"）+ 紧随其后的右引号/右括号，或换行；
+# 其后的空白（含段落换行）归入本句
+_SENTENCE_END_RE = re.compile(
+    r"(?:(?:[。！？!?；;…]+|\.(?=[\s\"'”’」』）)\]】]|$))[\"'”’」』）)\]】]*|\n)\s*"
+)
+
+
+def _cut_sentences(buffer: str, final: bool):
+    """从缓冲区切出完整句子，返回 (句子列表, 剩余文本)"""
+    sentences = []
+    start = 0
+    for match in _SENTENCE_END_RE.finditer(buffer):
+        end = match.end()
+        # 句末出现在缓冲区末尾时，后续数据可能还有标点/引号属于本句，流式输入时先保留
+        if end == len(buffer) and not final:
+            break
+        sentences.append(buffer[start:end])
+        start = end
+    return sentences, buffer[start:]
+
+
+def iter_sentence_spans(text: Union[str, Iterable[str]]) -> Iterator[Tuple[int, str]]:
+    """
+    逐句产出 (句子在原文中的字符偏移, 句子)，保留原文空白，跳过空白句
+
+    Args:
+        text: 整段文本，或逐块产出文本的可迭代对象（如按块读取的大文件）
+    """
+    pieces = [text] if isinstance(text, str) else text
+    buffer = ""
+    base = 0  # buffer 开头在原文中的偏移
+    for piece in pieces:
+        if not piece:
+            continue
+        buffer += piece
+        sentences, buffer = _cut_sentences(buffer, final=False)
+        for sentence in sentences:
+            if sentence.strip():
+                yield base, sentence
+            base += len(sentence)
+    sentences, rest = _cut_sentences(buffer, final=True)
+    for sentence in sentences + [rest]:
+        if sentence.strip():
+            yield base, sentence
+        base += len(sentence)
+
+
+def iter_sentences(text: Union[str, Iterable[str]]) -> Iterator[str]:
+    """
+    逐句产出（保留原文空白，跳过空白句）
+
+    Args:
+        text: 整段文本，或逐块产出文本的可迭代对象（如按块读取的大文件）
+    """
+    for _, sentence in iter_sentence_spans(text):
+        yield sentence
+
+
+def _hard_split(sentence: str, max_length: int, length_function: Callable[[str], int]) -> List[str]:
+    """超过 max_length 的单句按比例估算字符数硬切"""
+    total = length_function(sentence)
+    step = max(1, int(len(sentence) * max_length / max(total, 1)))
+    return [sentence[i:i + step] for i in range(0, len(sentence), step)]
+
+
+def iter_chunk_spans(
+    spans: Iterable[Tuple[int, str]],
+    max_length: int = 500,
+    overlap: int = 0,
+    length_function: Callable[[str], int] = len,
+) -> Iterator[Tuple[int, str]]:
+    """
+    把 (偏移, 句子) 合并为不超过 max_length 的分块，产出 (分块首字符在原文中的偏移, 分块)
+
+    Args:
+        spans: (偏移, 句子) 序列（通常来自 iter_sentence_spans）
+        max_length: 单个分块的最大长度（单位由 length_function 决定）
+        overlap: 相邻分块的重叠长度：下一块以上一块末尾总长不超过 overlap 的若干整句开头
+        length_function: 长度计算函数，默认按字符数
+    """
+    max_length = max(1, max_length)
+    overlap = max(0, min(overlap, max_length // 2))
+    current: List[Tuple[int, str]] = []
+    lengths: List[int] = []
+    current_length = 0
+
+    def make_chunk(parts):
+        raw = "".join(part for _, part in parts)
+        chunk = raw.strip()
+        return parts[0][0] + len(raw) - len(raw.lstrip()), chunk
+
+    def flush():
+        offset, chunk = make_chunk(current)
+        # 保留末尾若干整句作为下一块的开头
+        carried, carried_lengths, carried_length = [], [], 0
+        if overlap:
+            for part, length in zip(reversed(current), reversed(lengths)):
+                if carried_length + length > overlap:
+                    break
+                carried.insert(0, part)
+                carried_lengths.insert(0, length)
+                carried_length += length
+        return offset, chunk, carried, carried_lengths, carried_length
+
+    for start, sentence in spans:
+        length = length_function(sentence)
+        if length <= max_length:
+            parts = [((start, sentence), length)]
+        else:
+            parts = []
+            position = start
+            for piece in _hard_split(sentence, max_length, length_function):
+                parts.append(((position, piece), length_function(piece)))
+                position += len(piece)
+        for part, part_length in parts:
+            if current and current_length + part_length > max_length:
+                offset, chunk, current, lengths, current_length = flush()
+                if chunk:
+                    yield offset, chunk
+                # 重叠部分加上新句仍超长时放弃重叠
+                if current_length + part_length > max_length:
+                    current, lengths, current_length = [], [], 0
+            current.append(part)
+            lengths.append(part_length)
+            current_length += part_length
+
+    if current:
+        offset, chunk = make_chunk(current)
+        if chunk:
+            yield offset, chunk
+
+
+def iter_chunks(
+    sentences: Iterable[str],
+    max_length: int = 500,
+    overlap: int = 0,
+    length_function: Callable[[str], int] = len,
+) -> Iterator[str]:
+    """
+    把句子合并为不超过 max_length 的分块
+
+    Args:
+        sentences: 句子序列（通常来自 iter_sentences）
+        max_length: 单个分块的最大长度（单位由 length_function 决定）
+        overlap: 相邻分块的重叠长度：下一块以上一块末尾总长不超过 overlap 的若干整句开头
+        length_function: 长度计算函数，默认按字符数
+    """
+    def spans():
+        position = 0
+        for sentence in sentences:
+            yield position, sentence
+            position += len(sentence)
+
+    for _, chunk in iter_chunk_spans(spans(), max_length, overlap, length_function):
+        yield chunk
+
+
+def split_text(
+    text: Union[str, Iterable[str]],
+    max_length: int = 500,
+    overlap: int = 0,
+    length_function: Callable[[str], int] = len,
+) -> List[str]:
+    """分句并合并为分块，返回分块列表"""
+    return list(iter_chunks(iter_sentences(text), max_length, overlap, length_function))
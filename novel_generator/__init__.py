@@ -9,5 +9,6 @@ from .chapter import (
     generate_chapter_draft
 )
 from .finalization import finalize_chapter, enrich_chapter_text
-from .knowledge import import_knowledge_file
+from .knowledge import import_knowledge_file, import_knowledge_path
+from .reindex import rebuild_vector_store
 from .vectorstore_utils import clear_vector_store, check_chapter_in_vectorstore
@@ -6,6 +6,7 @@
 import os
 import json
 import logging
+import threading
 import traceback
 from novel_generator.common import invoke_with_cleaning
 from core.adapters.llm_adapters import create_llm_adapter
@@ -22,9 +23,10 @@ from core.prompting.prompt_definitions import (
     concept_character_dynamics_prompt,
     concept_world_building_prompt
 )
-from core.prompting.prompt_manager import PromptManager  # 新增：提示词管理器
+from core.prompting.prompt_manager import get_shared_prompt_manager  # 进程共享的提示词管理器
 from core.prompting.prompt_manager_helper import format_prompt_safe
 from core.utils.file_utils import clear_file_content, save_string_to_txt, get_log_file_path
+from core.utils.step_graph import Step, default_step_workers, run_step_graph
 logging.basicConfig(
     filename=get_log_file_path(),      # 日志文件名
     filemode='a',            # 追加模式（'w' 会覆盖）
@@ -34,6 +36,8 @@ logging.basicConfig(
 )
 from core.utils.volume_utils import calculate_volume_ranges  # 新增：分卷工具函数
 
+# 角色动力学与世界观两条分支的并发数（设为1则依次执行）
+ARCHITECTURE_MAX_WORKERS = default_step_workers("AUTONOVEL_ARCHITECTURE_WORKERS", 2)
 
 def sanitize_prompt_variable(value: str) -> str:
     """
@@ -198,6 +202,7 @@ def Novel_architecture_generate(
       2. character_dynamics_prompt
       3. world_building_prompt
       4. plot_architecture_prompt
+    其中 2（含初始角色状态）与 3 只依赖核心种子，两者并发执行（AUTONOVEL_ARCHITECTURE_WORKERS=1 时依次执行）。
     若在中间任何一步报错且重试多次失败，则将已经生成的内容写入 partial_architecture.json 并退出；
     下次调用时可从该步骤继续。
     最终输出 Novel_architecture.txt
@@ -211,7 +216,7 @@ def Novel_architecture_generate(
 
     # 创建提示词管理器实例（带异常保护）
     try:
-        pm = PromptManager()
+        pm = get_shared_prompt_manager()
     except Exception as e:
         # 如果PromptManager初始化失败（如导入prompt_definitions失败、权限问题等）
         # 创建一个最小化的fallback对象，确保后续代码不崩溃
@@ -344,185 +349,203 @@ def Novel_architecture_generate(
                 if saved_mode == "构思模式" and not saved_concept:
                     gui_log("   ⚠️ 检测到构思模式但用户构思为空，已回退为灵感模式")
 
-    # Step2: 角色动力学（可选）
-    if pm.is_module_enabled("architecture", "character_dynamics"):
-        # 检查是否需要生成（键不存在 OR 值为占位文本）
-        existing_value = partial_data.get("character_dynamics_result", "")
-        is_placeholder = existing_value.startswith("（已跳过") and existing_value.endswith("）")
+    # Step2（角色动力学 + 初始角色状态）与 Step3（世界观）都只依赖核心种子，两条分支并发执行；
+    # 每个结果完成后立即写入 partial_architecture.json，中断后可从断点继续
+    partial_lock = threading.Lock()
 
-        if "character_dynamics_result" not in partial_data or is_placeholder:
-            if is_placeholder:
-                gui_log(f"▶ [2/{total_steps}] 角色动力学生成（检测到占位值，重新生成）")
-            else:
-                gui_log(f"▶ [2/{total_steps}] 角色动力学生成")
-
-            gui_log("   ├─ 基于核心种子设计角色...")
-            logging.info("Step2: Generating character_dynamics_prompt ...")
-
-            # 根据创作模式选择提示词
-            if is_concept_mode:
-                # 构思模式：使用包含用户构思的提示词
-                prompt_template = pm.get_prompt("architecture", "concept_character_dynamics")
-                if not prompt_template:
-                    prompt_template = concept_character_dynamics_prompt
-
-                prompt_character = format_prompt_safe(
-                    prompt_template,
-                    {
-                        "user_concept": user_concept,
-                        "core_seed": partial_data["core_seed_result"].strip(),
-                        "user_guidance": user_guidance
-                    },
-                    "architecture.concept_character_dynamics"
-                )
-            else:
-                # 灵感模式：使用原有提示词
-                prompt_template = pm.get_prompt("architecture", "character_dynamics")
-                if not prompt_template:
-                    gui_log("   └─ ⚠️ 提示词加载失败，使用默认提示词")
-                    prompt_template = character_dynamics_prompt
-
-                prompt_character = format_prompt_safe(
-                    prompt_template,
-                    {
-                        "core_seed": partial_data["core_seed_result"].strip(),
-                        "user_guidance": user_guidance
-                    },
-                    "architecture.character_dynamics"
-                )
-            gui_log("   ├─ 向LLM发起请求...")
-            character_dynamics_result = invoke_with_cleaning(llm_adapter, prompt_character, system_prompt=system_prompt)
-            if not character_dynamics_result.strip():
-                gui_log("   └─ ❌ 生成失败")
-                logging.warning("character_dynamics_prompt generation failed.")
-                save_partial_architecture_data(filepath, partial_data)
-                return
-            gui_log("   └─ ✅ 角色动力学生成完成")
-            partial_data["character_dynamics_result"] = character_dynamics_result
+    def checkpoint(key, value):
+        with partial_lock:
+            partial_data[key] = value
             save_partial_architecture_data(filepath, partial_data)
 
-            # 🆕 新增：单独保存角色动力学
-            gui_log("   ├─ 保存角色框架文件...")
-            character_dynamics_file = os.path.join(filepath, "character_dynamics.txt")
-            clear_file_content(character_dynamics_file)
-            save_string_to_txt(character_dynamics_result, character_dynamics_file)
-            gui_log("   └─ ✅ 已保存至: character_dynamics.txt\n")
-            logging.info("character_dynamics.txt saved successfully")
+    def character_branch(log):
+        # Step2: 角色动力学（可选）
+        if pm.is_module_enabled("architecture", "character_dynamics"):
+            # 检查是否需要生成（键不存在 OR 值为占位文本）
+            existing_value = partial_data.get("character_dynamics_result", "")
+            is_placeholder = existing_value.startswith("（已跳过") and existing_value.endswith("）")
+
+            if "character_dynamics_result" not in partial_data or is_placeholder:
+                if is_placeholder:
+                    log(f"▶ [2/{total_steps}] 角色动力学生成（检测到占位值，重新生成）")
+                else:
+                    log(f"▶ [2/{total_steps}] 角色动力学生成")
+
+                log("   ├─ 基于核心种子设计角色...")
+                logging.info("Step2: Generating character_dynamics_prompt ...")
+
+                # 根据创作模式选择提示词
+                if is_concept_mode:
+                    # 构思模式：使用包含用户构思的提示词
+                    prompt_template = pm.get_prompt("architecture", "concept_character_dynamics")
+                    if not prompt_template:
+                        prompt_template = concept_character_dynamics_prompt
+
+                    prompt_character = format_prompt_safe(
+                        prompt_template,
+                        {
+                            "user_concept": user_concept,
+                            "core_seed": partial_data["core_seed_result"].strip(),
+                            "user_guidance": user_guidance
+                        },
+                        "architecture.concept_character_dynamics"
+                    )
+                else:
+                    # 灵感模式：使用原有提示词
+                    prompt_template = pm.get_prompt("architecture", "character_dynamics")
+                    if not prompt_template:
+                        log("   └─ ⚠️ 提示词加载失败，使用默认提示词")
+                        prompt_template = character_dynamics_prompt
+
+                    prompt_character = format_prompt_safe(
+                        prompt_template,
+                        {
+                            "core_seed": partial_data["core_seed_result"].strip(),
+                            "user_guidance": user_guidance
+                        },
+                        "architecture.character_dynamics"
+                    )
+                log("   ├─ 向LLM发起请求...")
+                character_dynamics_result = invoke_with_cleaning(llm_adapter, prompt_character, system_prompt=system_prompt)
+                if not character_dynamics_result.strip():
+                    log("   └─ ❌ 生成失败")
+                    logging.warning("character_dynamics_prompt generation failed.")
+                    raise RuntimeError("character_dynamics_prompt generation failed")
+                log("   └─ ✅ 角色动力学生成完成")
+                checkpoint("character_dynamics_result", character_dynamics_result)
+
+                # 🆕 新增：单独保存角色动力学
+                log("   ├─ 保存角色框架文件...")
+                character_dynamics_file = os.path.join(filepath, "character_dynamics.txt")
+                clear_file_content(character_dynamics_file)
+                save_string_to_txt(character_dynamics_result, character_dynamics_file)
+                log("   └─ ✅ 已保存至: character_dynamics.txt\n")
+                logging.info("character_dynamics.txt saved successfully")
+            else:
+                log(f"▷ [2/{total_steps}] 角色动力学 (已完成，跳过)\n")
+                logging.info("Step2 already done. Skipping...")
         else:
-            gui_log(f"▷ [2/{total_steps}] 角色动力学 (已完成，跳过)\n")
-            logging.info("Step2 already done. Skipping...")
-    else:
-        gui_log(f"▷ [2/{total_steps}] 角色动力学 (已禁用，跳过)\n")
-        partial_data["character_dynamics_result"] = "（已跳过角色动力学生成）"
-        save_partial_architecture_data(filepath, partial_data)
-        logging.info("Step2 disabled by user configuration")
-
-    # 生成初始角色状态（仅当角色动力学已启用时）
-    if (
-        pm.is_module_enabled("architecture", "character_dynamics") and
-        pm.is_module_enabled("helper", "create_character_state") and
-        "character_dynamics_result" in partial_data and
-        partial_data["character_dynamics_result"] != "（已跳过角色动力学生成）" and
-        "character_state_result" not in partial_data
-    ):
-        gui_log(f"▶ [3/{total_steps}] 初始角色状态生成")
-        gui_log("   ├─ 基于角色动力学建立状态表...")
-        logging.info("Generating initial character state from character dynamics ...")
-
-        prompt_template = pm.get_prompt("helper", "create_character_state")
-        if not prompt_template:
-            gui_log("   └─ ⚠️ 提示词加载失败，使用默认提示词")
-            prompt_template = create_character_state_prompt
-
-        prompt_char_state_init = format_prompt_safe(
-            prompt_template,
-            {
-                "character_dynamics": partial_data["character_dynamics_result"].strip()
-            },
-            "helper.create_character_state"
-        )
-        gui_log("   ├─ 向LLM发起请求...")
-        character_state_init = invoke_with_cleaning(llm_adapter, prompt_char_state_init, system_prompt=system_prompt)
-        if not character_state_init.strip():
-            gui_log("   └─ ❌ 生成失败")
-            logging.warning("create_character_state_prompt generation failed.")
-            save_partial_architecture_data(filepath, partial_data)
-            return
-        gui_log("   ├─ 保存角色状态到 character_state.txt...")
-        partial_data["character_state_result"] = character_state_init
-        character_state_file = os.path.join(filepath, "character_state.txt")
-        clear_file_content(character_state_file)
-        save_string_to_txt(character_state_init, character_state_file)
-        save_partial_architecture_data(filepath, partial_data)
-        gui_log("   └─ ✅ 初始角色状态生成完成\n")
-        logging.info("Initial character state created and saved.")
-    elif not pm.is_module_enabled("architecture", "character_dynamics"):
-        gui_log(f"▷ [3/{total_steps}] 初始角色状态 (角色动力学已禁用，跳过)\n")
-
-    # Step3: 世界观（可选）
-    if pm.is_module_enabled("architecture", "world_building"):
-        # 检查是否需要生成（键不存在 OR 值为占位文本）
-        existing_value = partial_data.get("world_building_result", "")
-        is_placeholder = existing_value.startswith("（已跳过") and existing_value.endswith("）")
+            log(f"▷ [2/{total_steps}] 角色动力学 (已禁用，跳过)\n")
+            checkpoint("character_dynamics_result", "（已跳过角色动力学生成）")
+            logging.info("Step2 disabled by user configuration")
+
+        # 生成初始角色状态（仅当角色动力学已启用时）
+        if (
+            pm.is_module_enabled("architecture", "character_dynamics") and
+            pm.is_module_enabled("helper", "create_character_state") and
+            "character_dynamics_result" in partial_data and
+            partial_data["character_dynamics_result"] != "（已跳过角色动力学生成）" and
+            "character_state_result" not in partial_data
+        ):
+            log(f"▶ [3/{total_steps}] 初始角色状态生成")
+            log("   ├─ 基于角色动力学建立状态表...")
+            logging.info("Generating initial character state from character dynamics ...")
+
+            prompt_template = pm.get_prompt("helper", "create_character_state")
+            if not prompt_template:
+                log("   └─ ⚠️ 提示词加载失败，使用默认提示词")
+                prompt_template = create_character_state_prompt
 
-        if "world_building_result" not in partial_data or is_placeholder:
-            if is_placeholder:
-                gui_log(f"▶ [4/{total_steps}] 世界观构建（检测到占位值，重新生成）")
-            else:
-                gui_log(f"▶ [4/{total_steps}] 世界观构建")
-
-            gui_log("   ├─ 构建世界观设定...")
-            logging.info("Step3: Generating world_building_prompt ...")
-
-            # 根据创作模式选择提示词
-            if is_concept_mode:
-                # 构思模式：使用包含用户构思的提示词
-                prompt_template = pm.get_prompt("architecture", "concept_world_building")
-                if not prompt_template:
-                    prompt_template = concept_world_building_prompt
-
-                prompt_world = format_prompt_safe(
-                    prompt_template,
-                    {
-                        "user_concept": user_concept,
-                        "core_seed": partial_data["core_seed_result"].strip(),
-                        "user_guidance": user_guidance
-                    },
-                    "architecture.concept_world_building"
-                )
+            prompt_char_state_init = format_prompt_safe(
+                prompt_template,
+                {
+                    "character_dynamics": partial_data["character_dynamics_result"].strip()
+                },
+                "helper.create_character_state"
+            )
+            log("   ├─ 向LLM发起请求...")
+            character_state_init = invoke_with_cleaning(llm_adapter, prompt_char_state_init, system_prompt=system_prompt)
+            if not character_state_init.strip():
+                log("   └─ ❌ 生成失败")
+                logging.warning("create_character_state_prompt generation failed.")
+                raise RuntimeError("create_character_state_prompt generation failed")
+            log("   ├─ 保存角色状态到 character_state.txt...")
+            character_state_file = os.path.join(filepath, "character_state.txt")
+            clear_file_content(character_state_file)
+            save_string_to_txt(character_state_init, character_state_file)
+            checkpoint("character_state_result", character_state_init)
+            log("   └─ ✅ 初始角色状态生成完成\n")
+            logging.info("Initial character state created and saved.")
+        elif not pm.is_module_enabled("architecture", "character_dynamics"):
+            log(f"▷ [3/{total_steps}] 初始角色状态 (角色动力学已禁用，跳过)\n")
+
+    def world_branch(log):
+        # Step3: 世界观（可选）
+        if pm.is_module_enabled("architecture", "world_building"):
+            # 检查是否需要生成（键不存在 OR 值为占位文本）
+            existing_value = partial_data.get("world_building_result", "")
+            is_placeholder = existing_value.startswith("（已跳过") and existing_value.endswith("）")
+
+            if "world_building_result" not in partial_data or is_placeholder:
+                if is_placeholder:
+                    log(f"▶ [4/{total_steps}] 世界观构建（检测到占位值，重新生成）")
+                else:
+                    log(f"▶ [4/{total_steps}] 世界观构建")
+
+                log("   ├─ 构建世界观设定...")
+                logging.info("Step3: Generating world_building_prompt ...")
+
+                # 根据创作模式选择提示词
+                if is_concept_mode:
+                    # 构思模式：使用包含用户构思的提示词
+                    prompt_template = pm.get_prompt("architecture", "concept_world_building")
+                    if not prompt_template:
+                        prompt_template = concept_world_building_prompt
+
+                    prompt_world = format_prompt_safe(
+                        prompt_template,
+                        {
+                            "user_concept": user_concept,
+                            "core_seed": partial_data["core_seed_result"].strip(),
+                            "user_guidance": user_guidance
+                        },
+                        "architecture.concept_world_building"
+                    )
+                else:
+                    # 灵感模式：使用原有提示词
+                    prompt_template = pm.get_prompt("architecture", "world_building")
+                    if not prompt_template:
+                        log("   └─ ⚠️ 提示词加载失败，使用默认提示词")
+                        prompt_template = world_building_prompt
+
+                    prompt_world = format_prompt_safe(
+                        prompt_template,
+                        {
+                            "core_seed": partial_data["core_seed_result"].strip(),
+                            "user_guidance": user_guidance
+                        },
+                        "architecture.world_building"
+                    )
+                log("   ├─ 向LLM发起请求...")
+                world_building_result = invoke_with_cleaning(llm_adapter, prompt_world, system_prompt=system_prompt)
+                if not world_building_result.strip():
+                    log("   └─ ❌ 生成失败")
+                    logging.warning("world_building_prompt generation failed.")
+                    raise RuntimeError("world_building_prompt generation failed")
+                log("   └─ ✅ 世界观构建完成\n")
+                checkpoint("world_building_result", world_building_result)
             else:
-                # 灵感模式：使用原有提示词
-                prompt_template = pm.get_prompt("architecture", "world_building")
-                if not prompt_template:
-                    gui_log("   └─ ⚠️ 提示词加载失败，使用默认提示词")
-                    prompt_template = world_building_prompt
-
-                prompt_world = format_prompt_safe(
-                    prompt_template,
-                    {
-                        "core_seed": partial_data["core_seed_result"].strip(),
-                        "user_guidance": user_guidance
-                    },
-                    "architecture.world_building"
-                )
-            gui_log("   ├─ 向LLM发起请求...")
-            world_building_result = invoke_with_cleaning(llm_adapter, prompt_world, system_prompt=system_prompt)
-            if not world_building_result.strip():
-                gui_log("   └─ ❌ 生成失败")
-                logging.warning("world_building_prompt generation failed.")
-                save_partial_architecture_data(filepath, partial_data)
-                return
-            gui_log("   └─ ✅ 世界观构建完成\n")
-            partial_data["world_building_result"] = world_building_result
-            save_partial_architecture_data(filepath, partial_data)
+                log(f"▷ [4/{total_steps}] 世界观 (已完成，跳过)\n")
+                logging.info("Step3 already done. Skipping...")
         else:
-            gui_log(f"▷ [4/{total_steps}] 世界观 (已完成，跳过)\n")
-            logging.info("Step3 already done. Skipping...")
-    else:
-        gui_log(f"▷ [4/{total_steps}] 世界观 (已禁用，跳过)\n")
-        partial_data["world_building_result"] = "（已跳过世界观构建）"
-        save_partial_architecture_data(filepath, partial_data)
-        logging.info("Step3 disabled by user configuration")
+            log(f"▷ [4/{total_steps}] 世界观 (已禁用，跳过)\n")
+            checkpoint("world_building_result", "（已跳过世界观构建）")
+            logging.info("Step3 disabled by user configuration")
+
+    if ARCHITECTURE_MAX_WORKERS > 1:
+        gui_log("▶ 角色动力学与世界观并行生成中...\n")
+    branch_results = run_step_graph(
+        [
+            Step("character_dynamics", character_branch, label="角色动力学"),
+            Step("world_building", world_branch, label="世界观"),
+        ],
+        max_workers=ARCHITECTURE_MAX_WORKERS,
+        log=gui_log
+    )
+    if any(error is not None for error in branch_results.values()):
+        with partial_lock:
+            save_partial_architecture_data(filepath, partial_data)
+        return
 
     # Step4: 三幕式情节（可选）
     if pm.is_module_enabled("architecture", "plot_architecture"):
@@ -0,0 +1,612 @@
+#novel_generator/batch.py
+# -*- coding: utf-8 -*-
+"""
+无界面的单章生成流程：构建提示词 → 生成草稿 →（可选）扩写 → 定稿
+
+界面的批量生成与命令行批处理（python -m autonovel batch）共用这里的实现，
+本模块及其依赖均不导入 tkinter / customtkinter。
+
+批量生成时通过 ChapterPipeline 让第N章定稿与第N+1章的上下文预取重叠执行，
+并发深度由 AUTONOVEL_PIPELINE_DEPTH 控制（默认2，设为1即完全串行）。
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from core.prompting.prompt_definitions import resolve_global_system_prompt
+from core.utils.file_utils import save_string_to_txt, clear_file_content
+from core.utils.stage_journal import ChapterCheckpoint, MemoryCheckpoint, get_stage_journal, make_fingerprint
+from core.utils.step_graph import default_step_workers
+from novel_generator.chapter import build_chapter_prompt, generate_chapter_draft, get_last_n_chapters_text
+from novel_generator.finalization import finalize_chapter, enrich_chapter_text
+
+
+def _llm_params(llm_config: dict) -> dict:
+    return {
+        "interface_format": llm_config["interface_format"],
+        "api_key": llm_config["api_key"],
+        "base_url": llm_config["base_url"],
+        "model_name": llm_config["model_name"],
+        "temperature": llm_config["temperature"],
+        "max_tokens": llm_config["max_tokens"],
+        "timeout": llm_config["timeout"],
+    }
+
+
+def _safe_int(value, default: int = 0) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def build_batch_context_from_config(config: dict, filepath: str = "") -> dict:
+    """
+    从 config.json 构建批量生成上下文（结构与界面批量生成一致）
+
+    草稿模型取 choose_configs.prompt_draft_llm，定稿模型取 choose_configs.final_chapter_llm，
+    Embedding 取 last_embedding_interface_format 对应的配置，其余参数取 other_params。
+
+    Raises:
+        KeyError: 配置中缺少所需的模型或 Embedding 配置
+    """
+    llm_configs = config.get("llm_configs", {})
+    choose_configs = config.get("choose_configs", {})
+    other_params = config.get("other_params", {})
+
+    draft_key = choose_configs.get("prompt_draft_llm") or next(iter(llm_configs))
+    finalize_key = choose_configs.get("final_chapter_llm") or draft_key
+    if draft_key not in llm_configs:
+        raise KeyError(f"LLM 配置不存在: {draft_key}")
+    if finalize_key not in llm_configs:
+        raise KeyError(f"LLM 配置不存在: {finalize_key}")
+
+    embedding_configs = config.get("embedding_configs", {})
+    embedding_key = config.get("last_embedding_interface_format", "OpenAI")
+    if embedding_key not in embedding_configs:
+        if not embedding_configs:
+            raise KeyError("config.json 中没有 embedding_configs")
+        embedding_key = next(iter(embedding_configs))
+    embedding_config = embedding_configs[embedding_key]
+
+    characters_involved = other_params.get("characters_involved", "")
+    return {
+        "filepath": filepath or other_params.get("filepath", ""),
+        "draft": _llm_params(llm_configs[draft_key]),
+        "finalize": _llm_params(llm_configs[finalize_key]),
+        "user_guidance": other_params.get("user_guidance", ""),
+        "characters_involved": characters_involved,
+        "key_items": other_params.get("key_items", ""),
+        "scene_location": other_params.get("scene_location", ""),
+        "time_constraint": other_params.get("time_constraint", ""),
+        "char_inv_text": characters_involved,
+        "embedding": {
+            "api_key": embedding_config.get("api_key", ""),
+            "url": embedding_config.get("base_url", ""),
+            "interface_format": embedding_config.get("interface_format", embedding_key),
+            "model_name": embedding_config.get("model_name", ""),
+            "k": _safe_int(embedding_config.get("retrieval_k"), 4),
+        },
+        "num_volumes": _safe_int(other_params.get("num_volumes"), 0),
+        "total_chapters": _safe_int(other_params.get("num_chapters"), 0),
+    }
+
+
+def apply_role_library(prompt_text: str, filepath: str, char_text: str, log: Callable[[str], None] = None) -> str:
+    """把项目“角色库”中与核心人物同名的角色文件内容替换进提示词的核心人物一栏"""
+    # 兼容逗号和换行两种分隔符
+    if ',' in char_text:
+        role_names = [name.strip() for name in char_text.split(',') if name.strip()]
+    else:
+        role_names = [name.strip() for name in char_text.split("\n") if name.strip()]
+
+    role_lib_path = os.path.join(filepath, "角色库")
+    role_contents = []
+
+    if os.path.exists(role_lib_path):
+        for root, dirs, files in os.walk(role_lib_path):
+            for file in files:
+                if file.endswith(".txt") and os.path.splitext(file)[0] in role_names:
+                    file_path = os.path.join(root, file)
+                    try:
+                        with open(file_path, 'r', encoding='utf-8') as f:
+                            role_contents.append(f.read().strip())
+                    except Exception as e:
+                        if log:
+                            log(f"读取角色文件 {file} 失败: {str(e)}")
+
+    if not role_contents:
+        return prompt_text
+
+    role_content_str = "\n".join(role_contents)
+    placeholder_variations = [
+        "核心人物(可能未指定)：{characters_involved}",
+        "核心人物：{characters_involved}",
+        "核心人物(可能未指定):{characters_involved}",
+        "核心人物:{characters_involved}"
+    ]
+
+    for placeholder in placeholder_variations:
+        if placeholder in prompt_text:
+            return prompt_text.replace(placeholder, f"核心人物：\n{role_content_str}")
+
+    lines = prompt_text.split('\n')
+    for idx, line in enumerate(lines):
+        if "核心人物" in line and "：" in line:
+            lines[idx] = f"核心人物：\n{role_content_str}"
+            break
+    return '\n'.join(lines)
+
+
+def _chapter_fingerprint(batch_context: dict, chapter_num: int, word: int, min_word: int, auto_enrich: bool) -> str:
+    """
+    影响本章各阶段输出的参数指纹，参数变化时检查点作废
+
+    前文摘要等阶段依赖前几章的正文/摘要（与 build_chapter_prompt 读取的范围一致），
+    前文被改写或重新生成后，本章已记录（含预取）的阶段也随之作废。
+    """
+    draft_config = batch_context["draft"]
+    finalize_config = batch_context["finalize"]
+    recent_texts = get_last_n_chapters_text(os.path.join(batch_context["filepath"], "chapters"), chapter_num, n=3)
+    return make_fingerprint({
+        "chapter": chapter_num,
+        "word": word,
+        "min_word": min_word,
+        "auto_enrich": auto_enrich,
+        "user_guidance": batch_context["user_guidance"],
+        "characters_involved": batch_context["characters_involved"],
+        "key_items": batch_context["key_items"],
+        "scene_location": batch_context["scene_location"],
+        "time_constraint": batch_context["time_constraint"],
+        "draft_model": [draft_config["base_url"], draft_config["model_name"]],
+        "finalize_model": [finalize_config["base_url"], finalize_config["model_name"]],
+        "previous_chapters": hashlib.sha1("\x00".join(recent_texts).encode("utf-8")).hexdigest(),
+    })
+
+
+PIPELINE_DEPTH = default_step_workers("AUTONOVEL_PIPELINE_DEPTH", 2)
+
+
+class ChapterPipeline:
+    """
+    批量生成的章节流水线
+
+    第N章草稿落盘后、定稿进行的同时，在后台预取第N+1章不依赖定稿结果的上下文
+    （前文摘要、检索关键词、向量检索、知识过滤，写入第N+1章的检查点）。第N+1章正式构建
+    提示词前等待预取完成，此时这些阶段直接命中检查点，只剩读取定稿后最新的摘要、角色状态、
+    伏笔文件并格式化模板。第N章的向量库更新与单章摘要因此不再阻塞第N+1章的 LLM 调用。
+
+    depth 为同时在途的章节数，1 表示完全串行。第N+1章的草稿依赖第N章定稿后的摘要与角色状态，
+    第N+2章的前文摘要又依赖第N+1章的草稿，所以目前只有相邻两章可以重叠，depth > 2 与 2 等价。
+    """
+
+    def __init__(
+        self,
+        batch_context: dict,
+        word: int,
+        min_word: int,
+        auto_enrich: bool,
+        depth: int = PIPELINE_DEPTH,
+        use_checkpoints: bool = True,
+    ):
+        self.batch_context = batch_context
+        self.word = word
+        self.min_word = min_word
+        self.auto_enrich = auto_enrich
+        self.depth = max(1, depth)
+        self.journal = get_stage_journal(batch_context["filepath"]) if use_checkpoints else None
+        self._executor = None
+        if self.depth > 1:
+            self._executor = ThreadPoolExecutor(max_workers=min(self.depth, 2) - 1, thread_name_prefix="chapter-prefetch")
+        self._futures = {}
+        self._memory: Dict[int, MemoryCheckpoint] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def overlapping(self) -> bool:
+        return self._executor is not None
+
+    def checkpoint_for(self, chapter_num: int) -> Optional[ChapterCheckpoint]:
+        """本章的检查点：优先使用项目检查点日志，日志关闭时流水线内用内存检查点传递预取结果"""
+        if self.journal is not None:
+            return self.journal.begin_chapter(
+                chapter_num,
+                _chapter_fingerprint(self.batch_context, chapter_num, self.word, self.min_word, self.auto_enrich)
+            )
+        if not self.overlapping:
+            return None
+        with self._lock:
+            if chapter_num not in self._memory:
+                self._memory[chapter_num] = MemoryCheckpoint(chapter_num)
+            return self._memory[chapter_num]
+
+    def complete(self, chapter_num: int):
+        """本章定稿成功：作废其检查点"""
+        if self.journal is not None:
+            self.journal.complete_chapter(chapter_num)
+        with self._lock:
+            self._memory.pop(chapter_num, None)
+
+    def prefetch(self, chapter_num: Optional[int]):
+        """在后台预取指定章节的上下文（第1章没有前文，无需预取）"""
+        if not self.overlapping or not chapter_num or chapter_num < 2:
+            return
+        with self._lock:
+            if chapter_num in self._futures:
+                return
+            self._futures[chapter_num] = self._executor.submit(self._prefetch, chapter_num)
+
+    def _prefetch(self, chapter_num: int) -> List[str]:
+        # 预取与上一章定稿并发执行，日志先缓冲，等本章开始时再整体输出，避免与定稿日志交错
+        lines: List[str] = []
+        started = time.monotonic()
+        try:
+            _build_prompt(
+                self.batch_context, chapter_num, self.word,
+                log=lines.append, progress=None,
+                checkpoint=self.checkpoint_for(chapter_num), prefetch_only=True
+            )
+            lines.append(f"⏩ 第{chapter_num}章上下文已在上一章定稿期间预取 ({time.monotonic() - started:.1f}s)")
+        except Exception as e:
+            logging.warning(f"Prefetch for chapter {chapter_num} failed: {e}")
+            lines.append(f"⚠️ 第{chapter_num}章上下文预取失败，将在构建提示词时重新计算: {str(e)[:100]}")
+        return lines
+
+    def wait_prefetch(self, chapter_num: int, log: Callable[[str], None] = None):
+        """等待本章的预取结束，并输出其缓冲的日志"""
+        with self._lock:
+            future = self._futures.pop(chapter_num, None)
+        if future is None:
+            return
+        for line in future.result():
+            if log:
+                log(line)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def pending_chapters(filepath: str) -> set:
+    """检查点日志中已开始但未完成的章节（章节文件可能已存在，但应续跑而不是跳过）"""
+    journal = get_stage_journal(filepath)
+    return set(journal.pending_chapters()) if journal else set()
+
+
+def generate_chapter(
+    batch_context: dict,
+    chapter_num: int,
+    word: int,
+    min_word: int,
+    auto_enrich: bool,
+    log: Callable[[str], None] = None,
+    progress: Callable[[str, float], None] = None,
+    begin_stream: Optional[Callable[[], Callable[[str], None]]] = None,
+    use_checkpoints: bool = True,
+    pipeline: Optional[ChapterPipeline] = None,
+    next_chapter: Optional[int] = None,
+) -> bool:
+    """
+    单章生成核心逻辑（不含重试）
+
+    包含3个阶段:
+    1. 构建提示词（含向量检索）
+    2. 生成草稿（字数不足且 auto_enrich 时自动扩写）
+    3. 定稿章节
+
+    Args:
+        log: 日志回调 log(msg)
+        progress: 进度回调 progress(msg, 0~1)
+        begin_stream: 开始生成草稿时调用，返回接收流式片段的回调（界面用来清空并实时刷新文本框）；
+            流式内容作废时会再次调用以清空文本框
+        use_checkpoints: 是否使用项目的阶段检查点日志（中断或重试时跳过已完成的阶段）；传入 pipeline 时以其设置为准
+        pipeline: 批量流水线；不传时按单章串行执行
+        next_chapter: 批量中下一个要生成的章节号，本章草稿落盘后开始在后台预取它的上下文
+
+    Returns:
+        bool: 定稿是否成功（章节内容为空时为 False）
+    """
+    log = log or (lambda msg: None)
+    progress = progress or (lambda msg, pct: None)
+
+    draft_config = batch_context["draft"]
+    finalize_config = batch_context["finalize"]
+    embedding_config = batch_context["embedding"]
+    filepath = batch_context["filepath"]
+    num_volumes = batch_context["num_volumes"]
+    total_chapters = batch_context["total_chapters"]
+
+    embedding_params = {
+        "embedding_api_key": embedding_config["api_key"],
+        "embedding_url": embedding_config["url"],
+        "embedding_interface_format": embedding_config["interface_format"],
+        "embedding_model_name": embedding_config["model_name"],
+    }
+    story_params = {
+        "user_guidance": batch_context["user_guidance"],
+        "characters_involved": batch_context["characters_involved"],
+        "key_items": batch_context["key_items"],
+        "scene_location": batch_context["scene_location"],
+        "time_constraint": batch_context["time_constraint"],
+    }
+
+    if pipeline is None:
+        pipeline = ChapterPipeline(batch_context, word, min_word, auto_enrich, depth=1, use_checkpoints=use_checkpoints)
+    pipeline.wait_prefetch(chapter_num, log)
+    checkpoint = pipeline.checkpoint_for(chapter_num)
+    if checkpoint is not None:
+        completed = checkpoint.completed_stages()
+        if completed:
+            log(f"♻️ 第{chapter_num}章已有 {len(completed)} 个阶段的检查点结果，将直接复用")
+
+    # ========== 阶段1: 构建提示词（含向量检索） ==========
+    # 进度范围: 0% → 35% (在 build_chapter_prompt 内部更新)
+    log("▶ [阶段1/3] 构建章节提示词")
+
+    prompt_done, final_prompt = checkpoint.lookup("prompt") if checkpoint else (False, None)
+    if prompt_done:
+        log("   ⏭ 提示词已在上次运行中构建，使用检查点结果")
+    else:
+        final_prompt = _build_prompt(batch_context, chapter_num, word, log, progress, checkpoint)
+        if checkpoint:
+            checkpoint.record("prompt", final_prompt)
+
+    # ========== 阶段2: 生成草稿 ==========
+    # 进度范围: 35% → 65%
+    log("\n▶ [阶段2/3] 生成章节草稿")
+    progress("✍️ 生成草稿中...", 0.35)
+
+    draft_done, draft_text = checkpoint.lookup("draft") if checkpoint else (False, None)
+    if draft_done:
+        log("   ⏭ 草稿已在上次运行中生成，使用检查点结果")
+        if begin_stream:
+            begin_stream()(draft_text)
+    else:
+        draft_text = generate_chapter_draft(
+            api_key=draft_config["api_key"],
+            base_url=draft_config["base_url"],
+            model_name=draft_config["model_name"],
+            filepath=filepath,
+            novel_number=chapter_num,
+            word_number=word,
+            temperature=draft_config["temperature"],
+            **story_params,
+            **embedding_params,
+            embedding_retrieval_k=embedding_config["k"],
+            interface_format=draft_config["interface_format"],
+            max_tokens=draft_config["max_tokens"],
+            timeout=draft_config["timeout"],
+            custom_prompt_text=final_prompt,
+            use_global_system_prompt=None,  # 使用PromptManager配置
+            num_volumes=num_volumes,
+            total_chapters=total_chapters,
+            gui_log_callback=log,
+            stream_callback=begin_stream() if begin_stream else None,
+            stream_reset_callback=begin_stream,
+            checkpoint=checkpoint
+        )
+        if checkpoint and draft_text.strip():
+            checkpoint.record("draft", draft_text)
+
+    # 草稿生成完成
+    progress("✅ 草稿生成完成", 0.50)
+
+    # 检查字数并扩写
+    chapters_dir = os.path.join(filepath, "chapters")
+    os.makedirs(chapters_dir, exist_ok=True)
+    chapter_path = os.path.join(chapters_dir, f"chapter_{chapter_num}.txt")
+
+    log(f"   ├─ 检查字数: {len(draft_text)}字 (目标{min_word}字)")
+    if len(draft_text) < 0.7 * min_word and auto_enrich:
+        log(f"\n⚠️  字数不足 ({len(draft_text)}/{min_word})")
+        enrich_done, enriched_text = checkpoint.lookup("enriched_draft") if checkpoint else (False, None)
+        if enrich_done:
+            log("   └─ ⏭ 扩写已在上次运行中完成，使用检查点结果\n")
+            draft_text = enriched_text
+        else:
+            log("   ├─ 启动自动扩写...")
+            progress("🔄 扩写中...", 0.55)
+
+            draft_text = enrich_chapter_text(
+                chapter_text=draft_text,
+                word_number=word,
+                api_key=draft_config["api_key"],
+                base_url=draft_config["base_url"],
+                model_name=draft_config["model_name"],
+                temperature=draft_config["temperature"],
+                interface_format=draft_config["interface_format"],
+                max_tokens=draft_config["max_tokens"],
+                timeout=draft_config["timeout"],
+                use_global_system_prompt=None  # 使用PromptManager配置
+            )
+            if checkpoint and draft_text.strip():
+                checkpoint.record("enriched_draft", draft_text)
+            log(f"   └─ ✅ 扩写完成 (现{len(draft_text)}字)\n")
+
+    # 保存草稿
+    clear_file_content(chapter_path)
+    save_string_to_txt(draft_text, chapter_path)
+
+    # 下一章的前文摘要与检索只依赖本章草稿，与本章定稿重叠执行
+    pipeline.prefetch(next_chapter)
+
+    progress("✅ 草稿完成", 0.65)
+
+    # ========== 阶段3: 定稿章节 ==========
+    # 进度范围: 65% → 100% (在 finalize_chapter 内部更新)
+    log("\n▶ [阶段3/3] 章节定稿")
+
+    success = finalize_chapter(
+        novel_number=chapter_num,
+        word_number=word,
+        api_key=finalize_config["api_key"],
+        base_url=finalize_config["base_url"],
+        model_name=finalize_config["model_name"],
+        temperature=finalize_config["temperature"],
+        filepath=filepath,
+        **embedding_params,
+        interface_format=finalize_config["interface_format"],
+        max_tokens=finalize_config["max_tokens"],
+        timeout=finalize_config["timeout"],
+        use_global_system_prompt=None,  # 使用PromptManager配置
+        num_volumes=num_volumes,
+        total_chapters=total_chapters,
+        gui_log_callback=log,
+        progress_callback=progress,
+        checkpoint=checkpoint
+    )
+
+    if success:
+        pipeline.complete(chapter_num)
+        log(f"✅ 第 {chapter_num} 章定稿完成")
+    else:
+        log(f"⚠️ 第 {chapter_num} 章定稿失败（章节内容为空）")
+    return success
+
+
+def _build_prompt(
+    batch_context: dict,
+    chapter_num: int,
+    word: int,
+    log,
+    progress,
+    checkpoint,
+    prefetch_only: bool = False,
+) -> str:
+    """阶段1：构建提示词并注入角色库（prefetch_only 时只预取上下文到检查点）"""
+    draft_config = batch_context["draft"]
+    embedding_config = batch_context["embedding"]
+    filepath = batch_context["filepath"]
+
+    prompt_text = build_chapter_prompt(
+        api_key=draft_config["api_key"],
+        base_url=draft_config["base_url"],
+        model_name=draft_config["model_name"],
+        filepath=filepath,
+        novel_number=chapter_num,
+        word_number=word,
+        temperature=draft_config["temperature"],
+        user_guidance=batch_context["user_guidance"],
+        characters_involved=batch_context["characters_involved"],
+        key_items=batch_context["key_items"],
+        scene_location=batch_context["scene_location"],
+        time_constraint=batch_context["time_constraint"],
+        embedding_api_key=embedding_config["api_key"],
+        embedding_url=embedding_config["url"],
+        embedding_interface_format=embedding_config["interface_format"],
+        embedding_model_name=embedding_config["model_name"],
+        embedding_retrieval_k=embedding_config["k"],
+        interface_format=draft_config["interface_format"],
+        max_tokens=draft_config["max_tokens"],
+        timeout=draft_config["timeout"],
+        system_prompt=resolve_global_system_prompt(),  # 从PromptManager读取配置
+        num_volumes=batch_context["num_volumes"],
+        total_chapters=batch_context["total_chapters"],
+        gui_log_callback=log,
+        progress_callback=progress,
+        checkpoint=checkpoint,
+        prefetch_only=prefetch_only
+    )
+    if prefetch_only:
+        return prompt_text
+
+    # 处理角色库
+    return apply_role_library(prompt_text, filepath, batch_context["char_inv_text"], log)
+
+
+def generate_chapter_with_retry(
+    batch_context: dict,
+    chapter_num: int,
+    word: int,
+    min_word: int,
+    auto_enrich: bool,
+    log: Callable[[str], None] = None,
+    progress: Callable[[str, float], None] = None,
+    begin_stream: Optional[Callable[[], Callable[[str], None]]] = None,
+    max_retries: int = 1,
+    pipeline: Optional[ChapterPipeline] = None,
+    next_chapter: Optional[int] = None,
+) -> bool:
+    """
+    带重试的单章生成；重试后仍失败时抛出异常
+
+    Raises:
+        Exception: 重试 max_retries 次后仍失败
+    """
+    log = log or (lambda msg: None)
+    for attempt in range(max_retries + 1):
+        try:
+            if attempt > 0:
+                log(f"\n🔄 第{chapter_num}章生成失败，开始第{attempt}次重试...\n")
+            return generate_chapter(
+                batch_context, chapter_num, word, min_word, auto_enrich,
+                log=log, progress=progress, begin_stream=begin_stream,
+                pipeline=pipeline, next_chapter=next_chapter
+            )
+        except Exception as e:
+            if attempt < max_retries:
+                log(f"⚠️  生成出错: {str(e)}")
+                log(f"   准备重试...")
+                logging.warning(f"Chapter {chapter_num} attempt {attempt + 1} failed: {e}")
+                continue
+            raise Exception(f"生成失败（已重试{max_retries}次）: {str(e)}") from e
+
+
+def schedule_project_batch(
+    scheduler,
+    batch_context: dict,
+    chapters: List[int],
+    word: int,
+    min_word: int,
+    auto_enrich: bool,
+    log_factory: Optional[Callable[[int], Callable[[str], None]]] = None,
+    progress_factory: Optional[Callable[[int], Callable[[str, float], None]]] = None,
+    max_retries: int = 1,
+    depth: int = PIPELINE_DEPTH,
+) -> ChapterPipeline:
+    """
+    把一个项目的章节按顺序提交给多项目调度器（core.utils.task_queue.ProjectScheduler）
+
+    调度器保证同一项目的章节串行、按顺序执行；章节之间仍通过 ChapterPipeline 重叠
+    定稿与下一章的上下文预取。项目任务全部结束后自动关闭流水线。
+
+    Args:
+        scheduler: ProjectScheduler 实例，项目标识为 batch_context["filepath"]
+        chapters: 要生成的章节号（升序，已排除需跳过的章节）
+        log_factory / progress_factory: 按章节号返回日志/进度回调
+    """
+    pipeline = ChapterPipeline(batch_context, word, min_word, auto_enrich, depth=depth)
+    if not chapters:
+        pipeline.close()
+        return pipeline
+    tasks = []
+    for position, chapter_num in enumerate(chapters):
+        next_chapter = chapters[position + 1] if position + 1 < len(chapters) else None
+
+        def task(chapter_num=chapter_num, next_chapter=next_chapter):
+            success = generate_chapter_with_retry(
+                batch_context, chapter_num, word, min_word, auto_enrich,
+                log=log_factory(chapter_num) if log_factory else None,
+                progress=progress_factory(chapter_num) if progress_factory else None,
+                max_retries=max_retries,
+                pipeline=pipeline,
+                next_chapter=next_chapter
+            )
+            if not success:
+                raise RuntimeError(f"第{chapter_num}章定稿失败（章节内容为空）")
+
+        tasks.append((f"chapter_{chapter_num}", task))
+
+    scheduler.submit_many(batch_context["filepath"], tasks, on_finished=lambda state: pipeline.close())
+    return pipeline
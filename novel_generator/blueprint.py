@@ -6,6 +6,7 @@
 import os
 import re
 import logging
+import threading
 from novel_generator.common import invoke_with_cleaning
 from core.adapters.llm_adapters import create_llm_adapter
 from core.prompting.prompt_definitions import (
@@ -14,10 +15,11 @@ from core.prompting.prompt_definitions import (
     volume_chapter_blueprint_prompt,  # 新增：分卷蓝图提示词
     resolve_global_system_prompt
 )
-from core.prompting.prompt_manager import PromptManager  # 新增：提示词管理器
+from core.prompting.prompt_manager import get_shared_prompt_manager  # 进程共享的提示词管理器
 from core.prompting.prompt_manager_helper import format_prompt_safe
 from core.utils.file_utils import read_file, clear_file_content, save_string_to_txt, get_log_file_path
 from core.utils.volume_utils import calculate_volume_ranges  # 新增：分卷工具函数
+from core.utils.step_graph import Step, default_step_workers, run_step_graph
 logging.basicConfig(
     filename=get_log_file_path(),      # 日志文件名
     filemode='a',            # 追加模式（'w' 会覆盖）
@@ -25,6 +27,10 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     datefmt='%Y-%m-%d %H:%M:%S'
 )
+
+# 分卷模式下同时生成的卷数
+BLUEPRINT_MAX_WORKERS = default_step_workers("AUTONOVEL_BLUEPRINT_WORKERS", 3)
+
 def compute_chunk_size(number_of_chapters: int, max_tokens: int) -> int:
     """
     基于“每章约100 tokens”的粗略估算，
@@ -68,14 +74,17 @@ def Chapter_blueprint_generate(
     temperature: float = 0.7,
     max_tokens: int = 4096,
     timeout: int = 600,
-    gui_log_callback=None
+    gui_log_callback=None,
+    volume_workers: int = None,
+    previous_tail_chapters: int = 0
 ) -> None:
     """
     章节蓝图生成主函数，支持分卷模式和非分卷模式。
 
     分卷模式 (num_volumes > 1)：
       - 读取 Volume_architecture.txt
-      - 按卷逐个生成章节蓝图
+      - 各卷并发生成章节蓝图（volume_workers，默认取 AUTONOVEL_BLUEPRINT_WORKERS，未设置时为3），按卷顺序合并保存
+      - previous_tail_chapters > 0 时每卷附上上一卷最后几章蓝图作为衔接参考，此时各卷依次生成
       - 使用 volume_chapter_blueprint_prompt
 
     非分卷模式 (num_volumes <= 1)：
@@ -109,7 +118,7 @@ def Chapter_blueprint_generate(
 
     # 初始化 PromptManager 以动态加载提示词（带异常保护）
     try:
-        pm = PromptManager()
+        pm = get_shared_prompt_manager()
     except Exception as e:
         # 如果 PromptManager 初始化失败，创建 fallback 对象
         logging.error(f"Failed to initialize PromptManager in blueprint: {e}")
@@ -171,105 +180,166 @@ def Chapter_blueprint_generate(
             max_existing_chap = max(existing_chapter_numbers) if existing_chapter_numbers else 0
             gui_log(f"▷ 检测到已有蓝图内容，已完成到第{max_existing_chap}章")
 
-        # 按卷生成
+        # 待生成的卷：已完成的卷跳过，部分完成的卷从断点续写
+        pending_volumes = []
         for vol_idx, (vol_start, vol_end) in enumerate(volume_ranges, 1):
-            # 跳过已完成的卷
             if max_existing_chap >= vol_end:
                 gui_log(f"▷ [卷{vol_idx}] 第{vol_start}-{vol_end}章 已完成，跳过\n")
                 continue
+            pending_volumes.append((vol_idx, vol_start, vol_end, max(vol_start, max_existing_chap + 1)))
 
-            # 部分完成的卷：调整起始章节
-            actual_start = max(vol_start, max_existing_chap + 1)
+        # 从 PromptManager 动态加载提示词（带兜底处理）
+        volume_prompt_template = pm.get_prompt("blueprint", "volume_chapter_blueprint")
+        if not volume_prompt_template:
+            logging.warning("Volume chapter blueprint prompt not found, using default")
+            volume_prompt_template = volume_chapter_blueprint_prompt
+
+        # 各卷提示词只依赖分卷架构与生成前已有的摘要文件，彼此独立，可以并发生成；
+        # 生成结果按卷顺序合并，只把连续完成的前缀写入 Novel_directory.txt，断点续写逻辑不变
+        workers = max(1, volume_workers if volume_workers is not None else BLUEPRINT_MAX_WORKERS)
+        pending_indices = {vol_idx for vol_idx, _, _, _ in pending_volumes}
+        if previous_tail_chapters > 0:
+            gui_log(f"▷ 衔接模式：每卷参考上一卷最后{previous_tail_chapters}章蓝图，各卷依次生成")
+        elif workers > 1 and len(pending_volumes) > 1:
+            gui_log(f"▶ 并发生成 {len(pending_volumes)} 卷蓝图（并发数 {min(workers, len(pending_volumes))}）\n")
+
+        merge_lock = threading.Lock()
+        finished_volumes = {}  # vol_idx -> 蓝图文本（等待按顺序合并）
+        merge_state = {"blueprint": final_blueprint, "next": 0, "failed_volume": None}
+
+        def merge_finished_volumes():
+            """调用方需持有 merge_lock：按卷顺序合并已完成的卷并实时保存"""
+            merged = False
+            while merge_state["next"] < len(pending_volumes):
+                vol_idx = pending_volumes[merge_state["next"]][0]
+                if vol_idx not in finished_volumes:
+                    break
+                volume_text = finished_volumes.pop(vol_idx)
+                if merge_state["blueprint"].strip():
+                    merge_state["blueprint"] += "\n\n" + volume_text
+                else:
+                    merge_state["blueprint"] = volume_text
+                merge_state["next"] += 1
+                merged = True
+                logging.info(f"Volume {vol_idx} blueprint saved.")
+            if merged:
+                clear_file_content(filename_dir)
+                save_string_to_txt(merge_state["blueprint"].strip(), filename_dir)
+
+        def mark_volume_failed(vol_idx):
+            """记录最早失败的卷，其后的卷不再生成（合并只能写到失败卷之前）"""
+            with merge_lock:
+                if merge_state["failed_volume"] is None or vol_idx < merge_state["failed_volume"]:
+                    merge_state["failed_volume"] = vol_idx
+
+        def make_volume_step(vol_idx, vol_start, vol_end, actual_start):
             vol_total_chapters = vol_end - vol_start + 1  # 本卷总章数（整卷规划）
             vol_chapter_count = vol_end - actual_start + 1  # 本次待生成章节数
 
-            gui_log(f"▶ [卷{vol_idx}/{num_volumes}] 生成第{actual_start}-{vol_end}章 (共{vol_chapter_count}章)")
-            if actual_start > vol_start:
-                gui_log(f"   ├─ ⚠️ 续写模式：本卷共{vol_total_chapters}章，前{actual_start - vol_start}章已完成")
-            gui_log(f"   ├─ 构建分卷提示词...")
-
-            # 读取前序卷摘要（用于保持设定一致性，避免细节漂移）
-            previous_volumes_summary = ""
-            if vol_idx > 1:
-                for i in range(1, vol_idx):
-                    summary_file = os.path.join(filepath, f"volume_{i}_summary.txt")
-                    if os.path.exists(summary_file):
-                        prev_vol_summary = read_file(summary_file).strip()
-                        if prev_vol_summary:
-                            previous_volumes_summary += f"═══ 第{i}卷实际发展 ═══\n{prev_vol_summary}\n\n"
-
-                # 降级策略：如果前序卷摘要不存在，尝试使用 global_summary
-                if not previous_volumes_summary:
-                    global_summary_file = os.path.join(filepath, "global_summary.txt")
-                    if os.path.exists(global_summary_file):
-                        global_summary_content = read_file(global_summary_file).strip()
-                        if global_summary_content:
-                            previous_volumes_summary = f"前序剧情摘要（全局）：\n{global_summary_content}"
-                            gui_log(f"   ├─ ⚠ 前序卷摘要不存在，使用全局摘要降级")
-
-            # 🆕 条件化生成续写模式提示（仅续写时传入，避免影响上下文）
-            is_resume_mode = (actual_start > vol_start)
-            if is_resume_mode:
-                volume_previous_end = actual_start - 1
-                resume_mode_notice = f"""⚠️ 续写模式说明（volume_start > volume_original_start）：
+            def run(log):
+                failed_volume = merge_state["failed_volume"]
+                if failed_volume is not None and vol_idx > failed_volume:
+                    raise RuntimeError(f"第{failed_volume}卷蓝图生成失败，取消第{vol_idx}卷")
+
+                gui_log(f"▶ [卷{vol_idx}/{num_volumes}] 生成第{actual_start}-{vol_end}章 (共{vol_chapter_count}章)")
+                if actual_start > vol_start:
+                    log(f"   ├─ ⚠️ 续写模式：本卷共{vol_total_chapters}章，前{actual_start - vol_start}章已完成")
+                log(f"   ├─ [卷{vol_idx}] 构建分卷提示词...")
+
+                # 读取前序卷摘要（用于保持设定一致性，避免细节漂移）
+                previous_volumes_summary = ""
+                if vol_idx > 1:
+                    for i in range(1, vol_idx):
+                        summary_file = os.path.join(filepath, f"volume_{i}_summary.txt")
+                        if os.path.exists(summary_file):
+                            prev_vol_summary = read_file(summary_file).strip()
+                            if prev_vol_summary:
+                                previous_volumes_summary += f"═══ 第{i}卷实际发展 ═══\n{prev_vol_summary}\n\n"
+
+                    # 降级策略：如果前序卷摘要不存在，尝试使用 global_summary
+                    if not previous_volumes_summary:
+                        global_summary_file = os.path.join(filepath, "global_summary.txt")
+                        if os.path.exists(global_summary_file):
+                            global_summary_content = read_file(global_summary_file).strip()
+                            if global_summary_content:
+                                previous_volumes_summary = f"前序剧情摘要（全局）：\n{global_summary_content}"
+                                log(f"   ├─ ⚠ 前序卷摘要不存在，使用全局摘要降级")
+
+                    # 衔接模式：附上上一卷最后几章的蓝图（上一卷已合并到 merge_state 中）
+                    if previous_tail_chapters > 0:
+                        with merge_lock:
+                            merged_blueprint = merge_state["blueprint"]
+                        previous_tail = limit_chapter_blueprint(merged_blueprint, previous_tail_chapters) if merged_blueprint.strip() else ""
+                        if previous_tail:
+                            previous_volumes_summary += f"═══ 上一卷结尾章节蓝图（衔接参考） ═══\n{previous_tail}\n\n"
+
+                # 🆕 条件化生成续写模式提示（仅续写时传入，避免影响上下文）
+                is_resume_mode = (actual_start > vol_start)
+                if is_resume_mode:
+                    volume_previous_end = actual_start - 1
+                    resume_mode_notice = f"""⚠️ 续写模式说明（volume_start > volume_original_start）：
 - 本卷前面的章节已完成（第{vol_start}到第{volume_previous_end}章），请从第{actual_start}章继续生成
 - **节奏分配仍按整卷{vol_total_chapters}章计算，而非剩余{vol_chapter_count}章**
 - 例如：本卷共30章，前20章已完成，现在从第21章继续
   - 第21章应处于"高潮阶段"（30×0.7=21，已进入高潮30%阶段）
   - 而不是"开局阶段"（剩余10章×0.2=2，误判为开局）
 - 请根据章节在整卷中的位置（第X章/共{vol_total_chapters}章）判断应处于哪个阶段"""
-            else:
-                resume_mode_notice = ""
-
-            # 从 PromptManager 动态加载提示词（带兜底处理）
-            volume_prompt_template = pm.get_prompt("blueprint", "volume_chapter_blueprint")
-            if not volume_prompt_template:
-                logging.warning("Volume chapter blueprint prompt not found, using default")
-                volume_prompt_template = volume_chapter_blueprint_prompt
-
-            volume_prompt = format_prompt_safe(
-                volume_prompt_template,
-                {
-                    "novel_architecture": architecture_text,
-                    "volume_architecture": volume_architecture_text,
-                    "volume_number": vol_idx,
-                    "volume_start": actual_start,
-                    "volume_end": vol_end,
-                    "volume_total_chapters": vol_total_chapters,
-                    "volume_chapter_count": vol_chapter_count,
-                    "volume_original_start": vol_start,
-                    "previous_volumes_summary": previous_volumes_summary,
-                    "resume_mode_notice": resume_mode_notice,
-                    "user_guidance": user_guidance
-                },
-                "blueprint.volume_chapter_blueprint"
-            )
-
-            gui_log(f"   ├─ 向LLM发起请求...")
-            logging.info(f"Generating blueprint for Volume {vol_idx} (chapters {actual_start}-{vol_end})...")
-
-            volume_blueprint_result = invoke_with_cleaning(llm_adapter, volume_prompt, system_prompt=system_prompt)
-
-            if not volume_blueprint_result.strip():
-                gui_log(f"   └─ ❌ 第{vol_idx}卷蓝图生成失败\n")
-                logging.warning(f"Volume {vol_idx} blueprint generation failed.")
-                # 保存已有内容
-                clear_file_content(filename_dir)
-                save_string_to_txt(final_blueprint.strip(), filename_dir)
-                return
-
-            gui_log(f"   └─ ✅ 第{vol_idx}卷蓝图生成完成\n")
-
-            # 拼接蓝图
-            if final_blueprint.strip():
-                final_blueprint += "\n\n" + volume_blueprint_result.strip()
-            else:
-                final_blueprint = volume_blueprint_result.strip()
-
-            # 实时保存
-            clear_file_content(filename_dir)
-            save_string_to_txt(final_blueprint.strip(), filename_dir)
-            logging.info(f"Volume {vol_idx} blueprint saved.")
+                else:
+                    resume_mode_notice = ""
+
+                volume_prompt = format_prompt_safe(
+                    volume_prompt_template,
+                    {
+                        "novel_architecture": architecture_text,
+                        "volume_architecture": volume_architecture_text,
+                        "volume_number": vol_idx,
+                        "volume_start": actual_start,
+                        "volume_end": vol_end,
+                        "volume_total_chapters": vol_total_chapters,
+                        "volume_chapter_count": vol_chapter_count,
+                        "volume_original_start": vol_start,
+                        "previous_volumes_summary": previous_volumes_summary,
+                        "resume_mode_notice": resume_mode_notice,
+                        "user_guidance": user_guidance
+                    },
+                    "blueprint.volume_chapter_blueprint"
+                )
+
+                log(f"   ├─ [卷{vol_idx}] 向LLM发起请求...")
+                logging.info(f"Generating blueprint for Volume {vol_idx} (chapters {actual_start}-{vol_end})...")
+
+                try:
+                    volume_blueprint_result = invoke_with_cleaning(llm_adapter, volume_prompt, system_prompt=system_prompt)
+                except Exception as e:
+                    log(f"   └─ ❌ 第{vol_idx}卷蓝图生成出错: {str(e)[:100]}\n")
+                    logging.warning(f"Volume {vol_idx} blueprint generation raised: {e}")
+                    mark_volume_failed(vol_idx)
+                    raise
+
+                if not volume_blueprint_result.strip():
+                    log(f"   └─ ❌ 第{vol_idx}卷蓝图生成失败\n")
+                    logging.warning(f"Volume {vol_idx} blueprint generation failed.")
+                    mark_volume_failed(vol_idx)
+                    raise RuntimeError(f"第{vol_idx}卷蓝图生成失败")
+
+                log(f"   └─ ✅ 第{vol_idx}卷蓝图生成完成\n")
+                with merge_lock:
+                    finished_volumes[vol_idx] = volume_blueprint_result.strip()
+                    merge_finished_volumes()
+
+            # 衔接模式下依赖上一卷（上一卷已在已有蓝图中时无需等待）
+            depends_on = (f"volume_{vol_idx - 1}",) if previous_tail_chapters > 0 and (vol_idx - 1) in pending_indices else ()
+            return Step(f"volume_{vol_idx}", run, depends_on, label=f"第{vol_idx}卷蓝图")
+
+        step_results = run_step_graph(
+            [make_volume_step(*volume) for volume in pending_volumes],
+            max_workers=workers,
+            log=gui_log
+        )
+        if any(error is not None for error in step_results.values()):
+            failed_volume = merge_state["failed_volume"]
+            gui_log(f"❌ 第{failed_volume or '?'}卷蓝图生成失败，已保存之前连续完成的卷，重新生成将从断点继续")
+            return
 
         gui_log("\n━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
         gui_log("✅ 分卷章节蓝图全部生成完毕")
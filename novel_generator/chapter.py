@@ -18,12 +18,12 @@ from core.prompting.prompt_definitions import (
     chapter_refine_prompt,    # 🆕 作家重写提示词
     resolve_global_system_prompt
 )
-from core.prompting.prompt_manager import PromptManager  # 新增：提示词管理器
+from core.prompting.prompt_manager import get_shared_prompt_manager  # 进程共享的提示词管理器
 from core.prompting.prompt_manager_helper import format_prompt_safe
-from core.utils.chapter_directory_parser import get_chapter_info_from_blueprint
-from novel_generator.common import invoke_with_cleaning
+from core.utils.chapter_directory_parser import get_blueprint_index
+from novel_generator.common import invoke_with_cleaning, invoke_stream_with_cleaning
 from core.utils.file_utils import read_file, clear_file_content, save_string_to_txt, save_data_to_json, get_log_file_path
-from novel_generator.vectorstore_utils import load_vector_store
+from core.utils.project_files import ProjectFiles, split_volume_architecture, volume_summary_filename
 from core.utils.volume_utils import (
     get_volume_number,
     is_volume_last_chapter,
@@ -47,64 +47,22 @@ def extract_volume_architecture(volume_arch_text: str, target_volume_num: int) -
         ## 第二卷
         ### 第三卷
     """
-    import re
-
-    # 分割文本为卷块（通过标题行分割）
-    # 优化正则：匹配行首的标题格式，排除内容中的引用
-    # 必须以 # 或 * 开头，确保是 Markdown 标题
-    # 支持格式: ### **第一卷（第1-10章）** 等
-    volume_header_pattern = re.compile(
-        r'^\s*(?:[#*>\-]+\s*)?第\s*([零〇一二两三四五六七八九十百千万\d]+)\s*卷',
-        re.MULTILINE
-    )
-
-    matches = list(volume_header_pattern.finditer(volume_arch_text))
-    if not matches:
+    slices = split_volume_architecture(volume_arch_text)
+    if not slices:
         logging.warning("Volume_architecture.txt 中未找到卷标题")
         logging.debug(f"文件内容前500字符: {volume_arch_text[:500]}")
         return ""
 
-    logging.info(f"找到{len(matches)}个卷标题标记")
-
-    # 转换中文数字
-    from core.utils.chapter_directory_parser import _to_int_from_chinese
-
-    for i, match in enumerate(matches):
-        vol_num_str = match.group(1)
-        # 尝试数字转换
-        if vol_num_str.isdigit():
-            vol_num = int(vol_num_str)
-        else:
-            vol_num = _to_int_from_chinese(vol_num_str)
-
-        logging.debug(f"解析到卷号: '{vol_num_str}' -> {vol_num}, 目标: {target_volume_num}")
-
-        if vol_num == target_volume_num:
-            # 找到目标卷，提取从当前位置到下一个卷标题（或文件末尾）的内容
-            start_pos = match.start()
-
-            # 查找分隔符 "---" 或下一个卷标题
-            if i + 1 < len(matches):
-                end_pos = matches[i + 1].start()
-            else:
-                end_pos = len(volume_arch_text)
-
-            # 提取内容
-            content = volume_arch_text[start_pos:end_pos].strip()
-
-            # 移除开头和结尾的分隔符 "---"（支持前后都有的情况）
-            content = re.sub(r'^[\s\n]*-{3,}[\s\n]*', '', content)  # 移除开头
-            content = re.sub(r'[\s\n]*-{3,}[\s\n]*$', '', content)  # 移除结尾
-            content = content.strip()
-
-            if content:
-                logging.info(f"成功提取第{target_volume_num}卷架构，长度: {len(content)}字符")
-            else:
-                logging.warning(f"第{target_volume_num}卷架构提取后为空")
-            return content
+    content = slices.get(target_volume_num)
+    if content is None:
+        logging.warning(f"Volume_architecture.txt 中未找到第{target_volume_num}卷")
+        return ""
 
-    logging.warning(f"Volume_architecture.txt 中未找到第{target_volume_num}卷")
-    return ""
+    if content:
+        logging.info(f"成功提取第{target_volume_num}卷架构，长度: {len(content)}字符")
+    else:
+        logging.warning(f"第{target_volume_num}卷架构提取后为空")
+    return content
 
 
 logging.basicConfig(
@@ -171,25 +129,25 @@ def get_volume_context(
     is_first = (novel_number == vol_start)
     is_last = is_volume_last_chapter(novel_number, volume_ranges)
 
+    project_files = ProjectFiles(filepath)
+
     # 读取前一卷摘要
     prev_volume_summary = ""
     if volume_num > 1:
-        prev_vol_summary_file = os.path.join(filepath, f"volume_{volume_num - 1}_summary.txt")
+        prev_vol_summary_file = project_files.path(volume_summary_filename(volume_num - 1))
         if os.path.exists(prev_vol_summary_file):
-            prev_volume_summary = read_file(prev_vol_summary_file).strip()
+            prev_volume_summary = project_files.volume_summary(volume_num - 1).strip()
         else:
             # 降级策略：如果前一卷摘要不存在，使用全局摘要
             logging.warning(f"前一卷摘要文件不存在，尝试使用全局摘要降级")
-            global_summary_file = os.path.join(filepath, "global_summary.txt")
-            if os.path.exists(global_summary_file):
-                prev_volume_summary = read_file(global_summary_file).strip()
+            if project_files.exists("global_summary.txt"):
+                prev_volume_summary = project_files.global_summary.strip()
                 logging.info("已使用 global_summary.txt 作为前一卷摘要的降级替代")
 
     # 读取当前卷摘要（如果卷已经完成并生成了摘要）
     current_vol_summary = ""
-    current_vol_summary_file = os.path.join(filepath, f"volume_{volume_num}_summary.txt")
-    if os.path.exists(current_vol_summary_file):
-        current_vol_summary = read_file(current_vol_summary_file).strip()
+    if project_files.exists(volume_summary_filename(volume_num)):
+        current_vol_summary = project_files.volume_summary(volume_num).strip()
 
     return {
         "is_volume_mode": True,
@@ -210,52 +168,7 @@ def extract_key_plot_arcs(filepath: str) -> str:
     - 支持 [A级-xxx] 或 【A级-xxx】 格式
     - 自动排除已解决的伏笔（通过检查同行的解决标记）
     """
-    plot_arcs_file = os.path.join(filepath, "plot_arcs.txt")
-    if not os.path.exists(plot_arcs_file):
-        return "（暂无记录）"
-
-    full_content = read_file(plot_arcs_file)
-    if not full_content.strip():
-        return "（暂无记录）"
-
-    # 提取未解决部分
-    unresolved_lines = []
-
-    # 更宽松的正则匹配：任意位置匹配 [A级-xxx] 或 【A级-xxx】
-    # 格式示例: [A级-主线] xxxx、【B级-支线】xxx、1. [A级-主线] xxx
-    pattern = r'[\[【]([AB]级-[^\]】]+)[\]】]'
-
-    # 已解决标记：支持多种符号和格式
-    resolved_markers = ['✓已解决', '✅已解决', '☑已解决', '已解决', '（已解决）', '(已解决)', '[已解决]']
-
-    for line in full_content.split('\n'):
-        line_stripped = line.strip()
-        if not line_stripped:
-            continue
-
-        # 检查本行是否包含已解决标记
-        is_resolved = any(marker in line_stripped for marker in resolved_markers)
-        if is_resolved:
-            continue
-
-        # 使用 search 而非 match，匹配行内任意位置的 A/B 级标记
-        if re.search(pattern, line_stripped):
-            unresolved_lines.append(line_stripped)
-
-    if not unresolved_lines:
-        return "（暂无重要未解决伏笔）"
-
-    # 限制返回条数，避免过长（A级最多10条，B级最多5条）
-    a_level = [l for l in unresolved_lines if re.search(r'[\[【]A级', l)]
-    b_level = [l for l in unresolved_lines if re.search(r'[\[【]B级', l)]
-
-    result_lines = a_level[:10] + b_level[:5]
-
-    if not result_lines:
-        return "（暂无重要未解决伏笔）"
-
-    logging.debug(f"Extracted {len(a_level)} A-level and {len(b_level)} B-level plot arcs")
-    return "\n".join(result_lines)
+    return ProjectFiles(filepath).unresolved_plot_arcs()
 
 def get_last_n_chapters_text(chapters_dir: str, current_chapter_num: int, n: int = 3) -> list:
     """
@@ -359,7 +272,7 @@ def summarize_recent_chapters(
 
         # 从 PromptManager 动态加载提示词（带异常保护）
         try:
-            pm = PromptManager()
+            pm = get_shared_prompt_manager()
         except Exception as e:
             logging.error(f"Failed to initialize PromptManager in summarize_recent_chapters: {e}")
             pm = None
@@ -818,7 +731,7 @@ def get_filtered_knowledge_context(
 
         # 从 PromptManager 动态加载提示词（带异常保护）
         try:
-            pm = PromptManager()
+            pm = get_shared_prompt_manager()
         except Exception as e:
             logging.error(f"Failed to initialize PromptManager in filter_knowledge_context: {e}")
             pm = None
@@ -884,6 +797,19 @@ def get_filtered_knowledge_context(
             error_preview = str(e)[:100]
             return f"（内容过滤出错：{error_preview}{'...' if len(str(e)) > 100 else ''}）"
 
+def _run_stage(checkpoint, stage: str, compute, log=None, keep=None):
+    """有检查点时复用/记录阶段输出，否则直接计算"""
+    if checkpoint is None:
+        return compute()
+    return checkpoint.run(stage, compute, log, keep)
+
+
+def _is_placeholder_text(text: str) -> bool:
+    """兜底提示文本（如“（知识内容过滤失败）”“[摘要生成异常]…”），不应写入检查点"""
+    text = (text or "").strip()
+    return not text or (text.startswith("（") and text.endswith("）")) or text.startswith("[摘要生成异常]")
+
+
 def build_chapter_prompt(
     api_key: str,
     base_url: str,
@@ -909,7 +835,9 @@ def build_chapter_prompt(
     num_volumes: int = 0,  # 新增：分卷数量
     total_chapters: int = 0,  # 新增：总章节数
     gui_log_callback=None,
-    progress_callback=None  # 🆕 进度回调函数
+    progress_callback=None,  # 🆕 进度回调函数
+    checkpoint=None,
+    prefetch_only: bool = False
 ) -> str:
     """
     构造当前章节的请求提示词（完整实现版）
@@ -917,6 +845,12 @@ def build_chapter_prompt(
     1. 优化知识库检索流程
     2. 新增内容重复检测机制
     3. 集成提示词应用规则
+
+    checkpoint: 可选的 ChapterCheckpoint，前文摘要、检索关键词、检索结果、知识过滤的
+    输出会记录到项目检查点日志，中断后重跑时直接复用
+    prefetch_only: 只执行不依赖上一章定稿结果的阶段（前文摘要、检索关键词、向量检索、
+    知识过滤）并写入 checkpoint，返回空字符串。批量流水线在上一章定稿的同时用它预取本章上下文，
+    之后正式构建时这些阶段直接命中 checkpoint，只剩读取最新状态文件和格式化模板。
     """
     # GUI日志辅助函数
     def gui_log(msg):
@@ -937,24 +871,21 @@ def build_chapter_prompt(
 
     # 读取基础文件：5%
     update_progress("📖 读取基础文件", 0.05)
-    arch_file = os.path.join(filepath, "Novel_architecture.txt")
-    novel_architecture_text = read_file(arch_file)
-    directory_file = os.path.join(filepath, "Novel_directory.txt")
-    blueprint_text = read_file(directory_file)
-    global_summary_file = os.path.join(filepath, "global_summary.txt")
-    global_summary_text = read_file(global_summary_file)
-    character_state_file = os.path.join(filepath, "character_state.txt")
-    character_state_text = read_file(character_state_file)
+    project_files = ProjectFiles(filepath)
+    novel_architecture_text = project_files.architecture
+    blueprint_index = get_blueprint_index(filepath)
+    global_summary_text = project_files.global_summary
+    character_state_text = project_files.character_state
 
     # [Plan A] 读取关键剧情伏笔
-    unresolved_plot_arcs = extract_key_plot_arcs(filepath)
+    unresolved_plot_arcs = project_files.unresolved_plot_arcs()
     if unresolved_plot_arcs and unresolved_plot_arcs != "（暂无记录）":
         logging.info(f"Injecting {len(unresolved_plot_arcs.splitlines())} unresolved plot arcs into prompt")
     else:
         unresolved_plot_arcs = "（暂无明确记录）"
 
     # 获取章节信息
-    chapter_info = get_chapter_info_from_blueprint(blueprint_text, novel_number)
+    chapter_info = blueprint_index.get_chapter(novel_number)
     chapter_title = chapter_info["chapter_title"]
     chapter_role = chapter_info["chapter_role"]
     chapter_purpose = chapter_info["chapter_purpose"]
@@ -973,10 +904,8 @@ def build_chapter_prompt(
 
     # 优化判断逻辑：即使 current_vol_num 为空，也尝试根据 num_volumes 推断
     if num_volumes > 1:
-        volume_arch_file = os.path.join(filepath, "Volume_architecture.txt")
+        volume_arch_file = project_files.path("Volume_architecture.txt")
         if os.path.exists(volume_arch_file):
-            volume_arch_text = read_file(volume_arch_file).strip()
-
             # 如果章节信息中没有卷号，尝试根据章节号推断
             if not current_vol_num:
                 volume_ranges = calculate_volume_ranges(total_chapters, num_volumes)
@@ -985,10 +914,7 @@ def build_chapter_prompt(
 
             # 提取当前卷的架构信息
             if current_vol_num:
-                current_volume_architecture = extract_volume_architecture(
-                    volume_arch_text,
-                    current_vol_num
-                )
+                current_volume_architecture = project_files.volume_architecture_slice(current_vol_num)
                 if current_volume_architecture:
                     logging.info(f"成功为第{novel_number}章提取第{current_vol_num}卷架构")
                 else:
@@ -1000,7 +926,7 @@ def build_chapter_prompt(
 
     # 获取下一章节信息
     next_chapter_number = novel_number + 1
-    next_chapter_info = get_chapter_info_from_blueprint(blueprint_text, next_chapter_number)
+    next_chapter_info = blueprint_index.get_chapter(next_chapter_number)
     next_chapter_title = next_chapter_info.get("chapter_title", "（未命名）")
     next_chapter_role = next_chapter_info.get("chapter_role", "过渡章节")
     next_chapter_purpose = next_chapter_info.get("chapter_purpose", "承上启下")
@@ -1030,9 +956,11 @@ def build_chapter_prompt(
 
     # 第一章特殊处理
     if novel_number == 1:
+        if prefetch_only:
+            return ""
         # 从 PromptManager 动态加载提示词（带异常保护）
         try:
-            pm = PromptManager()
+            pm = get_shared_prompt_manager()
         except Exception as e:
             logging.error(f"Failed to initialize PromptManager in build_first_chapter_prompt: {e}")
             pm = None
@@ -1118,7 +1046,7 @@ def build_chapter_prompt(
     update_progress("📝 生成前文摘要", 0.10)
     try:
         logging.info("Attempting to generate summary")
-        short_summary = summarize_recent_chapters(
+        short_summary = _run_stage(checkpoint, "prompt.short_summary", lambda: summarize_recent_chapters(
             interface_format=interface_format,
             api_key=api_key,
             base_url=base_url,
@@ -1131,7 +1059,7 @@ def build_chapter_prompt(
             next_chapter_info=next_chapter_info,
             timeout=timeout,
             system_prompt=system_prompt
-        )
+        ), gui_log, keep=lambda text: not _is_placeholder_text(text))
         logging.info("Summary generated successfully")
     except Exception as e:
         logging.error(f"Error in summarize_recent_chapters: {str(e)}")
@@ -1178,7 +1106,7 @@ def build_chapter_prompt(
 
         # 从 PromptManager 动态加载提示词（带异常保护）
         try:
-            pm = PromptManager()
+            pm = get_shared_prompt_manager()
         except Exception as e:
             logging.error(f"Failed to initialize PromptManager in build_next_chapter_prompt (knowledge search): {e}")
             pm = None
@@ -1217,8 +1145,12 @@ def build_chapter_prompt(
                 "helper.knowledge_search"
             )
 
-            search_response = invoke_with_cleaning(llm_adapter, search_prompt, system_prompt=system_prompt)
-            keyword_groups = parse_search_keywords(search_response)
+            keyword_groups = _run_stage(checkpoint, "prompt.keyword_groups", lambda: parse_search_keywords(
+                invoke_with_cleaning(
+                    llm_adapter, search_prompt, system_prompt=system_prompt,
+                    cache_module="helper.knowledge_search", cache_project=filepath
+                )
+            ), gui_log)
 
         if keyword_groups:
             gui_log(f"   ├─ 生成关键词组: {len(keyword_groups)}组")
@@ -1240,10 +1172,12 @@ def build_chapter_prompt(
         )
 
         retrieved_docs = []
+        # 检索结果命中检查点时（批量流水线预取过或中断后重跑），检索统计已在首次检索时记录
+        retrieval_from_checkpoint = bool(checkpoint) and checkpoint.lookup("prompt.retrieved_docs")[0]
         if keyword_groups:
             gui_log("   ├─ 执行向量检索...")
             # 使用新的去重检索函数（支持分卷检索）
-            retrieved_docs = get_relevant_contexts_deduplicated(
+            retrieved_docs = _run_stage(checkpoint, "prompt.retrieved_docs", lambda: get_relevant_contexts_deduplicated(
                 embedding_adapter=embedding_adapter,
                 query_groups=keyword_groups,
                 filepath=filepath,
@@ -1252,7 +1186,7 @@ def build_chapter_prompt(
                 current_chapter=novel_number,  # 新增：当前章节号
                 num_volumes=num_volumes,  # 新增：总卷数
                 total_chapters=total_chapters  # 新增：总章节数
-            )
+            ), gui_log)
         else:
             gui_log("   ├─ 无关键词，跳过向量检索")
 
@@ -1272,7 +1206,7 @@ def build_chapter_prompt(
             for doc_type, count in type_counts.items():
                 gui_log(f"       · {doc_type}: {count}条")
 
-        if keyword_groups:
+        if keyword_groups and not retrieval_from_checkpoint:
             for keyword_group in keyword_groups:
                 # 为每个关键词组找到所有命中的文档
                 docs_for_group = [
@@ -1333,7 +1267,7 @@ def build_chapter_prompt(
                 "time_constraint": time_constraint
             }
             
-            filtered_context = get_filtered_knowledge_context(
+            filtered_context = _run_stage(checkpoint, "prompt.filtered_context", lambda: get_filtered_knowledge_context(
                 api_key=api_key,
                 base_url=base_url,
                 model_name=model_name,
@@ -1345,7 +1279,7 @@ def build_chapter_prompt(
                 max_tokens=max_tokens,
                 timeout=timeout,
                 system_prompt=system_prompt
-            )
+            ), gui_log, keep=lambda text: not _is_placeholder_text(text))
 
         # 统计最终使用的知识
         final_length = len(filtered_context)
@@ -1358,9 +1292,12 @@ def build_chapter_prompt(
         logging.error(f"知识处理流程异常：{str(e)}")
         filtered_context = "（知识库处理失败）"
 
+    if prefetch_only:
+        return ""
+
     # 从 PromptManager 动态加载提示词（带异常保护）
     try:
-        pm = PromptManager()
+        pm = get_shared_prompt_manager()
     except Exception as e:
         logging.error(f"Failed to initialize PromptManager in build_next_chapter_prompt (final): {e}")
         pm = None
@@ -1443,10 +1380,18 @@ def generate_chapter_draft(
     use_global_system_prompt: bool = False,
     num_volumes: int = 0,  # 新增：分卷数量
     total_chapters: int = 0,  # 新增：总章节数
-    gui_log_callback=None
+    gui_log_callback=None,
+    stream_callback=None,
+    stream_reset_callback=None,
+    checkpoint=None
 ) -> str:
     """
     生成章节草稿，支持自定义提示词
+    草稿以流式方式生成：片段到达即追加写入 chapters/chapter_N.txt.partial，并通过 stream_callback(chunk) 转发给界面；
+    生成结束后才用清理后的完整内容替换 chapter_N.txt，生成失败时原有章节文件保持不变。
+    流式内容作废（例如流式结果是拒绝/错误文本，改用普通调用重试）时调用 stream_reset_callback()，
+    随后 stream_callback 收到替换后的完整内容。
+    checkpoint: 可选的 ChapterCheckpoint，初稿与批评意见会写入检查点，中断后重跑时直接复用
     """
     # GUI日志辅助函数
     def gui_log(msg):
@@ -1503,17 +1448,47 @@ def generate_chapter_draft(
         timeout=timeout
     )
 
-    gui_log("   ├─ 向LLM发起请求生成草稿...")
-    chapter_content = invoke_with_cleaning(llm_adapter, prompt_text, system_prompt=system_prompt)
+    chapter_file = os.path.join(chapters_dir, f"chapter_{novel_number}.txt")
+    partial_file = chapter_file + ".partial"
+
+    resumed, chapter_content = checkpoint.lookup("draft.initial") if checkpoint else (False, None)
+    if resumed:
+        gui_log("   ├─ ⏭ 初稿已在上次运行中生成，使用检查点结果")
+        if stream_callback:
+            stream_callback(chapter_content)
+    else:
+        gui_log("   ├─ 向LLM发起请求生成草稿（流式输出）...")
+        # 边生成边写入 .partial 文件：中途断线或程序退出时已生成的部分仍保留，且不会破坏原有章节文件
+        with open(partial_file, "w", encoding="utf-8") as stream_file:
+            def on_chunk(chunk: str):
+                stream_file.write(chunk)
+                stream_file.flush()
+                if stream_callback:
+                    stream_callback(chunk)
+
+            def on_reset():
+                stream_file.seek(0)
+                stream_file.truncate()
+                if stream_reset_callback:
+                    stream_reset_callback()
+
+            chapter_content = invoke_stream_with_cleaning(
+                llm_adapter, prompt_text, system_prompt=system_prompt, on_chunk=on_chunk, on_reset=on_reset,
+                cache_module="chapter.draft", cache_project=filepath
+            )
+        if checkpoint and chapter_content.strip():
+            checkpoint.record("draft.initial", chapter_content)
     if not chapter_content.strip():
         gui_log("   └─ ⚠️ 生成内容为空")
         logging.warning("Generated chapter draft is empty.")
     else:
         gui_log(f"   └─ ✅ 草稿生成完成 (共{len(chapter_content)}字)\n")
 
-    chapter_file = os.path.join(chapters_dir, f"chapter_{novel_number}.txt")
+    # 用清理后的完整内容替换章节文件，流式写入的原始片段随之丢弃
     clear_file_content(chapter_file)
     save_string_to_txt(chapter_content, chapter_file)
+    if os.path.exists(partial_file):
+        os.remove(partial_file)
 
     gui_log("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
     logging.info(f"[Draft] Chapter {novel_number} generated as a draft.")
@@ -1522,7 +1497,7 @@ def generate_chapter_draft(
     # 优先使用 PromptManager 配置；如果配置加载失败则默认禁用（避免意外增加成本）
     pm = None
     try:
-        pm = PromptManager()
+        pm = get_shared_prompt_manager()
         enable_refine = pm.is_module_enabled("chapter", "refine")
         enable_critique = pm.is_module_enabled("chapter", "critique")
     except Exception as e:
@@ -1535,9 +1510,8 @@ def generate_chapter_draft(
         gui_log("\n📚 [Plan C] 启动「批评家-作家」优化循环...")
 
         try:
-            directory_file = os.path.join(filepath, "Novel_directory.txt")
-            blueprint_text = read_file(directory_file) if os.path.exists(directory_file) else ""
-            chap_info = get_chapter_info_from_blueprint(blueprint_text, novel_number) if blueprint_text else {}
+            blueprint_index = get_blueprint_index(filepath)
+            chap_info = blueprint_index.get_chapter(novel_number) if blueprint_index else {}
             chap_title = chap_info.get("chapter_title", "")
 
             # 读取 Plan C 上下文（前文提要 + 上一章结尾）
@@ -1610,7 +1584,11 @@ def generate_chapter_draft(
                     chapter_text=chapter_content
                 )
 
-            critique_response = invoke_with_cleaning(llm_adapter, critique_prompt_text, system_prompt=system_prompt)
+            critique_response = _run_stage(
+                checkpoint, "draft.critique",
+                lambda: invoke_with_cleaning(llm_adapter, critique_prompt_text, system_prompt=system_prompt),
+                gui_log, keep=lambda text: bool(text.strip())
+            )
             gui_log(f"   ├─ 收到修改意见 ({len(critique_response)}字)")
             logging.info(f"Critique received: {critique_response[:100]}...")
 
@@ -3,7 +3,9 @@
 """
 通用重试、清洗、日志工具
 """
+import asyncio
 import logging
+import random
 import re
 import time
 import traceback
@@ -12,8 +14,17 @@ import os
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
+from core.adapters.llm_adapters import CancelledException
 from core.utils.file_utils import get_log_file_path
 from core.utils.error_utils import is_rate_limit_error, is_rate_limit_text
+from core.utils.rate_limiter import (
+    estimate_tokens,
+    get_adapter_rate_limiter,
+    get_inflight_limiter,
+    get_retry_after,
+    pop_last_usage,
+)
+from core.utils.llm_cache import get_project_llm_cache, make_cache_key, should_cache
 
 logging.basicConfig(
     filename=get_log_file_path(),      # 日志文件名
@@ -297,17 +308,17 @@ def debug_log(prompt: str, response_content: str):
     _log_llm_payload("[Prompt]", prompt)
     _log_llm_payload("[Response]", response_content)
 
-def invoke_with_cleaning(llm_adapter, prompt: str, max_retries: int = 10, system_prompt: Optional[str] = None) -> str:
-    """
-    调用 LLM 并清理返回结果，支持附加 system prompt。
-    增强功能：
-    - 抛出的异常使用指数退避策略（如适配器层抛出的429异常）
-    - 文本形式的限流错误(API错误响应)同样使用指数退避；其他API错误文本与空回复使用线性递增（最长4秒）
-    - 自动识别各种类型的空回复和API错误
-    - 向用户汇报所有重试状态
-    """
-    active_system_prompt = (system_prompt or "").strip()
+_EMPTY_TYPE_MESSAGES = {
+    "truly_empty": "返回真正的空内容",
+    "llm_refused": "LLM拒绝回应",
+    "api_error": "返回API错误信息",
+    "only_markup": "仅包含标记/格式符号",
+    "only_whitespace": "仅包含空白字符",
+    "structured_empty": "返回结构化的空回复"
+}
 
+
+def _log_llm_call_start(prompt: str, active_system_prompt: str):
     logging.info(
         "LLM call start (prompt_len=%d, system_prompt_len=%d)",
         len(prompt),
@@ -319,131 +330,407 @@ def invoke_with_cleaning(llm_adapter, prompt: str, max_retries: int = 10, system
         logging.info("[System]: <empty>")
     _log_llm_payload("[Prompt]", prompt)
 
+
+def _with_jitter(wait_time: float) -> float:
+    """退避时间加入 0~25% 的随机抖动，避免多个线程同时重试再次撞上限流"""
+    return round(wait_time * random.uniform(1.0, 1.25), 1)
+
+
+def _empty_response_wait(result: str, empty_type: str, retry_count: int, max_retries: int, base_wait_time: int, limiter=None) -> Optional[float]:
+    """
+    处理一次无效回复（空回复/拒绝/API错误文本），汇报重试状态。
+    返回下一次重试前应等待的秒数；已达最大重试次数时返回 None。
+    """
+    empty_msg = _EMPTY_TYPE_MESSAGES.get(empty_type, "返回空内容")
+
+    # 如果是API错误，使用与其他空回复相同的重试策略（线性递增）
+    if empty_type == "api_error":
+        error_preview = repr(result[:200])
+
+        if is_rate_limit_text(result):
+            # 文本形式的限流错误：与异常限流保持一致，指数退避（最长60秒）
+            wait_time = (2 ** retry_count) * base_wait_time
+            wait_time = _with_jitter(min(wait_time, 60))
+            msg = f"⚠️ LLM {empty_msg}（疑似限流）(第 {retry_count}/{max_retries} 次尝试)"
+            if limiter:
+                # 冻结该服务商的共享令牌桶，其他线程的请求也一起等待
+                limiter.block_for(wait_time)
+        else:
+            # 其他 API 错误文本：线性递增（最长4秒），避免等待过久
+            wait_time = base_wait_time * retry_count
+            wait_time = min(wait_time, 4)
+            msg = f"⚠️ LLM {empty_msg} (第 {retry_count}/{max_retries} 次尝试)"
+
+        _console_log(msg)
+        _console_log(f"   错误内容: {error_preview}")
+        _console_log(f"   等待 {wait_time} 秒后重试...")
+        logging.warning(
+            f"LLM API error response - retry {retry_count}/{max_retries}, waiting {wait_time}s. Error: {error_preview}"
+        )
+
+        if retry_count >= max_retries:
+            _console_log(f"❌ LLM 连续 {max_retries} 次{empty_msg}，生成失败")
+            _console_log(f"   最后一次错误: {error_preview}")
+            logging.error(f"LLM API error after {max_retries} attempts - Final error: {error_preview}")
+            return None
+        return wait_time
+
+    if retry_count < max_retries:
+        # 其他类型的空回复使用递增等待策略：2秒 -> 4秒 -> 8秒
+        wait_time = base_wait_time * retry_count
+        wait_time = min(wait_time, 4)  # 最多等待4秒
+
+        _console_log(f"⚠️ LLM {empty_msg} (第 {retry_count}/{max_retries} 次尝试)")
+        _console_log(f"   原始回复: {repr(result[:100])}")  # 显示原始回复的前100字符
+        _console_log(f"   等待 {wait_time} 秒后重试...")
+        logging.warning(f"LLM empty response - Type: {empty_type}, retry {retry_count}/{max_retries}, waiting {wait_time}s. Original: {repr(result[:200])}")
+        return wait_time
+
+    _console_log(f"❌ LLM 连续 {max_retries} 次{empty_msg}，生成失败")
+    _console_log(f"   最后一次回复: {repr(result[:100])}")
+    logging.error(f"LLM empty response after {max_retries} attempts - Final type: {empty_type}. Last response: {repr(result[:200])}")
+    return None
+
+
+def _exception_wait(e: Exception, retry_count: int, max_retries: int, base_wait_time: int, limiter=None) -> Optional[float]:
+    """
+    处理一次调用异常，汇报重试状态并返回下一次重试前应等待的秒数。
+    已达最大重试次数时返回 None，由调用方在 except 块内重新抛出以保留原始堆栈。
+    """
+    error_msg = str(e)
+
+    # 检测是否为速率限制错误
+    if is_rate_limit_error(e):
+        retry_after = get_retry_after(e)
+        if retry_after is not None:
+            # 服务端明确给出了 Retry-After，按其要求等待
+            wait_time = _with_jitter(max(retry_after, 1))
+        else:
+            # 使用指数退避策略：2^n * base_wait_time
+            wait_time = (2 ** retry_count) * base_wait_time
+            # 最长等待60秒
+            wait_time = _with_jitter(min(wait_time, 60))
+        if limiter:
+            # 冻结该服务商的共享令牌桶，其他线程的请求也一起等待，避免集中重试造成新一轮 429
+            limiter.block_for(wait_time)
+
+        _console_log(f"⚠️ 遇到速率限制 (第 {retry_count}/{max_retries} 次尝试)")
+        _console_log(f"   错误信息: {error_msg[:100]}...")
+        _console_log(f"   等待 {wait_time} 秒后重试...")
+        logging.warning(f"[Rate Limit] Attempt {retry_count}/{max_retries}, waiting {wait_time}s. Error: {error_msg[:200]}")
+
+        if retry_count >= max_retries:
+            _console_log("❌ 已达到最大重试次数，请稍后再试")
+            logging.error(f"Rate limit exceeded after {max_retries} retries")
+            return None
+        return wait_time
+
+    # 非速率限制错误，使用普通重试
+    _console_log(f"⚠️ 调用失败 (第 {retry_count}/{max_retries} 次尝试)")
+    _console_log(f"   错误信息: {error_msg[:100]}...")
+    logging.error(f"[LLM Error] Attempt {retry_count}/{max_retries}: {error_msg}")
+
+    if retry_count >= max_retries:
+        _console_log("❌ 已达到最大重试次数")
+        logging.error(f"LLM call failed after {max_retries} attempts")
+        return None
+
+    # 普通错误使用递增等待：2秒 -> 4秒 -> 6秒
+    wait_time = base_wait_time * retry_count
+    wait_time = min(wait_time, 10)  # 最多等待10秒
+    _console_log(f"   等待 {wait_time} 秒后重试...")
+    return wait_time
+
+
+def _accept_response(result: str, retry_count: int):
+    """记录响应并判定是否有效，返回 (清理后的文本, 空回复类型)"""
+    logging.info("LLM response received (len=%d)", len(result))
+    _log_llm_payload("[Response]", result)
+
+    # 使用增强的清理和分析逻辑
+    cleaned_result, empty_type = analyze_empty_response(result)
+    if empty_type == "valid" and retry_count > 0:
+        msg = f"✅ 重试成功！（第 {retry_count + 1} 次尝试）"
+        _console_log(msg)
+        logging.info(f"LLM call succeeded after {retry_count} retries")
+    return cleaned_result, empty_type
+
+
+def _open_response_cache(llm_adapter, prompt: str, active_system_prompt: str, cache_module: Optional[str], cache_project: Optional[str]):
+    """返回 (cache, key)；本次调用不走缓存（未开启/策略不允许/未指定项目）时返回 (None, None)"""
+    if not cache_project or not should_cache(cache_module, llm_adapter):
+        return None, None
+    cache = get_project_llm_cache(cache_project)
+    if cache is None:
+        return None, None
+    return cache, make_cache_key(llm_adapter, prompt, active_system_prompt)
+
+
+def invoke_with_cleaning(
+    llm_adapter,
+    prompt: str,
+    max_retries: int = 10,
+    system_prompt: Optional[str] = None,
+    cache_module: Optional[str] = None,
+    cache_project: Optional[str] = None
+) -> str:
+    """
+    调用 LLM 并清理返回结果，支持附加 system prompt。
+    增强功能：
+    - 抛出的异常使用指数退避策略（如适配器层抛出的429异常）
+    - 文本形式的限流错误(API错误响应)同样使用指数退避；其他API错误文本与空回复使用线性递增（最长4秒）
+    - 自动识别各种类型的空回复和API错误
+    - 向用户汇报所有重试状态
+    - 传入 cache_module（如 "helper.knowledge_search"）与 cache_project（项目路径）时，
+      按模块策略使用项目级响应缓存（需 AUTONOVEL_LLM_CACHE=1 开启）
+    """
+    active_system_prompt = (system_prompt or "").strip()
+    _log_llm_call_start(prompt, active_system_prompt)
+
+    cache, cache_key = _open_response_cache(llm_adapter, prompt, active_system_prompt, cache_module, cache_project)
+    if cache:
+        cached = cache.get(cache_key, cache_module)
+        if cached is not None:
+            return cached
+
     result = ""
     retry_count = 0
     base_wait_time = 2  # 基础等待时间（秒）
 
+    # 发送前按服务商共享的 RPM/TPM 预算排队，而不是等到 429 再各自退避
+    limiter = get_adapter_rate_limiter(llm_adapter)
+    inflight = get_inflight_limiter(llm_adapter)
+    estimated_tokens = estimate_tokens(prompt) + estimate_tokens(active_system_prompt)
+
     while retry_count < max_retries:
         try:
-            result = llm_adapter.invoke(prompt, system_prompt=active_system_prompt)
-            logging.info("LLM response received (len=%d)", len(result))
-            _log_llm_payload("[Response]", result)
-
-            # 使用增强的清理和分析逻辑
-            cleaned_result, empty_type = analyze_empty_response(result)
-
+            # 先在令牌桶排队再占用在途名额，限流等待期间不占着名额挡住其他请求；
+            # 同一模型的在途请求数在所有项目/线程间共享上限
+            limiter.acquire(estimated_tokens)
+            with inflight.slot():
+                result = llm_adapter.invoke(prompt, system_prompt=active_system_prompt)
+            limiter.record_usage(estimated_tokens, pop_last_usage())
+            cleaned_result, empty_type = _accept_response(result, retry_count)
             if empty_type == "valid":
                 # 有效内容，返回清理后的结果
-                if retry_count > 0:
-                    msg = f"✅ 重试成功！（第 {retry_count + 1} 次尝试）"
-                    _console_log(msg)
-                    logging.info(f"LLM call succeeded after {retry_count} retries")
+                if cache:
+                    cache.put(cache_key, cleaned_result, cache_module)
                 return cleaned_result
 
             # 处理各种类型的空回复
             retry_count += 1
+            wait_time = _empty_response_wait(result, empty_type, retry_count, max_retries, base_wait_time, limiter)
+            if wait_time is None:
+                # 返回空字符串，由上层代码处理
+                return ""
+            time.sleep(wait_time)
 
-            # 根据空回复类型显示不同的提示信息
-            empty_type_messages = {
-                "truly_empty": "返回真正的空内容",
-                "llm_refused": "LLM拒绝回应",
-                "api_error": "返回API错误信息",
-                "only_markup": "仅包含标记/格式符号",
-                "only_whitespace": "仅包含空白字符",
-                "structured_empty": "返回结构化的空回复"
-            }
-
-            empty_msg = empty_type_messages.get(empty_type, "返回空内容")
-
-            # 如果是API错误，使用与其他空回复相同的重试策略（线性递增）
-            if empty_type == "api_error":
-                error_preview = repr(result[:200])
-
-                if is_rate_limit_text(result):
-                    # 文本形式的限流错误：与异常限流保持一致，指数退避（最长60秒）
-                    wait_time = (2 ** retry_count) * base_wait_time
-                    wait_time = min(wait_time, 60)
-                    msg = f"⚠️ LLM {empty_msg}（疑似限流）(第 {retry_count}/{max_retries} 次尝试)"
-                else:
-                    # 其他 API 错误文本：线性递增（最长4秒），避免等待过久
-                    wait_time = base_wait_time * retry_count
-                    wait_time = min(wait_time, 4)
-                    msg = f"⚠️ LLM {empty_msg} (第 {retry_count}/{max_retries} 次尝试)"
-
-                _console_log(msg)
-                _console_log(f"   错误内容: {error_preview}")
-                _console_log(f"   等待 {wait_time} 秒后重试...")
-                logging.warning(
-                    f"LLM API error response - retry {retry_count}/{max_retries}, waiting {wait_time}s. Error: {error_preview}"
-                )
+        except Exception as e:
+            retry_count += 1
+            wait_time = _exception_wait(e, retry_count, max_retries, base_wait_time, limiter)
+            if wait_time is None:
+                raise  # 保留原始堆栈信息
+            if is_rate_limit_error(e):
+                # 限流等待已记入共享令牌桶，下一次 acquire 会统一排队
+                continue
+            time.sleep(wait_time)
 
-                if retry_count >= max_retries:
-                    _console_log(f"❌ LLM 连续 {max_retries} 次{empty_msg}，生成失败")
-                    _console_log(f"   最后一次错误: {error_preview}")
-                    logging.error(f"LLM API error after {max_retries} attempts - Final error: {error_preview}")
-                    return ""
+    # 理论上不会到达这里（空回复已在循环内返回）
+    logging.error("Unexpected: invoke_with_cleaning loop ended without return")
+    return result
 
-                time.sleep(wait_time)
 
-            elif retry_count < max_retries:
-                # 其他类型的空回复使用递增等待策略：2秒 -> 4秒 -> 8秒
-                wait_time = base_wait_time * retry_count
-                wait_time = min(wait_time, 4)  # 最多等待4秒
+async def ainvoke_with_cleaning(
+    llm_adapter,
+    prompt: str,
+    max_retries: int = 10,
+    system_prompt: Optional[str] = None,
+    cache_module: Optional[str] = None,
+    cache_project: Optional[str] = None
+) -> str:
+    """
+    invoke_with_cleaning 的异步版本：调用适配器的 ainvoke，限流与退避等待使用 asyncio.sleep，
+    不占用线程，可在同一个事件循环中并发发起大量请求。重试、清理与缓存策略与同步版本一致。
+    """
+    active_system_prompt = (system_prompt or "").strip()
+    _log_llm_call_start(prompt, active_system_prompt)
 
-                _console_log(f"⚠️ LLM {empty_msg} (第 {retry_count}/{max_retries} 次尝试)")
-                _console_log(f"   原始回复: {repr(result[:100])}")  # 显示原始回复的前100字符
-                _console_log(f"   等待 {wait_time} 秒后重试...")
-                logging.warning(f"LLM empty response - Type: {empty_type}, retry {retry_count}/{max_retries}, waiting {wait_time}s. Original: {repr(result[:200])}")
+    cache, cache_key = _open_response_cache(llm_adapter, prompt, active_system_prompt, cache_module, cache_project)
+    if cache:
+        cached = cache.get(cache_key, cache_module)
+        if cached is not None:
+            return cached
 
-                time.sleep(wait_time)
-            else:
-                _console_log(f"❌ LLM 连续 {max_retries} 次{empty_msg}，生成失败")
-                _console_log(f"   最后一次回复: {repr(result[:100])}")
-                logging.error(f"LLM empty response after {max_retries} attempts - Final type: {empty_type}. Last response: {repr(result[:200])}")
-                # 返回空字符串，由上层代码处理
+    result = ""
+    retry_count = 0
+    base_wait_time = 2  # 基础等待时间（秒）
+
+    limiter = get_adapter_rate_limiter(llm_adapter)
+    inflight = get_inflight_limiter(llm_adapter)
+    estimated_tokens = estimate_tokens(prompt) + estimate_tokens(active_system_prompt)
+
+    while retry_count < max_retries:
+        try:
+            # 与同步版本相同：先在令牌桶排队，再占用在途名额
+            await limiter.aacquire(estimated_tokens)
+            async with inflight.aslot():
+                result = await llm_adapter.ainvoke(prompt, system_prompt=active_system_prompt)
+            limiter.record_usage(estimated_tokens, pop_last_usage())
+            cleaned_result, empty_type = _accept_response(result, retry_count)
+            if empty_type == "valid":
+                if cache:
+                    cache.put(cache_key, cleaned_result, cache_module)
+                return cleaned_result
+
+            retry_count += 1
+            wait_time = _empty_response_wait(result, empty_type, retry_count, max_retries, base_wait_time, limiter)
+            if wait_time is None:
                 return ""
+            await asyncio.sleep(wait_time)
 
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             retry_count += 1
-            error_msg = str(e)
-
-            # 检测是否为速率限制错误
+            wait_time = _exception_wait(e, retry_count, max_retries, base_wait_time, limiter)
+            if wait_time is None:
+                raise  # 保留原始堆栈信息
             if is_rate_limit_error(e):
-                # 使用指数退避策略：2^n * base_wait_time
-                wait_time = (2 ** retry_count) * base_wait_time
-                # 最长等待60秒
-                wait_time = min(wait_time, 60)
+                continue
+            await asyncio.sleep(wait_time)
 
-                _console_log(f"⚠️ 遇到速率限制 (第 {retry_count}/{max_retries} 次尝试)")
-                _console_log(f"   错误信息: {error_msg[:100]}...")
-                _console_log(f"   等待 {wait_time} 秒后重试...")
-                logging.warning(f"[Rate Limit] Attempt {retry_count}/{max_retries}, waiting {wait_time}s. Error: {error_msg[:200]}")
+    logging.error("Unexpected: ainvoke_with_cleaning loop ended without return")
+    return result
 
-                if retry_count >= max_retries:
-                    _console_log("❌ 已达到最大重试次数，请稍后再试")
-                    logging.error(f"Rate limit exceeded after {max_retries} retries")
-                    raise  # 保留原始堆栈信息
 
-                time.sleep(wait_time)
+def _build_continue_prompt(prompt: str, partial_text: str) -> str:
+    """构造断流续写提示词：附上原始要求与已生成部分，要求模型从结尾处接着写"""
+    return (
+        f"{prompt}\n\n"
+        "━━━ 以下是你此前已经生成的部分（连接中断） ━━━\n"
+        f"{partial_text}\n"
+        "━━━ 已生成部分结束 ━━━\n\n"
+        "请从上文结尾处直接续写，保持文风与情节连贯。"
+        "不要重复已生成的内容，不要添加任何说明或标题，直接输出续写正文。"
+    )
 
-            else:
-                # 非速率限制错误，使用普通重试
-                _console_log(f"⚠️ 调用失败 (第 {retry_count}/{max_retries} 次尝试)")
-                _console_log(f"   错误信息: {error_msg[:100]}...")
-                logging.error(f"[LLM Error] Attempt {retry_count}/{max_retries}: {error_msg}")
-
-                if retry_count >= max_retries:
-                    _console_log("❌ 已达到最大重试次数")
-                    logging.error(f"LLM call failed after {max_retries} attempts")
-                    raise  # 保留原始堆栈信息
-
-                # 普通错误使用递增等待：2秒 -> 4秒 -> 6秒
-                wait_time = base_wait_time * retry_count
-                wait_time = min(wait_time, 10)  # 最多等待10秒
-                _console_log(f"   等待 {wait_time} 秒后重试...")
-                time.sleep(wait_time)
 
-    # 理论上不会到达这里（空回复已在循环内返回）
-    logging.error("Unexpected: invoke_with_cleaning loop ended without return")
+def _record_stream_usage(limiter, estimated_tokens: int, stream_parts):
+    """流式请求结束后校正令牌桶：优先用适配器上报的 usage，否则按提示词估算加已收到文本估算"""
+    actual_tokens = pop_last_usage()
+    if actual_tokens is None:
+        actual_tokens = estimated_tokens + estimate_tokens("".join(stream_parts))
+    limiter.record_usage(estimated_tokens, actual_tokens)
+
+
+def invoke_stream_with_cleaning(
+    llm_adapter,
+    prompt: str,
+    system_prompt: Optional[str] = None,
+    on_chunk=None,
+    on_reset=None,
+    max_resume: int = 2,
+    max_retries: int = 10,
+    cache_module: Optional[str] = None,
+    cache_project: Optional[str] = None,
+    cancellation_token=None
+) -> str:
+    """
+    流式调用 LLM 并清理最终结果。
+
+    - 每收到一个文本片段即调用 on_chunk(chunk)，用于实时写文件/刷新界面
+    - 已交给 on_chunk 的内容作废（流式结果无效，改用非流式重试）时先调用 on_reset()，
+      再把重试得到的完整内容作为一个片段交给 on_chunk
+    - 连接中途断开时保留已收到的部分文本，发起"从此处续写"调用拼接后续内容（最多 max_resume 次）
+    - 一个字都没收到就失败时，退回 invoke_with_cleaning 的非流式重试逻辑
+    - 续写仍失败时返回已清理的部分文本，而不是丢弃整章
+    - 命中响应缓存时把缓存内容作为一个片段交给 on_chunk；仅完整结束的流式结果会写入缓存
+    - 中断原因是限流时先按 _exception_wait 的退避冻结共享令牌桶，再续写/重试
+    - 用户取消（CancelledException，来自 cancellation_token 或 on_chunk）直接抛出，不续写也不重试
+    """
+    active_system_prompt = (system_prompt or "").strip()
+    _log_llm_call_start(prompt, active_system_prompt)
+
+    cache, cache_key = _open_response_cache(llm_adapter, prompt, active_system_prompt, cache_module, cache_project)
+    if cache:
+        cached = cache.get(cache_key, cache_module)
+        if cached is not None:
+            if on_chunk:
+                on_chunk(cached)
+            return cached
+
+    parts = []
+    resume_count = 0
+    current_prompt = prompt
+    limiter = get_adapter_rate_limiter(llm_adapter)
+    inflight = get_inflight_limiter(llm_adapter)
+
+    while True:
+        try:
+            # 限流排队在占用名额之前；流式请求在整个接收过程中占用一个在途名额
+            estimated_tokens = estimate_tokens(current_prompt) + estimate_tokens(active_system_prompt)
+            attempt_start = len(parts)
+            limiter.acquire(estimated_tokens)
+            with inflight.slot():
+                try:
+                    for chunk in llm_adapter.invoke_stream(
+                        current_prompt, system_prompt=active_system_prompt, cancellation_token=cancellation_token
+                    ):
+                        parts.append(chunk)
+                        if on_chunk:
+                            on_chunk(chunk)
+                finally:
+                    # 中断的请求同样消耗了额度，按本次已收到的内容计入
+                    _record_stream_usage(limiter, estimated_tokens, parts[attempt_start:])
+            break
+        except CancelledException:
+            raise
+        except Exception as e:
+            if is_rate_limit_error(e):
+                # 冻结该服务商的共享令牌桶，续写/重试请求在 acquire 处统一等待
+                _exception_wait(e, resume_count + 1, max_resume + 1, 2, limiter)
+            if not parts:
+                # 尚未收到任何内容：交给非流式调用的完整重试/退避逻辑
+                logging.warning(f"LLM stream failed before first chunk, falling back to invoke_with_cleaning: {e}")
+                _console_log(f"⚠️ 流式调用失败，改用普通调用重试: {str(e)[:100]}")
+                result = invoke_with_cleaning(
+                    llm_adapter, prompt, max_retries=max_retries, system_prompt=active_system_prompt,
+                    cache_module=cache_module, cache_project=cache_project
+                )
+                if result and on_chunk:
+                    on_chunk(result)
+                return result
+
+            resume_count += 1
+            partial_text = "".join(parts)
+            if resume_count > max_resume:
+                _console_log(f"❌ 流式输出连续中断 {max_resume} 次，保留已生成的 {len(partial_text)} 字")
+                logging.error(f"LLM stream interrupted after {max_resume} resumes, keeping partial text (len={len(partial_text)}): {e}")
+                break
+
+            _console_log(f"⚠️ 流式输出中断，已保留 {len(partial_text)} 字，从断点续写 (第 {resume_count}/{max_resume} 次)")
+            logging.warning(f"LLM stream interrupted (len={len(partial_text)}), resume {resume_count}/{max_resume}: {e}")
+            current_prompt = _build_continue_prompt(prompt, partial_text)
+
+    result = "".join(parts)
+    logging.info("LLM stream response received (len=%d)", len(result))
+    _log_llm_payload("[Response]", result)
+
+    cleaned_result, empty_type = analyze_empty_response(result)
+    if empty_type == "valid":
+        if cache and resume_count == 0:
+            cache.put(cache_key, cleaned_result, cache_module)
+        return cleaned_result
+
+    # 流式结果无效（空回复/拒绝/API错误文本）：退回非流式重试，已输出的无效片段作废
+    logging.warning(f"LLM stream returned invalid content (type={empty_type}), retrying with invoke_with_cleaning")
+    _console_log(f"⚠️ 流式输出无有效内容（{empty_type}），改用普通调用重试")
+    if parts and on_reset:
+        on_reset()
+    result = invoke_with_cleaning(
+        llm_adapter, prompt, max_retries=max_retries, system_prompt=active_system_prompt,
+        cache_module=cache_module, cache_project=cache_project
+    )
+    if result and on_chunk:
+        on_chunk(result)
     return result
-
@@ -19,12 +19,13 @@ from core.prompting.prompt_definitions import (
     single_chapter_summary_prompt,  # 🆕 单章摘要提示词
     resolve_global_system_prompt
 )
-from core.prompting.prompt_manager import PromptManager  # 新增：提示词管理器
+from core.prompting.prompt_manager import get_shared_prompt_manager  # 进程共享的提示词管理器
 from core.prompting.prompt_manager_helper import format_prompt_safe
 from novel_generator.common import invoke_with_cleaning
-from core.utils.file_utils import read_file, clear_file_content, save_string_to_txt, get_log_file_path
+from core.utils.file_utils import read_file, read_file_cached, clear_file_content, save_string_to_txt, get_log_file_path
 from novel_generator.vectorstore_utils import update_vector_store
 from core.utils.volume_utils import calculate_volume_ranges, is_volume_last_chapter  # 新增：分卷工具函数
+from core.utils.step_graph import Step, default_step_workers, run_step_graph
 logging.basicConfig(
     filename=get_log_file_path(),      # 日志文件名
     filemode='a',            # 追加模式（'w' 会覆盖）
@@ -32,6 +33,10 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     datefmt='%Y-%m-%d %H:%M:%S'
 )
+
+# 定稿阶段并发执行的 LLM 步骤数上限（可通过环境变量调整）
+FINALIZE_MAX_WORKERS = default_step_workers("AUTONOVEL_FINALIZE_WORKERS", 3)
+
 def finalize_volume(
     volume_number: int,
     volume_start: int,
@@ -75,7 +80,7 @@ def finalize_volume(
 
     # 创建提示词管理器实例（带异常保护）
     try:
-        pm = PromptManager()
+        pm = get_shared_prompt_manager()
     except Exception as e:
         logging.error(f"Failed to initialize PromptManager: {e}")
         gui_log(f"⚠️ 提示词管理器初始化失败，将使用默认提示词: {str(e)}")
@@ -125,7 +130,7 @@ def finalize_volume(
     volume_arch_file = os.path.join(filepath, "Volume_architecture.txt")
     volume_architecture_text = ""
     if os.path.exists(volume_arch_file):
-        volume_architecture_text = read_file(volume_arch_file).strip()
+        volume_architecture_text = read_file_cached(volume_arch_file).strip()
 
     # 读取完整版伏笔（plot_arcs.txt，仅提取未解决部分）
     gui_log("▶ 读取本卷伏笔记录...")
@@ -133,7 +138,7 @@ def finalize_volume(
     plot_arcs_text = ""
 
     if os.path.exists(plot_arcs_file):
-        full_plot_arcs = read_file(plot_arcs_file).strip()
+        full_plot_arcs = read_file_cached(plot_arcs_file).strip()
 
         if full_plot_arcs:
             # 提取未解决伏笔（排除已解决部分）
@@ -197,7 +202,9 @@ def finalize_volume(
     volume_summary_result = invoke_with_cleaning(
         llm_adapter,
         volume_summary_prompt_text,
-        system_prompt=system_prompt
+        system_prompt=system_prompt,
+        cache_module="finalization.volume_summary",
+        cache_project=filepath
     )
 
     if not volume_summary_result.strip():
@@ -217,7 +224,7 @@ def finalize_volume(
     gui_log("▶ 检查是否有精简版伏笔需要附加...")
     global_summary_file = os.path.join(filepath, "global_summary.txt")
     if os.path.exists(global_summary_file):
-        global_summary = read_file(global_summary_file)
+        global_summary = read_file_cached(global_summary_file)
 
         # 提取精简版伏笔段（使用正则匹配，支持新旧格式）
         foreshadow_match = re.search(
@@ -273,12 +280,8 @@ def finalize_volume(
             embedding_model_name
         )
 
-        # 先删除旧的卷摘要（避免重复存储）
-        from novel_generator.vectorstore_utils import delete_volume_summary_from_store
-        delete_volume_summary_from_store(embedding_adapter, filepath, volume_number)
-        gui_log(f"▶ 已清理旧卷摘要（如存在）")
-
         # 将卷摘要切分后存入向量库，标记为卷摘要类型
+        # 分块 ID 按卷号确定，旧卷摘要的分块会被原地替换或删除，无需先整体清理
         from novel_generator.vectorstore_utils import update_vector_store
 
         # 读取更新后的卷摘要（包含精简版伏笔）
@@ -332,12 +335,16 @@ def finalize_chapter(
     num_volumes: int = 0,  # 新增：分卷数量
     total_chapters: int = 0,  # 新增：总章节数
     gui_log_callback=None,
-    progress_callback=None  # 🆕 进度回调函数
+    progress_callback=None,  # 🆕 进度回调函数
+    checkpoint=None
 ):
     """
     对指定章节做最终处理：更新前文摘要、更新角色状态、插入向量库等。
     默认无需再做扩写操作，若有需要可在外部调用 enrich_chapter_text 处理后再定稿。
 
+    checkpoint: 可选的 ChapterCheckpoint，每个定稿子步骤完成后写入检查点，
+    中断后重跑时已完成的子步骤（及其写入的文件）不会重复执行。
+
     Returns:
         bool: 定稿是否成功。True表示成功，False表示失败（如章节为空等）
     """
@@ -360,7 +367,7 @@ def finalize_chapter(
 
     # 创建提示词管理器实例（带异常保护）
     try:
-        pm = PromptManager()
+        pm = get_shared_prompt_manager()
     except Exception as e:
         logging.error(f"Failed to initialize PromptManager: {e}")
         gui_log(f"⚠️ 提示词管理器初始化失败，将使用默认提示词: {str(e)}")
@@ -397,330 +404,445 @@ def finalize_chapter(
     )
     system_prompt = resolve_global_system_prompt(use_global_system_prompt if use_global_system_prompt is not None else None)
 
-    # [1/3] 更新前文摘要（可选）
-    if pm.is_module_enabled("finalization", "summary_update"):
-        # 更新前文摘要：70%
-        update_progress("📄 [1/3] 更新前文摘要", 0.70)
-        gui_log(f"▶ [1/3] 更新前文摘要")
-        gui_log("   ├─ 读取旧摘要...")
-        global_summary_file = os.path.join(filepath, "global_summary.txt")
-        old_global_summary = read_file(global_summary_file)
-
-        prompt_template = pm.get_prompt("finalization", "summary_update")
-        if not prompt_template:
-            gui_log("   └─ ⚠️ 提示词加载失败，使用默认提示词")
-            prompt_template = summary_prompt
-
-        prompt_summary = format_prompt_safe(
-            prompt_template,
-            {
-                "chapter_text": chapter_text,
-                "global_summary": old_global_summary
-            },
-            "finalization.summary_update"
-        )
-        gui_log("   ├─ 向LLM发起请求...")
-        new_global_summary = invoke_with_cleaning(llm_adapter, prompt_summary, system_prompt=system_prompt)
-        if not new_global_summary.strip():
-            gui_log("   ├─ ⚠ 生成失败，保留旧摘要")
-            new_global_summary = old_global_summary
-        else:
-            gui_log("   └─ ✅ 前文摘要更新完成\n")
-
-        clear_file_content(global_summary_file)
-        save_string_to_txt(new_global_summary, global_summary_file)
-    else:
-        gui_log(f"▷ [1/3] 更新前文摘要 (已禁用，跳过)\n")
-
-    # [2/3] 更新角色状态（可选）
-    if pm.is_module_enabled("finalization", "character_state_update"):
-        # 更新角色状态：75%
-        update_progress("👤 [2/3] 更新角色状态", 0.75)
-        gui_log("▶ [2/3] 更新角色状态")
-
-        # 读取旧状态
-        gui_log("   ├─ 读取旧状态...")
-        character_state_file = os.path.join(filepath, "character_state.txt")
-        old_character_state = read_file(character_state_file)
-
-        # 🆕 读取角色动力学（独立文件）
-        gui_log("   ├─ 读取角色框架...")
-        from core.utils.file_utils import read_character_dynamics
-        character_dynamics = read_character_dynamics(filepath)
-        if not character_dynamics:
-            gui_log("   │  └─ ⚠️ 角色框架缺失，仅基于当前状态更新")
-
-        # 🆕 读取上下文摘要（分卷兼容）
-        gui_log("   ├─ 读取上下文摘要...")
-        from core.utils.file_utils import get_context_summary_for_character
-        context_summary = get_context_summary_for_character(
-            filepath=filepath,
-            chapter_num=novel_number,
-            num_volumes=num_volumes,
-            total_chapters=total_chapters
-        )
+    # 以下步骤互相独立的部分并发执行，依赖关系：
+    #   plot_arcs_update → plot_arcs_compress_auto → plot_arcs_distill ┐
+    #   summary_update ────────────────────────────────────────────────┴→ 伏笔融入前文摘要
+    #   summary_update → character_state_update（读取更新后的 global_summary.txt 作为上下文）
+    #   vector_store / single_chapter_summary 无依赖
+    new_plot_arcs = ""
+    distilled_foreshadow = ""
+
+    def _step_summary_update(log):
+        # [1/3] 更新前文摘要（可选）
+        if pm.is_module_enabled("finalization", "summary_update"):
+            log(f"▶ [1/3] 更新前文摘要")
+            log("   ├─ 读取旧摘要...")
+            global_summary_file = os.path.join(filepath, "global_summary.txt")
+            old_global_summary = read_file_cached(global_summary_file)
+
+            prompt_template = pm.get_prompt("finalization", "summary_update")
+            if not prompt_template:
+                log("   └─ ⚠️ 提示词加载失败，使用默认提示词")
+                prompt_template = summary_prompt
 
-        # 格式化提示词
-        prompt_template = pm.get_prompt("finalization", "character_state_update")
-        if not prompt_template:
-            gui_log("   └─ ⚠️ 提示词加载失败，使用默认提示词")
-            prompt_template = update_character_state_prompt
-
-        prompt_char_state = format_prompt_safe(
-            prompt_template,
-            {
-                "chapter_text": chapter_text,
-                "old_state": old_character_state,
-                "character_dynamics": character_dynamics,
-                "context_summary": context_summary
-            },
-            "finalization.character_state_update"
-        )
+            prompt_summary = format_prompt_safe(
+                prompt_template,
+                {
+                    "chapter_text": chapter_text,
+                    "global_summary": old_global_summary
+                },
+                "finalization.summary_update"
+            )
+            log("   ├─ 向LLM发起请求...")
+            new_global_summary = invoke_with_cleaning(
+                llm_adapter, prompt_summary, system_prompt=system_prompt,
+                cache_module="finalization.summary_update", cache_project=filepath
+            )
+            if not new_global_summary.strip():
+                log("   ├─ ⚠ 生成失败，保留旧摘要")
+                new_global_summary = old_global_summary
+            else:
+                log("   └─ ✅ 前文摘要更新完成\n")
 
-        gui_log("   ├─ 向LLM发起请求...")
-        new_char_state = invoke_with_cleaning(llm_adapter, prompt_char_state, system_prompt=system_prompt)
-        if not new_char_state.strip():
-            gui_log("   ├─ ⚠ 生成失败，保留旧状态")
-            new_char_state = old_character_state
+            clear_file_content(global_summary_file)
+            save_string_to_txt(new_global_summary, global_summary_file)
         else:
-            gui_log("   └─ ✅ 角色状态更新完成\n")
+            log(f"▷ [1/3] 更新前文摘要 (已禁用，跳过)\n")
+
+    def _step_character_state_update(log):
+        # [2/3] 更新角色状态（可选）
+        if pm.is_module_enabled("finalization", "character_state_update"):
+            log("▶ [2/3] 更新角色状态")
+
+            # 读取旧状态
+            log("   ├─ 读取旧状态...")
+            character_state_file = os.path.join(filepath, "character_state.txt")
+            old_character_state = read_file_cached(character_state_file)
+
+            # 🆕 读取角色动力学（独立文件）
+            log("   ├─ 读取角色框架...")
+            from core.utils.file_utils import read_character_dynamics
+            character_dynamics = read_character_dynamics(filepath)
+            if not character_dynamics:
+                log("   │  └─ ⚠️ 角色框架缺失，仅基于当前状态更新")
+
+            # 🆕 读取上下文摘要（分卷兼容）
+            log("   ├─ 读取上下文摘要...")
+            from core.utils.file_utils import get_context_summary_for_character
+            context_summary = get_context_summary_for_character(
+                filepath=filepath,
+                chapter_num=novel_number,
+                num_volumes=num_volumes,
+                total_chapters=total_chapters
+            )
 
-        clear_file_content(character_state_file)
-        save_string_to_txt(new_char_state, character_state_file)
-    else:
-        gui_log(f"▷ [2/3] 更新角色状态 (已禁用，跳过)\n")
-
-    # [2.5/3] 更新剧情要点（详细版）
-    if pm.is_module_enabled("finalization", "plot_arcs_update"):
-        # 更新剧情要点：80%
-        update_progress("🎭 [2.5/3] 更新剧情要点", 0.80)
-        gui_log("▶ [2.5/3] 更新剧情要点（详细版）")
-        gui_log("   ├─ 读取旧的剧情要点...")
-        plot_arcs_file = os.path.join(filepath, "plot_arcs.txt")
-        old_plot_arcs = read_file(plot_arcs_file) if os.path.exists(plot_arcs_file) else ""
-
-        prompt_template = pm.get_prompt("finalization", "plot_arcs_update")
-        if not prompt_template:
-            gui_log("   └─ ⚠️ 提示词加载失败，使用默认提示词")
-            prompt_template = plot_arcs_update_prompt
-
-        prompt_plot_arcs = format_prompt_safe(
-            prompt_template,
-            {
-                "chapter_text": chapter_text,
-                "old_plot_arcs": old_plot_arcs if old_plot_arcs.strip() else "（暂无记录）"
-            },
-            "finalization.plot_arcs_update"
-        )
-        gui_log("   ├─ 向LLM发起请求...")
-        new_plot_arcs = invoke_with_cleaning(llm_adapter, prompt_plot_arcs, system_prompt=system_prompt)
-        if not new_plot_arcs.strip():
-            gui_log("   ├─ ⚠ 生成失败，保留旧内容")
-            new_plot_arcs = old_plot_arcs
-        else:
-            gui_log("   └─ ✅ 剧情要点更新完成\n")
+            # 格式化提示词
+            prompt_template = pm.get_prompt("finalization", "character_state_update")
+            if not prompt_template:
+                log("   └─ ⚠️ 提示词加载失败，使用默认提示词")
+                prompt_template = update_character_state_prompt
 
-        clear_file_content(plot_arcs_file)
-        save_string_to_txt(new_plot_arcs, plot_arcs_file)
-    else:
-        gui_log(f"▷ [2.5/3] 更新剧情要点 (已禁用，跳过)\n")
-        new_plot_arcs = ""
-
-    # [2.6/3] 智能压缩剧情要点（每10章自动触发）
-    if pm.is_module_enabled("finalization", "plot_arcs_compress_auto"):
-        # 检查是否需要压缩（每10章触发一次）
-        if novel_number % 10 == 0:
-            # 智能压缩：82%
-            update_progress("🗜️ [2.6/3] 智能压缩剧情要点", 0.82)
-            gui_log("▶ [2.6/3] 智能压缩剧情要点（周期性优化）")
-            gui_log(f"   ├─ 检测到第{novel_number}章（10的倍数），触发自动压缩")
+            prompt_char_state = format_prompt_safe(
+                prompt_template,
+                {
+                    "chapter_text": chapter_text,
+                    "old_state": old_character_state,
+                    "character_dynamics": character_dynamics,
+                    "context_summary": context_summary
+                },
+                "finalization.character_state_update"
+            )
 
+            log("   ├─ 向LLM发起请求...")
+            new_char_state = invoke_with_cleaning(
+                llm_adapter, prompt_char_state, system_prompt=system_prompt,
+                cache_module="finalization.character_state_update", cache_project=filepath
+            )
+            if not new_char_state.strip():
+                log("   ├─ ⚠ 生成失败，保留旧状态")
+                new_char_state = old_character_state
+            else:
+                log("   └─ ✅ 角色状态更新完成\n")
+
+            clear_file_content(character_state_file)
+            save_string_to_txt(new_char_state, character_state_file)
+        else:
+            log(f"▷ [2/3] 更新角色状态 (已禁用，跳过)\n")
+
+    def _step_plot_arcs_update(log):
+        nonlocal new_plot_arcs
+        # [2.5/3] 更新剧情要点（详细版）
+        if pm.is_module_enabled("finalization", "plot_arcs_update"):
+            log("▶ [2.5/3] 更新剧情要点（详细版）")
+            log("   ├─ 读取旧的剧情要点...")
             plot_arcs_file = os.path.join(filepath, "plot_arcs.txt")
-            current_plot_arcs = read_file(plot_arcs_file) if os.path.exists(plot_arcs_file) else ""
-
-            if current_plot_arcs.strip():
-                # 统计当前伏笔数量（宽松匹配，提高鲁棒性）
-                # 未解决伏笔：匹配 [A级-...] 或 [B级-...] 或 [C级-...]，允许前导符号和空格
-                unresolved_pattern = r'^\s*[-•·\*]?\s*\[([ABC]级[-\s]*[^\]]+)\]'
-                unresolved_lines = [line for line in current_plot_arcs.split('\n')
-                                   if re.match(unresolved_pattern, line.strip())]
-                unresolved_count = len(unresolved_lines)
-
-                # 已解决伏笔：匹配 ✓已解决 或 ✅已解决 或 已解决: 等变体，允许前导符号和空格
-                resolved_pattern = r'^\s*[-•·\*]?\s*[✓✅☑]\s*已解决[:：]?'
-                resolved_lines = [line for line in current_plot_arcs.split('\n')
-                                 if re.match(resolved_pattern, line.strip())]
-                resolved_count = len(resolved_lines)
-
-                gui_log(f"   ├─ 当前状态：未解决{unresolved_count}条，已解决{resolved_count}条")
-
-                # 判断是否需要压缩（未解决>50条 或 已解决>20条）
-                if unresolved_count > 50 or resolved_count > 20:
-                    gui_log("   ├─ 超过阈值，启动压缩流程...")
-
-                    # 由于记录时已分级，直接进行智能压缩（跳过分层标记步骤）
-                    gui_log("   └─ 基于已分级的伏笔进行智能压缩...")
-                    compress_prompt_template = pm.get_prompt("finalization", "plot_arcs_compress_auto")
-                    if not compress_prompt_template:
-                        gui_log("       └─ ⚠️ 提示词加载失败，使用默认提示词")
-                        compress_prompt_template = plot_arcs_compress_auto_prompt
-
-                    compress_prompt = format_prompt_safe(
-                        compress_prompt_template,
-                        {
-                            "classified_plot_arcs": current_plot_arcs,
-                            "current_chapter": novel_number,
-                            "unresolved_count": unresolved_count,
-                            "resolved_count": resolved_count
-                        },
-                        "finalization.plot_arcs_compress_auto"
-                    )
-
-                    compressed_arcs = invoke_with_cleaning(llm_adapter, compress_prompt, system_prompt=system_prompt)
-
-                    if not compressed_arcs.strip():
-                        gui_log("       └─ ⚠️ 压缩失败，保留原内容")
-                    else:
-                        # 统计压缩后数量（宽松匹配）
-                        new_unresolved = len([line for line in compressed_arcs.split('\n')
-                                            if re.match(unresolved_pattern, line.strip())])
-                        new_resolved = len([line for line in compressed_arcs.split('\n')
-                                          if re.match(resolved_pattern, line.strip())])
+            old_plot_arcs = read_file_cached(plot_arcs_file) if os.path.exists(plot_arcs_file) else ""
 
-                        gui_log(f"       ├─ ✅ 压缩完成：{unresolved_count}→{new_unresolved}条未解决，{resolved_count}→{new_resolved}条已解决")
+            prompt_template = pm.get_prompt("finalization", "plot_arcs_update")
+            if not prompt_template:
+                log("   └─ ⚠️ 提示词加载失败，使用默认提示词")
+                prompt_template = plot_arcs_update_prompt
 
-                        # 保存压缩后的结果
-                        clear_file_content(plot_arcs_file)
-                        save_string_to_txt(compressed_arcs, plot_arcs_file)
-                        gui_log("       └─ ✅ 已保存压缩后的剧情要点\n")
+            prompt_plot_arcs = format_prompt_safe(
+                prompt_template,
+                {
+                    "chapter_text": chapter_text,
+                    "old_plot_arcs": old_plot_arcs if old_plot_arcs.strip() else "（暂无记录）"
+                },
+                "finalization.plot_arcs_update"
+            )
+            log("   ├─ 向LLM发起请求...")
+            new_plot_arcs = invoke_with_cleaning(
+                llm_adapter, prompt_plot_arcs, system_prompt=system_prompt,
+                cache_module="finalization.plot_arcs_update", cache_project=filepath
+            )
+            if not new_plot_arcs.strip():
+                log("   ├─ ⚠ 生成失败，保留旧内容")
+                new_plot_arcs = old_plot_arcs
+            else:
+                log("   └─ ✅ 剧情要点更新完成\n")
 
-                        # 更新 new_plot_arcs 供后续步骤2.8使用
-                        new_plot_arcs = compressed_arcs
+            clear_file_content(plot_arcs_file)
+            save_string_to_txt(new_plot_arcs, plot_arcs_file)
+        else:
+            log(f"▷ [2.5/3] 更新剧情要点 (已禁用，跳过)\n")
+            new_plot_arcs = ""
+
+    def _step_plot_arcs_compress_auto(log):
+        nonlocal new_plot_arcs
+        # [2.6/3] 智能压缩剧情要点（每10章自动触发）
+        if pm.is_module_enabled("finalization", "plot_arcs_compress_auto"):
+            # 检查是否需要压缩（每10章触发一次）
+            if novel_number % 10 == 0:
+                log("▶ [2.6/3] 智能压缩剧情要点（周期性优化）")
+                log(f"   ├─ 检测到第{novel_number}章（10的倍数），触发自动压缩")
+
+                plot_arcs_file = os.path.join(filepath, "plot_arcs.txt")
+                current_plot_arcs = read_file_cached(plot_arcs_file) if os.path.exists(plot_arcs_file) else ""
+
+                if current_plot_arcs.strip():
+                    # 统计当前伏笔数量（宽松匹配，提高鲁棒性）
+                    # 未解决伏笔：匹配 [A级-...] 或 [B级-...] 或 [C级-...]，允许前导符号和空格
+                    unresolved_pattern = r'^\s*[-•·\*]?\s*\[([ABC]级[-\s]*[^\]]+)\]'
+                    unresolved_lines = [line for line in current_plot_arcs.split('\n')
+                                       if re.match(unresolved_pattern, line.strip())]
+                    unresolved_count = len(unresolved_lines)
+
+                    # 已解决伏笔：匹配 ✓已解决 或 ✅已解决 或 已解决: 等变体，允许前导符号和空格
+                    resolved_pattern = r'^\s*[-•·\*]?\s*[✓✅☑]\s*已解决[:：]?'
+                    resolved_lines = [line for line in current_plot_arcs.split('\n')
+                                     if re.match(resolved_pattern, line.strip())]
+                    resolved_count = len(resolved_lines)
+
+                    log(f"   ├─ 当前状态：未解决{unresolved_count}条，已解决{resolved_count}条")
+
+                    # 判断是否需要压缩（未解决>50条 或 已解决>20条）
+                    if unresolved_count > 50 or resolved_count > 20:
+                        log("   ├─ 超过阈值，启动压缩流程...")
+
+                        # 由于记录时已分级，直接进行智能压缩（跳过分层标记步骤）
+                        log("   └─ 基于已分级的伏笔进行智能压缩...")
+                        compress_prompt_template = pm.get_prompt("finalization", "plot_arcs_compress_auto")
+                        if not compress_prompt_template:
+                            log("       └─ ⚠️ 提示词加载失败，使用默认提示词")
+                            compress_prompt_template = plot_arcs_compress_auto_prompt
+
+                        compress_prompt = format_prompt_safe(
+                            compress_prompt_template,
+                            {
+                                "classified_plot_arcs": current_plot_arcs,
+                                "current_chapter": novel_number,
+                                "unresolved_count": unresolved_count,
+                                "resolved_count": resolved_count
+                            },
+                            "finalization.plot_arcs_compress_auto"
+                        )
+
+                        compressed_arcs = invoke_with_cleaning(llm_adapter, compress_prompt, system_prompt=system_prompt)
+
+                        if not compressed_arcs.strip():
+                            log("       └─ ⚠️ 压缩失败，保留原内容")
+                        else:
+                            # 统计压缩后数量（宽松匹配）
+                            new_unresolved = len([line for line in compressed_arcs.split('\n')
+                                                if re.match(unresolved_pattern, line.strip())])
+                            new_resolved = len([line for line in compressed_arcs.split('\n')
+                                              if re.match(resolved_pattern, line.strip())])
+
+                            log(f"       ├─ ✅ 压缩完成：{unresolved_count}→{new_unresolved}条未解决，{resolved_count}→{new_resolved}条已解决")
+
+                            # 保存压缩后的结果
+                            clear_file_content(plot_arcs_file)
+                            save_string_to_txt(compressed_arcs, plot_arcs_file)
+                            log("       └─ ✅ 已保存压缩后的剧情要点\n")
+
+                            # 更新 new_plot_arcs 供后续步骤2.8使用
+                            new_plot_arcs = compressed_arcs
+                    else:
+                        log("   └─ 未达到压缩阈值，跳过本次压缩\n")
                 else:
-                    gui_log("   └─ 未达到压缩阈值，跳过本次压缩\n")
+                    log("   └─ 剧情要点文件为空，跳过压缩\n")
+            # 非10的倍数章节，静默跳过（不输出日志）
+        else:
+            # 模块已禁用，仅在10的倍数章节输出提示
+            if novel_number % 10 == 0:
+                log(f"▷ [2.6/3] 智能压缩剧情要点 (已禁用，跳过)\n")
+
+    def _step_plot_arcs_distill(log):
+        nonlocal distilled_foreshadow
+        # [2.8/3] 提炼伏笔到摘要（精简版）
+        if pm.is_module_enabled("finalization", "plot_arcs_distill"):
+            log("▶ [2.8/3] 提炼伏笔到摘要（精简版）")
+
+            # 只有在步骤 2.5 启用时才有内容可提炼
+            if pm.is_module_enabled("finalization", "plot_arcs_update") and new_plot_arcs.strip():
+                log("   ├─ 从详细版提炼核心伏笔...")
+
+                prompt_template = pm.get_prompt("finalization", "plot_arcs_distill")
+                if not prompt_template:
+                    log("   └─ ⚠️ 提示词加载失败，使用默认提示词")
+                    prompt_template = plot_arcs_distill_prompt
+
+                prompt_distill = format_prompt_safe(
+                    prompt_template,
+                    {"plot_arcs_text": new_plot_arcs},
+                    "finalization.plot_arcs_distill"
+                )
+                log("   ├─ 向LLM发起请求...")
+                distilled_arcs = invoke_with_cleaning(
+                    llm_adapter, prompt_distill, system_prompt=system_prompt,
+                    cache_module="finalization.plot_arcs_distill", cache_project=filepath
+                )
+
+                if distilled_arcs.strip():
+                    # 验证字数
+                    distilled_length = len(distilled_arcs)
+                    log(f"   ├─ 精简版字数: {distilled_length}字")
+
+                    if distilled_length > 250:  # 留出50字buffer
+                        log(f"   ├─ ⚠️ 超过200字限制，触发二次压缩...")
+
+                        compress_prompt_template = pm.get_prompt("finalization", "plot_arcs_compress")
+                        if not compress_prompt_template:
+                            compress_prompt_template = plot_arcs_compress_prompt
+
+                        compress_prompt = format_prompt_safe(
+                            compress_prompt_template,
+                            {"distilled_arcs": distilled_arcs},
+                            "finalization.plot_arcs_compress"
+                        )
+                        distilled_arcs = invoke_with_cleaning(llm_adapter, compress_prompt, system_prompt=system_prompt)
+
+                        if distilled_arcs.strip():
+                            compressed_length = len(distilled_arcs)
+                            log(f"   ├─ 压缩后字数: {compressed_length}字")
+
+                            # 强制截断（极端情况）
+                            if compressed_length > 200:
+                                distilled_arcs = distilled_arcs[:200]
+                                log(f"   ├─ ⚠️ 仍超限，强制截断到200字")
+                        else:
+                            log("   ├─ ⚠️ 二次压缩失败，使用原版本")
+
+                    distilled_foreshadow = distilled_arcs.strip()
+                    log("   └─ ✅ 精简版伏笔提炼完成，待前文摘要更新后融入\n")
+                else:
+                    log("   └─ ⚠️ 提炼失败，跳过融入摘要\n")
             else:
-                gui_log("   └─ 剧情要点文件为空，跳过压缩\n")
-        # 非10的倍数章节，静默跳过（不输出日志）
-    else:
-        # 模块已禁用，仅在10的倍数章节输出提示
-        if novel_number % 10 == 0:
-            gui_log(f"▷ [2.6/3] 智能压缩剧情要点 (已禁用，跳过)\n")
+                if not pm.is_module_enabled("finalization", "plot_arcs_update"):
+                    log("   └─ ⚠️ 步骤2.5已禁用，无内容可提炼\n")
+                else:
+                    log("   └─ ⚠️ 详细版剧情要点为空，跳过提炼\n")
+        else:
+            log(f"▷ [2.8/3] 提炼伏笔到摘要 (已禁用，跳过)\n")
 
-    # [2.8/3] 提炼伏笔到摘要（精简版）
-    if pm.is_module_enabled("finalization", "plot_arcs_distill"):
-        # 提炼伏笔到摘要：85%
-        update_progress("💡 [2.8/3] 提炼伏笔到摘要", 0.85)
-        gui_log("▶ [2.8/3] 提炼伏笔到摘要（精简版）")
+    def _step_foreshadow_append(log):
+        if not distilled_foreshadow:
+            return
 
-        # 只有在步骤 2.5 启用时才有内容可提炼
-        if pm.is_module_enabled("finalization", "plot_arcs_update") and new_plot_arcs.strip():
-            gui_log("   ├─ 从详细版提炼核心伏笔...")
+        # 追加到 global_summary.txt
+        log("▶ [2.9/3] 融入伏笔到前文摘要")
+        log("   ├─ 追加到前文摘要...")
+        global_summary_file = os.path.join(filepath, "global_summary.txt")
+        current_summary = read_file_cached(global_summary_file) if os.path.exists(global_summary_file) else ""
+
+        # 移除旧的伏笔部分（如果存在），支持旧格式和新格式
+        current_summary = re.sub(
+            r'\n*━━━ 未解决伏笔.*?━━━\n.*?(?=\n\n|$)',
+            '',
+            current_summary,
+            flags=re.DOTALL
+        ).strip()
+
+        # 由程序添加分隔符，确保格式统一（新格式：带章节号）
+        formatted_foreshadow = f"━━━ 未解决伏笔（至第{novel_number}章） ━━━\n{distilled_foreshadow}"
+
+        # 追加新的伏笔（带换行隔离）
+        if current_summary:
+            updated_summary = f"{current_summary}\n\n{formatted_foreshadow}"
+        else:
+            updated_summary = formatted_foreshadow
 
-            prompt_template = pm.get_prompt("finalization", "plot_arcs_distill")
+        clear_file_content(global_summary_file)
+        save_string_to_txt(updated_summary, global_summary_file)
+        log("   └─ ✅ 精简版伏笔已融入摘要\n")
+
+    def _step_vector_store(log):
+        log("▶ [3/3] 插入向量库")
+        log("   ├─ 切分章节文本...")
+
+        # 计算卷号（用于向量检索优化）
+        volume_num = None
+        if num_volumes > 1 and total_chapters > 0:
+            from core.utils.volume_utils import get_volume_number, calculate_volume_ranges
+            volume_ranges = calculate_volume_ranges(total_chapters, num_volumes)
+            volume_num = get_volume_number(novel_number, volume_ranges)
+            log(f"   ├─ 章节元数据: chapter={novel_number}, volume={volume_num}")
+
+        update_vector_store(
+            embedding_adapter=create_embedding_adapter(
+                embedding_interface_format,
+                embedding_api_key,
+                embedding_url,
+                embedding_model_name
+            ),
+            new_chapter=chapter_text,
+            filepath=filepath,
+            chapter_num=novel_number,  # 新增：章节号
+            volume_num=volume_num,  # 新增：卷号
+            doc_type="chapter"  # 明确标记为章节
+        )
+        log("   └─ ✅ 向量库更新完成\n")
+
+    def _step_single_chapter_summary(log):
+        # [Plan B] 生成单章摘要缓存（为后续章节生成加速）
+        if pm.is_module_enabled("chapter", "single_chapter_summary"):
+            log("▶ [Plan B] 生成单章摘要缓存...")
+
+            # 读取章节元数据确保准确
+            from core.utils.chapter_directory_parser import get_blueprint_index
+            chap_info = get_blueprint_index(filepath).get_chapter(novel_number)
+
+            prompt_template = pm.get_prompt("chapter", "single_chapter_summary")
             if not prompt_template:
-                gui_log("   └─ ⚠️ 提示词加载失败，使用默认提示词")
-                prompt_template = plot_arcs_distill_prompt
+                prompt_template = single_chapter_summary_prompt
 
-            prompt_distill = format_prompt_safe(
+            summary_prompt_text = format_prompt_safe(
                 prompt_template,
-                {"plot_arcs_text": new_plot_arcs},
-                "finalization.plot_arcs_distill"
+                {
+                    "novel_number": novel_number,
+                    "chapter_title": chap_info.get("chapter_title", "未命名"),
+                    "chapter_text": chapter_text
+                },
+                "chapter.single_chapter_summary"
+            )
+
+            chapter_summary_content = invoke_with_cleaning(
+                llm_adapter, summary_prompt_text, system_prompt=system_prompt,
+                cache_module="chapter.single_chapter_summary", cache_project=filepath
             )
-            gui_log("   ├─ 向LLM发起请求...")
-            distilled_arcs = invoke_with_cleaning(llm_adapter, prompt_distill, system_prompt=system_prompt)
-
-            if distilled_arcs.strip():
-                # 验证字数
-                distilled_length = len(distilled_arcs)
-                gui_log(f"   ├─ 精简版字数: {distilled_length}字")
-
-                if distilled_length > 250:  # 留出50字buffer
-                    gui_log(f"   ├─ ⚠️ 超过200字限制，触发二次压缩...")
-
-                    compress_prompt_template = pm.get_prompt("finalization", "plot_arcs_compress")
-                    if not compress_prompt_template:
-                        compress_prompt_template = plot_arcs_compress_prompt
-
-                    compress_prompt = format_prompt_safe(
-                        compress_prompt_template,
-                        {"distilled_arcs": distilled_arcs},
-                        "finalization.plot_arcs_compress"
-                    )
-                    distilled_arcs = invoke_with_cleaning(llm_adapter, compress_prompt, system_prompt=system_prompt)
-
-                    if distilled_arcs.strip():
-                        compressed_length = len(distilled_arcs)
-                        gui_log(f"   ├─ 压缩后字数: {compressed_length}字")
-
-                        # 强制截断（极端情况）
-                        if compressed_length > 200:
-                            distilled_arcs = distilled_arcs[:200]
-                            gui_log(f"   ├─ ⚠️ 仍超限，强制截断到200字")
-                    else:
-                        gui_log("   ├─ ⚠️ 二次压缩失败，使用原版本")
-
-                # 追加到 global_summary.txt
-                gui_log("   ├─ 追加到前文摘要...")
-                global_summary_file = os.path.join(filepath, "global_summary.txt")
-                current_summary = read_file(global_summary_file) if os.path.exists(global_summary_file) else ""
-
-                # 移除旧的伏笔部分（如果存在），支持旧格式和新格式
-                current_summary = re.sub(
-                    r'\n*━━━ 未解决伏笔.*?━━━\n.*?(?=\n\n|$)',
-                    '',
-                    current_summary,
-                    flags=re.DOTALL
-                ).strip()
-
-                # 由程序添加分隔符，确保格式统一（新格式：带章节号）
-                formatted_foreshadow = f"━━━ 未解决伏笔（至第{novel_number}章） ━━━\n{distilled_arcs.strip()}"
-
-                # 追加新的伏笔（带换行隔离）
-                if current_summary:
-                    updated_summary = f"{current_summary}\n\n{formatted_foreshadow}"
-                else:
-                    updated_summary = formatted_foreshadow
 
-                clear_file_content(global_summary_file)
-                save_string_to_txt(updated_summary, global_summary_file)
-                gui_log("   └─ ✅ 精简版伏笔已融入摘要\n")
+            if chapter_summary_content.strip():
+                summary_cache_file = os.path.join(chapters_dir, f"chapter_{novel_number}_summary.txt")
+                clear_file_content(summary_cache_file)
+                save_string_to_txt(chapter_summary_content, summary_cache_file)
+                log(f"   └─ ✅ 单章摘要已缓存 ({len(chapter_summary_content)}字)")
             else:
-                gui_log("   └─ ⚠️ 提炼失败，跳过融入摘要\n")
+                log("   └─ ⚠️ 单章摘要生成失败")
         else:
-            if not pm.is_module_enabled("finalization", "plot_arcs_update"):
-                gui_log("   └─ ⚠️ 步骤2.5已禁用，无内容可提炼\n")
+            log("▷ [Plan B] 生成单章摘要缓存 (已禁用，跳过)\n")
+
+    def _resumable(step: Step) -> Step:
+        """有检查点时：已完成的步骤直接恢复其输出，新完成的步骤记录输出"""
+        if checkpoint is None:
+            return step
+        stage = f"finalize.{step.name}"
+
+        def run(log):
+            nonlocal new_plot_arcs, distilled_foreshadow
+            done, state = checkpoint.lookup(stage)
+            if done:
+                state = state or {}
+                if "new_plot_arcs" in state:
+                    new_plot_arcs = state["new_plot_arcs"]
+                if "distilled_foreshadow" in state:
+                    distilled_foreshadow = state["distilled_foreshadow"]
+                log(f"⏭ {step.label or step.name} 已在上次运行中完成，跳过\n")
+                return
+            step.func(log)
+            # 只记录本步骤负责产出的共享变量，避免与并发步骤互相覆盖
+            if step.name in ("plot_arcs_update", "plot_arcs_compress_auto"):
+                checkpoint.record(stage, {"new_plot_arcs": new_plot_arcs})
+            elif step.name == "plot_arcs_distill":
+                checkpoint.record(stage, {"distilled_foreshadow": distilled_foreshadow})
             else:
-                gui_log("   └─ ⚠️ 详细版剧情要点为空，跳过提炼\n")
-    else:
-        gui_log(f"▷ [2.8/3] 提炼伏笔到摘要 (已禁用，跳过)\n")
-
-    # [3/3] 插入向量库：90%
-    update_progress("🗄️ [3/3] 插入向量库", 0.90)
-    gui_log("▶ [3/3] 插入向量库")
-    gui_log("   ├─ 切分章节文本...")
-
-    # 计算卷号（用于向量检索优化）
-    volume_num = None
-    if num_volumes > 1 and total_chapters > 0:
-        from core.utils.volume_utils import get_volume_number, calculate_volume_ranges
-        volume_ranges = calculate_volume_ranges(total_chapters, num_volumes)
-        volume_num = get_volume_number(novel_number, volume_ranges)
-        gui_log(f"   ├─ 章节元数据: chapter={novel_number}, volume={volume_num}")
-
-    update_vector_store(
-        embedding_adapter=create_embedding_adapter(
-            embedding_interface_format,
-            embedding_api_key,
-            embedding_url,
-            embedding_model_name
-        ),
-        new_chapter=chapter_text,
-        filepath=filepath,
-        chapter_num=novel_number,  # 新增：章节号
-        volume_num=volume_num,  # 新增：卷号
-        doc_type="chapter"  # 明确标记为章节
+                checkpoint.record(stage, {})
+
+        return Step(step.name, run, step.depends_on, step.label)
+
+    finalize_steps = [_resumable(step) for step in [
+        Step("summary_update", _step_summary_update, label="📄 更新前文摘要"),
+        Step("character_state_update", _step_character_state_update, ("summary_update",), label="👤 更新角色状态"),
+        Step("plot_arcs_update", _step_plot_arcs_update, label="🎭 更新剧情要点"),
+        Step("plot_arcs_compress_auto", _step_plot_arcs_compress_auto, ("plot_arcs_update",), label="🗜️ 智能压缩剧情要点"),
+        Step("plot_arcs_distill", _step_plot_arcs_distill, ("plot_arcs_compress_auto",), label="💡 提炼伏笔"),
+        Step("foreshadow_append", _step_foreshadow_append, ("summary_update", "plot_arcs_distill"), label="💡 伏笔融入摘要"),
+        Step("vector_store", _step_vector_store, label="🗄️ 插入向量库"),
+        Step("single_chapter_summary", _step_single_chapter_summary, label="📑 生成章节摘要缓存"),
+    ]]
+
+    # 定稿步骤：70% → 95%
+    update_progress("📝 定稿步骤并发执行中...", 0.70)
+    step_results = run_step_graph(
+        finalize_steps,
+        max_workers=FINALIZE_MAX_WORKERS,
+        log=gui_log,
+        on_progress=lambda label, done, total: update_progress(f"{label} 完成 ({done}/{total})", 0.70 + 0.25 * done / total)
     )
-    gui_log("   └─ ✅ 向量库更新完成\n")
+    step_errors = [(name, err) for name, err in step_results.items() if err is not None]
+    if step_errors:
+        gui_log(f"❌ 定稿步骤失败: {', '.join(name for name, _ in step_errors)}")
+        raise step_errors[0][1]
 
     gui_log("━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
     gui_log(f"✅ 第{novel_number}章定稿完成")
@@ -737,7 +859,10 @@ def finalize_chapter(
             from core.utils.volume_utils import get_volume_number
 
             volume_num = get_volume_number(novel_number, volume_ranges)
-            if volume_num > 0:
+            volume_done = checkpoint.lookup("finalize.volume_summary")[0] if checkpoint else False
+            if volume_done:
+                gui_log(f"\n⏭ 第{volume_num}卷总结已在上次运行中完成，跳过\n")
+            elif volume_num > 0:
                 vol_start, vol_end = volume_ranges[volume_num - 1]
 
                 gui_log(f"\n🔔 检测到第{novel_number}章是第{volume_num}卷的最后一章")
@@ -762,6 +887,8 @@ def finalize_chapter(
                     embedding_model_name=embedding_model_name,
                     gui_log_callback=gui_log_callback
                 )
+                if checkpoint:
+                    checkpoint.record("finalize.volume_summary")
     elif num_volumes > 1 and total_chapters > 0 and not pm.is_module_enabled("finalization", "volume_summary"):
         # 卷总结已禁用，检查是否是卷末章节并提示
         volume_ranges = calculate_volume_ranges(total_chapters, num_volumes)
@@ -772,44 +899,6 @@ def finalize_chapter(
                 gui_log(f"\n🔔 第{novel_number}章是第{volume_num}卷的最后一章")
                 gui_log("   卷总结模块已禁用，跳过生成\n")
 
-    # [Plan B] 生成单章摘要缓存（为后续章节生成加速）
-    if pm.is_module_enabled("chapter", "single_chapter_summary"):
-        # 生成单章摘要：98%
-        update_progress("📑 生成章节摘要缓存", 0.98)
-        gui_log("▶ [Plan B] 生成单章摘要缓存...")
-
-        # 读取章节元数据确保准确
-        from core.utils.chapter_directory_parser import get_chapter_info_from_blueprint
-        directory_file = os.path.join(filepath, "Novel_directory.txt")
-        blueprint_text = read_file(directory_file) if os.path.exists(directory_file) else ""
-        chap_info = get_chapter_info_from_blueprint(blueprint_text, novel_number)
-
-        prompt_template = pm.get_prompt("chapter", "single_chapter_summary")
-        if not prompt_template:
-            prompt_template = single_chapter_summary_prompt
-
-        summary_prompt_text = format_prompt_safe(
-            prompt_template,
-            {
-                "novel_number": novel_number,
-                "chapter_title": chap_info.get("chapter_title", "未命名"),
-                "chapter_text": chapter_text
-            },
-            "chapter.single_chapter_summary"
-        )
-
-        chapter_summary_content = invoke_with_cleaning(llm_adapter, summary_prompt_text, system_prompt=system_prompt)
-
-        if chapter_summary_content.strip():
-            summary_cache_file = os.path.join(chapters_dir, f"chapter_{novel_number}_summary.txt")
-            clear_file_content(summary_cache_file)
-            save_string_to_txt(chapter_summary_content, summary_cache_file)
-            gui_log(f"   └─ ✅ 单章摘要已缓存 ({len(chapter_summary_content)}字)")
-        else:
-            gui_log("   └─ ⚠️ 单章摘要生成失败")
-    else:
-        gui_log("▷ [Plan B] 生成单章摘要缓存 (已禁用，跳过)\n")
-
     # 定稿完成：100%
     update_progress("🎉 完成", 1.0)
 
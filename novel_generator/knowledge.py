@@ -1,17 +1,29 @@
 #novel_generator/knowledge.py
 # -*- coding: utf-8 -*-
 """
-知识文件导入至向量库（advanced_split_content、import_knowledge_file）
+知识文件导入至向量库（advanced_split_content、import_knowledge_file、import_knowledge_path）
+
+大文件按块流式读取、分句分块，每攒够 KNOWLEDGE_EMBED_BATCH 个分块 embedding 一次并写入向量库，
+内存占用与文件大小无关。每个分块带确定性 ID（knowledge:<文件哈希前16位>:<序号>）及元数据
+source / offset / file_hash，最后一块额外标记 last_chunk：
+- 向量库本身就是断点：中断后重新导入同一文件时，已写入的分块直接跳过，从断点继续 embedding；
+- 内容哈希已完整入库（存在 last_chunk 分块）的文件整体跳过，改名或换目录也不会重复导入。
+
+导入目录时递归收集其中的 .txt / .md 文件，按 AUTONOVEL_KNOWLEDGE_WORKERS（默认2）个文件并发导入；
+每批分块数由 AUTONOVEL_KNOWLEDGE_BATCH（默认128）控制。
 """
 import os
+import codecs
+import hashlib
 import logging
 import re
-import traceback
-import nltk
+import threading
 import warnings
-from core.utils.file_utils import read_file, get_log_file_path
-from novel_generator.vectorstore_utils import load_vector_store, init_vector_store
-from langchain.docstore.document import Document
+from typing import Callable, Iterator, List, Optional
+from core.utils.file_utils import get_log_file_path
+from core.utils.step_graph import Step, default_step_workers, run_step_graph
+from core.utils.text_splitter import iter_chunk_spans, iter_sentence_spans, split_text
+from novel_generator.vectorstore_utils import open_vector_store
 
 # 禁用特定的Torch警告
 warnings.filterwarnings('ignore', message='.*Torch was not compiled with flash attention.*')
@@ -23,51 +35,197 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     datefmt='%Y-%m-%d %H:%M:%S'
 )
+
+KNOWLEDGE_MAX_WORKERS = default_step_workers("AUTONOVEL_KNOWLEDGE_WORKERS", 2)
+KNOWLEDGE_EMBED_BATCH = default_step_workers("AUTONOVEL_KNOWLEDGE_BATCH", 128)
+KNOWLEDGE_CHUNK_LENGTH = 500
+KNOWLEDGE_EXTENSIONS = (".txt", ".md")
+# 每次读取的字节数；编码探测只看文件开头这么多字节
+_READ_BLOCK_SIZE = 256 * 1024
+_ENCODINGS = ("utf-8-sig", "gb18030")
+
+
 def advanced_split_content(content: str, similarity_threshold: float = 0.7, max_length: int = 500) -> list:
-    """使用基本分段策略"""
-    # nltk.download('punkt', quiet=True)
-    # nltk.download('punkt_tab', quiet=True)
-    sentences = nltk.sent_tokenize(content)
-    if not sentences:
-        return []
-
-    final_segments = []
-    current_segment = []
-    current_length = 0
-    
-    for sentence in sentences:
-        sentence_length = len(sentence)
-        if current_length + sentence_length > max_length:
-            if current_segment:
-                final_segments.append(" ".join(current_segment))
-            current_segment = [sentence]
-            current_length = sentence_length
-        else:
-            current_segment.append(sentence)
-            current_length += sentence_length
-    
-    if current_segment:
-        final_segments.append(" ".join(current_segment))
-    
-    return final_segments
+    """使用基本分段策略：按中文句末标点分句后按长度合并"""
+    return split_text(content, max_length=max_length)
 
-def import_knowledge_file(
+
+def _detect_encoding(path: str) -> str:
+    """用文件开头探测编码：UTF-8（可带 BOM）优先，失败时按 GB18030（兼容 GBK/GB2312）读取"""
+    with open(path, "rb") as f:
+        head = f.read(_READ_BLOCK_SIZE)
+    for encoding in _ENCODINGS:
+        try:
+            # 增量解码：开头样本在多字节字符中间截断不算错误
+            codecs.getincrementaldecoder(encoding)().decode(head, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    raise UnicodeDecodeError(_ENCODINGS[-1], head[:1], 0, 1, f"无法识别文件编码: {path}")
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _iter_text_blocks(path: str, encoding: str) -> Iterator[str]:
+    # newline="" 保留原始换行，offset 与文件内容的字符位置一致
+    with open(path, "r", encoding=encoding, newline="") as f:
+        for block in iter(lambda: f.read(_READ_BLOCK_SIZE), ""):
+            yield block
+
+
+def _knowledge_chunk_id(file_hash: str, index: int) -> str:
+    return f"knowledge:{file_hash[:16]}:{index}"
+
+
+def _indexed_chunks(collection, file_hash: str):
+    """返回 (已入库的分块序号集合, 是否已完整入库)"""
+    results = collection.get(where={"file_hash": file_hash}, include=["metadatas"])
+    indexes = set()
+    complete = False
+    for metadata in results.get("metadatas") or []:
+        metadata = metadata or {}
+        if isinstance(metadata.get("chunk"), int):
+            indexes.add(metadata["chunk"])
+        complete = complete or bool(metadata.get("last_chunk"))
+    return indexes, complete
+
+
+def collect_knowledge_files(path: str) -> List[str]:
+    """单个文件原样返回；目录则递归收集其中的知识文件（按路径排序）"""
+    if os.path.isfile(path):
+        return [path]
+    files = []
+    for root, dirs, names in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in sorted(names):
+            if name.lower().endswith(KNOWLEDGE_EXTENSIONS):
+                files.append(os.path.join(root, name))
+    return files
+
+
+def _import_one_file(store, write_lock, file_path: str, source: str, batch_size: int, log) -> dict:
+    """
+    流式导入单个文件
+
+    Returns:
+        dict: {"status": "imported" | "skipped" | "empty", "chunks": 新写入的分块数, "total": 分块总数}
+    """
+    collection = store._collection
+    file_hash = _file_hash(file_path)
+    with write_lock:
+        indexed, complete = _indexed_chunks(collection, file_hash)
+    if complete:
+        log(f"⏭ {source} 内容已在向量库中，跳过")
+        return {"status": "skipped", "chunks": 0, "total": len(indexed)}
+    if indexed:
+        log(f"↻ {source} 上次导入中断，已有 {len(indexed)} 个分块，从断点继续")
+
+    encoding = _detect_encoding(file_path)
+    spans = iter_chunk_spans(
+        iter_sentence_spans(_iter_text_blocks(file_path, encoding)),
+        max_length=KNOWLEDGE_CHUNK_LENGTH
+    )
+    written = 0
+    total = 0
+    batch = []
+
+    def flush():
+        nonlocal written
+        texts = [text for _, _, text, _ in batch]
+        embeddings = store.embeddings.embed_documents(texts) or []
+        if len(embeddings) != len(texts) or not all(embeddings):
+            raise RuntimeError(f"Embedding 失败（{source}，第 {batch[0][0]} 块起）")
+        metadatas = [
+            {
+                "doc_type": "knowledge",
+                "source": source,
+                "offset": offset,
+                "chunk": index,
+                "file_hash": file_hash,
+                "content_hash": hashlib.sha1(text.encode("utf-8", errors="ignore")).hexdigest(),
+                "last_chunk": last,
+            }
+            for index, offset, text, last in batch
+        ]
+        with write_lock:
+            collection.upsert(
+                ids=[_knowledge_chunk_id(file_hash, index) for index, _, _, _ in batch],
+                embeddings=embeddings,
+                documents=texts,
+                metadatas=metadatas,
+            )
+        written += len(batch)
+        log(f"   {source}: 已写入 {written} 块（读到第 {batch[-1][1]} 字）")
+        batch.clear()
+
+    # 向后看一块，以便给最后一块打上 last_chunk 标记
+    pending = next(spans, None)
+    while pending is not None:
+        following = next(spans, None)
+        offset, text = pending
+        last = following is None
+        # 完整性标记所在的最后一块即使已入库也要重写
+        if total not in indexed or last:
+            batch.append((total, offset, text, last))
+            if len(batch) >= batch_size:
+                flush()
+        total += 1
+        pending = following
+    if batch:
+        flush()
+
+    if total == 0:
+        log(f"⚠️ {source} 内容为空，跳过")
+        return {"status": "empty", "chunks": 0, "total": 0}
+    log(f"✅ {source} 导入完成：共 {total} 块，本次写入 {written} 块")
+    return {"status": "imported", "chunks": written, "total": total}
+
+
+def import_knowledge_path(
     embedding_api_key: str,
     embedding_url: str,
     embedding_interface_format: str,
     embedding_model_name: str,
-    file_path: str,
-    filepath: str
-):
-    logging.info(f"开始导入知识库文件: {file_path}, 接口格式: {embedding_interface_format}, 模型: {embedding_model_name}")
-    if not os.path.exists(file_path):
-        logging.warning(f"知识库文件不存在: {file_path}")
-        return
-    content = read_file(file_path)
-    if not content.strip():
-        logging.warning("知识库文件内容为空。")
-        return
-    paragraphs = advanced_split_content(content)
+    path: str,
+    filepath: str,
+    log_callback: Optional[Callable[[str], None]] = None,
+    max_workers: Optional[int] = None,
+    batch_size: Optional[int] = None,
+) -> dict:
+    """
+    流式、可断点续传地把知识文件（或整个目录）导入向量库
+
+    Args:
+        path: 知识文件或目录（目录下递归收集 .txt / .md）
+        filepath: 小说保存路径
+        log_callback: 进度日志输出函数
+        max_workers: 并发导入的文件数（默认 KNOWLEDGE_MAX_WORKERS）
+        batch_size: 每批 embedding 的分块数（默认 KNOWLEDGE_EMBED_BATCH）
+
+    Returns:
+        dict: {"imported", "skipped", "failed", "chunks"}，failed 为失败的文件路径列表
+    """
+    def gui_log(msg):
+        if log_callback:
+            log_callback(msg)
+        logging.info(msg)
+
+    summary = {"imported": 0, "skipped": 0, "failed": [], "chunks": 0}
+    logging.info(f"开始导入知识库: {path}, 接口格式: {embedding_interface_format}, 模型: {embedding_model_name}")
+    if not os.path.exists(path):
+        logging.warning(f"知识库文件不存在: {path}")
+        return summary
+    files = collect_knowledge_files(path)
+    if not files:
+        gui_log(f"⚠️ {path} 下没有可导入的知识文件（{' / '.join(KNOWLEDGE_EXTENSIONS)}）")
+        return summary
+
     from core.adapters.embedding_adapters import create_embedding_adapter
     embedding_adapter = create_embedding_adapter(
         embedding_interface_format,
@@ -75,23 +233,65 @@ def import_knowledge_file(
         embedding_url if embedding_url else "http://localhost:11434/api",
         embedding_model_name
     )
-    store = load_vector_store(embedding_adapter, filepath)
-    if not store:
-        logging.info("Vector store does not exist or load failed. Initializing a new one for knowledge import...")
-        store = init_vector_store(embedding_adapter, paragraphs, filepath)
-        if store:
-            logging.info("知识库文件已成功导入至向量库(新初始化)。")
-        else:
-            logging.warning("知识库导入失败，跳过。")
-    else:
-        try:
-            docs = [Document(page_content=str(p)) for p in paragraphs]
-            store.add_documents(docs)
-            logging.info("知识库文件已成功导入至向量库(追加模式)。")
-        except Exception as e:
-            logging.warning(f"知识库导入失败: {e}")
-            traceback.print_exc()
+    # 向量库不存在时先建空库，各文件的写入都走 upsert
+    with open_vector_store(embedding_adapter, filepath, create=True) as store:
+        if not store:
+            gui_log("❌ 向量库加载失败，知识库导入跳过。")
+            return summary
 
+        base_dir = path if os.path.isdir(path) else os.path.dirname(path)
+        write_lock = threading.Lock()
+        summary_lock = threading.Lock()
+        batch_size = max(1, batch_size or KNOWLEDGE_EMBED_BATCH)
+        gui_log(f"📚 共 {len(files)} 个知识文件待导入")
 
+        def make_step(file_path):
+            source = os.path.relpath(file_path, base_dir)
 
+            def run(step_log):
+                result = _import_one_file(store, write_lock, file_path, source, batch_size, gui_log)
+                with summary_lock:
+                    summary["chunks"] += result["chunks"]
+                    if result["status"] == "imported":
+                        summary["imported"] += 1
+                    else:
+                        summary["skipped"] += 1
+            return Step(name=file_path, func=run, label=source)
 
+        results = run_step_graph(
+            [make_step(file_path) for file_path in files],
+            max_workers=max_workers or KNOWLEDGE_MAX_WORKERS,
+            log=gui_log
+        )
+
+    for file_path, error in results.items():
+        if error is not None:
+            gui_log(f"❌ {os.path.relpath(file_path, base_dir)} 导入失败（已写入的分块会在下次导入时跳过）: {error}")
+            summary["failed"].append(file_path)
+
+    gui_log(
+        f"知识库导入结束：导入 {summary['imported']} 个文件，跳过 {summary['skipped']} 个，"
+        f"失败 {len(summary['failed'])} 个，本次写入 {summary['chunks']} 块"
+    )
+    return summary
+
+
+def import_knowledge_file(
+    embedding_api_key: str,
+    embedding_url: str,
+    embedding_interface_format: str,
+    embedding_model_name: str,
+    file_path: str,
+    filepath: str,
+    log_callback: Optional[Callable[[str], None]] = None
+):
+    """导入单个知识文件（也接受目录），见 import_knowledge_path"""
+    return import_knowledge_path(
+        embedding_api_key,
+        embedding_url,
+        embedding_interface_format,
+        embedding_model_name,
+        file_path,
+        filepath,
+        log_callback=log_callback
+    )
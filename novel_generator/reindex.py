@@ -0,0 +1,361 @@
+#novel_generator/reindex.py
+# -*- coding: utf-8 -*-
+"""
+从定稿文件重建向量库（rebuild_vector_store）
+
+遍历 chapters/chapter_N.txt 与 volume_N_summary.txt，用与定稿相同的切分方式和元数据
+（chapter / volume / doc_type / chunk / content_hash，确定性分块 ID）写入一个全新的 collection：
+- 新库建在 vectorstore.rebuild/ 下，全部写完后才与 vectorstore/ 互换，重建失败或中断时旧库不受影响；
+  互换前等待其他线程归还当前库的句柄（最长 AUTONOVEL_REINDEX_SWAP_TIMEOUT 秒，默认60），超时则不替换；
+- 分块按 AUTONOVEL_REINDEX_BATCH（默认256）个一批，由 AUTONOVEL_REINDEX_WORKERS（默认2）个线程并发 embedding 写入；
+- 中断后再次重建会复用 vectorstore.rebuild/ 中内容哈希一致的分块，只补齐剩余部分
+  （Embedding 接口或模型变化时丢弃旧进度重新开始）；
+- 旧库中章节/卷摘要以外的文档（导入的知识库，含旧版没有元数据的文档）会用新的 Embedding
+  重新向量化后一并迁入，并标记 doc_type=knowledge。
+
+用于切换 Embedding 模型、修复损坏的向量库或清理重复文档。
+"""
+import os
+import re
+import json
+import time
+import shutil
+import logging
+import threading
+from typing import Callable, Optional
+from langchain.docstore.document import Document
+from core.utils.file_utils import read_file, get_log_file_path
+from core.utils.step_graph import Step, default_step_workers, run_step_graph
+from core.utils.volume_utils import calculate_volume_ranges, get_volume_number
+from novel_generator.vectorstore_utils import (
+    build_chunk_documents,
+    close_store_dir,
+    exclusive_store_dir,
+    get_vectorstore_dir,
+    open_vector_store,
+)
+
+logging.basicConfig(
+    filename=get_log_file_path(),      # 日志文件名
+    filemode='a',            # 追加模式（'w' 会覆盖）
+    level=logging.INFO,      # 记录 INFO 及以上级别的日志
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+REINDEX_MAX_WORKERS = default_step_workers("AUTONOVEL_REINDEX_WORKERS", 2)
+REINDEX_BATCH = default_step_workers("AUTONOVEL_REINDEX_BATCH", 256)
+REBUILD_DIR_SUFFIX = ".rebuild"
+BACKUP_DIR_SUFFIX = ".old"
+MANIFEST_FILE_NAME = "reindex_manifest.json"
+# 替换向量库前等待其他线程归还当前库句柄的最长秒数
+try:
+    REINDEX_SWAP_TIMEOUT = float(os.getenv("AUTONOVEL_REINDEX_SWAP_TIMEOUT", "60"))
+except ValueError:
+    REINDEX_SWAP_TIMEOUT = 60.0
+
+_CHAPTER_FILE_RE = re.compile(r"^chapter_(\d+)\.txt$")
+_VOLUME_SUMMARY_RE = re.compile(r"^volume_(\d+)_summary\.txt$")
+_LEGACY_VOLUME_TITLE_RE = re.compile(r"^【第\d+卷总结】")
+# 扫描旧库时每次读取的文档数
+_SCAN_PAGE_SIZE = 1000
+
+
+def _numbered_files(directory: str, pattern) -> list:
+    """目录下匹配 pattern 的文件，按编号排序：[(编号, 路径)]"""
+    if not os.path.isdir(directory):
+        return []
+    files = []
+    for name in os.listdir(directory):
+        match = pattern.match(name)
+        if match:
+            files.append((int(match.group(1)), os.path.join(directory, name)))
+    return sorted(files)
+
+
+def _collect_documents(filepath: str, num_volumes: int, total_chapters: int):
+    """
+    按定稿时的规则切分全部章节与卷摘要
+
+    Returns:
+        (ids, docs, counts): counts 为 {"chapters", "volume_summaries"}
+    """
+    volume_ranges = None
+    if num_volumes > 1 and total_chapters > 0:
+        volume_ranges = calculate_volume_ranges(total_chapters, num_volumes)
+
+    ids, docs = [], []
+    counts = {"chapters": 0, "volume_summaries": 0}
+    for chapter_num, path in _numbered_files(os.path.join(filepath, "chapters"), _CHAPTER_FILE_RE):
+        text = read_file(path)
+        if not text.strip():
+            continue
+        volume_num = get_volume_number(chapter_num, volume_ranges) if volume_ranges else None
+        chunk_ids, chunk_docs = build_chunk_documents(text, chapter_num, volume_num, "chapter")
+        ids.extend(chunk_ids)
+        docs.extend(chunk_docs)
+        counts["chapters"] += 1
+
+    for volume_num, path in _numbered_files(filepath, _VOLUME_SUMMARY_RE):
+        text = read_file(path)
+        if not text.strip():
+            continue
+        # 与 finalize_volume 一致：带卷标题，以卷末章号作为章节标记
+        volume_end = volume_ranges[volume_num - 1][1] if volume_ranges and volume_num <= len(volume_ranges) else None
+        chunk_ids, chunk_docs = build_chunk_documents(
+            f"【第{volume_num}卷总结】\n{text}", volume_end, volume_num, "volume_summary"
+        )
+        ids.extend(chunk_ids)
+        docs.extend(chunk_docs)
+        counts["volume_summaries"] += 1
+    return ids, docs, counts
+
+
+def _is_rebuilt_chunk(content: str, metadata: dict) -> bool:
+    """章节/卷摘要分块会从定稿文件重新生成；旧版无 doc_type 的章节分块按 chapter/volume 元数据或卷摘要标题识别"""
+    doc_type = metadata.get("doc_type")
+    if doc_type:
+        return doc_type in ("chapter", "volume_summary")
+    return "chapter" in metadata or "volume" in metadata or bool(_LEGACY_VOLUME_TITLE_RE.match(content))
+
+
+def _knowledge_documents(embedding_adapter, filepath: str, log):
+    """
+    读出旧库中需要迁移的知识库分块（只取文本与元数据，向量在新库中重新计算）
+
+    除章节/卷摘要分块外的文档都视为知识库内容，包括旧版导入时没有任何元数据的文档，
+    迁移后统一标记 doc_type="knowledge"。
+    """
+    if not os.path.exists(get_vectorstore_dir(filepath)):
+        return [], []
+    ids, docs = [], []
+    try:
+        with open_vector_store(embedding_adapter, filepath) as store:
+            if not store:
+                return [], []
+            offset = 0
+            while True:
+                results = store._collection.get(
+                    include=["documents", "metadatas"], limit=_SCAN_PAGE_SIZE, offset=offset
+                )
+                page_ids = results.get("ids") or []
+                documents = results.get("documents") or []
+                metadatas = results.get("metadatas") or []
+                for i, doc_id in enumerate(page_ids):
+                    content = (documents[i] if i < len(documents) else None) or ""
+                    metadata = dict((metadatas[i] if i < len(metadatas) else None) or {})
+                    if not content.strip() or _is_rebuilt_chunk(content, metadata):
+                        continue
+                    metadata["doc_type"] = "knowledge"
+                    ids.append(doc_id)
+                    docs.append(Document(page_content=content, metadata=metadata))
+                if len(page_ids) < _SCAN_PAGE_SIZE:
+                    break
+                offset += len(page_ids)
+    except Exception as e:
+        log(f"⚠️ 读取旧向量库中的知识库分块失败，需在重建后重新导入知识库: {e}")
+        return [], []
+    return ids, docs
+
+
+def _recover_interrupted_swap(store_dir: str):
+    """上次互换在两次改名之间中断时，把备份的旧库恢复回来"""
+    backup_dir = store_dir + BACKUP_DIR_SUFFIX
+    if os.path.exists(backup_dir) and not os.path.exists(store_dir):
+        os.replace(backup_dir, store_dir)
+        logging.warning(f"Restored vector store from interrupted swap: {backup_dir}")
+
+
+def _swap_in(rebuild_dir: str, store_dir: str, timeout: float = None) -> bool:
+    """
+    用重建好的目录替换当前向量库（旧库先改名为备份，替换成功后删除）
+
+    当前库仍被其他线程借用时最多等待 timeout 秒（默认 REINDEX_SWAP_TIMEOUT），
+    仍未归还则放弃替换并返回 False，重建目录与进度清单原样保留。
+    """
+    with exclusive_store_dir(store_dir, REINDEX_SWAP_TIMEOUT if timeout is None else timeout) as idle:
+        if not idle:
+            return False
+        os.remove(os.path.join(rebuild_dir, MANIFEST_FILE_NAME))
+        backup_dir = store_dir + BACKUP_DIR_SUFFIX
+        if os.path.exists(backup_dir):
+            shutil.rmtree(backup_dir)
+        if os.path.exists(store_dir):
+            os.replace(store_dir, backup_dir)
+        try:
+            os.replace(rebuild_dir, store_dir)
+        except OSError:
+            if os.path.exists(backup_dir):
+                os.replace(backup_dir, store_dir)
+            raise
+    shutil.rmtree(backup_dir, ignore_errors=True)
+    return True
+
+
+def _prepare_rebuild_dir(rebuild_dir: str, fingerprint: dict, log):
+    """准备（或续用）重建目录；上次进度对应的 Embedding 配置不同则清空重来"""
+    manifest_path = os.path.join(rebuild_dir, MANIFEST_FILE_NAME)
+    if os.path.exists(rebuild_dir):
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                previous = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            previous = None
+        if previous != fingerprint:
+            log("▶ 上次未完成的重建使用了不同的 Embedding 配置，丢弃旧进度")
+            close_store_dir(rebuild_dir)
+            shutil.rmtree(rebuild_dir)
+
+    os.makedirs(rebuild_dir, exist_ok=True)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(fingerprint, f, ensure_ascii=False)
+
+
+def rebuild_vector_store(
+    embedding_api_key: str,
+    embedding_url: str,
+    embedding_interface_format: str,
+    embedding_model_name: str,
+    filepath: str,
+    num_volumes: int = 0,
+    total_chapters: int = 0,
+    log_callback: Optional[Callable[[str], None]] = None,
+    progress_callback: Optional[Callable[[str, float], None]] = None,
+    max_workers: Optional[int] = None,
+    batch_size: Optional[int] = None,
+) -> dict:
+    """
+    从定稿章节与卷摘要重建向量库，完成后原子替换 vectorstore/
+
+    Args:
+        filepath: 小说保存路径
+        num_volumes / total_chapters: 分卷参数（用于计算 volume 元数据，不分卷时传0）
+        log_callback: 日志输出函数
+        progress_callback: 进度回调 (stage, 0~1)
+        max_workers: 并发 embedding 的批次数（默认 REINDEX_MAX_WORKERS）
+        batch_size: 每批分块数（默认 REINDEX_BATCH）
+
+    Returns:
+        dict: status（"ok" / "failed" / "empty"）、chapters、volume_summaries、knowledge、
+        chunks（分块总数）、embedded（本次 embedding 的分块数）、reused（续用的分块数）、
+        failed_batches、seconds、chunks_per_second
+    """
+    def gui_log(msg):
+        if log_callback:
+            log_callback(msg)
+        logging.info(msg)
+
+    started = time.monotonic()
+    store_dir = get_vectorstore_dir(filepath)
+    rebuild_dir = store_dir + REBUILD_DIR_SUFFIX
+    _recover_interrupted_swap(store_dir)
+
+    from core.adapters.embedding_adapters import create_embedding_adapter
+    embedding_adapter = create_embedding_adapter(
+        embedding_interface_format,
+        embedding_api_key,
+        embedding_url if embedding_url else "http://localhost:11434/api",
+        embedding_model_name
+    )
+
+    ids, docs, counts = _collect_documents(filepath, num_volumes, total_chapters)
+    knowledge_ids, knowledge_docs = _knowledge_documents(embedding_adapter, filepath, gui_log)
+    ids.extend(knowledge_ids)
+    docs.extend(knowledge_docs)
+    summary = dict(
+        counts, knowledge=len(knowledge_ids), chunks=len(ids), embedded=0, reused=0,
+        failed_batches=0, seconds=0.0, chunks_per_second=0.0, status="ok"
+    )
+    gui_log(
+        f"▶ 重建向量库：{counts['chapters']} 章、{counts['volume_summaries']} 份卷摘要、"
+        f"{len(knowledge_ids)} 个知识库分块，共 {len(ids)} 块"
+    )
+    if not ids:
+        gui_log("⚠️ 没有可索引的定稿章节或卷摘要，向量库保持不变。")
+        summary["status"] = "empty"
+        return summary
+
+    fingerprint = {"interface_format": embedding_interface_format, "model_name": embedding_model_name}
+    _prepare_rebuild_dir(rebuild_dir, fingerprint, gui_log)
+    with open_vector_store(embedding_adapter, store_dir=rebuild_dir, create=True) as store:
+        if not store:
+            gui_log("❌ 重建目录的向量库打开失败，当前向量库未替换。")
+            summary["status"] = "failed"
+            return summary
+        collection = store._collection
+        existing_results = collection.get(include=["metadatas"])
+        existing = {
+            doc_id: (metadata or {}).get("content_hash")
+            for doc_id, metadata in zip(existing_results.get("ids") or [], existing_results.get("metadatas") or [])
+        }
+        expected = set(ids)
+        stale_ids = [doc_id for doc_id in existing if doc_id not in expected]
+        if stale_ids:
+            collection.delete(ids=stale_ids)
+
+        todo = [
+            (doc_id, doc) for doc_id, doc in zip(ids, docs)
+            if doc_id not in existing or existing[doc_id] != doc.metadata.get("content_hash")
+        ]
+        summary["reused"] = len(ids) - len(todo)
+        if summary["reused"]:
+            gui_log(f"↻ 续用上次重建已写入的 {summary['reused']} 块，剩余 {len(todo)} 块")
+
+        batch_size = max(1, batch_size or REINDEX_BATCH)
+        batches = [todo[i:i + batch_size] for i in range(0, len(todo), batch_size)]
+        write_lock = threading.Lock()
+        embed_started = time.monotonic()
+
+        def make_step(number, batch):
+            def run(step_log):
+                texts = [doc.page_content for _, doc in batch]
+                embeddings = store.embeddings.embed_documents(texts) or []
+                if len(embeddings) != len(texts) or not all(embeddings):
+                    raise RuntimeError(f"第 {number} 批 embedding 失败")
+                with write_lock:
+                    collection.upsert(
+                        ids=[doc_id for doc_id, _ in batch],
+                        embeddings=embeddings,
+                        documents=texts,
+                        metadatas=[doc.metadata for _, doc in batch],
+                    )
+                    summary["embedded"] += len(batch)
+                    embedded = summary["embedded"]
+                rate = embedded / max(time.monotonic() - embed_started, 1e-6)
+                gui_log(f"   已写入 {embedded + summary['reused']}/{len(ids)} 块（{rate:.1f} 块/秒）")
+                if progress_callback:
+                    progress_callback("reindex", (embedded + summary["reused"]) / len(ids))
+            return Step(name=f"batch_{number}", func=run, label=f"第 {number} 批")
+
+        results = run_step_graph(
+            [make_step(number, batch) for number, batch in enumerate(batches, 1)],
+            max_workers=max_workers or REINDEX_MAX_WORKERS,
+            log=gui_log
+        )
+        summary["failed_batches"] = sum(1 for error in results.values() if error is not None)
+        elapsed = time.monotonic() - embed_started
+        summary["chunks_per_second"] = round(summary["embedded"] / elapsed, 2) if summary["embedded"] and elapsed > 0 else 0.0
+    # 重建目录即将被改名替换，先关闭其句柄（借用已归还，立即释放）
+    close_store_dir(rebuild_dir)
+
+    summary["seconds"] = round(time.monotonic() - started, 2)
+    if summary["failed_batches"]:
+        summary["status"] = "failed"
+        gui_log(
+            f"❌ {summary['failed_batches']} 批分块写入失败，当前向量库未替换；"
+            f"再次重建会从 {os.path.basename(rebuild_dir)} 中已写入的进度继续。"
+        )
+        return summary
+
+    if not _swap_in(rebuild_dir, store_dir):
+        summary["status"] = "failed"
+        gui_log(
+            f"❌ 当前向量库仍在被其他任务使用，未替换；"
+            f"再次重建会直接复用 {os.path.basename(rebuild_dir)} 中已写入的分块。"
+        )
+        return summary
+    gui_log(
+        f"✅ 向量库重建完成：共 {len(ids)} 块，本次 embedding {summary['embedded']} 块，"
+        f"耗时 {summary['seconds']} 秒（{summary['chunks_per_second']} 块/秒）"
+    )
+    return summary
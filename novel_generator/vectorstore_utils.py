@@ -6,15 +6,18 @@
 import os
 import logging
 import traceback
-import nltk
 import numpy as np
 import re
-import ssl
 import requests
 import warnings
+import gc
 import hashlib
+import threading
+import time
+from contextlib import contextmanager
 from langchain_chroma import Chroma
 from core.utils.file_utils import get_log_file_path
+from core.utils.text_splitter import split_text
 logging.basicConfig(
     filename=get_log_file_path(),      # 日志文件名
     filemode='a',            # 追加模式（'w' 会覆盖）
@@ -28,6 +31,7 @@ os.environ["TOKENIZERS_PARALLELISM"] = "false"  # 禁用tokenizer并行警告
 
 from chromadb.config import Settings
 from langchain.docstore.document import Document
+from langchain.embeddings.base import Embeddings as LCEmbeddings
 from sklearn.metrics.pairwise import cosine_similarity
 from .common import call_with_retry
 
@@ -35,264 +39,264 @@ def get_vectorstore_dir(filepath: str) -> str:
     """获取 vectorstore 路径"""
     return os.path.join(filepath, "vectorstore")
 
-def clear_vector_store(filepath: str) -> bool:
-    """清空 清空向量库"""
-    import shutil
-    store_dir = get_vectorstore_dir(filepath)
-    if not os.path.exists(store_dir):
-        logging.info("No vector store found to clear.")
-        return False
+
+class LCEmbeddingWrapper(LCEmbeddings):
+    """
+    把项目的 embedding 适配器包装为 langchain Embeddings（带重试）。
+    create_embedding_adapter 返回的适配器自带持久化缓存，重试与实际请求都只涉及缓存未命中的文本。
+    """
+    def __init__(self, embedding_adapter):
+        self.embedding_adapter = embedding_adapter
+
+    def embed_documents(self, texts):
+        return call_with_retry(
+            func=self.embedding_adapter.embed_documents,
+            max_retries=3,
+            fallback_return=[],
+            texts=texts
+        )
+
+    def embed_query(self, query: str):
+        res = call_with_retry(
+            func=self.embedding_adapter.embed_query,
+            max_retries=3,
+            fallback_return=[],
+            query=query
+        )
+        return res
+
+
+# 已打开的向量库句柄注册表：store_dir -> _StoreEntry
+# 一个章节周期内会多次访问同一向量库，复用句柄避免反复打开 SQLite/HNSW 文件；
+# 句柄通过 open_vector_store 借用并计数，关闭时只有在没有任何借用者后才真正释放
+class _StoreEntry:
+    def __init__(self, key, store, chroma_embedding):
+        self.key = key
+        self.store = store
+        self.chroma_embedding = chroma_embedding
+        self.refs = 0
+
+
+_open_stores = {}
+# 已被关闭（移出注册表）但仍有借用者的句柄
+_closing_entries = []
+_release_pending = False
+_open_stores_lock = threading.RLock()
+# 有借用者归还句柄时通知（等待某个目录空闲后再改名/删除）
+_store_returned = threading.Condition(_open_stores_lock)
+
+
+def _store_key(store_dir: str) -> str:
+    return os.path.abspath(store_dir)
+
+
+def _release_idle_clients():
+    """
+    调用方需持有 _open_stores_lock。
+
+    chromadb 同一路径的客户端共享同一个 System，且只提供进程级的
+    SharedSystemClient.clear_system_cache() 来释放；因此等到所有句柄都没有借用者时，
+    丢弃全部缓存句柄并清空 chromadb 的 System 缓存，未被引用的 System 随之回收并关闭文件。
+    之后再访问的项目会重新打开句柄。
+    """
+    global _release_pending
+    _closing_entries[:] = [entry for entry in _closing_entries if entry.refs]
+    if not _release_pending or _closing_entries or any(entry.refs for entry in _open_stores.values()):
+        return
+    _open_stores.clear()
+    _release_pending = False
     try:
-        shutil.rmtree(store_dir)
-        logging.info(f"Vector store directory '{store_dir}' removed.")
-        return True
+        from chromadb.api.client import SharedSystemClient
+        SharedSystemClient.clear_system_cache()
     except Exception as e:
-        logging.error(f"无法删除向量库文件夹，请关闭程序后手动删除 {store_dir}。\n {str(e)}")
-        traceback.print_exc()
-        return False
+        logging.warning(f"Release chroma clients failed: {e}")
+    gc.collect()
+
+
+def close_store_dir(store_dir: str):
+    """关闭 store_dir 的句柄：移出注册表，待所有借用者归还后释放（目录可被删除/替换）"""
+    global _release_pending
+    with _open_stores_lock:
+        entry = _open_stores.pop(_store_key(store_dir), None)
+        if entry is None:
+            return
+        if entry.refs:
+            _closing_entries.append(entry)
+        _release_pending = True
+        _release_idle_clients()
+    logging.info(f"Vector store handle closed: {store_dir}")
+
+
+def _store_borrowed(key: str) -> bool:
+    """调用方需持有 _open_stores_lock"""
+    entry = _open_stores.get(key)
+    if entry is not None and entry.refs:
+        return True
+    return any(entry.key == key and entry.refs for entry in _closing_entries)
 
 
-def check_chapter_in_vectorstore(embedding_adapter, filepath: str, chapter_num: int) -> bool:
+@contextmanager
+def exclusive_store_dir(store_dir: str, timeout: float):
     """
-    检查特定章节是否已存在于向量库中（用于避免重复定稿）
+    独占 store_dir：等待其借用者全部归还后关闭句柄，with 块内不会有新的借用开始
 
-    策略：
-    1) 优先使用元数据严格匹配：chapter=chapter_num 且 doc_type="chapter"。
-    2) 向后兼容：若 doc_type 不存在或查询失败，则按 chapter=chapter_num 获取候选，
-       通过 metadata/documents 排除卷摘要（识别以 "【第N卷总结】" 开头的内容）。
-    3) 任何异常均不视为已存在（避免误报）。
+    用于改名/替换向量库目录。with 块内持有注册表锁，其他线程打开任何向量库都会等待，块内只应做短暂的文件操作。
+
+    Yields:
+        bool: 是否已独占；超过 timeout 秒仍有借用者时为 False，此时不应改动目录
     """
-    try:
-        store = load_vector_store(embedding_adapter, filepath)
-        if not store:
-            return False
+    key = _store_key(store_dir)
+    deadline = time.monotonic() + timeout
+    with _store_returned:
+        while _store_borrowed(key):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logging.warning(f"Vector store still borrowed after {timeout}s: {store_dir}")
+                yield False
+                return
+            _store_returned.wait(remaining)
+        close_store_dir(store_dir)
+        yield True
 
-        collection = store._collection
 
-        # 1) 严格匹配（有 doc_type 元数据的新版向量库）
-        try:
-            results = collection.get(where={"chapter": chapter_num, "doc_type": "chapter"})
-            if results and results.get("ids"):
-                logging.info(
-                    f"Chapter {chapter_num} found in vector store with doc_type=chapter, count={len(results['ids'])}."
-                )
-                return True
-        except Exception as e:
-            # 旧版向量库或驱动不支持 doc_type 过滤，进入降级逻辑
-            logging.info(f"Metadata filter (doc_type) not available or failed: {e}")
+def close_vector_store(filepath: str):
+    """关闭指定项目的向量库句柄（切换项目、清空/重建向量库时调用）"""
+    close_store_dir(get_vectorstore_dir(filepath))
 
-        # 2) 向后兼容：按 chapter 获取候选，再排除卷摘要
-        try:
-            results = collection.get(where={"chapter": chapter_num})
-            if not results or not results.get("ids"):
-                logging.info(f"No documents found for chapter={chapter_num} in fallback mode.")
-                return False
 
-            ids = results.get("ids", [])
-            metadatas = results.get("metadatas", []) or []
-            documents = results.get("documents", []) or []
-
-            # 若任意文档显式标注为 chapter，则判定为已存在
-            for i, _ in enumerate(ids):
-                md = metadatas[i] if i < len(metadatas) else {}
-                dt = (md or {}).get("doc_type")
-                if dt == "chapter":
-                    logging.info(
-                        f"Chapter {chapter_num} found in vector store (legacy fallback with explicit doc_type=chapter)."
-                    )
-                    return True
-            
-            # 无显式 doc_type 的情况下：若存在卷摘要特征，则判定为未定稿（避免误报）
-            has_volume_summary_marker = False
-            for i, _ in enumerate(ids):
-                md = metadatas[i] if i < len(metadatas) else {}
-                dt = (md or {}).get("doc_type")
-                if dt is not None:
-                    if dt == "volume_summary":
-                        has_volume_summary_marker = True
-                        break
-                else:
-                    content = documents[i] if i < len(documents) else ""
-                    if re.match(r"^【第\d+卷总结】", str(content)):
-                        has_volume_summary_marker = True
-                        break
-            
-            if has_volume_summary_marker:
-                logging.info(
-                    f"Volume summary detected for chapter={chapter_num} (legacy fallback); treat as not finalized."
-                )
-                return False
-            
-            # 未检测到卷摘要特征，保守认为该章节存在
-            logging.info(
-                f"Chapter {chapter_num} found in vector store (legacy fallback, no volume summary markers)."
-            )
-            return True
-        except Exception as e:
-            logging.warning(f"Fallback chapter-only query failed: {e}")
-            return False
+def close_all_vector_stores():
+    """关闭所有向量库句柄（程序退出时调用）"""
+    global _release_pending
+    with _open_stores_lock:
+        for entry in _open_stores.values():
+            if entry.refs:
+                _closing_entries.append(entry)
+        _open_stores.clear()
+        _release_pending = True
+        _release_idle_clients()
 
-    except Exception as e:
-        logging.warning(f"Failed to check chapter in vector store: {e}", exc_info=True)
-        return False
-def init_vector_store(embedding_adapter, texts=None, filepath: str = None, documents=None):
+
+@contextmanager
+def open_vector_store(embedding_adapter, filepath: str = None, create: bool = False, store_dir: str = None):
     """
-    在 filepath 下创建/加载一个 Chroma 向量库并插入 texts 或 documents。
-    如果Embedding失败，则返回 None，不中断任务。
+    借用项目向量库句柄（with 块结束时归还）
 
     Args:
-        embedding_adapter: Embedding 适配器
-        texts: 文本列表（如果 documents 未提供）
+        embedding_adapter: Embedding 适配器（替换缓存句柄当前使用的适配器）
         filepath: 小说保存路径
-        documents: Document 对象列表（优先使用，可包含元数据）
-    """
-    from langchain.embeddings.base import Embeddings as LCEmbeddings
+        create: 向量库不存在时是否创建空库；为 False 时产出 None
+        store_dir: 直接指定向量库目录（如重建时的临时目录），优先于 filepath
 
-    store_dir = get_vectorstore_dir(filepath)
-    os.makedirs(store_dir, exist_ok=True)
+    Yields:
+        Chroma 或 None（不存在或加载失败）
+    """
+    store_dir = store_dir or get_vectorstore_dir(filepath)
+    key = _store_key(store_dir)
+    if not os.path.exists(store_dir):
+        if not create:
+            logging.info("Vector store not found. Will return None.")
+            # 目录已被外部删除，丢弃失效句柄
+            close_store_dir(store_dir)
+            yield None
+            return
+        os.makedirs(store_dir, exist_ok=True)
+
+    with _open_stores_lock:
+        entry = _open_stores.get(key)
+        if entry is None:
+            try:
+                chroma_embedding = LCEmbeddingWrapper(embedding_adapter)
+                entry = _StoreEntry(key, open_chroma_store(store_dir, chroma_embedding), chroma_embedding)
+                _open_stores[key] = entry
+            except Exception as e:
+                logging.warning(f"Failed to load vector store: {e}")
+                traceback.print_exc()
+        if entry is not None:
+            entry.chroma_embedding.embedding_adapter = embedding_adapter
+            entry.refs += 1
+
+    if entry is None:
+        yield None
+        return
+    try:
+        yield entry.store
+    finally:
+        with _open_stores_lock:
+            entry.refs -= 1
+            _release_idle_clients()
+            _store_returned.notify_all()
 
-    # 优先使用 documents，否则从 texts 创建
-    if documents is None:
-        if texts is None:
-            logging.error("Both texts and documents are None. Cannot init vector store.")
-            return None
-        documents = [Document(page_content=str(t)) for t in texts]
 
+def clear_vector_store(filepath: str) -> bool:
+    """清空 清空向量库"""
+    import shutil
+    close_vector_store(filepath)
+    store_dir = get_vectorstore_dir(filepath)
+    if not os.path.exists(store_dir):
+        logging.info("No vector store found to clear.")
+        return False
     try:
-        class LCEmbeddingWrapper(LCEmbeddings):
-            def embed_documents(self, texts):
-                return call_with_retry(
-                    func=embedding_adapter.embed_documents,
-                    max_retries=3,
-                    fallback_return=[],
-                    texts=texts
-                )
-            def embed_query(self, query: str):
-                res = call_with_retry(
-                    func=embedding_adapter.embed_query,
-                    max_retries=3,
-                    fallback_return=[],
-                    query=query
-                )
-                return res
-
-        chroma_embedding = LCEmbeddingWrapper()
-        vectorstore = Chroma.from_documents(
-            documents,
-            embedding=chroma_embedding,
-            persist_directory=store_dir,
-            client_settings=Settings(anonymized_telemetry=False),
-            collection_name="novel_collection"
-        )
-        return vectorstore
+        shutil.rmtree(store_dir)
+        logging.info(f"Vector store directory '{store_dir}' removed.")
+        return True
     except Exception as e:
-        logging.warning(f"Init vector store failed: {e}")
+        logging.error(f"无法删除向量库文件夹，请关闭程序后手动删除 {store_dir}。\n {str(e)}")
         traceback.print_exc()
-        return None
+        return False
 
-def load_vector_store(embedding_adapter, filepath: str):
+
+def chunk_id(doc_type: str, number: int, index: int) -> str:
     """
-    读取已存在的 Chroma 向量库。若不存在则返回 None。
-    如果加载失败（embedding 或IO问题），则返回 None。
+    分块的确定性 ID：同一章节（或卷摘要）的第 index 块始终对应同一个 ID，
+    重复定稿时据此原地更新，而不是追加重复文档。
+    number 对章节为章节号，对卷摘要为卷号。
     """
-    from langchain.embeddings.base import Embeddings as LCEmbeddings
-    store_dir = get_vectorstore_dir(filepath)
-    if not os.path.exists(store_dir):
-        logging.info("Vector store not found. Will return None.")
-        return None
+    return f"{doc_type}:{number}:{index}"
 
-    try:
-        class LCEmbeddingWrapper(LCEmbeddings):
-            def embed_documents(self, texts):
-                return call_with_retry(
-                    func=embedding_adapter.embed_documents,
-                    max_retries=3,
-                    fallback_return=[],
-                    texts=texts
-                )
-            def embed_query(self, query: str):
-                res = call_with_retry(
-                    func=embedding_adapter.embed_query,
-                    max_retries=3,
-                    fallback_return=[],
-                    query=query
-                )
-                return res
-
-        chroma_embedding = LCEmbeddingWrapper()
-        return Chroma(
-            persist_directory=store_dir,
-            embedding_function=chroma_embedding,
-            client_settings=Settings(anonymized_telemetry=False),
-            collection_name="novel_collection"
-        )
-    except Exception as e:
-        logging.warning(f"Failed to load vector store: {e}")
-        traceback.print_exc()
-        return None
 
-def delete_volume_summary_from_store(embedding_adapter, filepath: str, volume_num: int):
-    """
-    从向量库中删除指定卷的摘要（避免重复存储）
+def _content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8", errors="ignore")).hexdigest()
 
-    Args:
-        embedding_adapter: Embedding 适配器
-        filepath: 小说保存路径
-        volume_num: 要删除的卷号
+
+def check_chapter_in_vectorstore(embedding_adapter, filepath: str, chapter_num: int) -> bool:
     """
-    store = load_vector_store(embedding_adapter, filepath)
-    if not store:
-        logging.info("Vector store not found, skip deleting volume summary.")
-        return
+    检查特定章节是否已存在于向量库中（用于提示重复定稿）
 
+    按确定性 ID 精确查找该章第一块；旧版向量库中的随机 ID 文档按
+    chapter=chapter_num 且 doc_type="chapter" 的元数据精确匹配。
+    任何异常均不视为已存在（避免误报）。
+    """
     try:
-        # 获取所有文档
-        collection = store._collection
-
-        # 优先使用元数据过滤（新版向量库）
-        try:
-            results = collection.get(
-                where={"volume": volume_num, "doc_type": "volume_summary"}
-            )
+        with open_vector_store(embedding_adapter, filepath) as store:
+            if not store:
+                return False
 
-            if results and results.get('ids'):
-                ids_to_delete = results['ids']
-                if ids_to_delete:
-                    collection.delete(ids=ids_to_delete)
-                    logging.info(f"Deleted {len(ids_to_delete)} volume {volume_num} summary documents using metadata filter.")
-                    return
-                else:
-                    logging.info(f"No volume summary found for volume {volume_num} using metadata filter.")
-                    return
-        except Exception as meta_error:
-            # 降级：旧版向量库没有doc_type字段，使用内容匹配
-            logging.info(f"Metadata filter failed (legacy vector store?), falling back to content matching: {meta_error}")
-
-            results = collection.get(
-                where={"volume": volume_num}
-            )
+            collection = store._collection
+            results = collection.get(ids=[chunk_id("chapter", chapter_num, 0)], include=[])
+            if results and results.get("ids"):
+                logging.info(f"Chapter {chapter_num} found in vector store by chunk id.")
+                return True
 
-            if not results or not results.get('ids'):
-                logging.info(f"No existing volume {volume_num} summary found in vector store.")
-                return
+            results = collection.get(where={"$and": [{"chapter": chapter_num}, {"doc_type": "chapter"}]}, include=[])
+            if results and results.get("ids"):
+                logging.info(
+                    f"Chapter {chapter_num} found in vector store (legacy ids), count={len(results['ids'])}."
+                )
+                return True
+            return False
+    except Exception as e:
+        logging.warning(f"Failed to check chapter in vector store: {e}", exc_info=True)
+        return False
 
-            # 通过内容特征识别卷摘要
-            ids_to_delete = []
-            for i, doc_id in enumerate(results['ids']):
-                content = results['documents'][i] if 'documents' in results else ""
-                # 识别卷摘要标记
-                if content.startswith(f"【第{volume_num}卷总结】"):
-                    ids_to_delete.append(doc_id)
-
-            if ids_to_delete:
-                collection.delete(ids=ids_to_delete)
-                logging.info(f"Deleted {len(ids_to_delete)} old volume {volume_num} summary documents using content matching (legacy mode).")
-            else:
-                logging.info(f"No volume summary documents found for volume {volume_num}.")
+def open_chroma_store(store_dir: str, chroma_embedding) -> Chroma:
+    """打开（不存在时创建）store_dir 下的项目 collection（不经过句柄注册表，一般应使用 open_vector_store）"""
+    return Chroma(
+        persist_directory=store_dir,
+        embedding_function=chroma_embedding,
+        client_settings=Settings(anonymized_telemetry=False),
+        collection_name="novel_collection"
+    )
 
-    except Exception as e:
-        logging.warning(f"Failed to delete volume summary from vector store: {e}")
-        traceback.print_exc()
 
 def split_by_length(text: str, max_length: int = 500):
     """按照 max_length 切分文本"""
@@ -310,46 +314,91 @@ def split_by_length(text: str, max_length: int = 500):
 def split_text_for_vectorstore(chapter_text: str, max_length: int = 500, similarity_threshold: float = 0.7):
     """
     对新的章节文本进行分段后,再用于存入向量库。
-    强依赖 NLTK 分句：程序启动与此处都会确保 punkt / punkt_tab 存在；若缺失则尝试下载。
-    下载失败将抛出异常以便用户修复网络/代理。
+    按中文句末标点分句（core.utils.text_splitter），再按长度合并为分块，保留原文空白与换行。
     """
     if not chapter_text.strip():
         return []
+    # 直接按长度分段,不做相似度合并
+    return split_text(chapter_text, max_length=max_length)
 
-    # Ensure NLTK resources are available (punkt / punkt_tab)
-    from scripts.setup.nltk_setup import ensure_nltk_punkt_resources
-    ensure_nltk_punkt_resources()
 
-    import nltk
-    sentences = nltk.sent_tokenize(chapter_text)
-    if not sentences:
-        return []
+def _existing_chunks(collection, doc_type: str, chapter_num: int = None, volume_num: int = None) -> dict:
+    """
+    取出同一章节（或同一卷摘要）已入库的全部分块：id -> content_hash。
+    旧版随机 ID 的文档没有 content_hash，值为 None，会在本次更新中被替换掉。
+    卷摘要还会带上更早版本写入的、没有 doc_type 的旧卷摘要分块（按标题识别），
+    使其在首次重新写入该卷摘要时被清理。
+    """
+    if doc_type == "volume_summary":
+        where = {"$and": [{"volume": volume_num}, {"doc_type": doc_type}]}
+    else:
+        where = {"$and": [{"chapter": chapter_num}, {"doc_type": doc_type}]}
+    results = collection.get(where=where, include=["metadatas"])
+    ids = results.get("ids") or []
+    metadatas = results.get("metadatas") or []
+    existing = {
+        doc_id: ((metadatas[i] if i < len(metadatas) else None) or {}).get("content_hash")
+        for i, doc_id in enumerate(ids)
+    }
+    if doc_type == "volume_summary":
+        for doc_id in _legacy_volume_summary_ids(collection, volume_num):
+            existing.setdefault(doc_id, None)
+    return existing
+
+
+def _legacy_volume_summary_ids(collection, volume_num: int) -> list:
+    """旧版向量库中没有 doc_type 的卷摘要分块（内容以【第N卷总结】开头）"""
+    results = collection.get(where={"volume": volume_num}, include=["documents", "metadatas"])
+    ids = results.get("ids") or []
+    documents = results.get("documents") or []
+    metadatas = results.get("metadatas") or []
+    title = f"【第{volume_num}卷总结】"
+    return [
+        doc_id for i, doc_id in enumerate(ids)
+        if "doc_type" not in ((metadatas[i] if i < len(metadatas) else None) or {})
+        and ((documents[i] if i < len(documents) else None) or "").startswith(title)
+    ]
+
+
+def build_chunk_documents(text: str, chapter_num: int = None, volume_num: int = None, doc_type: str = "chapter"):
+    """
+    切分章节（或卷摘要）文本并构建带元数据的 Document
 
-    # 直接按长度分段,不做相似度合并
-    final_segments = []
-    current_segment = []
-    current_length = 0
-
-    for sentence in sentences:
-        sentence_length = len(sentence)
-        if current_length + sentence_length > max_length:
-            if current_segment:
-                final_segments.append(" ".join(current_segment))
-            current_segment = [sentence]
-            current_length = sentence_length
-        else:
-            current_segment.append(sentence)
-            current_length += sentence_length
+    Returns:
+        (ids, docs): ids 为确定性分块 ID 列表（章节号/卷号缺失时为 None）
+    """
+    splitted_texts = split_text_for_vectorstore(text)
+
+    # 构建元数据字典
+    metadata = {}
+    if chapter_num is not None:
+        metadata["chapter"] = chapter_num
+    if volume_num is not None:
+        metadata["volume"] = volume_num
+    metadata["doc_type"] = doc_type  # 添加文档类型标记
+
+    # 卷摘要按卷号定位，章节按章节号定位；都缺失时无法生成确定性 ID
+    id_number = volume_num if doc_type == "volume_summary" else chapter_num
+    if id_number is None:
+        ids = None
+    else:
+        ids = [chunk_id(doc_type, id_number, i) for i in range(len(splitted_texts))]
+
+    docs = []
+    for i, chunk in enumerate(splitted_texts):
+        chunk_metadata = dict(metadata, chunk=i, content_hash=_content_hash(str(chunk)))
+        docs.append(Document(page_content=str(chunk), metadata=chunk_metadata))
+    return ids, docs
 
-    if current_segment:
-        final_segments.append(" ".join(current_segment))
 
-    return final_segments
 def update_vector_store(embedding_adapter, new_chapter: str, filepath: str, chapter_num: int = None, volume_num: int = None, doc_type: str = "chapter"):
     """
     将最新章节文本插入到向量库中。
     若库不存在则初始化；若初始化/更新失败，则跳过。
 
+    分块使用确定性 ID（见 chunk_id），重复定稿同一章节时按内容哈希比对：
+    未改动的分块跳过 embedding，改动的分块原地 upsert，多出来的旧分块删除。
+
     Args:
         embedding_adapter: Embedding 适配器
         new_chapter: 章节文本
@@ -358,52 +407,155 @@ def update_vector_store(embedding_adapter, new_chapter: str, filepath: str, chap
         volume_num: 卷号（用于分卷检索，可选）
         doc_type: 文档类型（"chapter" 或 "volume_summary"，默认 "chapter"）
     """
-    from core.utils.file_utils import read_file, clear_file_content, save_string_to_txt
-    splitted_texts = split_text_for_vectorstore(new_chapter)
-    if not splitted_texts:
+    ids, docs = build_chunk_documents(new_chapter, chapter_num, volume_num, doc_type)
+    if not docs:
         logging.warning("No valid text to insert into vector store. Skipping.")
         return
 
-    store = load_vector_store(embedding_adapter, filepath)
-    if not store:
-        logging.info("Vector store does not exist or failed to load. Initializing a new one for new chapter...")
+    with open_vector_store(embedding_adapter, filepath, create=True) as store:
+        if not store:
+            logging.warning("Vector store load failed, skip embedding.")
+            return
+        _upsert_chunks(store, ids, docs, chapter_num, volume_num, doc_type)
 
-        # 初始化时也需要添加元数据
-        metadata = {}
-        if chapter_num is not None:
-            metadata["chapter"] = chapter_num
-        if volume_num is not None:
-            metadata["volume"] = volume_num
-        metadata["doc_type"] = doc_type  # 添加文档类型标记
 
-        # 创建带元数据的文档
-        docs = [Document(page_content=str(t), metadata=metadata) for t in splitted_texts]
-        store = init_vector_store(embedding_adapter, filepath=filepath, documents=docs)
+def _upsert_chunks(store, ids, docs, chapter_num, volume_num, doc_type):
+    """按确定性 ID 与内容哈希增量写入一个章节（或卷摘要）的分块，ids 为 None 时直接追加"""
+    try:
+        if ids is None:
+            store.add_documents(docs)
+            logging.info(f"Vector store updated with metadata: chapter={chapter_num}, volume={volume_num}, doc_type={doc_type}")
+            return
 
-        if not store:
-            logging.warning("Init vector store failed, skip embedding.")
-        else:
-            logging.info(f"New vector store created successfully with metadata: chapter={chapter_num}, volume={volume_num}, doc_type={doc_type}")
-        return
+        collection = store._collection
+        existing = _existing_chunks(collection, doc_type, chapter_num, volume_num)
+
+        changed = [
+            (doc_id, doc) for doc_id, doc in zip(ids, docs)
+            if existing.get(doc_id) != doc.metadata["content_hash"]
+        ]
+        new_ids = set(ids)
+        stale_ids = [doc_id for doc_id in existing if doc_id not in new_ids]
+
+        if changed:
+            texts = [doc.page_content for _, doc in changed]
+            embeddings = store.embeddings.embed_documents(texts) or []
+            if len(embeddings) != len(texts) or not all(embeddings):
+                logging.warning("Embedding failed for some chunks, skip updating vector store.")
+                return
+            collection.upsert(
+                ids=[doc_id for doc_id, _ in changed],
+                embeddings=embeddings,
+                documents=texts,
+                metadatas=[doc.metadata for _, doc in changed],
+            )
+        if stale_ids:
+            collection.delete(ids=stale_ids)
 
-    try:
-        # 构建元数据字典
-        metadata = {}
-        if chapter_num is not None:
-            metadata["chapter"] = chapter_num
-        if volume_num is not None:
-            metadata["volume"] = volume_num
-        metadata["doc_type"] = doc_type  # 添加文档类型标记
-
-        # 创建带元数据的文档
-        docs = [Document(page_content=str(t), metadata=metadata) for t in splitted_texts]
-        store.add_documents(docs)
-
-        logging.info(f"Vector store updated with metadata: chapter={chapter_num}, volume={volume_num}, doc_type={doc_type}")
+        logging.info(
+            f"Vector store updated with metadata: chapter={chapter_num}, volume={volume_num}, doc_type={doc_type} "
+            f"(upserted={len(changed)}, unchanged={len(ids) - len(changed)}, deleted={len(stale_ids)})"
+        )
     except Exception as e:
         logging.warning(f"Failed to update vector store: {e}")
         traceback.print_exc()
 
+# 跨卷检索触发词（使用词边界匹配避免误触发）
+# 优化版关键词库：32个精选词汇，覆盖跨卷伏笔核心场景
+_CROSS_VOLUME_KEYWORDS = [
+    # === 角色背景类 ===
+    "起源", "身世", "师傅", "仇人",
+    "父亲", "母亲", "恩人", "师兄",
+
+    # === 物品类 ===
+    "宝物", "信物", "遗物", "神器", "遗迹",
+
+    # === 能力/技能类（玄幻向）===
+    "功法", "传承", "心法", "剑法",
+
+    # === 剧情伏笔类 ===
+    "预言", "诅咒", "秘密", "真相", "阴谋", "誓言",
+    "约定", "承诺", "宿命", "封印",
+
+    # === 关键事件类 ===
+    "惨案", "灭门", "叛变",
+
+    # === 时间引用类 ===
+    "初遇", "相识"
+]
+
+
+def _plan_volume_quotas(query: str, current_vol: int, adjusted_k: int) -> list:
+    """
+    分卷检索：当前卷优先 + 跨卷智能检索，返回 [(卷号, 条数), ...]
+    """
+    # 使用正则词边界匹配，避免子串误触发（如"起源于"、"秘密花园"）
+    needs_cross_volume_search = False
+    for kw in _CROSS_VOLUME_KEYWORDS:
+        # 构建词边界正则：前后必须是非汉字字符或字符串边界
+        pattern = rf'(?<![a-zA-Z0-9\u4e00-\u9fa5]){re.escape(kw)}(?![a-zA-Z0-9\u4e00-\u9fa5])'
+        if re.search(pattern, query):
+            needs_cross_volume_search = True
+            logging.info(f"检测到跨卷关键词 '{kw}' 在查询 '{query}' 中")
+            break
+
+    # 动态调整检索数量，保持总量恒定
+    if needs_cross_volume_search:
+        # 启用跨卷检索：减少当前卷检索量，为历史卷留出空间
+        # 总量控制：current_vol_k + prev_vol_k + historical_k = adjusted_k
+        historical_volumes_count = min(3, current_vol - 1)  # 最多回溯3卷
+        historical_k = min(historical_volumes_count, adjusted_k // 3)  # 历史卷占1/3
+        prev_vol_k = 1 if current_vol > 1 and adjusted_k > historical_k + 1 else 0
+        current_vol_k = max(1, adjusted_k - historical_k - prev_vol_k)
+
+        logging.info(f"跨卷检索分配: 当前卷{current_vol_k}条 + 前一卷{prev_vol_k}条 + 历史卷{historical_k}条 = 总计{adjusted_k}条")
+    else:
+        # 常规检索：当前卷为主 + 前一卷补充
+        current_vol_k = max(1, adjusted_k - 1)
+        prev_vol_k = 1 if current_vol > 1 else 0
+        historical_k = 0
+
+    # 策略1：当前卷优先；策略2：前一卷补充
+    quotas = [(current_vol, current_vol_k)]
+    if prev_vol_k > 0:
+        quotas.append((current_vol - 1, prev_vol_k))
+
+    # 策略3：跨卷关键词检索（历史卷均匀分配，每卷1条）
+    if needs_cross_volume_search and historical_k > 0:
+        for vol in range(max(1, current_vol - 3), current_vol - 1):
+            if historical_k <= 0:
+                break
+            quotas.append((vol, 1))
+            historical_k -= 1
+    return quotas
+
+
+def _query_collection(store, query_embeddings: list, n_results: int, where) -> list:
+    """
+    用预先计算好的向量直接查询底层 Chroma collection（一次请求覆盖多组查询）
+
+    Returns:
+        list: 与 query_embeddings 对应的候选列表，每项为按相似度排序的 [{"content", "volume"}]
+    """
+    kwargs = {
+        "query_embeddings": query_embeddings,
+        "n_results": max(1, n_results),
+        "include": ["documents", "metadatas"],
+    }
+    if where:
+        kwargs["where"] = where
+    result = store._collection.query(**kwargs)
+
+    candidates = []
+    for documents, metadatas in zip(result.get("documents") or [], result.get("metadatas") or []):
+        candidates.append([
+            {"content": doc, "volume": (meta or {}).get("volume")}
+            for doc, meta in zip(documents, metadatas or [None] * len(documents))
+            if doc
+        ])
+    return candidates
+
+
 def get_relevant_contexts_deduplicated(
     embedding_adapter,
     query_groups: list,
@@ -432,7 +584,17 @@ def get_relevant_contexts_deduplicated(
         list: 去重后的文档内容列表,每个元素为 {"content": str, "queries": [str], "type": str}
               其中 queries 包含所有命中该文档的关键词组
     """
-    store = load_vector_store(embedding_adapter, filepath)
+    if not query_groups:
+        return []
+
+    with open_vector_store(embedding_adapter, filepath) as store:
+        return _retrieve_deduplicated(
+            store, query_groups, k_per_group, max_total_results, current_chapter, num_volumes, total_chapters
+        )
+
+
+def _retrieve_deduplicated(store, query_groups, k_per_group, max_total_results, current_chapter, num_volumes, total_chapters) -> list:
+    """get_relevant_contexts_deduplicated 的检索主体（store 由调用方借用）"""
     if not store:
         logging.info("No vector store found or load failed. Returning empty list.")
         return []
@@ -473,107 +635,57 @@ def get_relevant_contexts_deduplicated(
         docs_by_hash = {}  # hash -> {"content": str, "queries": [str], "type": str}
         seen_hashes = set()
 
+        # 1) 为每组关键词确定各卷配额（纯内存计算，不访问向量库）
+        plans = []  # [(query, [(volume_or_None, k), ...])]
         for query in query_groups:
-            # 分卷检索：当前卷优先 + 跨卷智能检索
             if use_volume_filter and current_vol is not None and current_vol > 0:
-                try:
-                    # 检测是否需要跨卷检索（使用词边界匹配避免误触发）
-                    # 优化版关键词库：32个精选词汇，覆盖跨卷伏笔核心场景
-                    cross_volume_keywords = [
-                        # === 角色背景类 ===
-                        "起源", "身世", "师傅", "仇人",
-                        "父亲", "母亲", "恩人", "师兄",
-
-                        # === 物品类 ===
-                        "宝物", "信物", "遗物", "神器", "遗迹",
-
-                        # === 能力/技能类（玄幻向）===
-                        "功法", "传承", "心法", "剑法",
-
-                        # === 剧情伏笔类 ===
-                        "预言", "诅咒", "秘密", "真相", "阴谋", "誓言",
-                        "约定", "承诺", "宿命", "封印",
-
-                        # === 关键事件类 ===
-                        "惨案", "灭门", "叛变",
-
-                        # === 时间引用类 ===
-                        "初遇", "相识"
-                    ]
-
-                    # 使用正则词边界匹配，避免子串误触发（如"起源于"、"秘密花园"）
-                    needs_cross_volume_search = False
-                    for kw in cross_volume_keywords:
-                        # 构建词边界正则：前后必须是非汉字字符或字符串边界
-                        pattern = rf'(?<![a-zA-Z0-9\u4e00-\u9fa5]){re.escape(kw)}(?![a-zA-Z0-9\u4e00-\u9fa5])'
-                        if re.search(pattern, query):
-                            needs_cross_volume_search = True
-                            logging.info(f"检测到跨卷关键词 '{kw}' 在查询 '{query}' 中")
-                            break
-
-                    # 动态调整检索数量，保持总量恒定
-                    if needs_cross_volume_search:
-                        # 启用跨卷检索：减少当前卷检索量，为历史卷留出空间
-                        # 总量控制：current_vol_k + prev_vol_k + historical_k = adjusted_k
-                        historical_volumes_count = min(3, current_vol - 1)  # 最多回溯3卷
-                        historical_k = min(historical_volumes_count, adjusted_k // 3)  # 历史卷占1/3
-                        prev_vol_k = 1 if current_vol > 1 and adjusted_k > historical_k + 1 else 0
-                        current_vol_k = max(1, adjusted_k - historical_k - prev_vol_k)
-
-                        logging.info(f"跨卷检索分配: 当前卷{current_vol_k}条 + 前一卷{prev_vol_k}条 + 历史卷{historical_k}条 = 总计{adjusted_k}条")
-                    else:
-                        # 常规检索：当前卷为主 + 前一卷补充
-                        current_vol_k = max(1, adjusted_k - 1)
-                        prev_vol_k = 1 if current_vol > 1 else 0
-                        historical_k = 0
-
-                    # 策略1：当前卷优先检索
-                    current_vol_docs = store.similarity_search(
-                        query,
-                        k=current_vol_k,
-                        filter={"volume": current_vol}
-                    )
-                    docs = current_vol_docs
-
-                    # 策略2：前一卷补充检索
-                    if prev_vol_k > 0:
-                        prev_vol_docs = store.similarity_search(
-                            query,
-                            k=prev_vol_k,
-                            filter={"volume": current_vol - 1}
-                        )
-                        docs.extend(prev_vol_docs)
-
-                    # 策略3：跨卷关键词检索（仅在触发时执行）
-                    if needs_cross_volume_search and historical_k > 0:
-                        # 检索历史卷（均匀分配，每卷1条）
-                        start_vol = max(1, current_vol - 3)
-                        end_vol = current_vol - 1
-                        for vol in range(start_vol, end_vol):
-                            if historical_k <= 0:
-                                break
-                            try:
-                                historical_docs = store.similarity_search(
-                                    query,
-                                    k=1,
-                                    filter={"volume": vol}
-                                )
-                                docs.extend(historical_docs)
-                                historical_k -= len(historical_docs)
-                            except:
-                                pass  # 某卷可能不存在，跳过
-
-                except Exception as e:
-                    # 降级：如果元数据过滤失败（旧向量库无元数据），使用普通检索
-                    logging.warning(f"分卷检索失败，降级为普通检索: {e}")
-                    docs = store.similarity_search(query, k=adjusted_k)
+                plans.append((query, _plan_volume_quotas(query, current_vol, adjusted_k)))
             else:
-                # 普通检索
-                docs = store.similarity_search(query, k=adjusted_k)
+                plans.append((query, [(None, adjusted_k)]))
 
-            for doc in docs:
-                content = doc.page_content
+        # 2) 所有关键词组一次性向量化（一次 embedding 请求）
+        query_embeddings = store.embeddings.embed_documents(list(query_groups))
+        if not query_embeddings or len(query_embeddings) != len(query_groups) or any(not e for e in query_embeddings):
+            logging.warning("Query embedding failed or returned empty vectors. Returning empty list.")
+            return []
+
+        # 3) 一次 Chroma 查询取回所有组的候选，卷过滤用 $in 合并
+        all_volumes = sorted({vol for _, quotas in plans for vol, _ in quotas if vol is not None})
+        quota_total = max(sum(k for _, k in quotas) for _, quotas in plans)
+        if all_volumes:
+            # 多个卷共用一次查询，按卷配额在内存中筛选，因此适当多取一些候选
+            n_results = min(collection_size, max(quota_total * 4, 10))
+            where = {"volume": {"$in": all_volumes}} if len(all_volumes) > 1 else {"volume": all_volumes[0]}
+        else:
+            n_results = min(collection_size, quota_total)
+            where = None
 
+        try:
+            candidates = _query_collection(store, query_embeddings, n_results, where)
+        except Exception as e:
+            # 降级：如果元数据过滤失败（旧向量库无元数据），使用普通检索
+            logging.warning(f"分卷检索失败，降级为普通检索: {e}")
+            plans = [(query, [(None, adjusted_k)]) for query in query_groups]
+            candidates = _query_collection(store, query_embeddings, min(collection_size, adjusted_k), None)
+
+        logging.info(f"Batched retrieval: {len(query_groups)} queries, 1 embedding call, n_results={n_results}, volumes={all_volumes or 'all'}")
+
+        # 4) 在内存中按卷配额挑选并去重
+        for (query, quotas), query_embedding, query_candidates in zip(plans, query_embeddings, candidates):
+            docs = []
+            for vol, k in quotas:
+                if k <= 0:
+                    continue
+                picked = [c for c in query_candidates if vol is None or c["volume"] == vol][:k]
+                if len(picked) < k and vol is not None and len(query_candidates) >= n_results:
+                    # 合并查询的候选被其他卷占满：仅对该卷补一次查询（复用已有向量，无需再次 embedding）
+                    try:
+                        picked = _query_collection(store, [query_embedding], k, {"volume": vol})[0]
+                    except Exception as e:
+                        logging.warning(f"第{vol}卷补充检索失败: {e}")
+                docs.extend(c["content"] for c in picked)
+
+            for content in docs:
                 # 使用稳定的SHA1哈希进行去重（与monitor模块保持一致）
                 content_hash = hashlib.sha1(
                     (content[:400] if len(content) > 400 else content).encode('utf-8', errors='ignore')
@@ -620,16 +732,10 @@ def get_relevant_contexts_deduplicated(
         return []
 
 def _get_sentence_transformer(model_name: str = 'paraphrase-MiniLM-L6-v2'):
-    """获取sentence transformer模型，处理SSL问题"""
+    """获取sentence transformer模型（与本地 embedding 适配器共用进程内缓存），加载失败返回 None"""
+    from core.adapters.embedding_adapters import get_local_embedding_model
     try:
-        # 设置torch环境变量
-        os.environ["TORCH_ALLOW_TF32_CUBLAS_OVERRIDE"] = "0"
-        os.environ["TORCH_CUDNN_V8_API_ENABLED"] = "0"
-        
-        # 禁用SSL验证
-        ssl._create_default_https_context = ssl._create_unverified_context
-        
-        # ...existing code...
+        return get_local_embedding_model(model_name).result()
     except Exception as e:
         logging.error(f"Failed to load sentence transformer model: {e}")
         traceback.print_exc()
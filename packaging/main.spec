@@ -9,7 +9,6 @@ hiddenimports = ['typing_extensions',
                  'openai', 
                  'google-genai',
                  'google',
-                 'nltk',
                  'sentence_transformers',
                  'scikit-learn',
                  'langchain-community',
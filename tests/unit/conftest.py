@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+"""单元测试公共配置：把项目根目录加入导入路径"""
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""novel_generator.batch 的阶段检查点续跑测试"""
+import pytest
+
+pytest.importorskip("langchain_openai")
+pytest.importorskip("langchain_chroma")
+
+from core.utils import stage_journal  # noqa: E402
+from novel_generator import batch  # noqa: E402
+
+LLM = {
+    "interface_format": "OpenAI", "api_key": "", "base_url": "http://fake-llm.test/v1", "model_name": "fake",
+    "temperature": 0.7, "max_tokens": 1024, "timeout": 60,
+}
+
+
+def _batch_context(filepath):
+    return {
+        "filepath": str(filepath),
+        "draft": dict(LLM),
+        "finalize": dict(LLM),
+        "user_guidance": "", "characters_involved": "", "key_items": "",
+        "scene_location": "", "time_constraint": "", "char_inv_text": "",
+        "embedding": {"api_key": "", "url": "", "interface_format": "ollama", "model_name": "", "k": 4},
+        "num_volumes": 0,
+        "total_chapters": 10,
+    }
+
+
+class FakeStages:
+    """替换提示词构建/草稿/定稿三个阶段，记录调用次数；定稿可按次数设定失败"""
+
+    def __init__(self, monkeypatch, finalize_failures=0):
+        self.calls = {"prompt": 0, "draft": 0, "finalize": 0}
+        self.finalize_failures = finalize_failures
+        monkeypatch.setattr(batch, "_build_prompt", self._build_prompt)
+        monkeypatch.setattr(batch, "generate_chapter_draft", self._draft)
+        monkeypatch.setattr(batch, "finalize_chapter", self._finalize)
+
+    def _build_prompt(self, batch_context, chapter_num, word, log, progress, checkpoint, prefetch_only=False):
+        self.calls["prompt"] += 1
+        return f"第{chapter_num}章提示词#{self.calls['prompt']}"
+
+    def _draft(self, **kwargs):
+        self.calls["draft"] += 1
+        return f"第{kwargs['novel_number']}章草稿#{self.calls['draft']}"
+
+    def _finalize(self, **kwargs):
+        self.calls["finalize"] += 1
+        if self.finalize_failures:
+            self.finalize_failures -= 1
+            raise RuntimeError("定稿中途失败")
+        return True
+
+
+def _restart(monkeypatch):
+    """模拟进程重启：丢弃内存中的检查点日志，下次从磁盘重新加载"""
+    monkeypatch.setattr(stage_journal, "_journals", {})
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    monkeypatch.setattr(stage_journal, "STAGE_JOURNAL_ENABLED", True)
+    _restart(monkeypatch)
+    chapters_dir = tmp_path / "chapters"
+    chapters_dir.mkdir()
+    (chapters_dir / "chapter_1.txt").write_text("第一章正文。", encoding="utf-8")
+    return tmp_path
+
+
+def _run(batch_context, chapter_num=2):
+    return batch.generate_chapter(batch_context, chapter_num, word=3000, min_word=10, auto_enrich=False)
+
+
+def test_failed_finalize_resumes_from_prompt_and_draft_checkpoints(project, monkeypatch):
+    context = _batch_context(project)
+    stages = FakeStages(monkeypatch, finalize_failures=1)
+    with pytest.raises(RuntimeError):
+        _run(context)
+    assert batch.pending_chapters(str(project)) == {2}
+
+    _restart(monkeypatch)
+    assert _run(context)
+
+    # 提示词与草稿直接复用检查点，只重跑了定稿
+    assert stages.calls == {"prompt": 1, "draft": 1, "finalize": 2}
+    assert (project / "chapters" / "chapter_2.txt").read_text(encoding="utf-8") == "第2章草稿#1"
+    assert batch.pending_chapters(str(project)) == set()
+
+
+def test_editing_previous_chapter_invalidates_checkpoints(project, monkeypatch):
+    context = _batch_context(project)
+    stages = FakeStages(monkeypatch, finalize_failures=1)
+    with pytest.raises(RuntimeError):
+        _run(context)
+
+    (project / "chapters" / "chapter_1.txt").write_text("第一章被改写后的正文。", encoding="utf-8")
+    _restart(monkeypatch)
+    assert _run(context)
+
+    # 前文变化后指纹不同，提示词与草稿重新生成
+    assert stages.calls == {"prompt": 2, "draft": 2, "finalize": 2}
+    assert (project / "chapters" / "chapter_2.txt").read_text(encoding="utf-8") == "第2章草稿#2"
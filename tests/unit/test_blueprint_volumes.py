@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""novel_generator.blueprint 分卷蓝图并发生成、按序合并与断点续写的单元测试"""
+import json
+import threading
+
+import pytest
+
+pytest.importorskip("langchain_openai")
+pytest.importorskip("langchain_chroma")
+
+from novel_generator import blueprint  # noqa: E402
+
+
+class FakePromptManager:
+    def get_prompt(self, category, name):
+        return "分卷蓝图模板"
+
+
+class FakeVolumeLLM:
+    """按提示词中的卷参数生成章节目录；fail 中的卷抛出异常（可等待 fail_after_volume 先完成）"""
+
+    def __init__(self, fail=(), fail_after_volume=None):
+        self.fail = set(fail)
+        self.fail_after_volume = fail_after_volume
+        self.finished = {}
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, llm_adapter, prompt, system_prompt=None, **kwargs):
+        params = json.loads(prompt)
+        vol_idx = params["volume_number"]
+        with self.lock:
+            self.calls.append((vol_idx, params["volume_start"], params["volume_end"]))
+        if vol_idx in self.fail:
+            if self.fail_after_volume is not None:
+                self._event(self.fail_after_volume).wait(timeout=5)
+            raise ConnectionError(f"第{vol_idx}卷请求中断")
+        text = "\n\n".join(
+            f"第{chapter}章 - 标题{chapter}\n本章简述：第{vol_idx}卷的内容"
+            for chapter in range(params["volume_start"], params["volume_end"] + 1)
+        )
+        self._event(vol_idx).set()
+        return text
+
+    def _event(self, vol_idx):
+        with self.lock:
+            return self.finished.setdefault(vol_idx, threading.Event())
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    (tmp_path / "Novel_architecture.txt").write_text("小说架构", encoding="utf-8")
+    (tmp_path / "Volume_architecture.txt").write_text("分卷架构", encoding="utf-8")
+    monkeypatch.setattr(blueprint, "create_llm_adapter", lambda **kwargs: object())
+    monkeypatch.setattr(blueprint, "resolve_global_system_prompt", lambda *args: "")
+    monkeypatch.setattr(blueprint, "get_shared_prompt_manager", FakePromptManager)
+    # 提示词直接带出卷参数，供假 LLM 解析
+    monkeypatch.setattr(blueprint, "format_prompt_safe", lambda template, params, key: json.dumps(params))
+    return tmp_path
+
+
+def _generate(project, monkeypatch, llm, workers, logs):
+    monkeypatch.setattr(blueprint, "invoke_with_cleaning", llm)
+    blueprint.Chapter_blueprint_generate(
+        "OpenAI", "", "http://fake-llm.test/v1", "fake", str(project),
+        number_of_chapters=40, num_volumes=4, gui_log_callback=logs.append, volume_workers=workers,
+    )
+
+
+def _chapter_numbers(project):
+    text = (project / "Novel_directory.txt").read_text(encoding="utf-8")
+    return [int(number) for number in blueprint.re.findall(r"第(\d+)章", text)]
+
+
+def test_failed_volume_is_reported_and_stops_later_volumes(project, monkeypatch):
+    llm = FakeVolumeLLM(fail={2})
+    logs = []
+    _generate(project, monkeypatch, llm, workers=1, logs=logs)
+
+    assert [call[0] for call in llm.calls] == [1, 2]
+    assert any("第2卷蓝图生成失败" in line for line in logs)
+    assert _chapter_numbers(project) == list(range(1, 11))
+
+
+def test_merge_keeps_contiguous_prefix_and_resume_continues(project, monkeypatch):
+    # 第4卷先完成、第3卷随后失败：只有第1-2卷写入目录
+    llm = FakeVolumeLLM(fail={3}, fail_after_volume=4)
+    logs = []
+    _generate(project, monkeypatch, llm, workers=4, logs=logs)
+
+    assert {call[0] for call in llm.calls} == {1, 2, 3, 4}
+    assert _chapter_numbers(project) == list(range(1, 21))
+    assert any("第3卷蓝图生成失败" in line for line in logs)
+
+    # 重新生成从第21章（第3卷开头）继续，已完成的卷跳过
+    resumed = FakeVolumeLLM()
+    _generate(project, monkeypatch, resumed, workers=4, logs=logs)
+
+    assert sorted(resumed.calls) == [(3, 21, 30), (4, 31, 40)]
+    assert _chapter_numbers(project) == list(range(1, 41))
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""novel_generator.knowledge 流式导入与断点续传的单元测试"""
+import threading
+
+import pytest
+
+pytest.importorskip("langchain_chroma")
+
+from novel_generator import knowledge  # noqa: E402
+
+TEXT = "".join(f"第{i}条设定：角色甲在此处出现。" for i in range(40))
+
+
+class FakeCollection:
+    """按 where 单条件过滤的最小 Chroma collection"""
+
+    def __init__(self):
+        self.docs = {}
+
+    def get(self, where=None, include=None):
+        (field, value), = where.items()
+        ids = [doc_id for doc_id, (_, metadata) in self.docs.items() if metadata.get(field) == value]
+        return {"ids": ids, "metadatas": [self.docs[doc_id][1] for doc_id in ids]}
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        for doc_id, document, metadata in zip(ids, documents, metadatas):
+            self.docs[doc_id] = (document, metadata)
+
+
+class FakeEmbeddings:
+    """记录每批 embedding 的文本；fail_after 次调用之后返回空结果模拟服务中断"""
+
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+        self.batches = []
+
+    def embed_documents(self, texts):
+        if self.fail_after is not None and len(self.batches) >= self.fail_after:
+            return []
+        self.batches.append(list(texts))
+        return [[1.0, 0.0]] * len(texts)
+
+
+class FakeStore:
+    def __init__(self, embeddings):
+        self._collection = FakeCollection()
+        self.embeddings = embeddings
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(knowledge, "KNOWLEDGE_CHUNK_LENGTH", 40)
+
+
+def _import(store, path, source=None, batch_size=3):
+    return knowledge._import_one_file(store, threading.Lock(), str(path), source or path.name, batch_size, lambda msg: None)
+
+
+def test_interrupted_import_resumes_without_re_embedding(tmp_path):
+    path = tmp_path / "设定.txt"
+    path.write_text(TEXT, encoding="utf-8")
+    store = FakeStore(FakeEmbeddings(fail_after=2))
+
+    with pytest.raises(RuntimeError):
+        _import(store, path)
+    written = {metadata["chunk"] for _, metadata in store._collection.docs.values()}
+    assert written == set(range(6))
+
+    store.embeddings = FakeEmbeddings()
+    result = _import(store, path)
+
+    assert result["status"] == "imported"
+    embedded = [text for batch in store.embeddings.batches for text in batch]
+    assert len(embedded) == result["chunks"] == result["total"] - len(written)
+    chunks = sorted((metadata["chunk"], document) for document, metadata in store._collection.docs.values())
+    assert [index for index, _ in chunks] == list(range(result["total"]))
+    assert not set(embedded) & {document for index, document in chunks if index in written}
+    # 分块按原文顺序拼回原文，只有最后一块带完整性标记
+    assert "".join(document for _, document in chunks) == TEXT
+    assert [metadata["chunk"] for _, metadata in store._collection.docs.values() if metadata["last_chunk"]] == [result["total"] - 1]
+
+
+def test_renamed_identical_file_is_skipped(tmp_path):
+    original = tmp_path / "设定.txt"
+    original.write_text(TEXT, encoding="utf-8")
+    store = FakeStore(FakeEmbeddings())
+    assert _import(store, original)["status"] == "imported"
+    embedded_batches = len(store.embeddings.batches)
+
+    renamed = tmp_path / "sub" / "改名后的设定.md"
+    renamed.parent.mkdir()
+    original.rename(renamed)
+    result = _import(store, renamed, source="sub/改名后的设定.md")
+
+    assert result["status"] == "skipped"
+    assert len(store.embeddings.batches) == embedded_batches
+
+
+def test_file_without_last_chunk_marker_is_not_treated_as_complete(tmp_path):
+    path = tmp_path / "设定.txt"
+    path.write_text(TEXT, encoding="utf-8")
+    store = FakeStore(FakeEmbeddings(fail_after=1))
+    with pytest.raises(RuntimeError):
+        _import(store, path)
+
+    # 同内容的另一个文件名同样从断点续传，而不是整体跳过
+    copy = tmp_path / "副本.txt"
+    copy.write_text(TEXT, encoding="utf-8")
+    store.embeddings = FakeEmbeddings()
+    result = _import(store, copy)
+
+    assert result["status"] == "imported"
+    assert result["chunks"] == result["total"] - 3
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""core.utils.llm_cache 单元测试"""
+import pytest
+
+from core.utils import llm_cache
+from core.utils.llm_cache import LLMResponseCache, make_cache_key, should_cache
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+class FakeAdapter:
+    def __init__(self, temperature, model_name="fake", base_url="http://fake-llm.test/v1"):
+        self.temperature = temperature
+        self.model_name = model_name
+        self.base_url = base_url
+        self.max_tokens = 1024
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_cache, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def make_cache(tmp_path):
+    caches = []
+
+    def make(**kwargs):
+        cache = LLMResponseCache(str(tmp_path / ".cache" / "llm_responses.sqlite3"), **kwargs)
+        caches.append(cache)
+        return cache
+
+    yield make
+    for cache in caches:
+        cache.close()
+
+
+def _value(name):
+    return f"第{name}条缓存内容。" * 40
+
+
+def test_lru_eviction_drops_least_recently_accessed(clock, make_cache):
+    size = max(len(llm_cache._compress(_value(name))) for name in "abcd")
+    cache = make_cache(max_bytes=3 * size, ttl_seconds=0)
+    for name in "abc":
+        clock.now += 1
+        cache.put(name, _value(name))
+
+    # 访问 a 之后，最久未访问的是 b
+    clock.now += 1
+    assert cache.get("a") == _value("a")
+    clock.now += 1
+    cache.put("d", _value("d"))
+
+    assert cache.get("b") is None
+    assert [cache.get(name) for name in "acd"] == [_value(name) for name in "acd"]
+
+
+def test_eviction_frees_oldest_entries_until_under_limit(clock, make_cache):
+    size = max(len(llm_cache._compress(_value(name))) for name in "abcd")
+    cache = make_cache(max_bytes=2 * size, ttl_seconds=0)
+    for name in "abcd":
+        clock.now += 1
+        cache.put(name, _value(name))
+
+    assert [cache.get(name) is None for name in "abcd"] == [True, True, False, False]
+
+
+def test_entries_expire_after_ttl(clock, make_cache):
+    cache = make_cache(ttl_seconds=100)
+    cache.put("k", "结果")
+
+    clock.now += 99
+    assert cache.get("k") == "结果"
+    # 有效期从写入时算起，访问不会续期
+    clock.now += 2
+    assert cache.get("k") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_expired_entries_are_purged_on_put(clock, make_cache):
+    cache = make_cache(ttl_seconds=100)
+    cache.put("old", "旧结果")
+    clock.now += 101
+    cache.put("new", "新结果")
+
+    rows = cache._conn.execute("SELECT key FROM responses").fetchall()
+    assert rows == [("new",)]
+
+
+def test_deterministic_modules_bypass_cache_when_sampling():
+    assert not should_cache("chapter.draft", FakeAdapter(temperature=0.7))
+    assert should_cache("chapter.draft", FakeAdapter(temperature=0))
+    # 未列出的模块按 deterministic 处理
+    assert not should_cache("finalization.some_step", FakeAdapter(temperature=0.3))
+    assert should_cache("finalization.some_step", FakeAdapter(temperature=0.0))
+    # always 策略与 temperature 无关；未指定模块时不缓存
+    assert should_cache("helper.knowledge_search", FakeAdapter(temperature=1.2))
+    assert not should_cache(None, FakeAdapter(temperature=0))
+
+
+def test_cache_key_depends_on_sampling_parameters():
+    key = make_cache_key(FakeAdapter(temperature=0), "写一章", "系统提示")
+
+    assert key == make_cache_key(FakeAdapter(temperature=0), "写一章", "系统提示")
+    assert key != make_cache_key(FakeAdapter(temperature=0.5), "写一章", "系统提示")
+    assert key != make_cache_key(FakeAdapter(temperature=0, model_name="other"), "写一章", "系统提示")
+    assert key != make_cache_key(FakeAdapter(temperature=0), "写一章", "")
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""novel_generator.common 中 LLM 调用封装（重试/清洗/流式/异步）的单元测试"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("langchain_openai")
+pytest.importorskip("langchain_chroma")
+
+from core.adapters.llm_adapters import BaseLLMAdapter  # noqa: E402
+from novel_generator import common  # noqa: E402
+
+GOOD_TEXT = "林默推开门，屋里空无一人。" * 10
+
+
+class FakeAdapter:
+    """按脚本产出流式片段的适配器；脚本项为字符串或异常"""
+
+    def __init__(self, stream_script, invoke_result=GOOD_TEXT, base_url="http://fake-llm.test/v1", model_name="fake"):
+        self.stream_script = stream_script
+        self.invoke_result = invoke_result
+        self.base_url = base_url
+        self.model_name = model_name
+        self.invoke_calls = 0
+
+    def invoke_stream(self, prompt, system_prompt=None, cancellation_token=None):
+        for item in self.stream_script:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def invoke(self, prompt, system_prompt=None, cancellation_token=None):
+        self.invoke_calls += 1
+        return self.invoke_result
+
+
+def test_stream_passes_chunks_through():
+    chunks = []
+    adapter = FakeAdapter([GOOD_TEXT[:30], GOOD_TEXT[30:]])
+
+    result = common.invoke_stream_with_cleaning(adapter, "写一章", on_chunk=chunks.append)
+
+    assert result == GOOD_TEXT
+    assert "".join(chunks) == GOOD_TEXT
+    assert adapter.invoke_calls == 0
+
+
+def test_invalid_stream_resets_before_replacement():
+    events = []
+    adapter = FakeAdapter(["抱歉，我无法", "生成这段内容。"])
+
+    result = common.invoke_stream_with_cleaning(
+        adapter, "写一章",
+        on_chunk=lambda chunk: events.append(("chunk", chunk)),
+        on_reset=lambda: events.append(("reset", None)),
+    )
+
+    assert result == GOOD_TEXT
+    assert adapter.invoke_calls == 1
+    # 拒绝文本之后先作废，再交出非流式重试得到的完整内容
+    assert events[-2:] == [("reset", None), ("chunk", GOOD_TEXT)]
+
+
+def test_stream_failure_before_first_chunk_falls_back_without_reset():
+    events = []
+    adapter = FakeAdapter([ConnectionError("reset by peer")])
+
+    result = common.invoke_stream_with_cleaning(
+        adapter, "写一章",
+        on_chunk=lambda chunk: events.append(("chunk", chunk)),
+        on_reset=lambda: events.append(("reset", None)),
+    )
+
+    assert result == GOOD_TEXT
+    assert events == [("chunk", GOOD_TEXT)]
+
+
+def _draft_kwargs(filepath):
+    return dict(
+        api_key="", base_url="http://fake-llm.test/v1", model_name="fake", filepath=str(filepath),
+        novel_number=3, word_number=3000, temperature=0.7, user_guidance="", characters_involved="",
+        key_items="", scene_location="", time_constraint="", embedding_api_key="", embedding_url="",
+        embedding_interface_format="ollama", embedding_model_name="", custom_prompt_text="写第三章",
+    )
+
+
+def test_failed_draft_leaves_existing_chapter_untouched(tmp_path, monkeypatch):
+    from core.adapters.llm_adapters import CancelledException
+    from novel_generator import chapter
+
+    chapters_dir = tmp_path / "chapters"
+    chapters_dir.mkdir()
+    chapter_file = chapters_dir / "chapter_3.txt"
+    chapter_file.write_text("用户已有的第三章", encoding="utf-8")
+    adapter = FakeAdapter(["新生成的开头。", CancelledException("用户取消")])
+    monkeypatch.setattr(chapter, "create_llm_adapter", lambda **kwargs: adapter)
+
+    with pytest.raises(CancelledException):
+        chapter.generate_chapter_draft(**_draft_kwargs(tmp_path))
+
+    assert chapter_file.read_text(encoding="utf-8") == "用户已有的第三章"
+    assert (chapters_dir / "chapter_3.txt.partial").read_text(encoding="utf-8") == "新生成的开头。"
+
+
+class FakeAsyncClient:
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeAsyncAdapter(BaseLLMAdapter):
+    """ainvoke 通过 _get_loop_client 取按事件循环创建的客户端，并记录并发峰值"""
+
+    def __init__(self, base_url="http://fake-async-llm.test/v1", model_name="fake"):
+        self.base_url = base_url
+        self.model_name = model_name
+        self.clients = []
+        self.active = 0
+        self.peak = 0
+
+    def _new_client(self):
+        client = FakeAsyncClient()
+        self.clients.append(client)
+        return client
+
+    async def ainvoke(self, prompt, system_prompt=None, cancellation_token=None):
+        self._get_loop_client(self._new_client)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        return f"  {GOOD_TEXT}{prompt}  "
+
+
+def test_ainvoke_fan_out_runs_concurrently_and_cleans():
+    adapter = FakeAsyncAdapter()
+
+    async def fan_out():
+        return await asyncio.gather(*(common.ainvoke_with_cleaning(adapter, f"第{i}段") for i in range(4)))
+
+    results = asyncio.run(fan_out())
+
+    assert results == [f"{GOOD_TEXT}第{i}段" for i in range(4)]
+    assert adapter.peak > 1
+    # 同一事件循环只创建一个客户端，循环关闭时随之关闭
+    assert len(adapter.clients) == 1
+    assert adapter.clients[0].closed
+
+
+def test_loop_clients_are_per_loop_and_closable_early():
+    adapter = FakeAsyncAdapter()
+
+    async def call_then_close():
+        await adapter.ainvoke("一")
+        await adapter.ainvoke("二")
+        await adapter.aclose_loop_clients()
+        return adapter.clients[-1].closed
+
+    assert asyncio.run(call_then_close())
+    asyncio.run(adapter.ainvoke("三"))
+
+    assert len(adapter.clients) == 2
+    assert all(client.closed for client in adapter.clients)
+
+
+def test_stream_usage_is_recorded_against_token_budget(monkeypatch):
+    from core.utils import rate_limiter
+
+    monkeypatch.setattr(rate_limiter, "_limiters", {})
+    monkeypatch.setattr(rate_limiter, "_limit_overrides", {"http://fake-llm.test/v1": (0, 6000)})
+    adapter = FakeAdapter([GOOD_TEXT[:30], GOOD_TEXT[30:]])
+    limiter = rate_limiter.get_adapter_rate_limiter(adapter)
+
+    common.invoke_stream_with_cleaning(adapter, "写一章")
+
+    # 预扣提示词之外，流式输出的 token 也计入了预算（允许期间的少量回补）
+    spent = 6000 - limiter._tok_tokens
+    expected = rate_limiter.estimate_tokens("写一章") + rate_limiter.estimate_tokens(GOOD_TEXT)
+    assert expected - 5 <= spent <= expected
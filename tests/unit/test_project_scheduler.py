@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""core.utils.task_queue.ProjectScheduler 单元测试"""
+import threading
+import time
+
+import pytest
+
+from core.utils.task_queue import ProjectScheduler, TaskManager
+
+
+@pytest.fixture
+def task_manager():
+    manager = TaskManager()
+    yield manager
+    manager.shutdown()
+
+
+def _recorder(order, lock):
+    def make(name, gate=None):
+        def run():
+            if gate is not None:
+                assert gate.wait(timeout=5)
+            with lock:
+                order.append(name)
+        return name, run
+    return make
+
+
+def test_single_worker_alternates_between_projects(task_manager):
+    order = []
+    make = _recorder(order, threading.Lock())
+    gate = threading.Event()
+    scheduler = ProjectScheduler(task_manager, max_workers=1)
+
+    # A 的第一个任务等 B 入队后才结束，此后唯一的线程应在两个项目间轮转
+    scheduler.submit_many("A", [make("A1", gate), make("A2"), make("A3")])
+    scheduler.submit_many("B", [make("B1"), make("B2"), make("B3")])
+    gate.set()
+
+    assert scheduler.wait(timeout=5)
+    assert order == ["A1", "B1", "A2", "B2", "A3", "B3"]
+
+
+def test_tasks_within_a_project_never_overlap(task_manager):
+    running = {"A": 0, "B": 0}
+    overlaps = []
+    order = {"A": [], "B": []}
+    lock = threading.Lock()
+
+    def make(project, index):
+        def run():
+            with lock:
+                running[project] += 1
+                overlaps.append(running[project] > 1)
+            time.sleep(0.01)
+            with lock:
+                running[project] -= 1
+                order[project].append(index)
+        return f"{project}{index}", run
+
+    scheduler = ProjectScheduler(task_manager, max_workers=4)
+    for project in ("A", "B"):
+        scheduler.submit_many(project, [make(project, i) for i in range(5)])
+
+    assert scheduler.wait(timeout=5)
+    assert not any(overlaps)
+    assert order == {"A": list(range(5)), "B": list(range(5))}
+    assert scheduler.stats()["queue_depth"] == 0
+
+
+def test_failure_cancels_only_its_project(task_manager):
+    order = []
+    make = _recorder(order, threading.Lock())
+    events = []
+    scheduler = ProjectScheduler(
+        task_manager, max_workers=2,
+        on_event=lambda event, project, label, **fields: events.append((event, project, label))
+    )
+
+    def boom():
+        raise RuntimeError("boom")
+
+    scheduler.submit_many("A", [make("A1"), ("A2", boom), make("A3")])
+    scheduler.submit_many("B", [make("B1"), make("B2")])
+
+    assert scheduler.wait(timeout=5)
+    assert "A3" not in order
+    assert [name for name in order if name.startswith("B")] == ["B1", "B2"]
+    failures = scheduler.failures()
+    assert list(failures) == ["A"]
+    assert failures["A"][0] == "A2"
+    assert ("task_failed", "A", "A2") in events
+    assert ("project_done", "B", None) in events
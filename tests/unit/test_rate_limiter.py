@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""core.utils.rate_limiter 单元测试"""
+import threading
+import time
+
+import pytest
+
+from core.utils import rate_limiter
+from core.utils.rate_limiter import (
+    configure_rate_limits_from_config,
+    get_adapter_rate_limiter,
+    get_inflight_limiter,
+    llm_rate_limit_key,
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_limiters(monkeypatch):
+    """每个测试使用独立的进程级限流器表，避免互相影响"""
+    for name in ("_limiters", "_limit_overrides", "_inflight", "_inflight_overrides"):
+        monkeypatch.setattr(rate_limiter, name, {})
+    for name in ("AUTONOVEL_LLM_RPM", "AUTONOVEL_LLM_TPM", "AUTONOVEL_LLM_MAX_INFLIGHT"):
+        monkeypatch.delenv(name, raising=False)
+
+
+def _config(**entries):
+    return {"llm_configs": entries}
+
+
+class KeyedAdapter:
+    def __init__(self, rate_limit_key, base_url="", model_name="m"):
+        self.rate_limit_key = rate_limit_key
+        self.base_url = base_url
+        self.model_name = model_name
+
+
+def test_rate_limit_key_ignores_rewritten_adapter_url():
+    configure_rate_limits_from_config(_config(
+        local={"interface_format": "Ollama", "base_url": "http://localhost:11434/", "rpm": 30, "tpm": 5000},
+    ))
+    # 适配器内部把地址改写成 .../v1，但分组键仍按配置中的原始地址
+    adapter = KeyedAdapter(llm_rate_limit_key("ollama", "http://localhost:11434"), base_url="http://localhost:11434/v1")
+
+    limiter = get_adapter_rate_limiter(adapter)
+    assert (limiter.rpm, limiter.tpm) == (30, 5000)
+
+
+def test_config_without_base_url_is_keyed_by_interface_format():
+    configure_rate_limits_from_config(_config(
+        gemini={"interface_format": "Gemini", "base_url": "", "rpm": 10},
+    ))
+    adapter = KeyedAdapter(llm_rate_limit_key("gemini", ""))
+
+    assert get_adapter_rate_limiter(adapter).rpm == 10
+
+
+def test_reconfigure_updates_existing_limiter():
+    adapter = KeyedAdapter(llm_rate_limit_key("openai", "https://api.example.com/v1"))
+    limiter = get_adapter_rate_limiter(adapter)
+    assert limiter.rpm == 0
+
+    configure_rate_limits_from_config(_config(
+        a={"interface_format": "OpenAI", "base_url": "https://api.example.com/v1", "rpm": 60},
+        b={"interface_format": "OpenAI", "base_url": "https://API.example.com/v1/", "rpm": 20},
+    ))
+    # 同一服务商出现在多个配置中时取最小的非零预算
+    assert get_adapter_rate_limiter(adapter) is limiter
+    assert limiter.rpm == 20
+
+
+@pytest.mark.parametrize("interface_format, base_url", [
+    ("Ollama", "http://localhost:11434"),
+    ("Azure AI", "https://example.services.ai.azure.com/models"),
+    ("Azure OpenAI", "https://example.openai.azure.com/openai/deployments/gpt/chat/completions?api-version=2024-08-01-preview"),
+])
+def test_configured_budget_reaches_factory_built_adapter(interface_format, base_url):
+    pytest.importorskip("langchain_openai")
+    from core.adapters.llm_adapters import create_llm_adapter
+
+    configure_rate_limits_from_config(_config(
+        target={"interface_format": interface_format, "base_url": base_url, "model_name": "m", "rpm": 7, "tpm": 700},
+    ))
+    adapter = create_llm_adapter(interface_format, base_url, "m", "key", 0.7, 1024, 60, reuse=False)
+
+    limiter = get_adapter_rate_limiter(adapter)
+    assert (limiter.rpm, limiter.tpm) == (7, 700)
+
+
+def test_configured_max_concurrency_caps_in_flight_requests():
+    configure_rate_limits_from_config(_config(
+        local={"interface_format": "Ollama", "base_url": "http://localhost:11434", "model_name": "Qwen3", "max_concurrency": 2},
+    ))
+    adapter = KeyedAdapter(llm_rate_limit_key("ollama", "http://localhost:11434"),
+                           base_url="http://localhost:11434/v1", model_name="qwen3")
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def request():
+        with get_inflight_limiter(adapter).slot():
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.pop()
+
+    threads = [threading.Thread(target=request) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert len(peak) == 6
+    assert max(peak) == 2
+    assert get_inflight_limiter(adapter).in_flight == 0
+
+
+def test_configured_max_concurrency_reaches_factory_built_adapter():
+    pytest.importorskip("langchain_openai")
+    from core.adapters.llm_adapters import create_llm_adapter
+
+    configure_rate_limits_from_config(_config(
+        gemini={"interface_format": "Gemini", "base_url": "", "model_name": "gemini-2.5-pro", "max_concurrency": 3},
+    ))
+    adapter = create_llm_adapter("Gemini", "", "gemini-2.5-pro", "key", 0.7, 1024, 60, reuse=False)
+
+    assert get_inflight_limiter(adapter).limit == 3
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""novel_generator.reindex 向量库重建（失败保护、断点续建、替换时的借用等待）的单元测试"""
+import json
+import os
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("langchain_chroma")
+
+from core.adapters import embedding_adapters  # noqa: E402
+from novel_generator import reindex, vectorstore_utils  # noqa: E402
+
+
+class FakeCollection:
+    """把文档存到目录下 JSON 文件的最小 collection，目录改名后内容随之移动"""
+
+    def __init__(self, store_dir):
+        self.path = os.path.join(store_dir, "data.json")
+        self.docs = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.docs = json.load(f)
+
+    def _save(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.docs, f, ensure_ascii=False)
+
+    def get(self, where=None, include=None, ids=None, limit=None, offset=0):
+        items = list(self.docs.items())
+        if limit:
+            items = items[offset:offset + limit]
+        return {
+            "ids": [doc_id for doc_id, _ in items],
+            "documents": [doc[0] for _, doc in items],
+            "metadatas": [doc[1] for _, doc in items],
+        }
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        for doc_id, document, metadata in zip(ids, documents, metadatas):
+            self.docs[doc_id] = [document, metadata]
+        self._save()
+
+    def delete(self, ids):
+        for doc_id in ids:
+            self.docs.pop(doc_id, None)
+        self._save()
+
+
+class FakeStore:
+    def __init__(self, store_dir, embeddings):
+        os.makedirs(store_dir, exist_ok=True)
+        self._collection = FakeCollection(store_dir)
+        self.embeddings = embeddings
+
+
+class FakeEmbeddingAdapter:
+    """fail_after 次调用之后返回空结果模拟 embedding 服务中断"""
+
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        if self.fail_after is not None and len(self.embedded) >= self.fail_after:
+            return []
+        self.embedded.append(list(texts))
+        return [[1.0, 0.0]] * len(texts)
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    monkeypatch.setattr(vectorstore_utils, "open_chroma_store", FakeStore)
+    monkeypatch.setattr(vectorstore_utils, "_open_stores", {})
+    monkeypatch.setattr(vectorstore_utils, "_closing_entries", [])
+    chapters_dir = tmp_path / "chapters"
+    chapters_dir.mkdir()
+    for chapter_num in range(1, 7):
+        text = "".join(f"第{chapter_num}章第{i}句。" for i in range(60))
+        (chapters_dir / f"chapter_{chapter_num}.txt").write_text(text, encoding="utf-8")
+    live = FakeStore(vectorstore_utils.get_vectorstore_dir(str(tmp_path)), None)
+    live._collection.upsert(["chapter:1:old"], [[1.0]], ["旧库中的分块"], [{"doc_type": "chapter", "chapter": 1}])
+    return tmp_path
+
+
+def _use_adapter(monkeypatch, adapter):
+    monkeypatch.setattr(embedding_adapters, "create_embedding_adapter", lambda *args: adapter)
+
+
+def _rebuild(project):
+    return reindex.rebuild_vector_store("", "", "ollama", "fake-embed", str(project), max_workers=1, batch_size=2)
+
+
+def _live_docs(project):
+    return FakeCollection(vectorstore_utils.get_vectorstore_dir(str(project))).docs
+
+
+def test_failed_batch_leaves_live_store_untouched(project, monkeypatch):
+    _use_adapter(monkeypatch, FakeEmbeddingAdapter(fail_after=2))
+
+    summary = _rebuild(project)
+
+    assert summary["status"] == "failed"
+    assert summary["failed_batches"] > 0
+    assert list(_live_docs(project)) == ["chapter:1:old"]
+    rebuild_dir = vectorstore_utils.get_vectorstore_dir(str(project)) + reindex.REBUILD_DIR_SUFFIX
+    assert os.path.exists(os.path.join(rebuild_dir, reindex.MANIFEST_FILE_NAME))
+
+
+def test_rebuild_resumes_from_written_batches(project, monkeypatch):
+    _use_adapter(monkeypatch, FakeEmbeddingAdapter(fail_after=2))
+    first = _rebuild(project)
+    written = first["embedded"]
+    assert written == 4
+
+    adapter = FakeEmbeddingAdapter()
+    _use_adapter(monkeypatch, adapter)
+    second = _rebuild(project)
+
+    assert second["status"] == "ok"
+    assert second["reused"] == written
+    assert sum(len(batch) for batch in adapter.embedded) == second["embedded"] == second["chunks"] - written
+    docs = _live_docs(project)
+    assert "chapter:1:old" not in docs
+    assert len(docs) == second["chunks"]
+    store_dir = vectorstore_utils.get_vectorstore_dir(str(project))
+    assert not os.path.exists(store_dir + reindex.REBUILD_DIR_SUFFIX)
+    assert not os.path.exists(os.path.join(store_dir, reindex.MANIFEST_FILE_NAME))
+
+
+def _prepared_rebuild_dir(project):
+    store_dir = vectorstore_utils.get_vectorstore_dir(str(project))
+    rebuild_dir = store_dir + reindex.REBUILD_DIR_SUFFIX
+    FakeStore(rebuild_dir, None)._collection.upsert(["chapter:1:0"], [[1.0]], ["新库中的分块"], [{"doc_type": "chapter"}])
+    with open(os.path.join(rebuild_dir, reindex.MANIFEST_FILE_NAME), "w", encoding="utf-8") as f:
+        json.dump({}, f)
+    return rebuild_dir, store_dir
+
+
+def test_swap_refuses_while_store_is_borrowed(project):
+    rebuild_dir, store_dir = _prepared_rebuild_dir(project)
+    borrowed = threading.Event()
+    release = threading.Event()
+
+    def reader():
+        with vectorstore_utils.open_vector_store(FakeEmbeddingAdapter(), str(project)):
+            borrowed.set()
+            release.wait(timeout=5)
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    try:
+        assert borrowed.wait(timeout=5)
+        assert reindex._swap_in(rebuild_dir, store_dir, timeout=0.1) is False
+        # 放弃替换时两个目录（含进度清单）原样保留
+        assert list(_live_docs(project)) == ["chapter:1:old"]
+        assert os.path.exists(os.path.join(rebuild_dir, reindex.MANIFEST_FILE_NAME))
+    finally:
+        release.set()
+        thread.join(timeout=5)
+
+
+def test_swap_waits_for_borrowed_store_to_be_returned(project):
+    rebuild_dir, store_dir = _prepared_rebuild_dir(project)
+    borrowed = threading.Event()
+    returned_at = []
+
+    def reader():
+        with vectorstore_utils.open_vector_store(FakeEmbeddingAdapter(), str(project)):
+            borrowed.set()
+            time.sleep(0.2)
+            returned_at.append(time.monotonic())
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    assert borrowed.wait(timeout=5)
+    assert reindex._swap_in(rebuild_dir, store_dir, timeout=5) is True
+    swapped_at = time.monotonic()
+    thread.join(timeout=5)
+
+    assert returned_at and swapped_at >= returned_at[0]
+    assert list(_live_docs(project)) == ["chapter:1:0"]
+    assert not os.path.exists(rebuild_dir)
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""core.utils.stage_journal 单元测试"""
+import json
+
+from core.utils import stage_journal
+from core.utils.stage_journal import StageJournal, make_fingerprint
+
+
+def _lines(journal):
+    with open(journal.path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_resume_reads_recorded_stages_back(tmp_path):
+    journal = StageJournal(str(tmp_path))
+    checkpoint = journal.begin_chapter(3, "fp")
+    checkpoint.record("prompt.short_summary", "前文摘要")
+    checkpoint.record("prompt.keyword_groups", ["甲 乙", "丙"])
+
+    # 模拟进程重启：从磁盘重新加载
+    reloaded = StageJournal(str(tmp_path))
+    assert reloaded.pending_chapters() == [3]
+    resumed = reloaded.begin_chapter(3, "fp")
+    assert resumed.lookup("prompt.short_summary") == (True, "前文摘要")
+    assert resumed.lookup("prompt.keyword_groups") == (True, ["甲 乙", "丙"])
+    assert resumed.lookup("draft.initial") == (False, None)
+    # 续用时不重写 begin 记录
+    assert [entry["kind"] for entry in _lines(reloaded)] == ["begin", "stage", "stage"]
+
+
+def test_changed_fingerprint_discards_checkpoints(tmp_path):
+    journal = StageJournal(str(tmp_path))
+    journal.begin_chapter(1, make_fingerprint({"word": 3000})).record("draft.initial", "草稿")
+
+    checkpoint = StageJournal(str(tmp_path)).begin_chapter(1, make_fingerprint({"word": 4000}))
+    assert checkpoint.completed_stages() == []
+
+
+def test_run_skips_completed_stage_and_honours_keep(tmp_path):
+    checkpoint = StageJournal(str(tmp_path)).begin_chapter(1, "fp")
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return "结果"
+
+    assert checkpoint.run("a", compute) == "结果"
+    assert checkpoint.run("a", compute) == "结果"
+    assert len(calls) == 1
+
+    checkpoint.run("b", lambda: "（出错）", keep=lambda output: not output.startswith("（"))
+    assert checkpoint.lookup("b") == (False, None)
+
+
+def test_corrupt_trailing_line_is_ignored(tmp_path):
+    journal = StageJournal(str(tmp_path))
+    journal.begin_chapter(2, "fp").record("prompt.short_summary", "摘要")
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"kind": "stage", "chapter": 2, "stage": "draft.ini')
+
+    reloaded = StageJournal(str(tmp_path))
+    assert reloaded.lookup(2, "prompt.short_summary") == (True, "摘要")
+    assert reloaded.lookup(2, "draft.initial") == (False, None)
+
+
+def test_completing_last_chapter_empties_journal(tmp_path):
+    journal = StageJournal(str(tmp_path))
+    journal.begin_chapter(1, "fp").record("draft.initial", "草稿")
+    journal.complete_chapter(1)
+
+    assert journal.pending_chapters() == []
+    assert _lines(journal) == []
+    # 已完成章节的记录不再接受写入
+    journal.record(1, "draft.initial", "迟到的输出")
+    assert StageJournal(str(tmp_path)).pending_chapters() == []
+
+
+def test_compaction_keeps_only_pending_chapters(tmp_path, monkeypatch):
+    monkeypatch.setattr(stage_journal, "_COMPACT_EVERY", 6)
+    journal = StageJournal(str(tmp_path))
+    journal.begin_chapter(1, "fp1").record("draft.initial", "第一章")
+    journal.begin_chapter(2, "fp2").record("draft.initial", "第二章")
+    journal.begin_chapter(3, "fp3").record("prompt.short_summary", "第三章摘要")
+    journal.complete_chapter(1)
+
+    assert _lines(journal) == [
+        {"kind": "begin", "chapter": 2, "fingerprint": "fp2"},
+        {"kind": "stage", "chapter": 2, "stage": "draft.initial", "output": "第二章"},
+        {"kind": "begin", "chapter": 3, "fingerprint": "fp3"},
+        {"kind": "stage", "chapter": 3, "stage": "prompt.short_summary", "output": "第三章摘要"},
+    ]
+    reloaded = StageJournal(str(tmp_path))
+    assert reloaded.pending_chapters() == [2, 3]
+    assert reloaded.begin_chapter(3, "fp3").lookup("prompt.short_summary") == (True, "第三章摘要")
+
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""core.utils.step_graph 单元测试"""
+import threading
+
+import pytest
+
+from core.utils.step_graph import Step, default_step_workers, run_step_graph
+
+
+def _noop(log):
+    pass
+
+
+def _fail(log):
+    raise RuntimeError("boom")
+
+
+def test_dependencies_run_in_order():
+    order = []
+    lock = threading.Lock()
+
+    def record(name):
+        def run(log):
+            with lock:
+                order.append(name)
+        return run
+
+    results = run_step_graph([
+        Step("c", record("c"), ("b",)),
+        Step("a", record("a")),
+        Step("b", record("b"), ("a",)),
+    ], max_workers=3)
+
+    assert results == {"a": None, "b": None, "c": None}
+    assert order == ["a", "b", "c"]
+
+
+def test_independent_steps_run_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+
+    def wait_for_peer(log):
+        barrier.wait()
+
+    results = run_step_graph([Step("a", wait_for_peer), Step("b", wait_for_peer)], max_workers=2)
+    assert results == {"a": None, "b": None}
+
+
+def test_failure_propagates_to_dependents_only():
+    results = run_step_graph([
+        Step("a", _fail),
+        Step("b", _noop, ("a",)),
+        Step("other", _noop),
+    ])
+
+    assert isinstance(results["a"], RuntimeError)
+    assert results["b"] is results["a"]
+    assert results["other"] is None
+
+
+def test_failed_chain_listed_out_of_order_is_not_a_cycle():
+    # C 排在 B 前面：B 因 A 失败被跳过后，C 也必须在同一轮被判定，而不是报循环依赖
+    ran = []
+    results = run_step_graph([
+        Step("A", _fail),
+        Step("C", lambda log: ran.append("C"), ("B",)),
+        Step("B", lambda log: ran.append("B"), ("A",)),
+    ])
+
+    assert set(results) == {"A", "B", "C"}
+    assert results["B"] is results["A"] and results["C"] is results["A"]
+    assert ran == []
+
+
+def test_step_logs_are_buffered_per_step():
+    lines = []
+
+    def chatty(name):
+        def run(log):
+            log(f"{name}-1")
+            log(f"{name}-2")
+        return run
+
+    run_step_graph([Step("a", chatty("a")), Step("b", chatty("b"))], max_workers=2, log=lines.append)
+
+    assert sorted(lines) == ["a-1", "a-2", "b-1", "b-2"]
+    for name in ("a", "b"):
+        assert lines.index(f"{name}-2") == lines.index(f"{name}-1") + 1
+
+
+def test_progress_reports_each_finished_step():
+    progress = []
+    run_step_graph(
+        [Step("a", _noop, label="步骤A"), Step("b", _noop, ("a",))],
+        on_progress=lambda label, done, total: progress.append((label, done, total)),
+    )
+    assert progress == [("步骤A", 1, 2), ("b", 2, 2)]
+
+
+def test_unknown_dependency_raises():
+    with pytest.raises(ValueError):
+        run_step_graph([Step("a", _noop, ("missing",))])
+
+
+def test_real_cycle_raises():
+    with pytest.raises(ValueError):
+        run_step_graph([Step("a", _noop, ("b",)), Step("b", _noop, ("a",))])
+
+
+def test_default_step_workers(monkeypatch):
+    monkeypatch.setenv("AUTONOVEL_TEST_WORKERS", "5")
+    assert default_step_workers("AUTONOVEL_TEST_WORKERS", 2) == 5
+    monkeypatch.setenv("AUTONOVEL_TEST_WORKERS", "0")
+    assert default_step_workers("AUTONOVEL_TEST_WORKERS", 2) == 1
+    monkeypatch.setenv("AUTONOVEL_TEST_WORKERS", "abc")
+    assert default_step_workers("AUTONOVEL_TEST_WORKERS", 2) == 2
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""core.utils.text_splitter 单元测试"""
+from core.utils.text_splitter import (
+    iter_chunk_spans,
+    iter_sentence_spans,
+    iter_sentences,
+    split_text,
+)
+
+TEXT = (
+    "　　林默推开门。屋里没有人！他低声问：“有人吗？”\n"
+    "\n"
+    "无人回应……窗外的雨越下越大；远处传来钟声。Then he left. 最后一句没有标点"
+)
+
+
+def _pieces(text, size):
+    """把文本切成固定长度的小块，模拟逐块读取的文件流"""
+    return (text[i:i + size] for i in range(0, len(text), size))
+
+
+def test_sentences_keep_trailing_quote_and_whitespace():
+    sentences = list(iter_sentences(TEXT))
+
+    assert sentences[2] == "他低声问：“有人吗？”\n\n"
+    assert sentences[-1] == "最后一句没有标点"
+    # 句子保留原文空白，拼接后与原文一致
+    assert "".join(sentences) == TEXT
+
+
+def test_sentence_offsets_point_into_original_text():
+    for offset, sentence in iter_sentence_spans(TEXT):
+        assert TEXT[offset:offset + len(sentence)] == sentence
+
+
+def test_streaming_input_matches_whole_text():
+    expected = list(iter_sentence_spans(TEXT))
+    # 块边界落在句末标点与右引号之间等位置时，结果不变
+    for size in (1, 2, 3, 7, 64):
+        assert list(iter_sentence_spans(_pieces(TEXT, size))) == expected
+
+
+def test_chunk_offsets_point_into_original_text():
+    chunks = list(iter_chunk_spans(iter_sentence_spans(TEXT), max_length=20))
+
+    assert len(chunks) > 1
+    for offset, chunk in chunks:
+        assert chunk == chunk.strip()
+        assert TEXT[offset:offset + len(chunk)] == chunk
+
+
+def test_streamed_chunk_offsets_match_whole_text():
+    whole = list(iter_chunk_spans(iter_sentence_spans(TEXT), max_length=20, overlap=8))
+    streamed = list(iter_chunk_spans(iter_sentence_spans(_pieces(TEXT, 5)), max_length=20, overlap=8))
+
+    assert streamed == whole
+
+
+def test_chunks_respect_max_length_and_do_not_insert_spaces():
+    text = "".join(f"第{i}句话。" for i in range(50))
+    chunks = split_text(text, max_length=30)
+
+    assert all(len(chunk) <= 30 for chunk in chunks)
+    assert "".join(chunks) == text
+
+
+def test_long_sentence_is_hard_split_with_offsets():
+    text = "开头一句。" + "长" * 95 + "。结尾。"
+    chunks = list(iter_chunk_spans(iter_sentence_spans(text), max_length=40))
+
+    assert all(len(chunk) <= 40 for _, chunk in chunks)
+    assert "".join(chunk for _, chunk in chunks) == text
+    for offset, chunk in chunks:
+        assert text[offset:offset + len(chunk)] == chunk
+
+
+def test_overlap_repeats_whole_trailing_sentences():
+    text = "甲甲甲甲。乙乙乙乙。丙丙丙丙。丁丁丁丁。"
+    chunks = split_text(text, max_length=10, overlap=5)
+
+    assert chunks == ["甲甲甲甲。乙乙乙乙。", "乙乙乙乙。丙丙丙丙。", "丙丙丙丙。丁丁丁丁。"]
+
+
+def test_blank_input_yields_nothing():
+    assert split_text("") == []
+    assert split_text("  \n\n ") == []
+    assert list(iter_sentence_spans(iter(["", "  ", "\n"]))) == []
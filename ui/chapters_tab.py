@@ -5,7 +5,7 @@ import customtkinter as ctk
 from tkinter import messagebox
 from ui.context_menu import TextWidgetContextMenu
 from core.utils.file_utils import read_file, save_string_to_txt, clear_file_content
-from core.utils.chapter_directory_parser import get_chapter_info_from_blueprint
+from core.utils.chapter_directory_parser import get_blueprint_index
 from ui.ios_theme import IOSColors, IOSLayout, IOSFonts
 
 def build_chapters_tab(self):
@@ -205,19 +205,14 @@ def update_chapter_info_display(self, chapter_number_str):
         chapter_num = int(chapter_number_str)
         filepath = self.filepath_var.get().strip()
 
-        # 读取 Novel_directory.txt 文件
-        directory_file = os.path.join(filepath, "Novel_directory.txt")
-        if not os.path.exists(directory_file):
-            set_info_text(f"📖 第{chapter_num}章")
-            return
-
-        blueprint_text = read_file(directory_file)
-        if not blueprint_text:
+        # 读取 Novel_directory.txt 的解析索引（文件未改动时复用缓存）
+        blueprint_index = get_blueprint_index(filepath)
+        if not blueprint_index:
             set_info_text(f"📖 第{chapter_num}章")
             return
 
         # 解析章节信息
-        chapter_info = get_chapter_info_from_blueprint(blueprint_text, chapter_num)
+        chapter_info = blueprint_index.get_chapter(chapter_num)
 
         # 构建显示文本
         display_parts = []
@@ -19,7 +19,7 @@ tooltips = {
                   "deepseek-reasoner：8192\n"+
                   "deepseek-chat：4096\n",
     "embedding_api_key": "调用Embedding模型时所需的API Key。",
-    "embedding_interface_format": "Embedding模型接口风格，比如OpenAI或Ollama。",
+    "embedding_interface_format": "Embedding模型接口风格，比如OpenAI或Ollama。选择Local则在本机CPU上用sentence-transformers推理，无需联网（首次使用需下载或指定本地模型目录）。",
     "embedding_url": "Embedding模型接口地址。",
     "embedding_model_name": "Embedding模型名称，如text-embedding-ada-002。",
     "embedding_retrieval_k": "向量检索时返回的Top-K结果数量。",
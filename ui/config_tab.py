@@ -7,6 +7,7 @@ import datetime
 import customtkinter as ctk
 
 from core.config.config_manager import load_config, save_config
+from core.adapters.llm_adapters import clear_llm_adapter_cache
 from ui.common import tooltips
 from ui.ios_theme import IOSFonts
 
@@ -498,6 +499,9 @@ def build_embeddings_config_tab(self):
             elif new_value == "SiliconFlow":
                 self.embedding_url_var.set("https://api.siliconflow.cn/v1/embeddings")
                 self.embedding_model_name_var.set("BAAI/bge-m3")
+            elif new_value == "Local":
+                self.embedding_url_var.set("")
+                self.embedding_model_name_var.set("sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
 
     for i in range(5):
         self.embeddings_config_tab.grid_rowconfigure(i, weight=0)
@@ -513,7 +517,7 @@ def build_embeddings_config_tab(self):
     # 2) Embedding 接口格式
     create_label_with_help(self, parent=self.embeddings_config_tab, label_text="Embedding 接口格式:", tooltip_key="embedding_intexrface_format", row=1, column=0, font=IOSFonts.get_font(12))
 
-    emb_interface_options = ["DeepSeek", "OpenAI", "Azure OpenAI", "Gemini", "Ollama", "ML Studio","SiliconFlow"]
+    emb_interface_options = ["DeepSeek", "OpenAI", "Azure OpenAI", "Gemini", "Ollama", "ML Studio","SiliconFlow", "Local"]
 
     emb_interface_dropdown = ctk.CTkOptionMenu(self.embeddings_config_tab, values=emb_interface_options, variable=self.embedding_interface_format_var, command=on_embedding_interface_changed, font=IOSFonts.get_font(12))
     emb_interface_dropdown.grid(row=1, column=1, padx=5, pady=5, sticky="nsew")
@@ -717,6 +721,9 @@ def build_proxy_setting_tab(self):
             os.environ.pop('HTTP_PROXY', None)
             os.environ.pop('HTTPS_PROXY', None)
 
+        # 已缓存的客户端在构造时读取代理环境变量，代理变更后需重建
+        clear_llm_adapter_cache()
+
     # 添加保存按钮
     save_btn = ctk.CTkButton(
         self.proxy_setting_tab,
@@ -16,12 +16,14 @@ from novel_generator import (
     Chapter_blueprint_generate,
     generate_chapter_draft,
     finalize_chapter,
-    import_knowledge_file,
+    import_knowledge_path,
     clear_vector_store,
+    rebuild_vector_store,
     enrich_chapter_text,
     build_chapter_prompt,
     check_chapter_in_vectorstore
 )
+from novel_generator.batch import ChapterPipeline, generate_chapter, generate_chapter_with_retry, pending_chapters
 from core.consistency.consistency_checker import check_consistency
 from ui.validation_utils import validate_chapter_continuity
 from ui.ios_theme import IOSFonts
@@ -111,6 +113,7 @@ def generate_chapter_blueprint_ui(self):
 
     number_of_chapters = self.safe_get_int(self.num_chapters_var, 10)
     num_volumes = self.safe_get_int(self.num_volumes_var, 0)
+    previous_tail_chapters = max(0, self.safe_get_int(self.blueprint_tail_chapters_var, 0))
 
     blueprint_llm_key = self.chapter_outline_llm_var.get()
     llm_config = self.loaded_config["llm_configs"][blueprint_llm_key]
@@ -143,7 +146,8 @@ def generate_chapter_blueprint_ui(self):
                 timeout=timeout_val,
                 user_guidance=user_guidance,  # 新增参数
                 use_global_system_prompt=None,  # 使用PromptManager配置
-                gui_log_callback=self.safe_log  # 传入GUI日志回调
+                gui_log_callback=self.safe_log,  # 传入GUI日志回调
+                previous_tail_chapters=previous_tail_chapters
             )
         except Exception:
             self.handle_exception("生成章节蓝图时出错")
@@ -332,7 +336,9 @@ def generate_chapter_draft_ui(self):
                 use_global_system_prompt=None,  # 使用PromptManager配置
                 num_volumes=num_volumes,  # 新增：传递分卷参数
                 total_chapters=total_chapters,  # 新增：传递总章节数
-                gui_log_callback=self.safe_log  # 传入GUI日志回调
+                gui_log_callback=self.safe_log,  # 传入GUI日志回调
+                stream_callback=self.begin_chapter_stream(),  # 流式片段实时显示到章节文本框
+                stream_reset_callback=self.begin_chapter_stream  # 流式内容作废时清空文本框
             )
             if draft_text:
                 self.safe_log(f"✅ 第{chap_num}章草稿已保存，请在左侧查看或编辑。")
@@ -411,7 +417,7 @@ def finalize_chapter_ui(self):
                             "重复定稿确认",
                             f"⚠️ 第{chap_num}章已在向量库中，疑似已定稿过！\n\n"
                             f"重复定稿将导致：\n"
-                            f"1. 向量库重复存储相同内容（污染检索）\n"
+                            f"1. 向量库中该章内容被替换为当前文本\n"
                             f"2. 摘要和角色状态可能重复更新\n\n"
                             f"是否继续？建议检查章节号是否正确",
                             timeout=30.0,
@@ -419,7 +425,7 @@ def finalize_chapter_ui(self):
                         )
 
                         if not confirmed:
-                            self.safe_log(f"❌ 用户取消了第{chap_num}章定稿，避免重复写入向量库。")
+                            self.safe_log(f"❌ 用户取消了第{chap_num}章定稿。")
                             return
                 except Exception as e:
                     # 检查失败时记录日志但不阻止定稿（避免因向量库问题导致无法定稿）
@@ -712,6 +718,7 @@ def generate_batch_ui(self):
 
     # 2. 定义后台任务
     def batch_task():
+        pipeline = None
         try:
             # 初始化取消标志
             self.init_batch_cancel_flag()
@@ -739,10 +746,14 @@ def generate_batch_ui(self):
             chapters_dir = os.path.join(filepath, "chapters")
             os.makedirs(chapters_dir, exist_ok=True)
 
+            # 检查点日志中未完成的章节（上次中断）直接续跑，不算作冲突
+            resumable = pending_chapters(filepath)
             existing_chapters = []
             for i in range(start, end + 1):
                 chapter_file = os.path.join(chapters_dir, f"chapter_{i}.txt")
-                if os.path.exists(chapter_file):
+                if i in resumable:
+                    self.safe_log(f"♻️ 第{i}章上次未完成，将从检查点续跑")
+                elif os.path.exists(chapter_file):
                     existing_chapters.append(i)
 
             # 如果有冲突章节，弹出对话框 - 使用异步对话框
@@ -788,6 +799,10 @@ def generate_batch_ui(self):
             failed = False  # 标记是否有失败
             cancelled = False  # 标记是否被取消
             actual_total = total - len(skip_chapters)  # 实际需要处理的章节数
+            to_generate = [n for n in range(start, end + 1) if n not in skip_chapters]
+
+            # 流水线：第N章定稿的同时预取第N+1章上下文
+            pipeline = ChapterPipeline(batch_context, word, min_word, auto_enrich)
 
             for i in range(start, end + 1):
                 # 检查是否被取消
@@ -809,6 +824,9 @@ def generate_batch_ui(self):
                 self.safe_log(f"▶▶▶ 第{i}章 [{processed_count + 1}/{actual_total}] 开始处理")
                 self.safe_log("━" * 70 + "\n")
 
+                position = to_generate.index(i)
+                next_chapter = to_generate[position + 1] if position + 1 < len(to_generate) else None
+
                 try:
                     # 调用单章生成函数（带重试机制）
                     generate_chapter_batch_with_retry(
@@ -819,7 +837,9 @@ def generate_batch_ui(self):
                         min_word=min_word,
                         auto_enrich=auto_enrich,
                         current_index=processed_count + 1,
-                        total=actual_total
+                        total=actual_total,
+                        pipeline=pipeline,
+                        next_chapter=next_chapter
                     )
 
                     # 成功后递增计数
@@ -863,6 +883,9 @@ def generate_batch_ui(self):
         except Exception as e:
             self.handle_exception("批量生成时出错")
         finally:
+            # 等待未完成的预取任务并释放线程
+            if pipeline is not None:
+                pipeline.close()
             # 清除取消标志
             self.clear_batch_cancel_flag()
             # 隐藏进度条
@@ -882,10 +905,12 @@ def generate_chapter_batch_with_retry(
     min_word: int,
     auto_enrich: bool,
     current_index: int,
-    total: int
+    total: int,
+    pipeline=None,
+    next_chapter=None
 ):
     """
-    单章批量生成函数（带重试机制）
+    单章批量生成函数（带重试机制，最多重试1次）
 
     Args:
         batch_context: 批量生成上下文
@@ -895,40 +920,22 @@ def generate_chapter_batch_with_retry(
         auto_enrich: 是否自动扩写
         current_index: 当前处理索引（用于进度显示）
         total: 总章节数
+        pipeline: 批量流水线（ChapterPipeline），为 None 时串行执行
+        next_chapter: 下一个要生成的章节号，本章定稿期间预取其上下文
     """
-    max_retries = 1  # 最多重试1次
-
-    for attempt in range(max_retries + 1):
-        try:
-            if attempt > 0:
-                self.safe_log(f"\n🔄 第{chapter_num}章生成失败，开始第{attempt}次重试...\n")
-
-            # 调用单章生成核心逻辑
-            generate_single_chapter_batch(
-                self,
-                batch_context=batch_context,
-                chapter_num=chapter_num,
-                word=word,
-                min_word=min_word,
-                auto_enrich=auto_enrich,
-                current_index=current_index,
-                total=total
-            )
-
-            # 成功则退出
-            return
-
-        except Exception as e:
-            if attempt < max_retries:
-                self.safe_log(f"⚠️  生成出错: {str(e)}")
-                self.safe_log(f"   准备重试...")
-
-                # 如果生成过程中已经污染了向量库，需要回滚
-                # 但由于向量库没有事务机制，我们在第二次尝试时避免更新向量库
-                continue
-            else:
-                # 重试后仍失败，抛出异常
-                raise Exception(f"生成失败（已重试{max_retries}次）: {str(e)}")
+    generate_chapter_with_retry(
+        batch_context,
+        chapter_num,
+        word,
+        min_word,
+        auto_enrich,
+        log=self.safe_log,
+        progress=lambda msg, pct: self.update_chapter_progress(msg, pct),
+        begin_stream=self.begin_chapter_stream,  # 流式片段实时显示到章节文本框
+        max_retries=1,
+        pipeline=pipeline,
+        next_chapter=next_chapter
+    )
 
 
 def generate_single_chapter_batch(
@@ -942,236 +949,35 @@ def generate_single_chapter_batch(
     total: int
 ):
     """
-    单章批量生成核心逻辑（不含重试）
-
-    包含3个阶段:
-    1. 构建提示词（含向量检索）
-    2. 生成草稿
-    3. 定稿章节
+    单章批量生成核心逻辑（不含重试），实现见 novel_generator.batch.generate_chapter
     """
-    draft_config = batch_context["draft"]
-    finalize_config = batch_context["finalize"]
-    embedding_config = batch_context["embedding"]
-
-    filepath = batch_context["filepath"]
-    user_guidance = batch_context["user_guidance"]
-    char_inv = batch_context["characters_involved"]
-    key_items = batch_context["key_items"]
-    scene_loc = batch_context["scene_location"]
-    time_constr = batch_context["time_constraint"]
-    char_text = batch_context["char_inv_text"]
-    num_volumes = batch_context["num_volumes"]
-    total_chapters = batch_context["total_chapters"]
-
-    draft_interface_format = draft_config["interface_format"]
-    draft_api_key = draft_config["api_key"]
-    draft_base_url = draft_config["base_url"]
-    draft_model_name = draft_config["model_name"]
-    draft_temperature = draft_config["temperature"]
-    draft_max_tokens = draft_config["max_tokens"]
-    draft_timeout = draft_config["timeout"]
-
-    finalize_interface_format = finalize_config["interface_format"]
-    finalize_api_key = finalize_config["api_key"]
-    finalize_base_url = finalize_config["base_url"]
-    finalize_model_name = finalize_config["model_name"]
-    finalize_temperature = finalize_config["temperature"]
-    finalize_max_tokens = finalize_config["max_tokens"]
-    finalize_timeout = finalize_config["timeout"]
-
-    embedding_api_key = embedding_config["api_key"]
-    embedding_url = embedding_config["url"]
-    embedding_interface_format = embedding_config["interface_format"]
-    embedding_model_name = embedding_config["model_name"]
-    embedding_k = embedding_config["k"]
-
-    # ========== 阶段1: 构建提示词（含向量检索） ==========
-    # 进度范围: 0% → 35% (在 build_chapter_prompt 内部更新)
-    self.safe_log("▶ [阶段1/3] 构建章节提示词")
-
-    prompt_text = build_chapter_prompt(
-        api_key=draft_api_key,
-        base_url=draft_base_url,
-        model_name=draft_model_name,
-        filepath=filepath,
-        novel_number=chapter_num,
-        word_number=word,
-        temperature=draft_temperature,
-        user_guidance=user_guidance,
-        characters_involved=char_inv,
-        key_items=key_items,
-        scene_location=scene_loc,
-        time_constraint=time_constr,
-        embedding_api_key=embedding_api_key,
-        embedding_url=embedding_url,
-        embedding_interface_format=embedding_interface_format,
-        embedding_model_name=embedding_model_name,
-        embedding_retrieval_k=embedding_k,
-        interface_format=draft_interface_format,
-        max_tokens=draft_max_tokens,
-        timeout=draft_timeout,
-        system_prompt=resolve_global_system_prompt(),  # 从PromptManager读取配置
-        num_volumes=num_volumes,  # 新增：传递分卷数量
-        total_chapters=total_chapters,  # 新增：传递总章节数
-        gui_log_callback=self.safe_log,  # 传入回调，显示向量检索详情
-        progress_callback=lambda msg, pct: self.update_chapter_progress(msg, pct)  # 🆕 进度回调
+    return generate_chapter(
+        batch_context,
+        chapter_num,
+        word,
+        min_word,
+        auto_enrich,
+        log=self.safe_log,
+        progress=lambda msg, pct: self.update_chapter_progress(msg, pct),
+        begin_stream=self.begin_chapter_stream
     )
 
-    # 处理角色库
-    final_prompt = prompt_text
-    # 兼容逗号和换行两种分隔符
-    role_names = []
-    if ',' in char_text:
-        # 逗号分隔格式（与单章流程一致）
-        role_names = [name.strip() for name in char_text.split(',') if name.strip()]
-    else:
-        # 换行分隔格式
-        role_names = [name.strip() for name in char_text.split("\n") if name.strip()]
-
-    role_lib_path = os.path.join(filepath, "角色库")
-    role_contents = []
-
-    if os.path.exists(role_lib_path):
-        for root, dirs, files in os.walk(role_lib_path):
-            for file in files:
-                if file.endswith(".txt") and os.path.splitext(file)[0] in role_names:
-                    file_path = os.path.join(root, file)
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            role_contents.append(f.read().strip())
-                    except Exception as e:
-                        self.safe_log(f"读取角色文件 {file} 失败: {str(e)}")
-
-    if role_contents:
-        role_content_str = "\n".join(role_contents)
-        placeholder_variations = [
-            "核心人物(可能未指定)：{characters_involved}",
-            "核心人物：{characters_involved}",
-            "核心人物(可能未指定):{characters_involved}",
-            "核心人物:{characters_involved}"
-        ]
-
-        for placeholder in placeholder_variations:
-            if placeholder in final_prompt:
-                final_prompt = final_prompt.replace(
-                    placeholder,
-                    f"核心人物：\n{role_content_str}"
-                )
-                break
-        else:
-            lines = final_prompt.split('\n')
-            for idx, line in enumerate(lines):
-                if "核心人物" in line and "：" in line:
-                    lines[idx] = f"核心人物：\n{role_content_str}"
-                    break
-            final_prompt = '\n'.join(lines)
-
-    # ========== 阶段2: 生成草稿 ==========
-    # 进度范围: 35% → 65%
-    self.safe_log("\n▶ [阶段2/3] 生成章节草稿")
-    self.update_chapter_progress("✍️ 生成草稿中...", 0.35)
-
-    draft_text = generate_chapter_draft(
-        api_key=draft_api_key,
-        base_url=draft_base_url,
-        model_name=draft_model_name,
-        filepath=filepath,
-        novel_number=chapter_num,
-        word_number=word,
-        temperature=draft_temperature,
-        user_guidance=user_guidance,
-        characters_involved=char_inv,
-        key_items=key_items,
-        scene_location=scene_loc,
-        time_constraint=time_constr,
-        embedding_api_key=embedding_api_key,
-        embedding_url=embedding_url,
-        embedding_interface_format=embedding_interface_format,
-        embedding_model_name=embedding_model_name,
-        embedding_retrieval_k=embedding_k,
-        interface_format=draft_interface_format,
-        max_tokens=draft_max_tokens,
-        timeout=draft_timeout,
-        custom_prompt_text=final_prompt,
-        use_global_system_prompt=None,  # 使用PromptManager配置
-        num_volumes=num_volumes,  # 新增：传递分卷参数
-        total_chapters=total_chapters,  # 新增：传递总章节数
-        gui_log_callback=self.safe_log  # 传入回调
-    )
-
-    # 草稿生成完成
-    self.update_chapter_progress("✅ 草稿生成完成", 0.50)
-
-    # 检查字数并扩写
-    chapters_dir = os.path.join(filepath, "chapters")
-    os.makedirs(chapters_dir, exist_ok=True)
-    chapter_path = os.path.join(chapters_dir, f"chapter_{chapter_num}.txt")
-
-    self.safe_log(f"   ├─ 检查字数: {len(draft_text)}字 (目标{min_word}字)")
-    if len(draft_text) < 0.7 * min_word and auto_enrich:
-        self.safe_log(f"\n⚠️  字数不足 ({len(draft_text)}/{min_word})")
-        self.safe_log("   ├─ 启动自动扩写...")
-        self.update_chapter_progress("🔄 扩写中...", 0.55)
-
-        enriched = enrich_chapter_text(
-            chapter_text=draft_text,
-            word_number=word,
-            api_key=draft_api_key,
-            base_url=draft_base_url,
-            model_name=draft_model_name,
-            temperature=draft_temperature,
-            interface_format=draft_interface_format,
-            max_tokens=draft_max_tokens,
-            timeout=draft_timeout,
-            use_global_system_prompt=None  # 使用PromptManager配置
-        )
-        draft_text = enriched
-        self.safe_log(f"   └─ ✅ 扩写完成 (现{len(draft_text)}字)\n")
-
-    # 保存草稿
-    clear_file_content(chapter_path)
-    save_string_to_txt(draft_text, chapter_path)
-
-    self.update_chapter_progress("✅ 草稿完成", 0.65)
-
-    # ========== 阶段3: 定稿章节 ==========
-    # 进度范围: 65% → 100% (在 finalize_chapter 内部更新)
-    self.safe_log("\n▶ [阶段3/3] 章节定稿")
-
-    success = finalize_chapter(
-        novel_number=chapter_num,
-        word_number=word,
-        api_key=finalize_api_key,
-        base_url=finalize_base_url,
-        model_name=finalize_model_name,
-        temperature=finalize_temperature,
-        filepath=filepath,
-        embedding_api_key=embedding_api_key,
-        embedding_url=embedding_url,
-        embedding_interface_format=embedding_interface_format,
-        embedding_model_name=embedding_model_name,
-        interface_format=finalize_interface_format,
-        max_tokens=finalize_max_tokens,
-        timeout=finalize_timeout,
-        use_global_system_prompt=None,  # 使用PromptManager配置
-        num_volumes=num_volumes,  # 新增：传递分卷参数
-        total_chapters=total_chapters,  # 新增：传递总章节数
-        gui_log_callback=self.safe_log,  # 传入回调
-        progress_callback=lambda msg, pct: self.update_chapter_progress(msg, pct)  # 🆕 进度回调
-    )
-
-    if success:
-        self.safe_log(f"✅ 第 {chapter_num} 章定稿完成")
-    else:
-        self.safe_log(f"⚠️ 第 {chapter_num} 章定稿失败（章节内容为空）")
-
 
 def import_knowledge_handler(self):
-    selected_file = tk.filedialog.askopenfilename(
-        title="选择要导入的知识库文件",
-        filetypes=[("Text Files", "*.txt"), ("All Files", "*.*")]
+    import_folder = messagebox.askyesnocancel(
+        "导入知识库",
+        "是否导入整个文件夹？\n\n是：选择文件夹（递归导入其中的 .txt / .md 文件）\n否：选择单个文件"
     )
-    if selected_file:
+    if import_folder is None:
+        return
+    if import_folder:
+        selected_path = tk.filedialog.askdirectory(title="选择要导入的知识库文件夹")
+    else:
+        selected_path = tk.filedialog.askopenfilename(
+            title="选择要导入的知识库文件",
+            filetypes=[("Text Files", "*.txt"), ("All Files", "*.*")]
+        )
+    if selected_path:
         emb_api_key = self.embedding_api_key_var.get().strip()
         emb_url = self.embedding_url_var.get().strip()
         emb_format = self.embedding_interface_format_var.get().strip()
@@ -1181,48 +987,21 @@ def import_knowledge_handler(self):
         def task():
             self.disable_button_safe(self.btn_import_knowledge)
             try:
-                # 尝试不同编码读取文件
-                content = None
-                encodings = ['utf-8', 'gbk', 'gb2312', 'ansi']
-                for encoding in encodings:
-                    try:
-                        with open(selected_file, 'r', encoding=encoding) as f:
-                            content = f.read()
-                            break
-                    except UnicodeDecodeError:
-                        continue
-                    except Exception as e:
-                        self.safe_log(f"读取文件时发生错误: {str(e)}")
-                        raise
-
-                if content is None:
-                    raise Exception("无法以任何已知编码格式读取文件")
-
-                # 创建临时UTF-8文件
-                import tempfile
-                import os
-                with tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', delete=False, suffix='.txt') as temp:
-                    temp.write(content)
-                    temp_path = temp.name
-
-                try:
-                    self.safe_log(f"开始导入知识库文件: {selected_file}")
-                    import_knowledge_file(
-                        embedding_api_key=emb_api_key,
-                        embedding_url=emb_url,
-                        embedding_interface_format=emb_format,
-                        embedding_model_name=emb_model,
-                        file_path=temp_path,
-                        filepath=filepath
-                    )
-                    self.safe_log("✅ 知识库文件导入完成。")
-                finally:
-                    # 清理临时文件
-                    try:
-                        os.unlink(temp_path)
-                    except:
-                        pass
-
+                # 编码探测（UTF-8 / GBK）、分块流式读取与断点续传均在导入函数内完成
+                self.safe_log(f"开始导入知识库: {selected_path}")
+                summary = import_knowledge_path(
+                    embedding_api_key=emb_api_key,
+                    embedding_url=emb_url,
+                    embedding_interface_format=emb_format,
+                    embedding_model_name=emb_model,
+                    path=selected_path,
+                    filepath=filepath,
+                    log_callback=self.safe_log
+                )
+                if summary["failed"]:
+                    self.safe_log("⚠️ 部分知识文件导入失败，重新导入同一路径即可从断点继续。")
+                else:
+                    self.safe_log("✅ 知识库导入完成。")
             except Exception:
                 self.handle_exception("导入知识库时出错")
             finally:
@@ -1254,6 +1033,56 @@ def clear_vectorstore_handler(self):
             except Exception as e:
                 messagebox.showerror("错误", f"清空向量库失败: {str(e)}")
 
+def rebuild_vectorstore_handler(self):
+    filepath = self.filepath_var.get().strip()
+    if not filepath:
+        messagebox.showwarning("警告", "请先配置保存文件路径。")
+        return
+
+    confirm = messagebox.askyesno(
+        "重建向量库",
+        "将用当前 Embedding 配置，从 chapters/ 下的定稿章节和卷摘要重新构建向量库，"
+        "完成后替换现有向量库（已导入的知识库分块会一并迁移）。\n\n"
+        "重建期间请勿定稿章节；中途失败不影响现有向量库，再次重建会从断点继续。\n\n确定开始吗？"
+    )
+    if not confirm:
+        return
+
+    emb_api_key = self.embedding_api_key_var.get().strip()
+    emb_url = self.embedding_url_var.get().strip()
+    emb_format = self.embedding_interface_format_var.get().strip()
+    emb_model = self.embedding_model_name_var.get().strip()
+    num_volumes = self.safe_get_int(self.num_volumes_var, 0)
+    total_chapters = self.safe_get_int(self.num_chapters_var, 0)
+
+    def task():
+        self.disable_button_safe(self.btn_rebuild_vectorstore)
+        try:
+            summary = rebuild_vector_store(
+                embedding_api_key=emb_api_key,
+                embedding_url=emb_url,
+                embedding_interface_format=emb_format,
+                embedding_model_name=emb_model,
+                filepath=filepath,
+                num_volumes=num_volumes,
+                total_chapters=total_chapters,
+                log_callback=self.safe_log
+            )
+            if summary["status"] == "ok":
+                from novel_generator.vectorstore_monitor import clear_stats
+                clear_stats(filepath)  # 旧库的检索统计不再适用
+        except Exception:
+            self.handle_exception("重建向量库时出错")
+        finally:
+            self.enable_button_safe(self.btn_rebuild_vectorstore)
+
+    try:
+        thread = threading.Thread(target=task, daemon=True)
+        thread.start()
+    except Exception as e:
+        self.enable_button_safe(self.btn_rebuild_vectorstore)
+        messagebox.showerror("错误", f"线程启动失败: {str(e)}")
+
 def show_vectorstore_report(self):
     """显示向量库质量报告"""
     filepath = self.filepath_var.get().strip()
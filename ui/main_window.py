@@ -22,6 +22,7 @@ from core.utils.volume_utils import validate_volume_config as validate_vol_confi
 
 # 导入任务队列管理器
 from core.utils.task_queue import init_task_manager
+from core.utils.rate_limiter import configure_rate_limits_from_config
 from core.utils.async_dialog import init_dialog_helper
 
 ICON_PATH = Path(__file__).resolve().parents[1] / "assets" / "icons" / "app.ico"
@@ -45,6 +46,7 @@ from ui.generation_handlers import (
     do_consistency_check,
     import_knowledge_handler,
     clear_vectorstore_handler,
+    rebuild_vectorstore_handler,
     show_plot_arcs_ui,
     generate_batch_ui,
     show_vectorstore_report
@@ -95,6 +97,8 @@ class NovelGeneratorGUI:
         # --------------- 配置文件路径 ---------------
         self.config_file = "config.json"
         self.loaded_config = load_config(self.config_file)
+        # 应用各 LLM 配置中可选的 rpm/tpm 限流预算（进程级，按 base_url 共享）
+        configure_rate_limits_from_config(self.loaded_config)
 
         # 获取上次选中的LLM配置名
         last_selected_llm_config = self.loaded_config.get("last_selected_llm_config", None)
@@ -176,6 +180,7 @@ class NovelGeneratorGUI:
             self.genre_var = ctk.StringVar(value=op.get("genre", "玄幻"))
             self.num_chapters_var = ctk.StringVar(value=str(op.get("num_chapters", 10)))
             self.num_volumes_var = ctk.StringVar(value=str(op.get("num_volumes", 0)))  # 新增：分卷数量
+            self.blueprint_tail_chapters_var = ctk.StringVar(value=str(op.get("blueprint_tail_chapters", 0)))
             self.word_number_var = ctk.StringVar(value=str(op.get("word_number", 3000)))
             self.filepath_var = ctk.StringVar(value=op.get("filepath", ""))
             self.chapter_num_var = ctk.StringVar(value=str(op.get("chapter_num", "1")))
@@ -196,6 +201,7 @@ class NovelGeneratorGUI:
             self.genre_var = ctk.StringVar(value="玄幻")
             self.num_chapters_var = ctk.StringVar(value="10")
             self.num_volumes_var = ctk.StringVar(value="0")  # 新增：分卷数量默认为0（不分卷）
+            self.blueprint_tail_chapters_var = ctk.StringVar(value="0")
             self.word_number_var = ctk.StringVar(value="3000")
             self.filepath_var = ctk.StringVar(value="")
             self.chapter_num_var = ctk.StringVar(value="1")
@@ -408,6 +414,18 @@ class NovelGeneratorGUI:
         self.chapter_result.insert("0.0", text)
         self.chapter_result.see("end")
 
+    def append_chapter_stream_safe(self, chunk: str):
+        """线程安全地把流式生成的片段追加到章节文本框末尾"""
+        def _append():
+            self.chapter_result.insert("end", chunk)
+            self.chapter_result.see("end")
+        self.master.after(0, _append)
+
+    def begin_chapter_stream(self):
+        """开始流式生成前清空章节文本框，并返回供生成函数使用的片段回调"""
+        self.master.after(0, lambda: self.chapter_result.delete("0.0", "end"))
+        return self.append_chapter_stream_safe
+
     # ========== 进度条控制方法 ==========
     def show_progress_bars(self):
         """显示进度条区域"""
@@ -530,6 +548,11 @@ class NovelGeneratorGUI:
     def browse_folder(self):
         selected_dir = filedialog.askdirectory()
         if selected_dir:
+            previous_dir = self.filepath_var.get().strip()
+            if previous_dir and os.path.abspath(previous_dir) != os.path.abspath(selected_dir):
+                # 切换项目：释放旧项目的向量库句柄
+                from novel_generator.vectorstore_utils import close_vector_store
+                close_vector_store(previous_dir)
             self.filepath_var.set(selected_dir)
             # 自动加载项目信息
             self.auto_load_project_info(selected_dir)
@@ -760,6 +783,7 @@ class NovelGeneratorGUI:
                 "genre": self.genre_var.get().strip(),
                 "num_chapters": self.safe_get_int(self.num_chapters_var, 10),
                 "num_volumes": self.safe_get_int(self.num_volumes_var, 0),  # 新增：保存分卷数量
+                "blueprint_tail_chapters": self.safe_get_int(self.blueprint_tail_chapters_var, 0),
                 "word_number": self.safe_get_int(self.word_number_var, 3000),
                 "filepath": self.filepath_var.get().strip(),
                 "chapter_num": self.chapter_num_var.get().strip(),
@@ -978,6 +1002,7 @@ class NovelGeneratorGUI:
     generate_batch_ui = generate_batch_ui
     import_knowledge_handler = import_knowledge_handler
     clear_vectorstore_handler = clear_vectorstore_handler
+    rebuild_vectorstore_handler = rebuild_vectorstore_handler
     show_vectorstore_report = show_vectorstore_report
     show_plot_arcs_ui = show_plot_arcs_ui
     load_novel_architecture = load_novel_architecture
@@ -114,6 +114,12 @@ def build_novel_params_area(self, start_row=1):
     self.num_volumes_lock_label = ctk.CTkLabel(num_volumes_container, text="", font=IOSFonts.get_font(14), text_color="gray", width=20)
     self.num_volumes_lock_label.pack(side="left")
 
+    # 卷间衔接章数（分卷生成蓝图时附上上一卷最后几章蓝图，大于0时各卷依次生成）
+    tail_chapters_label = ctk.CTkLabel(chapter_word_frame, text="衔接章数:", font=IOSFonts.get_font(12))
+    tail_chapters_label.grid(row=0, column=6, padx=(10, 3), pady=3, sticky="e")
+    tail_chapters_entry = ctk.CTkEntry(chapter_word_frame, textvariable=self.blueprint_tail_chapters_var, width=40, font=IOSFonts.get_font(12))
+    tail_chapters_entry.grid(row=0, column=7, padx=3, pady=3, sticky="w")
+
     # 绑定验证事件
     self.num_chapters_entry.bind("<FocusOut>", self.validate_volume_config)
     self.num_volumes_entry.bind("<FocusOut>", self.validate_volume_config)
@@ -271,6 +277,16 @@ def build_optional_buttons_area(self, start_row=2):
     )
     self.btn_vectorstore_report.grid(row=1, column=2, padx=3, pady=3, sticky="ew")
 
+    # ========== 第三行 ==========
+    self.btn_rebuild_vectorstore = ctk.CTkButton(
+        self.optional_btn_frame,
+        text="重建向量库",
+        command=self.rebuild_vectorstore_handler,
+        font=IOSFonts.get_font(11),
+        height=30
+    )
+    self.btn_rebuild_vectorstore.grid(row=2, column=0, padx=3, pady=3, sticky="ew")
+
 def create_label_with_help_for_novel_params(self, parent, label_text, tooltip_key, row, column, font=None, sticky="e", padx=5, pady=5):
     frame = ctk.CTkFrame(parent)
     frame.grid(row=row, column=column, padx=padx, pady=pady, sticky=sticky)
@@ -323,6 +339,7 @@ def setup_novel_params_change_listeners(self):
     self.genre_var.trace_add("write", mark_unsaved)
     self.num_chapters_var.trace_add("write", mark_unsaved)
     self.num_volumes_var.trace_add("write", mark_unsaved)
+    self.blueprint_tail_chapters_var.trace_add("write", mark_unsaved)
     self.word_number_var.trace_add("write", mark_unsaved)
     self.filepath_var.trace_add("write", mark_unsaved)
     self.chapter_num_var.trace_add("write", mark_unsaved)
@@ -10,7 +10,7 @@ import customtkinter as ctk
 from tkinter import messagebox, filedialog
 import logging
 from string import Formatter
-from core.prompting.prompt_manager import PromptManager
+from core.prompting.prompt_manager import get_shared_prompt_manager
 from ui.ios_theme import IOSColors, IOSLayout, IOSStyles, IOSFonts
 
 class PromptManagerTab(ctk.CTkFrame):
@@ -93,7 +93,8 @@ class PromptManagerTab(ctk.CTkFrame):
 
     def __init__(self, parent):
         super().__init__(parent, fg_color=IOSColors.BG_PRIMARY)
-        self.pm = PromptManager()
+        # 与生成流程共用同一实例：保存/启停/重置直接刷新生成时使用的模板缓存
+        self.pm = get_shared_prompt_manager()
         self.current_category = None
         self.current_module = None
         self.is_modified = False  # 跟踪是否有未保存的修改
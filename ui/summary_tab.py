@@ -3,7 +3,7 @@
 import os
 import customtkinter as ctk
 from tkinter import messagebox
-from core.utils.file_utils import read_file, save_string_to_txt, clear_file_content
+from core.utils.file_utils import read_file_cached, save_string_to_txt, clear_file_content
 from ui.context_menu import TextWidgetContextMenu
 from ui.ios_theme import IOSColors, IOSLayout, IOSStyles
 
@@ -50,7 +50,7 @@ def load_global_summary(self):
         messagebox.showwarning("警告", "请先设置保存文件路径")
         return
     filename = os.path.join(filepath, "global_summary.txt")
-    content = read_file(filename)
+    content = read_file_cached(filename)
     self.summary_text.delete("0.0", "end")
     self.summary_text.insert("0.0", content)
     self.log("已加载 global_summary.txt 到编辑区。")
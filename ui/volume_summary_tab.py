@@ -4,7 +4,7 @@ import os
 import glob
 import customtkinter as ctk
 from tkinter import messagebox
-from core.utils.file_utils import read_file, save_string_to_txt, clear_file_content
+from core.utils.file_utils import read_file_cached, save_string_to_txt, clear_file_content
 from ui.context_menu import TextWidgetContextMenu
 from ui.ios_theme import IOSColors, IOSLayout, IOSStyles, IOSFonts
 
@@ -145,7 +145,7 @@ def load_volume_summary(self, volume_number=None):
         volume_number = self.current_volume_number
 
     filename = os.path.join(filepath, f"volume_{volume_number}_summary.txt")
-    content = read_file(filename)
+    content = read_file_cached(filename)
 
     if content.strip():
         self.volume_summary_text.delete("0.0", "end")